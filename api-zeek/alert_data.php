@@ -1,5 +1,20 @@
 <?php
 // /usr/local/www/zeek-api/alert_data.php
+//
+// Modos de leitura (parâmetro "mode"):
+//   tail  (padrão) - as últimas `maxlines` linhas do log, em ordem cronológica.
+//                    O arquivo é lido do fim para o início em blocos, sem carregar o log inteiro.
+//   head           - as primeiras `maxlines` linhas (comportamento antigo).
+//   Com "offset" (cursor em bytes), lê para frente a partir do cursor até `maxlines`
+//   linhas completas - usado para buscar apenas as linhas novas desde a última chamada.
+//
+// Toda resposta inclui "next_offset" (posição logo após a última linha completa lida)
+// e "inode" do arquivo. Para polling incremental, reenvie offset=next_offset e inode=inode:
+// se o log foi rotacionado (inode diferente) ou truncado (offset > tamanho), a leitura
+// recomeça do início do arquivo novo e a resposta traz "rotated": true.
+//
+// format=ndjson transmite um registro JSON por linha à medida que é lido; a última linha
+// é {"_meta": {...}} com os mesmos metadados da resposta JSON (next_offset, inode, ...).
 header('Content-Type: application/json');
 
 // --- AUTENTICAÇÃO ---
@@ -13,8 +28,16 @@ if ($apiKey !== 'Bearer y1X6Qn8PpV9jR4kM0wBz7Tf2GhUs3Lc8NrDq5Ke1HxYi0AzF7Gv9MbX2
 // --- PARÂMETROS ---
 $logfile = $_POST['logfile'] ?? $_GET['logfile'] ?? 'notice.log';
 $maxlines = (int)($_POST['maxlines'] ?? $_GET['maxlines'] ?? 50);
+$mode = $_POST['mode'] ?? $_GET['mode'] ?? 'tail';
+$offsetParam = $_POST['offset'] ?? $_GET['offset'] ?? null;
+$inodeParam = $_POST['inode'] ?? $_GET['inode'] ?? null;
+$format = $_POST['format'] ?? $_GET['format'] ?? 'json';
 $logDir = '/usr/local/spool/zeek/';
 
+// Limites de segurança
+$maxlines = max(1, min($maxlines, 100000));
+$blockSize = 65536;
+
 // --- VALIDAÇÃO DE LOG ---
 $validLogs = ['notice.log', 'http.log', 'dns.log', 'conn.log', 'ssl.log', 'files.log', 'weird.log', 'reporter.log'];
 if (!in_array($logfile, $validLogs)) {
@@ -22,6 +45,21 @@ if (!in_array($logfile, $validLogs)) {
     echo json_encode(['error' => 'Invalid log file']);
     exit;
 }
+if (!in_array($mode, ['tail', 'head'])) {
+    http_response_code(400);
+    echo json_encode(['error' => 'Invalid mode']);
+    exit;
+}
+if (!in_array($format, ['json', 'ndjson'])) {
+    http_response_code(400);
+    echo json_encode(['error' => 'Invalid format']);
+    exit;
+}
+if ($offsetParam !== null && $offsetParam !== '' && (!ctype_digit((string)$offsetParam))) {
+    http_response_code(400);
+    echo json_encode(['error' => 'Invalid offset']);
+    exit;
+}
 
 $logFile = $logDir . $logfile;
 if (!file_exists($logFile)) {
@@ -30,67 +68,174 @@ if (!file_exists($logFile)) {
     exit;
 }
 
-// --- FUNÇÃO PARA PARSEAR TSV DO ZEEK ---
-function parseZeekLog($filepath, $maxlines) {
-    $lines = file($filepath, FILE_IGNORE_NEW_LINES | FILE_SKIP_EMPTY_LINES);
+// --- FUNÇÕES PARA PARSEAR TSV DO ZEEK ---
+
+// Lê #fields e #types do cabeçalho no início do arquivo (sem percorrer o log)
+function readZeekHeader($fh) {
     $fields = [];
     $types = [];
-    $data = [];
-
-    foreach ($lines as $line) {
+    rewind($fh);
+    while (($line = fgets($fh)) !== false) {
+        if ($line === '' || $line[0] !== '#') break; // fim do cabeçalho
+        $line = rtrim($line, "\r\n");
         if (strpos($line, '#fields') === 0) {
             $fields = explode("\t", substr($line, 8));
-            continue;
-        }
-        if (strpos($line, '#types') === 0) {
+        } elseif (strpos($line, '#types') === 0) {
             $types = explode("\t", substr($line, 7));
-            continue;
         }
-        if ($line[0] === '#') continue; // ignora metadados
-        if (empty($fields)) continue;
-
-        $cols = explode("\t", $line);
-        $row = [];
-        foreach ($fields as $i => $field) {
-            $value = $cols[$i] ?? null;
-            if ($value === '-' || $value === '(empty)') $value = null;
-
-            // Converte tipos básicos
-            if (isset($types[$i])) {
-                switch ($types[$i]) {
-                    case 'count':
-                    case 'port':
-                        $value = $value !== null ? (int)$value : null;
-                        break;
-                    case 'double':
-                        $value = $value !== null ? (float)$value : null;
-                        break;
-                    case 'time':
-                        if ($value !== null) $value = ['raw' => (float)$value, 'iso' => gmdate('c', (int)$value)];
-                        break;
-                    case 'set[enum]':
-                    case 'set[string]':
-                        if ($value !== null) $value = array_map('trim', explode(',', $value));
-                        break;
-                }
+    }
+    return [$fields, $types];
+}
+
+// Converte uma linha de dados em array associativo; null para comentários/linhas inválidas
+function parseZeekLine($line, $fields, $types) {
+    if ($line === '' || $line[0] === '#' || empty($fields)) return null;
+
+    $cols = explode("\t", $line);
+    $row = [];
+    foreach ($fields as $i => $field) {
+        $value = $cols[$i] ?? null;
+        if ($value === '-' || $value === '(empty)') $value = null;
+
+        // Converte tipos básicos
+        if (isset($types[$i])) {
+            switch ($types[$i]) {
+                case 'count':
+                case 'port':
+                    $value = $value !== null ? (int)$value : null;
+                    break;
+                case 'double':
+                    $value = $value !== null ? (float)$value : null;
+                    break;
+                case 'time':
+                    if ($value !== null) $value = ['raw' => (float)$value, 'iso' => gmdate('c', (int)$value)];
+                    break;
+                case 'set[enum]':
+                case 'set[string]':
+                    if ($value !== null) $value = array_map('trim', explode(',', $value));
+                    break;
             }
-            $row[$field] = $value;
         }
-        $data[] = $row;
-        if (count($data) >= $maxlines) break;
+        $row[$field] = $value;
     }
-    return $data;
+    return $row;
 }
 
-// --- EXECUTA O PARSE ---
-$parsedLines = parseZeekLog($logFile, $maxlines);
+// Últimas $maxlines linhas de dados, lendo blocos do fim para o início.
+// Retorna [linhas em ordem cronológica, posição após a última linha completa].
+function tailLines($fh, $size, $maxlines, $blockSize) {
+    $lines = [];
+    $pos = $size;
+    $buffer = '';
+    $end = null; // posição após o último "\n" do arquivo
+
+    while ($pos > 0 && count($lines) < $maxlines) {
+        $read = min($blockSize, $pos);
+        $pos -= $read;
+        fseek($fh, $pos);
+        $buffer = fread($fh, $read) . $buffer;
+
+        if ($end === null) {
+            // Descarta a última linha se ainda estiver sendo escrita (sem "\n")
+            $lastNl = strrpos($buffer, "\n");
+            if ($lastNl === false) continue;
+            $end = $pos + $lastNl + 1;
+            $buffer = substr($buffer, 0, $lastNl);
+        }
 
-// --- RETORNO JSON ---
-echo json_encode([
+        // Linhas completas no buffer; a primeira pode estar cortada e fica para o próximo bloco
+        $parts = explode("\n", $buffer);
+        $buffer = $pos > 0 ? array_shift($parts) : '';
+        for ($i = count($parts) - 1; $i >= 0 && count($lines) < $maxlines; $i--) {
+            $line = rtrim($parts[$i], "\r");
+            if ($line === '' || $line[0] === '#') continue;
+            $lines[] = $line;
+        }
+    }
+    return [array_reverse($lines), $end ?? 0];
+}
+
+// --- LEITURA ---
+clearstatcache(true, $logFile);
+$fh = fopen($logFile, 'rb');
+if ($fh === false) {
+    http_response_code(500);
+    echo json_encode(['error' => 'Unable to open log file']);
+    exit;
+}
+$stat = fstat($fh);
+$size = $stat['size'];
+$inode = $stat['ino'];
+list($fields, $types) = readZeekHeader($fh);
+
+$rotated = false;
+$startOffset = null;
+if ($offsetParam !== null && $offsetParam !== '') {
+    $startOffset = (int)$offsetParam;
+    // Rotação (inode diferente) ou truncamento: recomeça do início do arquivo atual
+    if (($inodeParam !== null && $inodeParam !== '' && (string)$inodeParam !== (string)$inode) || $startOffset > $size) {
+        $rotated = true;
+        $startOffset = 0;
+    }
+    $mode = 'offset';
+}
+
+$meta = [
     'success' => true,
     'logfile' => $logfile,
     'maxlines' => $maxlines,
-    'total_lines' => count($parsedLines),
-    'data' => $parsedLines
-]);
+    'mode' => $mode,
+    'offset' => $startOffset,
+    'inode' => $inode,
+    'file_size' => $size,
+    'rotated' => $rotated,
+];
+
+// Emissor de registros: acumula (json) ou transmite imediatamente (ndjson)
+$data = [];
+$count = 0;
+if ($format === 'ndjson') {
+    header('Content-Type: application/x-ndjson');
+    header('X-Zeek-Inode: ' . $inode);
+    while (ob_get_level() > 0) ob_end_flush();
+}
+$emit = function ($row) use ($format, &$data, &$count) {
+    $count++;
+    if ($format === 'ndjson') {
+        echo json_encode($row), "\n";
+        if ($count % 500 === 0) flush();
+    } else {
+        $data[] = $row;
+    }
+};
+
+if ($mode === 'tail') {
+    list($lines, $nextOffset) = tailLines($fh, $size, $maxlines, $blockSize);
+    foreach ($lines as $line) {
+        $row = parseZeekLine($line, $fields, $types);
+        if ($row !== null) $emit($row);
+    }
+} else {
+    // head / offset: leitura para frente, apenas linhas completas
+    $nextOffset = $mode === 'offset' ? $startOffset : 0;
+    fseek($fh, $nextOffset);
+    while ($count < $maxlines && ($line = fgets($fh)) !== false) {
+        if (substr($line, -1) !== "\n") break; // linha ainda sendo escrita
+        $nextOffset += strlen($line);
+        $row = parseZeekLine(rtrim($line, "\r\n"), $fields, $types);
+        if ($row !== null) $emit($row);
+    }
+}
+fclose($fh);
+
+$meta['next_offset'] = $nextOffset;
+$meta['total_lines'] = $count;
+
+// --- RETORNO ---
+if ($format === 'ndjson') {
+    echo json_encode(['_meta' => $meta]), "\n";
+} else {
+    $meta['data'] = $data;
+    echo json_encode($meta);
+}
 ?>
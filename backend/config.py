@@ -32,10 +32,104 @@ MYSQL_DB = os.getenv("MYSQL_DB", "iot_edu")
 PFSENSE_API_URL = os.getenv("PFSENSE_API_URL")
 PFSENSE_API_KEY = os.getenv("PFSENSE_API_KEY")
 PFSENSE_API_SECRET = os.getenv("PFSENSE_API_SECRET")
+# Validação do certificado TLS do pfSense (o certificado padrão é autoassinado)
+PFSENSE_VERIFY_SSL = os.getenv("PFSENSE_VERIFY_SSL", "false").lower() in ("1", "true", "yes")
+# Pool de conexões keep-alive e política de reenvio (falhas de conexão e consultas GET)
+PFSENSE_POOL_SIZE = int(os.getenv("PFSENSE_POOL_SIZE", "10"))
+PFSENSE_MAX_RETRIES = int(os.getenv("PFSENSE_MAX_RETRIES", "3"))
+PFSENSE_RETRY_BACKOFF = float(os.getenv("PFSENSE_RETRY_BACKOFF", "0.5"))
+# Máximo de requisições simultâneas do cliente assíncrono (rotas async def)
+PFSENSE_ASYNC_MAX_CONNECTIONS = int(os.getenv("PFSENSE_ASYNC_MAX_CONNECTIONS", "100"))
+# Cache das listagens do pfSense (segundos; 0 desativa o cache do endpoint)
+PFSENSE_CACHE_ENABLED = os.getenv("PFSENSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+PFSENSE_CACHE_TTL_ALIASES = float(os.getenv("PFSENSE_CACHE_TTL_ALIASES", "30"))
+PFSENSE_CACHE_TTL_DHCP_SERVERS = float(os.getenv("PFSENSE_CACHE_TTL_DHCP_SERVERS", "30"))
+PFSENSE_CACHE_TTL_RULES = float(os.getenv("PFSENSE_CACHE_TTL_RULES", "30"))
+PFSENSE_CACHE_TTL_LEASES = float(os.getenv("PFSENSE_CACHE_TTL_LEASES", "10"))
+# Agrupamento de applies do pfSense: um apply por janela em vez de um por alteração
+PFSENSE_APPLY_COALESCE = os.getenv("PFSENSE_APPLY_COALESCE", "true").lower() in ("1", "true", "yes")
+PFSENSE_APPLY_WINDOW = float(os.getenv("PFSENSE_APPLY_WINDOW", "2"))
+PFSENSE_APPLY_MAX_WAIT = float(os.getenv("PFSENSE_APPLY_MAX_WAIT", "10"))
+# Tamanho dos lotes de escrita na sincronização de aliases (POST /aliases-db/save)
+ALIAS_SYNC_BATCH_SIZE = int(os.getenv("ALIAS_SYNC_BATCH_SIZE", "1000"))
+# Tamanho dos lotes (IN e escritas em massa) na sincronização de mapeamentos DHCP
+DHCP_SYNC_BATCH_SIZE = int(os.getenv("DHCP_SYNC_BATCH_SIZE", "1000"))
 
 # Configurações do Zeek Network Security Monitor
 ZEEK_API_URL = os.getenv("ZEEK_API_URL", "http://192.168.100.1/zeek-api")
 ZEEK_API_TOKEN = os.getenv("ZEEK_API_TOKEN")
+# Origem dos logs: "http" (API alert_data.php no sensor) ou "local" (leitura direta de ZEEK_LOG_DIR,
+# quando o backend roda no próprio sensor)
+ZEEK_SOURCE = os.getenv("ZEEK_SOURCE", "http").lower()
+ZEEK_LOG_DIR = os.getenv("ZEEK_LOG_DIR", "/usr/local/spool/zeek")
+# Rotas assíncronas (/zeek/incidents, /zeek/stats): tempo máximo por tipo de log buscado em paralelo
+# (os tipos que excederem entram como falha e o restante é retornado)
+ZEEK_FETCH_TIMEOUT = float(os.getenv("ZEEK_FETCH_TIMEOUT", "10"))
+ZEEK_ASYNC_MAX_CONNECTIONS = int(os.getenv("ZEEK_ASYNC_MAX_CONNECTIONS", "8"))
+# Gravação de incidentes: ocorrências com o mesmo (IP, tipo, severidade) na mesma janela de detecção
+# (segundos, alinhada ao relógio) são agrupadas em um único incidente (occurrence_count);
+# a gravação é feita em lotes de até N linhas por INSERT ... ON DUPLICATE KEY UPDATE
+ZEEK_INCIDENT_DEDUPE_BUCKET = int(os.getenv("ZEEK_INCIDENT_DEDUPE_BUCKET", "3600"))
+ZEEK_INCIDENT_BATCH_SIZE = int(os.getenv("ZEEK_INCIDENT_BATCH_SIZE", "500"))
+# Estatísticas de incidentes (/api/incidents/stats/summary e /zeek/stats): resultado
+# mantido em cache por N segundos para cada período; gravações de incidentes invalidam o cache.
+# 0 desativa o cache
+ZEEK_INCIDENT_STATS_TTL = float(os.getenv("ZEEK_INCIDENT_STATS_TTL", "15"))
+# Agregados de incidentes por minuto e por hora (zeek_incident_rollup_minute/_hour), atualizados na gravação
+# dos incidentes. O worker de ingestão remove, a cada ZEEK_ROLLUP_PRUNE_INTERVAL segundos, os buckets
+# mais antigos que a retenção de cada tabela (as linhas processadas por hora, zeek_ingestion_stats,
+# seguem a retenção por hora)
+ZEEK_ROLLUP_MINUTE_RETENTION_HOURS = int(os.getenv("ZEEK_ROLLUP_MINUTE_RETENTION_HOURS", "48"))
+ZEEK_ROLLUP_HOUR_RETENTION_DAYS = int(os.getenv("ZEEK_ROLLUP_HOUR_RETENTION_DAYS", "35"))
+ZEEK_ROLLUP_PRUNE_INTERVAL = float(os.getenv("ZEEK_ROLLUP_PRUNE_INTERVAL", "3600"))
+# Regras de detecção de incidentes (JSON, recarregado quando o arquivo muda; verificação a cada N segundos).
+# Vazio usa services_scanners/detection_rules.json
+ZEEK_RULES_FILE = os.getenv("ZEEK_RULES_FILE", "")
+ZEEK_RULES_RELOAD_INTERVAL = float(os.getenv("ZEEK_RULES_RELOAD_INTERVAL", "5"))
+# Detecção no conn.log: limiar de alto volume (orig_bytes + resp_bytes) e estados de conexão falhada.
+# Lotes com pelo menos ZEEK_COLUMNAR_MIN_BATCH registros são avaliados de forma vetorizada (NumPy)
+ZEEK_CONN_HIGH_VOLUME_BYTES = int(os.getenv("ZEEK_CONN_HIGH_VOLUME_BYTES", str(100 * 1024 * 1024)))
+ZEEK_CONN_FAILED_STATES = [state.strip() for state in os.getenv("ZEEK_CONN_FAILED_STATES", "REJ,RSTO,RSTR").split(",") if state.strip()]
+ZEEK_COLUMNAR_MIN_BATCH = int(os.getenv("ZEEK_COLUMNAR_MIN_BATCH", "256"))
+# Detectores com estado no conn.log (alimentados pelo worker de ingestão): contadores por IP de origem em
+# janela deslizante de ZEEK_SCAN_WINDOW segundos; memória limitada a MAX_SOURCES origens x MAX_EVENTS eventos
+ZEEK_SCAN_WINDOW = float(os.getenv("ZEEK_SCAN_WINDOW", "60"))
+ZEEK_SCAN_PORT_THRESHOLD = int(os.getenv("ZEEK_SCAN_PORT_THRESHOLD", "25"))
+ZEEK_SCAN_HOST_THRESHOLD = int(os.getenv("ZEEK_SCAN_HOST_THRESHOLD", "50"))
+ZEEK_SCAN_FAILED_THRESHOLD = int(os.getenv("ZEEK_SCAN_FAILED_THRESHOLD", "30"))
+ZEEK_BRUTE_FORCE_THRESHOLD = int(os.getenv("ZEEK_BRUTE_FORCE_THRESHOLD", "20"))
+ZEEK_BRUTE_FORCE_PORTS = [int(port) for port in os.getenv("ZEEK_BRUTE_FORCE_PORTS", "21,22,23,2323,3389,5900").split(",") if port.strip()]
+ZEEK_SCAN_COOLDOWN = float(os.getenv("ZEEK_SCAN_COOLDOWN", "600"))
+ZEEK_SCAN_MAX_SOURCES = int(os.getenv("ZEEK_SCAN_MAX_SOURCES", "4096"))
+ZEEK_SCAN_MAX_EVENTS = int(os.getenv("ZEEK_SCAN_MAX_EVENTS", "256"))
+# Detector de beaconing (conexões periódicas por fluxo orig_h/resp_h/resp_p): buffer circular de
+# BUFFER_SIZE instantes por fluxo; periódico se o coeficiente de variação dos intervalos for <= MAX_CV
+ZEEK_BEACON_BUFFER_SIZE = int(os.getenv("ZEEK_BEACON_BUFFER_SIZE", "16"))
+ZEEK_BEACON_MIN_EVENTS = int(os.getenv("ZEEK_BEACON_MIN_EVENTS", "8"))
+ZEEK_BEACON_MIN_INTERVAL = float(os.getenv("ZEEK_BEACON_MIN_INTERVAL", "10"))
+ZEEK_BEACON_MAX_CV = float(os.getenv("ZEEK_BEACON_MAX_CV", "0.1"))
+ZEEK_BEACON_IGNORE_PORTS = [int(port) for port in os.getenv("ZEEK_BEACON_IGNORE_PORTS", "53,123,5353").split(",") if port.strip()]
+ZEEK_BEACON_COOLDOWN = float(os.getenv("ZEEK_BEACON_COOLDOWN", "3600"))
+ZEEK_BEACON_MAX_FLOWS = int(os.getenv("ZEEK_BEACON_MAX_FLOWS", "50000"))
+# Pontuação de DGA no dns.log (rótulo registrável): suspeito se tiver pelo menos MIN_LENGTH caracteres,
+# verossimilhança média dos bigramas (log10) <= BIGRAM_THRESHOLD e entropia (bits) >= ENTROPY_THRESHOLD
+# ou proporção de consoantes >= CONSONANT_THRESHOLD. Pontuações ficam em cache LRU por domínio
+ZEEK_DGA_MIN_LENGTH = int(os.getenv("ZEEK_DGA_MIN_LENGTH", "8"))
+ZEEK_DGA_ENTROPY_THRESHOLD = float(os.getenv("ZEEK_DGA_ENTROPY_THRESHOLD", "3.0"))
+ZEEK_DGA_CONSONANT_THRESHOLD = float(os.getenv("ZEEK_DGA_CONSONANT_THRESHOLD", "0.75"))
+ZEEK_DGA_BIGRAM_THRESHOLD = float(os.getenv("ZEEK_DGA_BIGRAM_THRESHOLD", "-1.8"))
+ZEEK_DGA_CACHE_SIZE = int(os.getenv("ZEEK_DGA_CACHE_SIZE", "100000"))
+# Rótulos registráveis (ex: "jsdelivr" de cdn.jsdelivr.net) nunca considerados DGA, além dos embutidos em zeek_dga.BENIGN_LABELS
+ZEEK_DGA_ALLOWLIST = [label.strip().lower() for label in os.getenv("ZEEK_DGA_ALLOWLIST", "").split(",") if label.strip()]
+ZEEK_DGA_IGNORE_SUFFIXES = [suffix.strip().lower() for suffix in os.getenv("ZEEK_DGA_IGNORE_SUFFIXES", "arpa,local,lan,home,internal,localdomain").split(",") if suffix.strip()]
+# Worker de ingestão incremental dos logs do Zeek (iniciado com a aplicação)
+ZEEK_INGESTION_ENABLED = os.getenv("ZEEK_INGESTION_ENABLED", "false").lower() in ("1", "true", "yes")
+ZEEK_INGESTION_INTERVAL = float(os.getenv("ZEEK_INGESTION_INTERVAL", "10"))
+ZEEK_INGESTION_LOGS = [log.strip() for log in os.getenv("ZEEK_INGESTION_LOGS", "http.log,dns.log,conn.log,notice.log").split(",") if log.strip()]
+ZEEK_INGESTION_BATCH_LINES = int(os.getenv("ZEEK_INGESTION_BATCH_LINES", "5000"))
+ZEEK_INGESTION_MAX_BATCHES = int(os.getenv("ZEEK_INGESTION_MAX_BATCHES", "20"))
+# Sem cursor salvo: "end" começa do fim do arquivo atual; "beginning" processa o arquivo inteiro
+ZEEK_INGESTION_START = os.getenv("ZEEK_INGESTION_START", "end")
 
 # Configurações de atribuição automática de IP
 IP_RANGE_START = os.getenv("IP_RANGE_START", "192.168.100.1")
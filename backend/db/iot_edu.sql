@@ -31,7 +31,7 @@ CREATE TABLE `blocking_feedback_history` (
   `dhcp_mapping_id` int(11) NOT NULL COMMENT 'ID do mapeamento DHCP',
   `user_feedback` text DEFAULT NULL COMMENT 'Feedback detalhado do usuário',
   `problem_resolved` tinyint(1) DEFAULT NULL COMMENT 'NULL = não respondido, TRUE = resolvido, FALSE = não resolvido',
-  `feedback_date` datetime DEFAULT NULL COMMENT 'Data/hora do feedback',
+  `feedback_date` datetime NOT NULL DEFAULT current_timestamp() COMMENT 'Data/hora do feedback',
   `feedback_by` varchar(100) DEFAULT NULL COMMENT 'Nome/identificação do usuário que forneceu o feedback',
   `admin_notes` text DEFAULT NULL COMMENT 'Anotações da equipe de rede sobre o feedback',
   `admin_review_date` datetime DEFAULT NULL COMMENT 'Data/hora da revisão administrativa',
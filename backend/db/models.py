@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, func, Index, Enum
+from sqlalchemy import Column, Integer, BigInteger, Float, String, DateTime, Boolean, Text, LargeBinary, ForeignKey, func, Index, Enum
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 try:
@@ -245,6 +245,45 @@ class PfSenseFirewallRule(Base):
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
+class PfSenseRuleEndpoint(Base):
+    """
+    Tokens normalizados de source/destination/interface das regras de firewall.
+    
+    Cada regra gera uma linha por token dos campos CSV source, destination e
+    interface, sem o prefixo de negação "!" (indicado em `negated`). Permite
+    localizar as regras que referenciam um alias com busca indexada em vez de
+    LIKE '%,alias,%'. Reconstruída a cada sincronização das regras.
+    """
+    __tablename__ = "pfsense_rule_endpoints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    rule_id = Column(Integer, ForeignKey("pfsense_firewall_rules.id", ondelete="CASCADE"), nullable=False)
+    side = Column(String(16), nullable=False, comment="source, destination ou interface")
+    token = Column(String(255), nullable=False, comment="Alias/endereço/interface referenciado (sem '!')")
+    negated = Column(Boolean, default=False, nullable=False)
+
+    rule = relationship("PfSenseFirewallRule")
+
+    __table_args__ = (
+        # Cobre "quais regras referenciam o alias X (em qual lado)" só com o índice
+        Index('idx_rule_endpoint_token_side', 'token', 'side', 'rule_id'),
+        Index('idx_rule_endpoint_rule', 'rule_id'),
+    )
+
+class DeviceAccessStatus(Base):
+    """
+    Status de acesso materializado por IP (BLOQUEADO, LIBERADO ou AGUARDANDO).
+    
+    Mantido pelo AccessStatusService sempre que aliases ou regras de firewall
+    são sincronizados/alterados, para que as listagens de dispositivos façam
+    apenas uma busca pela chave primária.
+    """
+    __tablename__ = "device_access_status"
+
+    ipaddr = Column(String(255), primary_key=True, comment="Endereço IP do dispositivo")
+    status = Column(String(16), nullable=False)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
 class ZeekIncident(Base):
     """
     Modelo SQLAlchemy para incidentes de segurança detectados pelo Zeek.
@@ -260,10 +299,13 @@ class ZeekIncident(Base):
         description (str): Descrição detalhada do incidente.
         detected_at (datetime): Quando o incidente foi detectado.
         zeek_log_type (ZeekLogType): Tipo de log do Zeek que gerou o incidente.
-        raw_log_data (str): Dados brutos do log em JSON.
         action_taken (str): Ação tomada em resposta ao incidente.
         assigned_to (int): ID do usuário responsável pela investigação.
         notes (str): Observações adicionais sobre o incidente.
+        occurrence_count (int): Quantidade de ocorrências agrupadas neste incidente.
+        first_seen (datetime): Primeira ocorrência agrupada.
+        last_seen (datetime): Última ocorrência agrupada.
+        dedupe_key (str): Chave de agrupamento (hash de IP, tipo, severidade e janela de detecção).
         created_at (datetime): Data/hora de criação do registro.
         updated_at (datetime): Data/hora da última atualização.
     """
@@ -278,10 +320,13 @@ class ZeekIncident(Base):
     description = Column(Text, nullable=False, comment="Descrição detalhada")
     detected_at = Column(DateTime, nullable=False, comment="Data/hora da detecção")
     zeek_log_type = Column(Enum(ZeekLogType), nullable=False, comment="Tipo de log do Zeek")
-    raw_log_data = Column(Text, nullable=True, comment="Dados brutos do log em JSON")
     action_taken = Column(Text, nullable=True, comment="Ação tomada")
     assigned_to = Column(Integer, ForeignKey('users.id'), nullable=True, comment="Usuário responsável")
     notes = Column(Text, nullable=True, comment="Observações adicionais")
+    occurrence_count = Column(Integer, default=1, server_default='1', nullable=False, comment="Ocorrências agrupadas")
+    first_seen = Column(DateTime, nullable=True, comment="Primeira ocorrência")
+    last_seen = Column(DateTime, nullable=True, comment="Última ocorrência")
+    dedupe_key = Column(String(40), nullable=True, comment="Chave de agrupamento (IP, tipo, severidade, janela)")
     created_at = Column(DateTime, default=func.now(), comment="Data de criação")
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), comment="Data de atualização")
     
@@ -290,12 +335,20 @@ class ZeekIncident(Base):
     
     # Índices para otimização de consultas
     __table_args__ = (
-        Index('idx_incident_device_ip', 'device_ip'),
+        # Listagens por cursor: (detected_at, id) e, filtrando por IP, (device_ip, detected_at, id)
+        Index('idx_incident_device_ip', 'device_ip', 'detected_at', 'id'),
         Index('idx_incident_severity', 'severity'),
         Index('idx_incident_status', 'status'),
-        Index('idx_incident_detected_at', 'detected_at'),
+        Index('idx_incident_detected_at', 'detected_at', 'id'),
         Index('idx_incident_log_type', 'zeek_log_type'),
         Index('idx_incident_device_severity', 'device_ip', 'severity'),
+        # Upsert das ocorrências repetidas (INSERT ... ON DUPLICATE KEY UPDATE)
+        Index('uq_incident_dedupe_key', 'dedupe_key', unique=True),
+        # Ranking por volume em um período
+        Index('idx_incident_last_seen_count', 'last_seen', 'occurrence_count'),
+        # Estatísticas por período (consulta agrupada e top IPs resolvidas só pelo índice)
+        Index('idx_incident_stats', 'detected_at', 'severity', 'status', 'zeek_log_type',
+              'device_ip', 'occurrence_count'),
     )
     
     def __repr__(self):
@@ -316,10 +369,135 @@ class ZeekIncident(Base):
             'action_taken': self.action_taken,
             'assigned_to': self.assigned_to,
             'notes': self.notes,
+            'occurrence_count': self.occurrence_count or 1,
+            'first_seen': self.first_seen.isoformat() if self.first_seen else None,
+            'last_seen': self.last_seen.isoformat() if self.last_seen else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
         }
 
+class ZeekIncidentRawLog(Base):
+    """
+    Log original que gerou um incidente, em JSON comprimido com zlib.
+    
+    Fica fora de zeek_incidents para que as listagens não transfiram os logs;
+    só o detalhe do incidente o lê. Gravado apenas na criação do incidente
+    (ocorrências agrupadas depois mantêm o log da primeira).
+    """
+    __tablename__ = "zeek_incident_raw_logs"
+
+    incident_id = Column(Integer, ForeignKey('zeek_incidents.id', ondelete='CASCADE'), primary_key=True,
+                         comment="Incidente")
+    data = Column(LargeBinary, nullable=False, comment="JSON do log original comprimido (zlib)")
+
+class _ZeekIncidentRollup:
+    """
+    Colunas comuns dos agregados de incidentes por intervalo de tempo.
+    
+    Cada linha soma, no intervalo iniciado em `bucket`, os incidentes criados
+    (pela data de detecção) e as ocorrências registradas para uma combinação de
+    IP, severidade, tipo de log e tipo de incidente.
+    """
+    bucket = Column(DateTime, primary_key=True, comment="Início do intervalo")
+    device_ip = Column(String(45), primary_key=True, comment="IP do dispositivo envolvido")
+    severity = Column(Enum(IncidentSeverity), primary_key=True, comment="Nível de severidade")
+    zeek_log_type = Column(Enum(ZeekLogType), primary_key=True, comment="Tipo de log do Zeek")
+    incident_type = Column(String(255), primary_key=True, comment="Tipo de incidente")
+    incident_count = Column(Integer, default=0, nullable=False, comment="Incidentes criados no intervalo")
+    occurrence_count = Column(Integer, default=0, nullable=False, comment="Ocorrências no intervalo")
+
+class ZeekIncidentRollupMinute(_ZeekIncidentRollup, Base):
+    """Agregado de incidentes por minuto (janelas curtas e bordas das janelas longas)."""
+    __tablename__ = "zeek_incident_rollup_minute"
+    __table_args__ = (
+        Index('idx_rollup_minute_ip_bucket', 'device_ip', 'bucket'),
+    )
+
+class ZeekIncidentRollupHour(_ZeekIncidentRollup, Base):
+    """Agregado de incidentes por hora (janelas de até ZEEK_ROLLUP_HOUR_RETENTION_DAYS dias)."""
+    __tablename__ = "zeek_incident_rollup_hour"
+    __table_args__ = (
+        Index('idx_rollup_hour_ip_bucket', 'device_ip', 'bucket'),
+    )
+
+class ZeekIncidentRollupTypeHour(Base):
+    """Agregado de incidentes por hora, tipo de log e severidade (painel de /zeek/stats)."""
+    __tablename__ = "zeek_incident_rollup_type_hour"
+
+    bucket = Column(DateTime, primary_key=True, comment="Início da hora")
+    zeek_log_type = Column(Enum(ZeekLogType), primary_key=True, comment="Tipo de log do Zeek")
+    severity = Column(Enum(IncidentSeverity), primary_key=True, comment="Nível de severidade")
+    incident_count = Column(Integer, default=0, nullable=False, comment="Incidentes criados na hora")
+    occurrence_count = Column(Integer, default=0, nullable=False, comment="Ocorrências na hora")
+
+class ZeekIncidentRollupIpHour(Base):
+    """Agregado de incidentes por hora e IP (IPs mais afetados em /zeek/stats)."""
+    __tablename__ = "zeek_incident_rollup_ip_hour"
+
+    bucket = Column(DateTime, primary_key=True, comment="Início da hora")
+    device_ip = Column(String(45), primary_key=True, comment="IP do dispositivo envolvido")
+    incident_count = Column(Integer, default=0, nullable=False, comment="Incidentes criados na hora")
+    occurrence_count = Column(Integer, default=0, nullable=False, comment="Ocorrências na hora")
+
+class ZeekIncidentRollupIpDay(Base):
+    """Agregado de incidentes por dia e IP (dias inteiros dos IPs mais afetados em /zeek/stats)."""
+    __tablename__ = "zeek_incident_rollup_ip_day"
+
+    bucket = Column(DateTime, primary_key=True, comment="Início do dia")
+    device_ip = Column(String(45), primary_key=True, comment="IP do dispositivo envolvido")
+    incident_count = Column(Integer, default=0, nullable=False, comment="Incidentes criados no dia")
+    occurrence_count = Column(Integer, default=0, nullable=False, comment="Ocorrências no dia")
+
+class ZeekLogCursor(Base):
+    """
+    Cursor de ingestão incremental de um arquivo de log do Zeek.
+    
+    Guarda a posição (em bytes) logo após a última linha processada e o inode
+    do arquivo, para que o worker de ingestão busque apenas as linhas novas e
+    detecte rotação do log (inode diferente ou arquivo menor que o cursor).
+    `last_ts`/`last_uid` identificam o último registro processado.
+    """
+    __tablename__ = "zeek_log_cursors"
+
+    logfile = Column(String(32), primary_key=True, comment="Arquivo de log (ex: conn.log)")
+    inode = Column(BigInteger, nullable=True, comment="Inode do arquivo no sensor")
+    offset = Column(BigInteger, default=0, nullable=False, comment="Posição após a última linha processada")
+    last_ts = Column(Float, nullable=True, comment="Timestamp (ts) do último registro processado")
+    last_uid = Column(String(64), nullable=True, comment="UID do último registro processado")
+    lines_processed = Column(BigInteger, default=0, nullable=False)
+    incidents_detected = Column(BigInteger, default=0, nullable=False)
+    rotations = Column(Integer, default=0, nullable=False)
+    last_polled_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    def to_dict(self):
+        """Converte o cursor para dicionário."""
+        return {
+            'logfile': self.logfile,
+            'inode': self.inode,
+            'offset': self.offset,
+            'last_ts': self.last_ts,
+            'last_uid': self.last_uid,
+            'lines_processed': self.lines_processed,
+            'incidents_detected': self.incidents_detected,
+            'rotations': self.rotations,
+            'last_polled_at': self.last_polled_at.isoformat() if self.last_polled_at else None,
+            'last_error': self.last_error,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+class ZeekIngestionStat(Base):
+    """
+    Linhas processadas pelo worker de ingestão, por log e por hora (pelo
+    timestamp dos registros). Usada nas estatísticas por período de /zeek/stats.
+    """
+    __tablename__ = "zeek_ingestion_stats"
+
+    bucket = Column(DateTime, primary_key=True, comment="Início da hora")
+    logfile = Column(String(32), primary_key=True, comment="Arquivo de log (ex: conn.log)")
+    lines = Column(BigInteger, default=0, nullable=False, comment="Linhas processadas na hora")
+
 class BlockingFeedbackHistory(Base):
     """
     Modelo SQLAlchemy para histórico de feedback de bloqueio de dispositivos.
@@ -345,7 +523,7 @@ class BlockingFeedbackHistory(Base):
     dhcp_mapping_id = Column(Integer, ForeignKey('dhcp_static_mappings.id'), nullable=False, comment="ID do mapeamento DHCP")
     user_feedback = Column(Text, nullable=True, comment="Feedback detalhado do usuário")
     problem_resolved = Column(Boolean, nullable=True, comment="NULL = não respondido, TRUE = resolvido, FALSE = não resolvido")
-    feedback_date = Column(DateTime, default=func.now(), comment="Data/hora do feedback")
+    feedback_date = Column(DateTime, default=func.now(), nullable=False, comment="Data/hora do feedback")
     feedback_by = Column(String(100), nullable=True, comment="Nome/identificação do usuário que forneceu o feedback")
     admin_notes = Column(Text, nullable=True, comment="Anotações da equipe de rede sobre o feedback")
     admin_review_date = Column(DateTime, nullable=True, comment="Data/hora da revisão administrativa")
@@ -359,10 +537,11 @@ class BlockingFeedbackHistory(Base):
     
     # Índices para otimização de consultas
     __table_args__ = (
-        Index('idx_feedback_dhcp_mapping', 'dhcp_mapping_id'),
-        Index('idx_feedback_status', 'status'),
+        # Listagens por cursor: filtro seguido de (feedback_date, id)
+        Index('idx_feedback_dhcp_mapping', 'dhcp_mapping_id', 'feedback_date', 'id'),
+        Index('idx_feedback_status', 'status', 'feedback_date', 'id'),
         Index('idx_feedback_date', 'feedback_date'),
-        Index('idx_feedback_by', 'feedback_by'),
+        Index('idx_feedback_by', 'feedback_by', 'feedback_date', 'id'),
         Index('idx_feedback_reviewed_by', 'admin_reviewed_by'),
     )
     
@@ -0,0 +1,108 @@
+"""
+Paginação por cursor (keyset) para as listagens da API.
+
+Em vez de OFFSET (que lê e descarta todas as linhas das páginas anteriores),
+a página seguinte é buscada a partir da chave de ordenação da última linha
+retornada: WHERE (col1, col2, ...) < (v1, v2, ...) na ordem da listagem.
+Com um índice composto nas colunas de ordenação (ex: (detected_at, id)),
+qualquer página custa o mesmo que a primeira.
+
+O cursor é opaco para o cliente: JSON com os valores da chave e os nomes das
+colunas, em base64 url-safe. As rotas devolvem o cursor da próxima página no
+cabeçalho X-Next-Cursor (ausente na última página).
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import DateTime, and_, or_
+from sqlalchemy.orm import Query
+
+# Cabeçalho com o cursor da próxima página
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class CursorError(ValueError):
+    """Cursor inválido ou gerado para outra listagem."""
+
+
+class Page(NamedTuple):
+    """Itens de uma página e o cursor da próxima (None na última página)."""
+    items: List[Any]
+    next_cursor: Optional[str]
+
+
+def _sort_names(order: Sequence[Tuple[Any, bool]]) -> List[str]:
+    return [f"{column.table.name}.{column.key}" for column, _ in order]
+
+
+def encode_cursor(row: Any, order: Sequence[Tuple[Any, bool]]) -> str:
+    """Gera o cursor com a chave de ordenação de `row` (entidade ou linha com os atributos das colunas)."""
+    values = []
+    for column, _ in order:
+        value = getattr(row, column.key)
+        values.append(value.isoformat() if isinstance(value, datetime) else getattr(value, 'value', value))
+    payload = json.dumps({'k': values, 'o': _sort_names(order)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, order: Sequence[Tuple[Any, bool]]) -> List[Any]:
+    """Valores da chave de ordenação contidos no cursor (CursorError se inválido)."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values, names = payload['k'], payload['o']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise CursorError("Cursor de paginação inválido")
+    if names != _sort_names(order) or len(values) != len(order):
+        raise CursorError("Cursor de paginação não corresponde a esta listagem")
+    decoded = []
+    for (column, _), value in zip(order, values):
+        if value is not None and isinstance(column.type, DateTime):
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise CursorError("Cursor de paginação inválido")
+        decoded.append(value)
+    return decoded
+
+
+def _after(order: Sequence[Tuple[Any, bool]], values: List[Any]):
+    """Condição "depois da chave": c1 > v1 OR (c1 = v1 AND c2 > v2) ... (< nas colunas decrescentes)."""
+    clauses = []
+    for i, (column, descending) in enumerate(order):
+        beyond = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*[prev == values[j] for j, (prev, _) in enumerate(order[:i])], beyond))
+    return or_(*clauses)
+
+
+def paginate(query: Query, order: Sequence[Tuple[Any, bool]], limit: int,
+             cursor: Optional[str] = None, offset: int = 0) -> Page:
+    """
+    Aplica a ordenação e a paginação por cursor a uma consulta.
+
+    Args:
+        query: Consulta já filtrada (sem order_by/limit)
+        order: Colunas de ordenação NOT NULL como (coluna, decrescente); a última
+            deve ser única (ex: id) para desempatar. Linhas com NULL em uma coluna
+            de ordenação nunca satisfazem a condição do cursor e sumiriam das
+            páginas seguintes
+        limit: Itens por página
+        cursor: Cursor recebido do cliente (None na primeira página)
+        offset: Paginação antiga por deslocamento, usada apenas sem cursor
+
+    Returns:
+        Page com os itens e o cursor da próxima página
+    """
+    if cursor:
+        query = query.filter(_after(order, decode_cursor(cursor, order)))
+    query = query.order_by(*[column.desc() if descending else column.asc() for column, descending in order])
+    if offset and not cursor:
+        query = query.offset(offset)
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return Page(rows, None)
+    rows = rows[:limit]
+    return Page(rows, encode_cursor(rows[-1], order))
@@ -1,10 +1,16 @@
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from services_firewalls.router import router as devices_router
 from services_firewalls.blocking_feedback_router import router as feedback_router
+from services_firewalls.pfsense_client import close_pfsense_client
+from services_firewalls.pfsense_async_client import close_async_pfsense_client
+from services_firewalls.pfsense_apply_queue import stop_apply_coalescer
 from services_scanners.zeek_router import router as zeek_router
 from services_scanners.incident_router import router as incident_router
+from services_scanners.zeek_ingestion import start_ingestion_worker, stop_ingestion_worker
+from services_scanners.zeek_async_service import close_async_zeek_service
 from auth.cafe_auth import router as cafe_auth_router
 from auth.google_auth import router as google_auth_router
 from auth.saml_router import router as saml_router
@@ -45,6 +51,24 @@ app.include_router(cafe_auth_router, prefix="/api/auth/cafe", tags=["Autenticaç
 app.include_router(google_auth_router, prefix="/api/auth", tags=["Autenticação Google OAuth2"])
 app.include_router(saml_router, tags=["Autenticação SAML CAFe"])
 
+@app.on_event("startup")
+async def start_background_workers():
+    """Inicia o worker de ingestão do Zeek (se ZEEK_INGESTION_ENABLED)."""
+    start_ingestion_worker()
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    """Encerra o worker de ingestão do Zeek e fecha o cliente HTTP assíncrono do Zeek."""
+    await stop_ingestion_worker()
+    await close_async_zeek_service()
+
+@app.on_event("shutdown")
+async def close_pfsense_clients():
+    """Aplica as alterações pendentes e fecha os pools de conexão com o pfSense ao encerrar a aplicação."""
+    await run_in_threadpool(stop_apply_coalescer)
+    await close_async_pfsense_client()
+    close_pfsense_client()
+
 @app.get("/", summary="Página inicial")
 async def root():
     """
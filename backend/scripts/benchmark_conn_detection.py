@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark: detecção no conn.log — por registro (_detect_conn_incident) vs.
+vetorizada com NumPy (zeek_columnar).
+
+Gera registros sintéticos do conn.log no formato do ZeekLocalSource (campos
+com ponto, ts como {"raw", "iso"}) em lotes, como o worker de ingestão, e mede
+somente a análise de cada lote:
+- "por registro": _normalize_log_fields + _detect_incident_in_log em cada registro
+- "vetorizada": ZeekService._detect_conn_incidents_batch (colunas + regras em
+  arrays + incidentes só para os índices que casam)
+- "colunas": somente ConnColumns + detect_conn (sem montar os incidentes)
+
+Também confere se os dois caminhos geram os mesmos incidentes (índice, tipo).
+
+Uso (na raiz do backend):
+  python scripts/benchmark_conn_detection.py
+  python scripts/benchmark_conn_detection.py --records 1000000 --batch 5000 --failed 0.05
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# Adicionar o diretório raiz do projeto ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services_scanners.zeek_columnar import ConnColumns, detect_conn
+from services_scanners.zeek_models import ZeekLogType
+from services_scanners.zeek_service import ZeekService
+
+STATES = ['SF', 'S0', 'S1', 'SH', 'OTH']
+FAILED_STATES = ['REJ', 'RSTO', 'RSTR']
+
+
+def make_batch(n, start_ts, failed, high_volume, rng):
+    batch = []
+    for i in range(n):
+        ts = start_ts + i * 0.001
+        big = rng.random() < high_volume
+        batch.append({
+            'ts': {'raw': ts, 'iso': '2024-01-01T00:00:00+00:00'},
+            'uid': f'C{rng.getrandbits(48):x}',
+            'id.orig_h': f'192.168.100.{rng.randint(2, 254)}',
+            'id.orig_p': rng.randint(1024, 65535),
+            'id.resp_h': f'10.0.{rng.randint(0, 3)}.{rng.randint(1, 254)}',
+            'id.resp_p': rng.choice([53, 80, 443, 22]),
+            'proto': rng.choice(['tcp', 'udp']),
+            'duration': rng.random() * 10,
+            'orig_bytes': rng.randint(60 * 1024 * 1024, 90 * 1024 * 1024) if big else rng.randint(0, 100000),
+            'resp_bytes': rng.randint(60 * 1024 * 1024, 90 * 1024 * 1024) if big else rng.choice([None, rng.randint(0, 100000)]),
+            'conn_state': rng.choice(FAILED_STATES) if rng.random() < failed else rng.choice(STATES),
+        })
+    return batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=1000000, help='Total de registros analisados')
+    parser.add_argument('--batch', type=int, default=5000, help='Registros por lote (ZEEK_INGESTION_BATCH_LINES)')
+    parser.add_argument('--failed', type=float, default=0.02, help='Fração de conexões falhadas')
+    parser.add_argument('--high-volume', type=float, default=0.001, help='Fração de conexões de alto volume')
+    parser.add_argument('--skip-legacy', action='store_true', help='Não mede o caminho por registro')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    service = ZeekService(api_token='benchmark', source='http')
+    rng = random.Random(args.seed)
+    timings = {'por registro': 0.0, 'vetorizada': 0.0, 'colunas': 0.0}
+    incidents = {'por registro': 0, 'vetorizada': 0}
+    mismatched_batches = 0
+    done = 0
+
+    while done < args.records:
+        batch = make_batch(min(args.batch, args.records - done), 1.7e9 + done, args.failed, args.high_volume, rng)
+
+        start = time.perf_counter()
+        detect_conn(ConnColumns(batch))
+        timings['colunas'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        vectorized = service._detect_conn_incidents_batch(batch)
+        timings['vetorizada'] += time.perf_counter() - start
+        incidents['vetorizada'] += len(vectorized)
+
+        if not args.skip_legacy:
+            start = time.perf_counter()
+            legacy = []
+            for log in batch:
+                incident = service._detect_incident_in_log(service._normalize_log_fields(log), ZeekLogType.CONN)
+                if incident:
+                    legacy.append(incident)
+            timings['por registro'] += time.perf_counter() - start
+            incidents['por registro'] += len(legacy)
+
+            if [(i.incident_type, i.description) for i in legacy] != \
+                    [(i.incident_type, i.description) for i, _ in vectorized]:
+                mismatched_batches += 1
+        done += len(batch)
+
+    print(f"{done} registros do conn.log em lotes de {args.batch}")
+    print(f"{'caminho':>14} {'tempo (s)':>10} {'registros/s':>13} {'incidentes':>11}")
+    for name, elapsed in timings.items():
+        if name == 'por registro' and args.skip_legacy:
+            continue
+        print(f"{name:>14} {elapsed:>10.2f} {done / elapsed:>13,.0f} {incidents.get(name, '-'):>11}")
+    if not args.skip_legacy:
+        print(f"lotes com divergência: {mismatched_batches}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Benchmark: pontuação de DGA do dns.log (services_scanners/zeek_dga.py).
+
+Gera um conjunto sintético de consultas DNS (padrão: 1M) com popularidade
+Zipf sobre um conjunto de domínios legítimos e gerados aleatoriamente (DGA),
+e mede, em consultas/s, processando em lotes como o worker de ingestão:
+- "python": implementação de referência em Python puro, consulta a consulta, sem cache
+- "numpy": DgaScorer por lote, sem aproveitar o cache entre lotes
+- "numpy+cache": DgaScorer com o cache LRU (consultas repetidas não são recalculadas)
+
+Também confere se a referência e o DgaScorer classificam igual cada domínio e
+compara a detecção (acertos nos domínios DGA, falsos positivos nos legítimos)
+com a heurística anterior (len(query) > 20 e mais de 3 pontos).
+
+Por fim pontua domínios reais de CDNs, serviços e fabricantes de IoT
+(REAL_BENIGN_DOMAINS) e termina com código 1 se algum for classificado como DGA.
+
+Uso (na raiz do backend):
+  python scripts/benchmark_dga_scoring.py
+  python scripts/benchmark_dga_scoring.py --queries 1000000 --domains 50000 --dga 0.05
+"""
+import argparse
+import math
+import os
+import random
+import string
+import sys
+import time
+
+# Adicionar o diretório raiz do projeto ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services_scanners.zeek_dga import DgaScorer, registered_label
+from scripts.generate_dga_bigrams import DOMAIN_LABELS
+
+SUBDOMAINS = ['', 'www.', 'api.', 'cdn.', 'static.', 'mail.', 'login.', 'img.', 'edge-01.', 'time.', 'ota.']
+TLDS = ['com', 'net', 'org', 'com.br', 'io', 'co.uk', 'gov.br', 'tv']
+# Domínios reais consultados por dashboards e dispositivos IoT (nenhum pode ser classificado como DGA)
+REAL_BENIGN_DOMAINS = """
+cdn.jsdelivr.net jsdelivr.com unpkg.com cdnjs.cloudflare.com ajax.googleapis.com code.jquery.com
+maxcdn.bootstrapcdn.com stackpath.bootstrapcdn.com fonts.gstatic.com fonts.googleapis.com
+d1a2b3c4.cloudfront.net a248.e.akamai.net e1234.dscb.akamaiedge.net media.akamaized.net
+www.apple.com.edgekey.net cs9.wac.phicdn.net b-cdn.net bunnycdn.com cdn77.org fastly.net
+global.ssl.fastly.net azureedge.net edgecastcdn.net llnwd.net cdngc.net stackpathdns.com
+cdn.segment.com js.hs-scripts.com static.hotjar.com cdn.mxpnl.com widget.intercom.io
+cdn.shopify.com use.fontawesome.com raw.githubusercontent.com registry.npmjs.org
+files.pythonhosted.org dl.google.com edgedl.me.gvt1.com connectivitycheck.gstatic.com
+time.windows.com ctldl.windowsupdate.com login.microsoftonline.com blob.core.windows.net
+s3.amazonaws.com a2xyz-ats.iot.us-east-1.amazonaws.com mqtt.googleapis.com
+a1.tuyaus.com a1.tuyaeu.com openapi.tuyacn.com api.smartthings.com fw.ota.xiaomi.com
+api.io.mi.com api.ewelink.cc eu-disp.coolkit.cc api.particle.io iot.espressif.cn
+time.nist.gov pool.ntp.org hik-connect.com ezvizlife.com api.meethue.com home.nest.com
+api.amazonalexa.com avs-alexa-na.amazon.com api.sonos.com api.roku.com unifi.ui.com
+wap.tplinkcloud.com n-devs.tplinkcloud.com browser-intake-datadoghq.com o123.ingest.sentry.io
+cloudflare-dns.com dns.google doh.opendns.com incoming.telemetry.mozilla.org
+ocsp.digicert.com ocsp.sectigo.com r3.o.lencr.org ocsp.pki.goog
+""".split()
+
+SYLLABLES = ['ka', 'lo', 'mer', 'tis', 'ban', 'co', 'net', 'ra', 'vi', 'sa', 'tel', 'pro', 'lin', 'dor',
+             'mix', 'ser', 'via', 'ton', 'gal', 'fer', 'nu', 'bra', 'sil', 'tec', 'da', 'mo', 'ver']
+
+
+def make_domains(count, dga_fraction, rng):
+    """Domínios únicos: legítimos (rótulos conhecidos e pronunciáveis) e DGA (aleatórios)."""
+    benign, dga = set(), set()
+    n_dga = int(count * dga_fraction)
+    while len(dga) < n_dga:
+        alphabet = string.ascii_lowercase + (string.digits if rng.random() < 0.5 else '')
+        label = ''.join(rng.choice(alphabet) for _ in range(rng.randint(8, 24)))
+        dga.add(f"{label}.{rng.choice(['com', 'net', 'info', 'biz', 'ru', 'top'])}")
+    while len(benign) < count - n_dga:
+        if rng.random() < 0.5:
+            label = rng.choice(DOMAIN_LABELS)
+        else:
+            label = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        benign.add(f"{rng.choice(SUBDOMAINS)}{label}.{rng.choice(TLDS)}")
+    return sorted(benign), sorted(dga)
+
+
+def reference_score(query, scorer):
+    """Mesmas medidas do DgaScorer, em Python puro (uma consulta por vez)."""
+    label = registered_label(query)
+    if label is None:
+        return None
+    alphabet = 'abcdefghijklmnopqrstuvwxyz0123456789-'
+    table = scorer.logprob
+    k = scorer.size
+    chars = [c for c in label if c in alphabet]
+    length = len(chars)
+    counts = {}
+    for c in chars:
+        counts[c] = counts.get(c, 0) + 1
+    entropy = -sum(n / length * math.log2(n / length) for n in counts.values()) if length else 0.0
+    letters = [c for c in chars if c.isalpha()]
+    consonants = sum(1 for c in letters if c not in 'aeiou')
+    consonant_ratio = consonants / len(letters) if letters else 0.0
+    pairs = [(a, b) for a, b in zip(label, label[1:]) if a in alphabet and b in alphabet]
+    bigram = (sum(table[alphabet.index(a) * k + alphabet.index(b)] for a, b in pairs) / len(pairs)) if pairs else 0.0
+    return (length >= scorer.min_length and bigram <= scorer.bigram_threshold and label not in scorer.allowlist
+            and (entropy >= scorer.entropy_threshold or consonant_ratio >= scorer.consonant_threshold))
+
+
+def legacy_is_dga(query):
+    return len(query) > 20 and query.count('.') > 3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=1000000, help='Consultas no conjunto sintético')
+    parser.add_argument('--domains', type=int, default=50000, help='Domínios distintos')
+    parser.add_argument('--dga', type=float, default=0.05, help='Fração de domínios DGA')
+    parser.add_argument('--batch', type=int, default=5000, help='Consultas por lote')
+    parser.add_argument('--zipf', type=float, default=1.1, help='Expoente da popularidade dos domínios')
+    parser.add_argument('--skip-python', action='store_true', help='Não mede a referência em Python puro')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    benign, dga = make_domains(args.domains, args.dga, rng)
+    domains = benign + dga
+    rng.shuffle(domains)
+    weights = [1 / (rank + 1) ** args.zipf for rank in range(len(domains))]
+    queries = rng.choices(domains, weights=weights, k=args.queries)
+    batches = [queries[i:i + args.batch] for i in range(0, len(queries), args.batch)]
+    print(f"{len(queries)} consultas, {len(domains)} domínios distintos ({len(dga)} DGA), lotes de {args.batch}")
+
+    results = {}
+    cold = DgaScorer(cache_size=1)
+    start = time.perf_counter()
+    for batch in batches:
+        cold.score_many(batch)
+    results['numpy'] = time.perf_counter() - start
+
+    cached = DgaScorer()
+    start = time.perf_counter()
+    for batch in batches:
+        cached.score_many(batch)
+    results['numpy+cache'] = time.perf_counter() - start
+
+    if not args.skip_python:
+        start = time.perf_counter()
+        for query in queries:
+            reference_score(query, cold)
+        results['python'] = time.perf_counter() - start
+
+    print(f"{'caminho':>12} {'tempo (s)':>10} {'consultas/s':>13}")
+    for name in ('python', 'numpy', 'numpy+cache'):
+        if name in results:
+            print(f"{name:>12} {results[name]:>10.2f} {len(queries) / results[name]:>13,.0f}")
+    status = cached.status()
+    print(f"cache: {status['hits']} acertos, {status['misses']} pontuações")
+
+    scores = DgaScorer().score_many(domains)
+    mismatches = [d for d in domains if (scores[d] is not None and scores[d].is_dga) != bool(reference_score(d, cold))]
+    print(f"divergências referência x DgaScorer: {len(mismatches)}")
+
+    def rate(items, predicate):
+        return sum(1 for d in items if predicate(d)) / max(len(items), 1)
+
+    is_dga = lambda d: scores[d] is not None and scores[d].is_dga
+    print(f"{'detector':>12} {'detecção DGA':>13} {'falsos positivos':>17}")
+    print(f"{'anterior':>12} {rate(dga, legacy_is_dga):>12.1%} {rate(benign, legacy_is_dga):>16.1%}")
+    print(f"{'pontuação':>12} {rate(dga, is_dga):>12.1%} {rate(benign, is_dga):>16.1%}")
+
+    real = DgaScorer().score_many(REAL_BENIGN_DOMAINS)
+    flagged = [d for d in REAL_BENIGN_DOMAINS if real[d] is not None and real[d].is_dga]
+    print(f"domínios reais de CDNs/fabricantes classificados como DGA: {len(flagged)} de {len(REAL_BENIGN_DOMAINS)}")
+    if flagged:
+        for domain in flagged:
+            print(f"  {domain}: {real[domain]}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
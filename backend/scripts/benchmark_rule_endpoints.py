@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark: regras que referenciam um alias — LIKE sobre CSV vs. índice pfsense_rule_endpoints.
+
+Para cada quantidade de regras, popula um banco com regras sintéticas cujos
+campos source/destination referenciam aliases aleatórios (inclusive negados) e
+mede o tempo médio de:
+- "like": consulta antiga, com 8 predicados LIKE/igualdade por token (alias e !alias)
+- "indice": AccessStatusService.find_rules_referencing (busca por token indexado)
+
+Por padrão usa SQLite em memória; use --database-url para medir em outro banco
+(as tabelas são criadas e removidas — NÃO aponte para o banco de produção).
+
+Uso (na raiz do backend):
+  python scripts/benchmark_rule_endpoints.py
+  python scripts/benchmark_rule_endpoints.py --rules 1000 10000 100000 --queries 200
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# Adicionar o diretório raiz do projeto ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, or_
+from sqlalchemy.orm import sessionmaker
+from db.models import PfSenseFirewallRule, PfSenseRuleEndpoint
+from services_firewalls.access_status_service import AccessStatusService
+
+
+def legacy_like_query(db, name):
+    """Consulta usada antes da tabela de tokens (router.py)."""
+    conds = []
+    for token in (name, f'!{name}'):
+        conds.extend([
+            PfSenseFirewallRule.source == token,
+            PfSenseFirewallRule.destination == token,
+            PfSenseFirewallRule.source.like(f'%,{token},%'),
+            PfSenseFirewallRule.source.like(f'{token},%'),
+            PfSenseFirewallRule.source.like(f'%,{token}'),
+            PfSenseFirewallRule.destination.like(f'%,{token},%'),
+            PfSenseFirewallRule.destination.like(f'{token},%'),
+            PfSenseFirewallRule.destination.like(f'%,{token}'),
+        ])
+    return db.query(PfSenseFirewallRule).filter(
+        or_(*conds), PfSenseFirewallRule.type.in_(['pass', 'block'])
+    ).all()
+
+
+def random_endpoint(rng, aliases):
+    parts = []
+    for _ in range(rng.randint(1, 3)):
+        name = rng.choice(aliases)
+        parts.append(f'!{name}' if rng.random() < 0.1 else name)
+    return ','.join(parts)
+
+
+def populate(db, n_rules, aliases, rng):
+    db.query(PfSenseRuleEndpoint).delete()
+    db.query(PfSenseFirewallRule).delete()
+    db.commit()
+    rows = [{
+        'pf_id': i,
+        'type': rng.choice(['pass', 'block', 'reject']),
+        'interface': rng.choice(['lan', 'wan', 'lan, opt1']),
+        'source': random_endpoint(rng, aliases),
+        'destination': random_endpoint(rng, aliases) if rng.random() < 0.5 else 'any',
+    } for i in range(n_rules)]
+    db.bulk_insert_mappings(PfSenseFirewallRule, rows)
+    db.commit()
+    return AccessStatusService(db).rebuild_rule_endpoints()
+
+
+def timed(fn, names):
+    start = time.perf_counter()
+    total = 0
+    for name in names:
+        total += len(fn(name))
+    elapsed = time.perf_counter() - start
+    return elapsed / len(names) * 1000, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rules', type=int, nargs='+', default=[100, 1000, 10000, 50000])
+    parser.add_argument('--aliases', type=int, default=500, help='Quantidade de aliases distintos')
+    parser.add_argument('--queries', type=int, default=100, help='Consultas por medição')
+    parser.add_argument('--database-url', default='sqlite://')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    engine = create_engine(args.database_url)
+    PfSenseFirewallRule.__table__.create(engine, checkfirst=True)
+    PfSenseRuleEndpoint.__table__.create(engine, checkfirst=True)
+    db = sessionmaker(bind=engine)()
+    service = AccessStatusService(db)
+
+    aliases = [f'alias_{i}' for i in range(args.aliases)]
+    print(f"{'regras':>8} {'tokens':>8} {'like (ms)':>10} {'indice (ms)':>12} {'ganho':>7}")
+    try:
+        for n_rules in args.rules:
+            tokens = populate(db, n_rules, aliases, rng)
+            names = [rng.choice(aliases) for _ in range(args.queries)]
+            like_ms, like_total = timed(lambda n: legacy_like_query(db, n), names)
+            idx_ms, idx_total = timed(lambda n: service.find_rules_referencing(n), names)
+            if like_total != idx_total:
+                print(f"  aviso: resultados diferentes (like={like_total}, indice={idx_total})")
+            print(f"{n_rules:>8} {tokens:>8} {like_ms:>10.3f} {idx_ms:>12.3f} {like_ms / idx_ms:>6.1f}x")
+    finally:
+        db.close()
+        PfSenseRuleEndpoint.__table__.drop(engine, checkfirst=True)
+        PfSenseFirewallRule.__table__.drop(engine, checkfirst=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark: leitura dos logs do Zeek — API HTTP (alert_data.php) vs. leitura local (mmap).
+
+Gera um conn.log sintético (TSV com cabeçalho #fields/#types) em um diretório
+temporário e mede, para cada quantidade de linhas pedidas (maxlines):
+- "local": ZeekLocalSource.read_logs (mmap + parse tipado em Python)
+- "local+json": o mesmo, mais json.dumps/json.loads do resultado — estima o custo
+  de serialização que o caminho HTTP acrescenta, mesmo sem rede e sem PHP
+- "http": ZeekService com ZEEK_SOURCE=http, somente com --zeek-api-url (mede o
+  sensor real; o log lido é o do sensor, não o sintético)
+
+Uso (na raiz do backend):
+  python scripts/benchmark_zeek_source.py
+  python scripts/benchmark_zeek_source.py --lines 200000 --maxlines 100 5000 50000
+  python scripts/benchmark_zeek_source.py --zeek-api-url http://192.168.100.1/zeek-api --token ...
+  python scripts/benchmark_zeek_source.py --log-dir /usr/local/spool/zeek   # logs reais no sensor
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# Adicionar o diretório raiz do projeto ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services_scanners.zeek_local_source import ZeekLocalSource
+from services_scanners.zeek_models import ZeekLogRequest, ZeekLogType
+
+CONN_FIELDS = [
+    ('ts', 'time'), ('uid', 'string'), ('id.orig_h', 'addr'), ('id.orig_p', 'port'),
+    ('id.resp_h', 'addr'), ('id.resp_p', 'port'), ('proto', 'enum'), ('service', 'string'),
+    ('duration', 'interval'), ('orig_bytes', 'count'), ('resp_bytes', 'count'),
+    ('conn_state', 'string'), ('local_orig', 'bool'), ('local_resp', 'bool'),
+    ('missed_bytes', 'count'), ('history', 'string'), ('orig_pkts', 'count'),
+    ('orig_ip_bytes', 'count'), ('resp_pkts', 'count'), ('resp_ip_bytes', 'count'),
+    ('tunnel_parents', 'set[string]'),
+]
+
+
+def write_conn_log(path, n_lines, rng):
+    """Escreve um conn.log sintético no formato TSV do Zeek."""
+    start = time.time() - n_lines * 0.01
+    with open(path, 'w') as fh:
+        fh.write('#separator \\x09\n#set_separator\t,\n#empty_field\t(empty)\n#unset_field\t-\n')
+        fh.write('#path\tconn\n#open\t2024-01-01-00-00-00\n')
+        fh.write('#fields\t' + '\t'.join(name for name, _ in CONN_FIELDS) + '\n')
+        fh.write('#types\t' + '\t'.join(kind for _, kind in CONN_FIELDS) + '\n')
+        for i in range(n_lines):
+            fh.write('\t'.join([
+                f'{start + i * 0.01:.6f}', f'C{rng.getrandbits(64):x}',
+                f'192.168.100.{rng.randint(2, 254)}', str(rng.randint(1024, 65535)),
+                f'10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}', str(rng.choice([53, 80, 443, 22])),
+                rng.choice(['tcp', 'udp']), rng.choice(['dns', 'http', 'ssl', '-']),
+                f'{rng.random() * 10:.6f}', str(rng.randint(0, 100000)), str(rng.randint(0, 100000)),
+                rng.choice(['SF', 'S0', 'REJ', 'RSTO']), 'T', 'F', '0', 'ShADadFf',
+                str(rng.randint(1, 100)), str(rng.randint(40, 100000)),
+                str(rng.randint(1, 100)), str(rng.randint(40, 100000)), '(empty)',
+            ]) + '\n')
+
+
+def timed(fn, repeat):
+    best = None
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = len(fn())
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, default=100000, help='Linhas do conn.log sintético')
+    parser.add_argument('--maxlines', type=int, nargs='+', default=[50, 1000, 5000, 20000])
+    parser.add_argument('--repeat', type=int, default=5, help='Repetições por medição (melhor tempo)')
+    parser.add_argument('--log-dir', help='Usa os logs existentes neste diretório em vez do sintético')
+    parser.add_argument('--zeek-api-url', help='Mede também o caminho HTTP nesta API')
+    parser.add_argument('--token', help='Token da API do Zeek (padrão: ZEEK_API_TOKEN)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    tmpdir = None
+    log_dir = args.log_dir
+    if log_dir is None:
+        tmpdir = tempfile.mkdtemp(prefix='zeek-bench-')
+        log_dir = tmpdir
+        path = os.path.join(tmpdir, 'conn.log')
+        write_conn_log(path, args.lines, random.Random(args.seed))
+        print(f"conn.log sintético: {args.lines} linhas, {os.path.getsize(path) / 1e6:.1f} MB")
+
+    http_service = None
+    if args.zeek_api_url:
+        from services_scanners.zeek_service import ZeekService
+        http_service = ZeekService(zeek_api_base_url=args.zeek_api_url, api_token=args.token, source='http')
+
+    source = ZeekLocalSource(log_dir)
+    header = f"{'maxlines':>9} {'registros':>10} {'local (ms)':>11} {'local+json (ms)':>16}"
+    if http_service:
+        header += f" {'http (ms)':>10} {'ganho':>7}"
+    print(header)
+    try:
+        for maxlines in args.maxlines:
+            local_ms, count = timed(lambda: source.read_logs(ZeekLogType.CONN, maxlines), args.repeat)
+            json_ms, _ = timed(lambda: json.loads(json.dumps(source.read_logs(ZeekLogType.CONN, maxlines))), args.repeat)
+            line = f"{maxlines:>9} {count:>10} {local_ms:>11.2f} {json_ms:>16.2f}"
+            if http_service:
+                request = ZeekLogRequest.model_construct(logfile=ZeekLogType.CONN, maxlines=maxlines)  # sem o limite de 1000 da rota
+                http_ms, _ = timed(lambda: http_service._fetch_logs_http(request)[0], args.repeat)
+                line += f" {http_ms:>10.2f} {http_ms / local_ms:>6.1f}x"
+            print(line)
+    finally:
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
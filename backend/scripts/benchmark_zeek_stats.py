@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark: estatísticas de /zeek/stats — consultas sobre zeek_incidents vs. agregados por hora.
+
+Popula um banco com incidentes sintéticos espalhados pelos últimos 7 dias e
+com os agregados por hora lidos por /zeek/stats (mesmas contagens que
+IncidentService grava) e mede o tempo médio, por período, de:
+- "tabela": contagens por tipo de log/severidade e top 10 IPs direto em zeek_incidents
+- "agregados": IncidentRollupService.hourly_facets (o que /zeek/stats usa, sem o cache)
+
+Por padrão usa SQLite em memória; use --database-url para medir em outro banco
+(as tabelas são criadas e removidas — NÃO aponte para o banco de produção).
+
+Uso (na raiz do backend):
+  python scripts/benchmark_zeek_stats.py
+  python scripts/benchmark_zeek_stats.py --incidents 10000000 --ips 2000 --database-url mysql+pymysql://...
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Adicionar o diretório raiz do projeto ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, desc, func
+from sqlalchemy.orm import sessionmaker
+from db.enums import IncidentSeverity, IncidentStatus, ZeekLogType
+from db.models import ZeekIncident, ZeekIncidentRollupIpDay, ZeekIncidentRollupIpHour, ZeekIncidentRollupTypeHour
+from services_scanners.incident_rollups import IncidentRollupService, RollupCounter, day_bucket, hour_bucket
+
+INCIDENT_TYPES = ['Port Scan', 'Brute Force', 'Possível DGA', 'Periodic Beaconing', 'Alto volume de tráfego',
+                  'Conexão falhada', 'User agent suspeito', 'Acesso a URI sensível']
+TABLES = (ZeekIncident, ZeekIncidentRollupTypeHour, ZeekIncidentRollupIpHour, ZeekIncidentRollupIpDay)
+CHUNK = 20000
+
+
+def populate(db, n_incidents, n_ips, rng, now):
+    """Insere os incidentes em lotes e, ao final, os agregados por hora."""
+    ips = [f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}' for i in range(n_ips)]
+    severities = list(IncidentSeverity)
+    log_types = [ZeekLogType.HTTP, ZeekLogType.DNS, ZeekLogType.CONN]
+    span = 7 * 24 * 3600
+    counter = RollupCounter()
+    for start in range(0, n_incidents, CHUNK):
+        rows = []
+        for i in range(start, min(start + CHUNK, n_incidents)):
+            detected_at = now - timedelta(seconds=rng.random() * span)
+            row = {
+                'device_ip': rng.choice(ips), 'incident_type': rng.choice(INCIDENT_TYPES),
+                'severity': rng.choice(severities), 'status': IncidentStatus.NEW, 'description': '',
+                'detected_at': detected_at, 'zeek_log_type': rng.choice(log_types),
+                'occurrence_count': 1, 'dedupe_key': f'{i:040x}',
+            }
+            rows.append(row)
+            counter.add(row, incidents=1, occurrences=1)
+        db.execute(ZeekIncident.__table__.insert(), rows)
+        db.commit()
+    # Tabelas vazias: INSERT simples com as linhas que IncidentRollupService.write somaria
+    db.execute(ZeekIncidentRollupTypeHour.__table__.insert(), counter.rows(hour_bucket, ('zeek_log_type', 'severity')))
+    db.execute(ZeekIncidentRollupIpHour.__table__.insert(), counter.rows(hour_bucket, ('device_ip',)))
+    db.execute(ZeekIncidentRollupIpDay.__table__.insert(), counter.rows(day_bucket, ('device_ip',)))
+    db.commit()
+
+
+def table_stats(db, since):
+    """Mesmas contagens de /zeek/stats calculadas direto em zeek_incidents; retorna o total."""
+    facets = db.query(ZeekIncident.zeek_log_type, ZeekIncident.severity, func.count()).filter(
+        ZeekIncident.detected_at >= since
+    ).group_by(ZeekIncident.zeek_log_type, ZeekIncident.severity).all()
+    db.query(ZeekIncident.device_ip, func.count().label('incidents')).filter(
+        ZeekIncident.detected_at >= since
+    ).group_by(ZeekIncident.device_ip).order_by(desc('incidents')).limit(10).all()
+    return sum(count for _, _, count in facets)
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) * 1000 / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--incidents', type=int, default=1000000)
+    parser.add_argument('--ips', type=int, default=500, help='IPs distintos')
+    parser.add_argument('--hours', type=int, nargs='+', default=[1, 24, 168], help='Períodos medidos')
+    parser.add_argument('--repeat', type=int, default=5, help='Consultas por medição')
+    parser.add_argument('--database-url', default='sqlite://')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    engine = create_engine(args.database_url)
+    for table in TABLES:
+        table.__table__.create(engine, checkfirst=True)
+    db = sessionmaker(bind=engine)()
+    service = IncidentRollupService()
+    now = datetime.now()
+    try:
+        started = time.perf_counter()
+        populate(db, args.incidents, args.ips, rng, now)
+        type_rows = db.query(ZeekIncidentRollupTypeHour).count()
+        ip_rows = db.query(ZeekIncidentRollupIpHour).count() + db.query(ZeekIncidentRollupIpDay).count()
+        print(f"{args.incidents} incidentes, agregados: {type_rows} linhas (tipo/severidade), "
+              f"{ip_rows} linhas (IP por hora e por dia) ({time.perf_counter() - started:.1f}s para popular)")
+
+        print(f"{'período (h)':>11} {'tabela (ms)':>12} {'agregados (ms)':>15} {'ganho':>7}")
+        for hours in args.hours:
+            # Os agregados começam no início da hora: a consulta na tabela usa a mesma janela
+            since = hour_bucket(now - timedelta(hours=hours))
+            table_ms, expected = timed(lambda: table_stats(db, since), args.repeat)
+            rollup_ms, facets = timed(lambda: service.hourly_facets(db, since), args.repeat)
+            if expected != facets['total_incidents']:
+                print(f"  aviso: totais diferentes (tabela={expected}, agregados={facets['total_incidents']})")
+            print(f"{hours:>11} {table_ms:>12.1f} {rollup_ms:>15.1f} {table_ms / rollup_ms:>6.1f}x")
+    finally:
+        db.close()
+        for table in reversed(TABLES):
+            table.__table__.drop(engine, checkfirst=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Gera a tabela de bigramas usada na pontuação de DGA (services_scanners/dga_bigrams.json).
+
+A tabela tem, para cada par de caracteres (a, b) do alfabeto [a-z0-9-], o
+log10 de P(b | a), com suavização de Laplace. As contagens vêm de:
+- arquivos de corpus informados em --corpus: texto livre (palavras) ou listas de
+  domínios, uma por linha, inclusive no formato CSV "posição,domínio" (ex: Tranco);
+  de domínios, só o rótulo registrável é usado;
+- uma lista embutida de rótulos de domínios comuns (serviços, CDNs, fabricantes
+  de IoT e domínios brasileiros), com peso --domain-weight.
+
+Uso (na raiz do backend):
+  python scripts/generate_dga_bigrams.py --corpus /caminho/texto.txt
+  python scripts/generate_dga_bigrams.py --corpus top-1m.csv --domain-weight 1
+"""
+import argparse
+import json
+import math
+import os
+import re
+import sys
+
+# Adicionar o diretório raiz do projeto ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789-"
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              "services_scanners", "dga_bigrams.json")
+
+DOMAIN_LABELS = """
+google youtube facebook instagram whatsapp twitter linkedin microsoft windows office live outlook
+apple icloud amazon amazonaws cloudfront akamai akamaiedge akamaihd fastly cloudflare netflix
+spotify github gitlab stackoverflow wikipedia yahoo bing baidu tiktok bytedance reddit pinterest
+dropbox adobe oracle salesforce zoom slack discord telegram mozilla firefox ubuntu debian
+googleapis gstatic googleusercontent doubleclick googlesyndication googletagmanager gvt1 ytimg
+fbcdn cdninstagram msftncsi msedge skype xbox playstation nintendo steampowered epicgames
+samsung xiaomi huawei tuya tuyaus tuyaeu hikvision dahua tplink tplinkcloud ezviz ring nest
+alexa philips hue sonos roku chromecast ubiquiti mikrotik netgear dlink asus synology qnap
+espressif arduino raspberrypi openwrt pfsense netgate zeek letsencrypt digicert sectigo
+globalsign godaddy namecheap wordpress shopify paypal stripe visa mastercard
+uol globo terra ig bol r7 band sbt folha estadao abril correios caixa bradesco itau santander
+bb bancodobrasil nubank inter mercadolivre mercadopago americanas magazineluiza magalu
+submarino casasbahia olx ifood rappi rnp ufrgs ufsc usp unicamp ufmg ufrj unb gov jus serpro
+dataprev receita fazenda detran sus saude educacao cafe cafeexpresso eduroam
+weather time news sport mail login account accounts update updates download support help
+service services status static media images assets content portal shop store online cloud
+home office school university campus library research network security server router
+""".split()
+
+
+def registered_label(domain):
+    labels = [label for label in domain.strip().rstrip('.').lower().split('.') if label]
+    if len(labels) < 2:
+        return labels[0] if labels else None
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in {'com', 'net', 'org', 'gov', 'edu', 'ac', 'co'}:
+        return labels[-3]
+    return labels[-2]
+
+
+def tokens(path):
+    """Rótulos de domínio (linhas com ponto) ou palavras do texto."""
+    word = re.compile(r"[a-z0-9-]{2,}")
+    with open(path, encoding='utf-8', errors='ignore') as fh:
+        for line in fh:
+            line = line.strip().lower()
+            candidate = line.split(',')[-1]
+            if candidate and ' ' not in candidate and '.' in candidate:
+                label = registered_label(candidate)
+                if label:
+                    yield label
+                continue
+            yield from word.findall(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', nargs='*', default=[], help='Arquivos de texto ou listas de domínios')
+    parser.add_argument('--domain-weight', type=int, default=50, help='Peso da lista embutida de rótulos')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    k = len(ALPHABET)
+    index = {char: i for i, char in enumerate(ALPHABET)}
+    counts = [[0] * k for _ in range(k)]
+
+    def add(token, weight=1):
+        for a, b in zip(token, token[1:]):
+            if a in index and b in index:
+                counts[index[a]][index[b]] += weight
+
+    total_tokens = 0
+    for path in args.corpus:
+        for token in tokens(path):
+            add(token)
+            total_tokens += 1
+    for label in DOMAIN_LABELS:
+        add(label, args.domain_weight)
+
+    logprob = []
+    for row in counts:
+        total = sum(row)
+        logprob.append([round(math.log10((count + 1) / (total + k)), 4) for count in row])
+
+    table = {
+        'description': 'log10 P(b | a) dos bigramas de rótulos de domínio, com suavização de Laplace',
+        'alphabet': ALPHABET,
+        'sources': [os.path.basename(path) for path in args.corpus] + [f'rótulos embutidos (peso {args.domain_weight})'],
+        'logprob': logprob,
+    }
+    with open(args.output, 'w', encoding='utf-8') as fh:
+        json.dump(table, fh, ensure_ascii=False, separators=(',', ':'))
+        fh.write('\n')
+    print(f"[OK] Tabela {k}x{k} gravada em {args.output} ({total_tokens} tokens de corpus)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Script para criar as tabelas pfsense_rule_endpoints e device_access_status
+e preenchê-las a partir das regras e aliases já salvos no banco.
+
+Pode ser executado novamente a qualquer momento para reconstruir o índice.
+"""
+import sys
+import os
+
+# Adicionar o diretório raiz do projeto ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.models import PfSenseRuleEndpoint, DeviceAccessStatus
+from db.session import engine, SessionLocal
+from services_firewalls.access_status_service import AccessStatusService
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def migrate():
+    """Cria as tabelas (se necessário) e recalcula o índice e o status de acesso."""
+    try:
+        logger.info("Criando tabelas 'pfsense_rule_endpoints' e 'device_access_status'...")
+        PfSenseRuleEndpoint.__table__.create(engine, checkfirst=True)
+        DeviceAccessStatus.__table__.create(engine, checkfirst=True)
+
+        db = SessionLocal()
+        try:
+            with AccessStatusService(db) as service:
+                tokens = service.rebuild_rule_endpoints()
+                logger.info(f"✅ {tokens} tokens de regras indexados")
+                changed = service.refresh_all()
+                logger.info(f"✅ Status de acesso materializado para {changed} IP(s)")
+        finally:
+            db.close()
+        return True
+    except Exception as e:
+        logger.error(f"❌ Erro na migração: {e}")
+        return False
+
+if __name__ == "__main__":
+    sys.exit(0 if migrate() else 1)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Migração de zeek_incidents para o agrupamento de ocorrências repetidas.
+
+Etapas (todas idempotentes):
+1. Adiciona as colunas occurrence_count, first_seen, last_seen e dedupe_key, se não existirem
+2. Preenche first_seen/last_seen dos incidentes existentes com detected_at
+3. Calcula a dedupe_key dos incidentes existentes; quando já há mais de um incidente
+   com a mesma chave, apenas o mais antigo a recebe (os demais ficam sem chave e
+   continuam listados normalmente)
+4. Cria o índice único uq_incident_dedupe_key e o índice idx_incident_last_seen_count
+
+Uso (na raiz do backend):
+  python scripts/migrate_add_incident_occurrences.py
+"""
+import sys
+import os
+
+# Adicionar o diretório raiz do projeto ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from db.session import engine
+from services_scanners.incident_service import incident_dedupe_key
+
+COLUMNS = {
+    "occurrence_count": "ADD COLUMN occurrence_count INT NOT NULL DEFAULT 1 COMMENT 'Ocorrências agrupadas'",
+    "first_seen": "ADD COLUMN first_seen DATETIME NULL COMMENT 'Primeira ocorrência'",
+    "last_seen": "ADD COLUMN last_seen DATETIME NULL COMMENT 'Última ocorrência'",
+    "dedupe_key": "ADD COLUMN dedupe_key VARCHAR(40) NULL COMMENT 'Chave de agrupamento (IP, tipo, severidade, janela)'",
+}
+
+def existing_columns(table: str) -> set:
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            """
+            SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table
+            """
+        ), {"table": table}).fetchall()
+        return {row[0] for row in rows}
+
+def index_exists(table: str, index: str) -> bool:
+    with engine.connect() as conn:
+        result = conn.execute(text(
+            """
+            SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND INDEX_NAME = :index
+            """
+        ), {"table": table, "index": index}).scalar()
+        return bool(result)
+
+def execute(ddl: str):
+    with engine.begin() as conn:
+        conn.execute(text(ddl))
+
+def backfill_dedupe_keys(batch_size: int = 5000) -> int:
+    """Calcula a dedupe_key dos incidentes existentes (o mais antigo de cada chave)."""
+    assigned = 0
+    seen = set()
+    with engine.connect() as conn:
+        seen.update(row[0] for row in conn.execute(text(
+            "SELECT dedupe_key FROM zeek_incidents WHERE dedupe_key IS NOT NULL"
+        )))
+        rows = conn.execute(text(
+            """
+            SELECT id, device_ip, incident_type, severity, detected_at
+            FROM zeek_incidents WHERE dedupe_key IS NULL ORDER BY id
+            """
+        )).fetchall()
+
+    updates = []
+    for incident_id, device_ip, incident_type, severity, detected_at in rows:
+        # severity é gravado como o nome do enum (ex: 'LOW'); a chave usa o valor ('low')
+        key = incident_dedupe_key(device_ip, incident_type, str(severity).lower(), detected_at)
+        if key in seen:
+            continue
+        seen.add(key)
+        updates.append({"id": incident_id, "key": key})
+
+    for start in range(0, len(updates), batch_size):
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE zeek_incidents SET dedupe_key = :key WHERE id = :id"), updates[start:start + batch_size])
+        assigned += len(updates[start:start + batch_size])
+    return assigned
+
+def main():
+    columns = existing_columns("zeek_incidents")
+    if not columns:
+        print("[ERRO] Tabela zeek_incidents não encontrada.")
+        return 1
+
+    for name, ddl in COLUMNS.items():
+        if name not in columns:
+            execute(f"ALTER TABLE zeek_incidents {ddl}")
+            print(f"[OK] Coluna {name} adicionada.")
+        else:
+            print(f"[SKIP] Coluna {name} já existe.")
+
+    execute("UPDATE zeek_incidents SET first_seen = detected_at WHERE first_seen IS NULL")
+    execute("UPDATE zeek_incidents SET last_seen = detected_at WHERE last_seen IS NULL")
+    print("[OK] first_seen/last_seen preenchidos.")
+
+    assigned = backfill_dedupe_keys()
+    print(f"[OK] dedupe_key calculada para {assigned} incidente(s).")
+
+    if not index_exists("zeek_incidents", "uq_incident_dedupe_key"):
+        execute("CREATE UNIQUE INDEX uq_incident_dedupe_key ON zeek_incidents (dedupe_key)")
+        print("[OK] Índice uq_incident_dedupe_key criado.")
+    else:
+        print("[SKIP] Índice uq_incident_dedupe_key já existe.")
+
+    if not index_exists("zeek_incidents", "idx_incident_last_seen_count"):
+        execute("CREATE INDEX idx_incident_last_seen_count ON zeek_incidents (last_seen, occurrence_count)")
+        print("[OK] Índice idx_incident_last_seen_count criado.")
+    else:
+        print("[SKIP] Índice idx_incident_last_seen_count já existe.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Migração dos agregados de incidentes (zeek_incident_rollup_minute,
+zeek_incident_rollup_hour e os agregados estreitos usados por /zeek/stats).
+
+Etapas:
+1. Cria as tabelas, se não existirem
+2. Com --backfill, preenche os agregados a partir de zeek_incidents dentro da
+   retenção de cada tabela (somente se os agregados estiverem vazios). Os
+   incidentes históricos não guardam o horário de cada ocorrência: todas as
+   ocorrências de um incidente entram no bucket da sua data de detecção.
+
+Uso (na raiz do backend):
+  python scripts/migrate_add_incident_rollups.py
+  python scripts/migrate_add_incident_rollups.py --backfill
+"""
+import argparse
+import sys
+import os
+from datetime import datetime
+
+# Adicionar o diretório raiz do projeto ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.models import ZeekIncident, ZeekIncidentRollupHour, ZeekIncidentRollupMinute
+from db.session import engine, SessionLocal
+from services_scanners.incident_rollups import ROLLUP_TARGETS, IncidentRollupService, RollupCounter
+
+# Incidentes lidos por vez no preenchimento
+CHUNK = 5000
+
+def backfill(db, service: IncidentRollupService) -> int:
+    """Soma os incidentes dentro da retenção por hora nos agregados; retorna quantos foram lidos."""
+    now = datetime.now()
+    columns = (ZeekIncident.id, ZeekIncident.detected_at, ZeekIncident.device_ip, ZeekIncident.severity,
+               ZeekIncident.zeek_log_type, ZeekIncident.incident_type, ZeekIncident.occurrence_count)
+    total = 0
+    last_id = 0
+    while True:
+        chunk = db.query(*columns).filter(
+            ZeekIncident.detected_at >= now - service.hour_retention,
+            ZeekIncident.id > last_id
+        ).order_by(ZeekIncident.id).limit(CHUNK).all()
+        if not chunk:
+            return total
+        minute, hour = RollupCounter(), RollupCounter()
+        for incident in chunk:
+            row = incident._asdict()
+            # Buckets por minuto só dentro da retenção da tabela por minuto
+            target = minute if incident.detected_at >= now - service.minute_retention else hour
+            target.add(row, incidents=1, occurrences=incident.occurrence_count or 1)
+        service.write(db, minute)
+        service.write(db, hour, models=[model for model, _, _ in ROLLUP_TARGETS if model is not ZeekIncidentRollupMinute])
+        db.commit()
+        total += len(chunk)
+        last_id = chunk[-1].id
+        print(f"  {total} incidentes somados...")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backfill', action='store_true', help='Preenche os agregados a partir de zeek_incidents')
+    args = parser.parse_args()
+
+    for model, _, _ in ROLLUP_TARGETS:
+        model.__table__.create(engine, checkfirst=True)
+    print("[OK] Tabelas de agregados de incidentes verificadas.")
+
+    if not args.backfill:
+        return
+    db = SessionLocal()
+    try:
+        if db.query(ZeekIncidentRollupHour.bucket).first() is not None:
+            print("[SKIP] Agregados já preenchidos; preenchimento ignorado.")
+            return
+        total = backfill(db, IncidentRollupService())
+        print(f"[OK] {total} incidentes somados nos agregados.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Script para criar a tabela zeek_log_cursors (cursores do worker de ingestão do Zeek).
+
+Os cursores são criados pelo próprio worker no primeiro ciclo; use --reset
+para apagá-los e recomeçar a ingestão conforme ZEEK_INGESTION_START.
+"""
+import sys
+import os
+
+# Adicionar o diretório raiz do projeto ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.models import ZeekLogCursor
+from db.session import engine, SessionLocal
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def migrate(reset: bool = False):
+    """Cria a tabela (se necessário) e, opcionalmente, apaga os cursores existentes."""
+    try:
+        logger.info("Criando tabela 'zeek_log_cursors'...")
+        ZeekLogCursor.__table__.create(engine, checkfirst=True)
+
+        if reset:
+            db = SessionLocal()
+            try:
+                removed = db.query(ZeekLogCursor).delete()
+                db.commit()
+                logger.info(f"✅ {removed} cursor(es) removido(s)")
+            finally:
+                db.close()
+        logger.info("✅ Tabela 'zeek_log_cursors' pronta")
+        return True
+    except Exception as e:
+        logger.error(f"❌ Erro na migração: {e}")
+        return False
+
+if __name__ == "__main__":
+    sys.exit(0 if migrate(reset="--reset" in sys.argv[1:]) else 1)
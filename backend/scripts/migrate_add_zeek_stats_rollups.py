@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Migração das tabelas usadas por /zeek/stats:
+- zeek_ingestion_stats: linhas processadas pelo worker de ingestão por log e por hora
+- zeek_incident_rollup_type_hour, zeek_incident_rollup_ip_hour e
+  zeek_incident_rollup_ip_day: agregados estreitos de incidentes
+
+Etapas:
+1. Cria as tabelas, se não existirem
+2. Com --backfill, preenche os agregados estreitos a partir de
+   zeek_incident_rollup_hour (scripts/migrate_add_incident_rollups.py),
+   somente se estiverem vazios. As linhas ingeridas não têm histórico e
+   passam a ser contadas a partir da migração.
+
+Uso (na raiz do backend):
+  python scripts/migrate_add_zeek_stats_rollups.py
+  python scripts/migrate_add_zeek_stats_rollups.py --backfill
+"""
+import argparse
+import sys
+import os
+from datetime import timedelta
+
+# Adicionar o diretório raiz do projeto ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.models import (
+    ZeekIngestionStat, ZeekIncidentRollupHour, ZeekIncidentRollupIpDay, ZeekIncidentRollupIpHour,
+    ZeekIncidentRollupTypeHour
+)
+from db.session import engine, SessionLocal
+from services_scanners.incident_rollups import IncidentRollupService, RollupCounter
+
+NARROW = (ZeekIncidentRollupTypeHour, ZeekIncidentRollupIpHour, ZeekIncidentRollupIpDay)
+
+def backfill(db, service: IncidentRollupService) -> int:
+    """Soma zeek_incident_rollup_hour nos agregados estreitos, um dia por vez; retorna as linhas lidas."""
+    first = db.query(ZeekIncidentRollupHour.bucket).order_by(ZeekIncidentRollupHour.bucket).first()
+    last = db.query(ZeekIncidentRollupHour.bucket).order_by(ZeekIncidentRollupHour.bucket.desc()).first()
+    if first is None:
+        return 0
+    total = 0
+    day = first[0].replace(hour=0)
+    while day <= last[0]:
+        counter = RollupCounter()
+        rows = db.query(ZeekIncidentRollupHour).filter(
+            ZeekIncidentRollupHour.bucket >= day, ZeekIncidentRollupHour.bucket < day + timedelta(days=1)
+        ).all()
+        for row in rows:
+            counter.add({'detected_at': row.bucket, 'device_ip': row.device_ip, 'severity': row.severity,
+                         'zeek_log_type': row.zeek_log_type, 'incident_type': row.incident_type},
+                        incidents=row.incident_count, occurrences=row.occurrence_count)
+        service.write(db, counter, models=NARROW)
+        db.commit()
+        total += len(rows)
+        day += timedelta(days=1)
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backfill', action='store_true', help='Preenche os agregados a partir de zeek_incident_rollup_hour')
+    args = parser.parse_args()
+
+    for model in (ZeekIngestionStat,) + NARROW:
+        model.__table__.create(engine, checkfirst=True)
+    print("[OK] Tabelas zeek_ingestion_stats e agregados por tipo/IP verificadas.")
+
+    if not args.backfill:
+        return
+    db = SessionLocal()
+    try:
+        if db.query(ZeekIncidentRollupTypeHour.bucket).first() is not None:
+            print("[SKIP] Agregados já preenchidos; preenchimento ignorado.")
+            return
+        total = backfill(db, IncidentRollupService())
+        print(f"[OK] {total} linhas de zeek_incident_rollup_hour somadas nos agregados.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Migração dos logs originais dos incidentes para zeek_incident_raw_logs.
+
+A coluna zeek_incidents.raw_log_data (TEXT) era lida em toda listagem de
+incidentes e guardava o JSON serializado duas vezes (ZeekService e
+IncidentService chamavam json.dumps). Os logs passam a ficar em
+zeek_incident_raw_logs, comprimidos com zlib, e só o detalhe do incidente os lê.
+
+Etapas:
+1. Cria a tabela zeek_incident_raw_logs, se não existir
+2. Copia raw_log_data de cada incidente, desfazendo a serialização dupla
+   (INSERT IGNORE: pode ser executada de novo após uma interrupção)
+3. Remove a coluna raw_log_data (mantida com --keep-column)
+
+Uso (na raiz do backend):
+  python scripts/migrate_incident_raw_logs.py
+  python scripts/migrate_incident_raw_logs.py --keep-column
+"""
+import argparse
+import sys
+import os
+
+# Adicionar o diretório raiz do projeto ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from sqlalchemy.dialects import mysql
+from db.models import ZeekIncidentRawLog
+from db.session import engine
+from services_scanners.incident_service import pack_raw_log
+
+# Incidentes lidos por vez na cópia
+CHUNK = 2000
+
+def column_exists(table: str, column: str) -> bool:
+    with engine.connect() as conn:
+        result = conn.execute(text(
+            """
+            SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND COLUMN_NAME = :column
+            """
+        ), {"table": table, "column": column}).scalar()
+        return bool(result)
+
+def copy_raw_logs() -> int:
+    """Copia os logs de raw_log_data para zeek_incident_raw_logs; retorna quantos foram gravados."""
+    total = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            chunk = conn.execute(text(
+                "SELECT id, raw_log_data FROM zeek_incidents "
+                "WHERE id > :last_id AND raw_log_data IS NOT NULL ORDER BY id LIMIT :limit"
+            ), {"last_id": last_id, "limit": CHUNK}).all()
+            if not chunk:
+                return total
+            rows = []
+            for incident_id, raw in chunk:
+                data = pack_raw_log(raw)
+                if data:
+                    rows.append({'incident_id': incident_id, 'data': data})
+            if rows:
+                conn.execute(mysql.insert(ZeekIncidentRawLog).values(rows).prefix_with('IGNORE'))
+        total += len(rows)
+        last_id = chunk[-1][0]
+        print(f"  {total} logs copiados...")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--keep-column', action='store_true', help='Não remove zeek_incidents.raw_log_data')
+    args = parser.parse_args()
+
+    ZeekIncidentRawLog.__table__.create(engine, checkfirst=True)
+    print("[OK] Tabela zeek_incident_raw_logs verificada.")
+
+    if not column_exists("zeek_incidents", "raw_log_data"):
+        print("[SKIP] Coluna raw_log_data já removida.")
+        return
+    total = copy_raw_logs()
+    print(f"[OK] {total} logs copiados para zeek_incident_raw_logs.")
+
+    if args.keep_column:
+        print("[SKIP] Coluna raw_log_data mantida (--keep-column).")
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE zeek_incidents DROP COLUMN raw_log_data"))
+    print("[OK] Coluna raw_log_data removida.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Migração da tabela zeek_incidents: índice de cobertura das estatísticas por período
+(IncidentService.get_incident_stats).
+
+O índice idx_incident_stats (detected_at, severity, status, zeek_log_type,
+device_ip, occurrence_count) permite que a consulta agrupada por status (as
+demais contagens vêm dos agregados de incident_rollups.py) leia apenas o
+intervalo de detected_at no índice, sem acessar as linhas da tabela.
+
+Etapa idempotente: cria o índice, se não existir.
+
+Uso (na raiz do backend):
+  python scripts/migrate_incident_stats_index.py
+"""
+import sys
+import os
+
+# Adicionar o diretório raiz do projeto ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from db.session import engine
+
+def index_exists(table: str, index: str) -> bool:
+    with engine.connect() as conn:
+        result = conn.execute(text(
+            """
+            SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND INDEX_NAME = :index
+            """
+        ), {"table": table, "index": index}).scalar()
+        return bool(result)
+
+def main():
+    if not index_exists("zeek_incidents", "idx_incident_stats"):
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE INDEX idx_incident_stats ON zeek_incidents "
+                "(detected_at, severity, status, zeek_log_type, device_ip, occurrence_count)"
+            ))
+        print("[OK] Índice idx_incident_stats criado.")
+    else:
+        print("[SKIP] Índice idx_incident_stats já existe.")
+
+if __name__ == "__main__":
+    main()
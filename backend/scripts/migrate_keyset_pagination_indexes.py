@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Migração dos índices usados pela paginação por cursor (db/pagination.py).
+
+As listagens ordenam por (detected_at, id) em zeek_incidents e por
+(feedback_date, id) em blocking_feedback_history; com o filtro da listagem à
+frente da chave de ordenação no índice, cada página lê só as linhas que
+retorna, qualquer que seja a sua posição:
+- zeek_incidents: idx_incident_detected_at (detected_at, id) e
+  idx_incident_device_ip (device_ip, detected_at, id)
+- blocking_feedback_history: idx_feedback_dhcp_mapping, idx_feedback_status e
+  idx_feedback_by passam a terminar em (feedback_date, id)
+
+Dispositivos e aliases são paginados pelo id (chave primária) e não precisam
+de índices novos.
+
+Etapas (idempotentes):
+1. blocking_feedback_history.feedback_date passa a ser NOT NULL: uma linha com
+   data NULL nunca satisfaz a condição do cursor (feedback_date < v) e sumiria
+   das páginas seguintes. Datas NULL recebem created_at (a data de inserção,
+   que segue a ordem dos ids), ou o momento da migração se também ausente
+2. Recria cada índice cujas colunas diferem da definição (DROP e ADD no mesmo
+   ALTER TABLE, para não deixar a chave estrangeira de dhcp_mapping_id sem índice)
+
+Uso (na raiz do backend):
+  python scripts/migrate_keyset_pagination_indexes.py
+"""
+import sys
+import os
+
+# Adicionar o diretório raiz do projeto ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from db.session import engine
+
+INDEXES = [
+    ("zeek_incidents", "idx_incident_detected_at", ["detected_at", "id"]),
+    ("zeek_incidents", "idx_incident_device_ip", ["device_ip", "detected_at", "id"]),
+    ("blocking_feedback_history", "idx_feedback_dhcp_mapping", ["dhcp_mapping_id", "feedback_date", "id"]),
+    ("blocking_feedback_history", "idx_feedback_status", ["status", "feedback_date", "id"]),
+    ("blocking_feedback_history", "idx_feedback_by", ["feedback_by", "feedback_date", "id"]),
+]
+
+def index_columns(table: str, index: str) -> list:
+    with engine.connect() as conn:
+        result = conn.execute(text(
+            """
+            SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND INDEX_NAME = :index
+            ORDER BY SEQ_IN_INDEX
+            """
+        ), {"table": table, "index": index})
+        return [row[0] for row in result]
+
+def column_nullable(table: str, column: str) -> bool:
+    with engine.connect() as conn:
+        result = conn.execute(text(
+            """
+            SELECT IS_NULLABLE FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND COLUMN_NAME = :column
+            """
+        ), {"table": table, "column": column}).scalar()
+        return result == "YES"
+
+def feedback_date_not_null():
+    if not column_nullable("blocking_feedback_history", "feedback_date"):
+        print("[SKIP] feedback_date já é NOT NULL.")
+        return
+    with engine.begin() as conn:
+        filled = conn.execute(text(
+            "UPDATE blocking_feedback_history SET feedback_date = COALESCE(created_at, NOW()) "
+            "WHERE feedback_date IS NULL"
+        )).rowcount
+        conn.execute(text(
+            "ALTER TABLE blocking_feedback_history MODIFY feedback_date DATETIME NOT NULL "
+            "DEFAULT CURRENT_TIMESTAMP COMMENT 'Data/hora do feedback'"
+        ))
+    print(f"[OK] feedback_date agora é NOT NULL ({filled} datas preenchidas).")
+
+def main():
+    feedback_date_not_null()
+    for table, index, columns in INDEXES:
+        current = index_columns(table, index)
+        if current == columns:
+            print(f"[SKIP] Índice {index} já está atualizado.")
+            continue
+        drop = f"DROP INDEX {index}, " if current else ""
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {table} {drop}ADD INDEX {index} ({', '.join(columns)})"))
+        print(f"[OK] Índice {index} ({', '.join(columns)}) {'recriado' if current else 'criado'}.")
+
+if __name__ == "__main__":
+    main()
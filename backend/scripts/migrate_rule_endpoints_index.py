@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Migração da tabela pfsense_rule_endpoints para o índice composto
+(token, side, rule_id) e inclusão dos tokens de interface das regras.
+
+Etapas (todas idempotentes):
+1. Cria a tabela, se não existir
+2. Remove o índice antigo idx_rule_endpoint_token, se existir
+3. Cria o índice idx_rule_endpoint_token_side, se não existir
+4. Reconstrói os tokens a partir de pfsense_firewall_rules e recalcula device_access_status
+
+Uso (na raiz do backend):
+  python scripts/migrate_rule_endpoints_index.py
+"""
+import sys
+import os
+
+# Adicionar o diretório raiz do projeto ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from db.models import PfSenseRuleEndpoint, DeviceAccessStatus
+from db.session import engine, SessionLocal
+from services_firewalls.access_status_service import AccessStatusService
+
+def index_exists(table: str, index: str) -> bool:
+    with engine.connect() as conn:
+        result = conn.execute(text(
+            """
+            SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND INDEX_NAME = :index
+            """
+        ), {"table": table, "index": index}).scalar()
+        return bool(result)
+
+def execute(ddl: str):
+    with engine.begin() as conn:
+        conn.execute(text(ddl))
+
+def main():
+    PfSenseRuleEndpoint.__table__.create(engine, checkfirst=True)
+    DeviceAccessStatus.__table__.create(engine, checkfirst=True)
+    print("[OK] Tabelas pfsense_rule_endpoints/device_access_status verificadas.")
+
+    if index_exists("pfsense_rule_endpoints", "idx_rule_endpoint_token"):
+        execute("DROP INDEX idx_rule_endpoint_token ON pfsense_rule_endpoints")
+        print("[OK] Índice antigo idx_rule_endpoint_token removido.")
+    else:
+        print("[SKIP] Índice idx_rule_endpoint_token não existe.")
+
+    if not index_exists("pfsense_rule_endpoints", "idx_rule_endpoint_token_side"):
+        execute(
+            "CREATE INDEX idx_rule_endpoint_token_side "
+            "ON pfsense_rule_endpoints (token, side, rule_id)"
+        )
+        print("[OK] Índice idx_rule_endpoint_token_side criado.")
+    else:
+        print("[SKIP] Índice idx_rule_endpoint_token_side já existe.")
+
+    db = SessionLocal()
+    try:
+        with AccessStatusService(db) as service:
+            tokens = service.rebuild_rule_endpoints()
+            print(f"[OK] {tokens} tokens de regras reconstruídos (source/destination/interface).")
+            changed = service.refresh_all()
+            print(f"[OK] Status de acesso recalculado ({changed} IP(s) alterados).")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
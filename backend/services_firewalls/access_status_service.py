@@ -0,0 +1,349 @@
+"""
+Serviço para cálculo do status de acesso de dispositivos.
+
+O status de acesso de um dispositivo é derivado dos aliases do pfSense que
+contêm o seu IP e das regras de firewall que referenciam esses aliases:
+- BLOQUEADO: algum alias do IP é usado por uma regra do tipo "block"
+- LIBERADO: algum alias do IP é usado por uma regra do tipo "pass" (e nenhuma "block")
+- AGUARDANDO: o IP não está em aliases ou os aliases não têm regras pass/block
+
+O status dos IPs de dispositivos (`dhcp_static_mappings`) fica materializado
+na tabela `device_access_status` e é recalculado
+quando aliases ou regras mudam (sincronização com o pfSense, criação/edição de
+aliases, bloqueio/liberação de dispositivos). As referências das regras aos
+aliases ficam normalizadas em `pfsense_rule_endpoints`, de modo que o cálculo
+usa apenas buscas indexadas.
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from sqlalchemy import exists
+from sqlalchemy.orm import Session
+from db.session import SessionLocal
+from db.models import (
+    PfSenseAlias, PfSenseAliasAddress, PfSenseFirewallRule, PfSenseRuleEndpoint,
+    DeviceAccessStatus, DhcpStaticMapping
+)
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATUS_BLOQUEADO = 'BLOQUEADO'
+STATUS_LIBERADO = 'LIBERADO'
+STATUS_AGUARDANDO = 'AGUARDANDO'
+
+
+RULE_SIDES = ('source', 'destination', 'interface')
+# Lados que indicam a quais endereços a regra se aplica (interface fica de fora)
+ADDRESS_SIDES = ('source', 'destination')
+
+# Tamanho máximo das listas IN enviadas ao banco (aliases de blocklist têm dezenas de milhares de endereços)
+IN_CHUNK_SIZE = 1000
+
+
+def _chunks(values: List[str], size: int = IN_CHUNK_SIZE) -> Iterator[List[str]]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def split_rule_field(value: Optional[str]) -> List[str]:
+    """
+    Separa um campo CSV de uma regra (source, destination ou interface) em tokens.
+
+    Para source/destination equivale às comparações `campo = token` e
+    `campo LIKE '%,token,%'`, `'token,%'`, `'%,token'` usadas anteriormente no
+    SQL. O campo interface é gravado como "lan, wan", por isso os espaços ao
+    redor de cada token são removidos.
+    """
+    if not value:
+        return []
+    return [token.strip() for token in value.split(',') if token.strip()]
+
+
+def rule_endpoint_rows(rule_id: int, source: Optional[str], destination: Optional[str],
+                       interface: Optional[str] = None) -> List[Dict]:
+    """
+    Gera as linhas de `pfsense_rule_endpoints` de uma regra.
+
+    Tokens negados ("!alias") são gravados sem o "!" e com negated=True.
+    """
+    rows = []
+    for side, value in zip(RULE_SIDES, (source, destination, interface)):
+        for token in dict.fromkeys(split_rule_field(value)):
+            negated = token.startswith('!')
+            rows.append({
+                'rule_id': rule_id,
+                'side': side,
+                'token': token[1:] if negated else token,
+                'negated': negated,
+            })
+    return rows
+
+
+class AccessStatusService:
+    """Serviço para cálculo e manutenção do status de acesso (alias/regras) de dispositivos."""
+
+    def __init__(self, db: Optional[Session] = None):
+        """
+        Parâmetros:
+            db (Session, opcional): Sessão existente a reutilizar. Se omitida,
+                o serviço abre (e fecha) a sua própria sessão.
+        """
+        self._owns_session = db is None
+        self.db: Session = db if db is not None else SessionLocal()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._owns_session:
+            self.db.close()
+
+    # ------------------------------------------------------------------
+    # Cálculo
+    # ------------------------------------------------------------------
+    def get_aliases_by_ip(self, ipaddrs: Iterable[str]) -> Dict[str, Set[str]]:
+        """
+        Retorna os nomes dos aliases que contêm cada IP (uma consulta a cada IN_CHUNK_SIZE IPs).
+
+        Args:
+            ipaddrs: IPs a consultar
+
+        Returns:
+            Dicionário {ip: {nome_alias, ...}} (IPs sem alias não aparecem)
+        """
+        ips = list({ip for ip in ipaddrs if ip})
+        aliases_by_ip: Dict[str, Set[str]] = {}
+        for chunk in _chunks(ips):
+            rows = self.db.query(PfSenseAliasAddress.address, PfSenseAlias.name).join(
+                PfSenseAlias, PfSenseAliasAddress.alias_id == PfSenseAlias.id
+            ).filter(PfSenseAliasAddress.address.in_(chunk)).all()
+            for address, name in rows:
+                aliases_by_ip.setdefault(address, set()).add(name)
+        return aliases_by_ip
+
+    def get_rule_types_by_alias(self, alias_names: Iterable[str]) -> Dict[str, Tuple[bool, bool]]:
+        """
+        Indica, para cada alias, se ele é referenciado por regras pass e/ou block.
+
+        Usa o índice de `pfsense_rule_endpoints.token` (uma única consulta).
+        Regras com negação (ex.: "!alias") também contam como referência ao alias.
+
+        Args:
+            alias_names: Nomes dos aliases a verificar
+
+        Returns:
+            Dicionário {nome_alias: (tem_pass, tem_block)}
+        """
+        names = set(alias_names)
+        if not names:
+            return {}
+        rows = self.db.query(PfSenseRuleEndpoint.token, PfSenseFirewallRule.type).join(
+            PfSenseFirewallRule, PfSenseRuleEndpoint.rule_id == PfSenseFirewallRule.id
+        ).filter(
+            PfSenseRuleEndpoint.token.in_(names),
+            PfSenseRuleEndpoint.side.in_(ADDRESS_SIDES),
+            PfSenseFirewallRule.type.in_(['pass', 'block'])
+        ).distinct().all()
+
+        has_pass: Set[str] = set()
+        has_block: Set[str] = set()
+        for token, rule_type in rows:
+            if rule_type == 'block':
+                has_block.add(token)
+            elif rule_type == 'pass':
+                has_pass.add(token)
+        return {name: (name in has_pass, name in has_block) for name in names}
+
+    def find_rules_referencing(self, token: str, types: Optional[Iterable[str]] = ('pass', 'block'),
+                               sides: Iterable[str] = ADDRESS_SIDES,
+                               include_negated: bool = True) -> List[PfSenseFirewallRule]:
+        """
+        Lista as regras que referenciam um alias (ou interface/endereço).
+
+        A busca parte do índice (token, side, rule_id) de `pfsense_rule_endpoints`.
+
+        Args:
+            token: Nome do alias, endereço ou interface
+            types: Tipos de regra a considerar (None = todos)
+            sides: Lados da regra onde procurar (source, destination, interface)
+            include_negated: Se deve incluir referências negadas ("!alias")
+
+        Returns:
+            Regras encontradas, ordenadas por ID
+        """
+        rule_ids = self.db.query(PfSenseRuleEndpoint.rule_id).filter(
+            PfSenseRuleEndpoint.token == token,
+            PfSenseRuleEndpoint.side.in_(list(sides))
+        )
+        if not include_negated:
+            rule_ids = rule_ids.filter(PfSenseRuleEndpoint.negated == False)
+
+        query = self.db.query(PfSenseFirewallRule).filter(PfSenseFirewallRule.id.in_(rule_ids))
+        if types is not None:
+            query = query.filter(PfSenseFirewallRule.type.in_(list(types)))
+        return query.order_by(PfSenseFirewallRule.id).all()
+
+    def compute_access_status_map(self, ipaddrs: Iterable[str]) -> Dict[str, str]:
+        """
+        Calcula (sem consultar a tabela materializada) o status de acesso de vários IPs.
+
+        Args:
+            ipaddrs: IPs dos dispositivos
+
+        Returns:
+            Dicionário {ip: status}
+        """
+        ips = list(dict.fromkeys(ip for ip in ipaddrs if ip))
+        aliases_by_ip = self.get_aliases_by_ip(ips)
+        all_names = set().union(*aliases_by_ip.values()) if aliases_by_ip else set()
+        rule_types = self.get_rule_types_by_alias(all_names)
+
+        status_map: Dict[str, str] = {}
+        for ip in ips:
+            found_pass, found_block = False, False
+            for name in aliases_by_ip.get(ip, ()):
+                alias_pass, alias_block = rule_types.get(name, (False, False))
+                found_pass = found_pass or alias_pass
+                found_block = found_block or alias_block
+            if found_block:
+                status_map[ip] = STATUS_BLOQUEADO
+            elif found_pass:
+                status_map[ip] = STATUS_LIBERADO
+            else:
+                status_map[ip] = STATUS_AGUARDANDO
+        return status_map
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+    def get_access_status_map(self, ipaddrs: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        Retorna o status de acesso de vários IPs a partir da tabela materializada.
+
+        IPs ainda não materializados são calculados na hora.
+
+        Args:
+            ipaddrs: IPs dos dispositivos
+
+        Returns:
+            Dicionário {ip: status}; em caso de erro o status é None
+        """
+        ips = list(dict.fromkeys(ip for ip in ipaddrs if ip))
+        if not ips:
+            return {}
+        try:
+            rows = self.db.query(DeviceAccessStatus.ipaddr, DeviceAccessStatus.status).filter(
+                DeviceAccessStatus.ipaddr.in_(ips)
+            ).all()
+            status_map: Dict[str, Optional[str]] = dict(rows)
+            missing = [ip for ip in ips if ip not in status_map]
+            if missing:
+                status_map.update(self.compute_access_status_map(missing))
+            return status_map
+        except Exception as e:
+            logger.error(f"Erro ao obter status de acesso: {e}")
+            return {ip: None for ip in ips}
+
+    # ------------------------------------------------------------------
+    # Manutenção
+    # ------------------------------------------------------------------
+    def rebuild_rule_endpoints(self) -> int:
+        """
+        Reconstrói `pfsense_rule_endpoints` a partir de `pfsense_firewall_rules`.
+
+        Returns:
+            Quantidade de tokens gravados
+        """
+        rules = self.db.query(
+            PfSenseFirewallRule.id, PfSenseFirewallRule.source,
+            PfSenseFirewallRule.destination, PfSenseFirewallRule.interface
+        ).all()
+        rows = []
+        for rule_id, source, destination, interface in rules:
+            rows.extend(rule_endpoint_rows(rule_id, source, destination, interface))
+
+        self.db.query(PfSenseRuleEndpoint).delete(synchronize_session=False)
+        if rows:
+            self.db.bulk_insert_mappings(PfSenseRuleEndpoint, rows)
+        self.db.commit()
+        return len(rows)
+
+    def refresh_ips(self, ipaddrs: Iterable[str]) -> int:
+        """
+        Recalcula e grava o status de acesso dos IPs informados.
+
+        Só IPs de dispositivos são materializados (são os únicos lidos); os
+        demais (ex: endereços de um alias de blocklist) são ignorados.
+
+        Args:
+            ipaddrs: IPs cujos aliases/regras podem ter mudado
+
+        Returns:
+            Quantidade de IPs cujo status mudou
+        """
+        ips = list({ip for ip in ipaddrs if ip})
+        device_ips: List[str] = []
+        for chunk in _chunks(ips):
+            device_ips.extend(ip for (ip,) in self.db.query(DhcpStaticMapping.ipaddr).filter(
+                DhcpStaticMapping.ipaddr.in_(chunk)
+            ).distinct())
+        return self._write_status(self.compute_access_status_map(device_ips))
+
+    def refresh_all(self) -> int:
+        """
+        Recalcula o status de todos os IPs de dispositivos.
+
+        IPs que não pertencem mais a nenhum dispositivo são removidos.
+
+        Returns:
+            Quantidade de IPs cujo status mudou
+        """
+        self.db.query(DeviceAccessStatus).filter(
+            ~exists().where(DhcpStaticMapping.ipaddr == DeviceAccessStatus.ipaddr)
+        ).delete(synchronize_session=False)
+
+        device_ips = [ip for (ip,) in self.db.query(DhcpStaticMapping.ipaddr).distinct()]
+        return self._write_status(self.compute_access_status_map(device_ips))
+
+    def _write_status(self, status_map: Dict[str, str]) -> int:
+        """Grava em lote os status que mudaram; retorna quantos IPs mudaram."""
+        existing: Dict[str, str] = {}
+        for chunk in _chunks(list(status_map)):
+            existing.update(self.db.query(DeviceAccessStatus.ipaddr, DeviceAccessStatus.status).filter(
+                DeviceAccessStatus.ipaddr.in_(chunk)
+            ).all())
+
+        now = datetime.utcnow()
+        inserts, updates = [], []
+        for ip, status in status_map.items():
+            if ip not in existing:
+                inserts.append({'ipaddr': ip, 'status': status, 'updated_at': now})
+            elif existing[ip] != status:
+                updates.append({'ipaddr': ip, 'status': status, 'updated_at': now})
+        if inserts:
+            self.db.bulk_insert_mappings(DeviceAccessStatus, inserts)
+        if updates:
+            self.db.bulk_update_mappings(DeviceAccessStatus, updates)
+        self.db.commit()
+        return len(inserts) + len(updates)
+
+
+def refresh_access_status(ipaddrs: Optional[Iterable[str]] = None, db: Optional[Session] = None) -> None:
+    """
+    Atualiza o status de acesso materializado sem propagar erros.
+
+    Parâmetros:
+        ipaddrs (iterável, opcional): IPs afetados; se None, recalcula todos.
+        db (Session, opcional): Sessão a reutilizar.
+    """
+    try:
+        with AccessStatusService(db) as service:
+            if ipaddrs is None:
+                changed = service.refresh_all()
+            else:
+                changed = service.refresh_ips(ipaddrs)
+        logger.info(f"Status de acesso atualizado: {changed} IP(s) alterados")
+    except Exception as e:
+        if db is not None:
+            db.rollback()
+        logger.error(f"Erro ao atualizar status de acesso materializado: {e}")
@@ -52,6 +52,7 @@ class AliasListResponse(BaseModel):
     per_page: int
     has_next: bool
     has_prev: bool
+    next_cursor: Optional[str] = Field(None, description="Cursor da próxima página (None na última)")
 
 class AliasStatisticsResponse(BaseModel):
     """Estatísticas de aliases."""
@@ -68,6 +69,9 @@ class AliasSaveResponse(BaseModel):
     aliases_updated: int
     addresses_saved: int
     addresses_updated: int
+    addresses_deleted: int = 0
+    elapsed_ms: Optional[float] = None
+    rows_per_second: Optional[float] = None
     timestamp: datetime
     pfsense_saved: bool
     pfsense_message: str
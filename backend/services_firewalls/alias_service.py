@@ -2,21 +2,31 @@
 Serviço para gerenciar aliases do pfSense.
 """
 
+from sqlalchemy.orm import selectinload
 from db.session import SessionLocal
+from db.pagination import Page, paginate
 from db.models import PfSenseAlias, PfSenseAliasAddress
-from services_firewalls.pfsense_client import listar_aliases_pfsense, cadastrar_alias_pfsense
+from services_firewalls.pfsense_client import cadastrar_alias_pfsense
+from services_firewalls.access_status_service import refresh_access_status
+from services_firewalls.pfsense_apply_queue import get_apply_coalescer, FIREWALL
 import requests
-from typing import List, Dict, Any, Optional
+import config
+import time
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, date
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Ordenação da listagem paginada de aliases
+ALIAS_ORDER = ((PfSenseAlias.id, False),)
+
 class AliasService:
     """Serviço para gerenciar aliases do pfSense."""
     
-    def __init__(self):
+    def __init__(self, batch_size: Optional[int] = None):
         self.db = SessionLocal()
+        self.batch_size = batch_size or config.ALIAS_SYNC_BATCH_SIZE
     
     def __enter__(self):
         return self
@@ -28,17 +38,21 @@ class AliasService:
         """
         Salva dados de aliases no banco de dados.
         
+        Os aliases e endereços existentes são carregados em memória com duas
+        consultas, comparados com os dados do pfSense e as diferenças são
+        gravadas em lotes (inserções, atualizações e remoções em massa).
+        Endereços que não existem mais no pfSense são removidos do alias.
+        
         Args:
             aliases_data: Dados dos aliases vindos do pfSense
             
         Returns:
             Estatísticas da operação
         """
+        started = time.perf_counter()
         try:
             aliases_saved = 0
             aliases_updated = 0
-            addresses_saved = 0
-            addresses_updated = 0
             
             # Verificar se os dados estão no formato correto
             if isinstance(aliases_data, dict) and 'data' in aliases_data:
@@ -48,98 +62,145 @@ class AliasService:
             else:
                 raise ValueError("Dados de aliases inválidos")
             
+            # 1) Pré-carregar aliases existentes (uma consulta)
+            existing_aliases = self.db.query(PfSenseAlias).all()
+            by_name = {alias.name: alias for alias in existing_aliases}
+            by_pf_id = {alias.pf_id: alias for alias in existing_aliases if alias.pf_id is not None}
+            
+            # 2) Reconciliar aliases em memória (nome é estável; pf_id pode mudar de dono)
+            synced = []  # (registro do alias, dados do pfSense)
+            new_aliases = []
+            pf_id_changes: Dict[int, Tuple[PfSenseAlias, Optional[int]]] = {}
+            now = datetime.utcnow()
+            
+            def current_pf_id(alias):
+                change = pf_id_changes.get(id(alias))
+                return change[1] if change else alias.pf_id
+            
+            def set_pf_id(alias, pf_id):
+                by_pf_id.pop(current_pf_id(alias), None)
+                pf_id_changes[id(alias)] = (alias, pf_id)
+                if pf_id is not None:
+                    by_pf_id[pf_id] = alias
+            
             for alias_data in data:
                 # Normalizar pf_id (0 é válido no pfSense)
                 raw_id = alias_data.get('id')
                 normalized_pf_id = raw_id if (isinstance(raw_id, int) and raw_id >= 0) else None
                 alias_name = alias_data['name']
-
-                # 1) Procurar por nome (estável) primeiro
-                record_by_name = (
-                    self.db.query(PfSenseAlias)
-                    .filter(PfSenseAlias.name == alias_name)
-                    .first()
-                )
-
-                # 2) Procurar por pf_id (pode ter mudado de dono)
-                record_by_pf_id = None
-                if normalized_pf_id is not None:
-                    record_by_pf_id = (
-                        self.db.query(PfSenseAlias)
-                        .filter(PfSenseAlias.pf_id == normalized_pf_id)
-                        .first()
-                    )
-
+                
+                record_by_name = by_name.get(alias_name)
+                record_by_pf_id = by_pf_id.get(normalized_pf_id) if normalized_pf_id is not None else None
+                
                 if record_by_name:
                     existing_alias = record_by_name
                     # Se o pf_id atual pertence a outro registro, liberar o pf_id desse outro
-                    if record_by_pf_id and record_by_pf_id.id != existing_alias.id:
-                        record_by_pf_id.pf_id = None
+                    if record_by_pf_id and record_by_pf_id is not existing_alias:
+                        set_pf_id(record_by_pf_id, None)
                     # Atualizar pf_id no registro correto (por nome)
-                    if normalized_pf_id is not None and existing_alias.pf_id != normalized_pf_id:
-                        existing_alias.pf_id = normalized_pf_id
-                    # Atualizar campos
-                    existing_alias.alias_type = alias_data['type']
-                    existing_alias.descr = alias_data.get('descr')
-                    existing_alias.updated_at = datetime.utcnow()
+                    if normalized_pf_id is not None and current_pf_id(existing_alias) != normalized_pf_id:
+                        set_pf_id(existing_alias, normalized_pf_id)
                     aliases_updated += 1
                 elif record_by_pf_id:
                     # Não existe por nome, mas existe por pf_id: renomear este registro para o nome atual
                     existing_alias = record_by_pf_id
+                    by_name.pop(existing_alias.name, None)
                     existing_alias.name = alias_name
-                    existing_alias.alias_type = alias_data['type']
-                    existing_alias.descr = alias_data.get('descr')
-                    existing_alias.updated_at = datetime.utcnow()
                     aliases_updated += 1
                 else:
-                    # Novo registro
-                    new_alias = PfSenseAlias(
-                        pf_id=normalized_pf_id,
-                        name=alias_name,
-                        alias_type=alias_data['type'],
-                        descr=alias_data.get('descr')
-                    )
-                    self.db.add(new_alias)
-                    self.db.flush()
+                    # Novo registro (inserido após a liberação dos pf_id, abaixo)
+                    existing_alias = PfSenseAlias(pf_id=normalized_pf_id, name=alias_name)
+                    new_aliases.append(existing_alias)
+                    if normalized_pf_id is not None:
+                        by_pf_id[normalized_pf_id] = existing_alias
                     aliases_saved += 1
-                    existing_alias = new_alias
                 
-                # Processar endereços (host/network)
-                if 'address' in alias_data and alias_data['address']:
-                    # alias_data['address'] pode ser lista de strings; alias_data['detail'] paralela
-                    details_list = alias_data.get('detail') or []
-                    for i, address in enumerate(alias_data['address']):
-                        detail = details_list[i] if i < len(details_list) else None
-
-                        # Verificar se o endereço já existe
-                        existing_address = self.db.query(PfSenseAliasAddress).filter(
-                            PfSenseAliasAddress.alias_id == existing_alias.id,
-                            PfSenseAliasAddress.address == address
-                        ).first()
-
-                        if existing_address:
-                            # Atualizar endereço existente
-                            if existing_address.detail != detail:
-                                existing_address.detail = detail
-                                addresses_updated += 1
-                        else:
-                            # Criar novo endereço
-                            new_address = PfSenseAliasAddress(
-                                alias_id=existing_alias.id,
-                                address=address,
-                                detail=detail
-                            )
-                            self.db.add(new_address)
-                            addresses_saved += 1
+                existing_alias.alias_type = alias_data['type']
+                existing_alias.descr = alias_data.get('descr')
+                existing_alias.updated_at = now
+                by_name[alias_name] = existing_alias
+                synced.append((existing_alias, alias_data))
+            
+            # pf_id é único: primeiro liberar os que mudam de dono, depois gravar os novos valores
+            changed = [(alias, pf_id) for alias, pf_id in pf_id_changes.values() if alias.pf_id != pf_id]
+            if changed:
+                for alias, _ in changed:
+                    alias.pf_id = None
+                self.db.flush()
+                for alias, pf_id in changed:
+                    alias.pf_id = pf_id
+            self.db.add_all(new_aliases)
             
+            # Um único flush grava os aliases novos/alterados e atribui os IDs
+            self.db.flush()
             self.db.commit()
             
+            # 3) Pré-carregar endereços existentes (uma consulta, sem instanciar objetos ORM)
+            current_addresses: Dict[int, Dict[str, Tuple[int, Optional[str]]]] = {}
+            for addr_id, alias_id, address, detail in self.db.query(
+                PfSenseAliasAddress.id, PfSenseAliasAddress.alias_id,
+                PfSenseAliasAddress.address, PfSenseAliasAddress.detail
+            ).yield_per(self.batch_size):
+                current_addresses.setdefault(alias_id, {})[address] = (addr_id, detail)
+            
+            # 4) Diff em memória
+            to_insert: List[Dict[str, Any]] = []
+            to_update: List[Dict[str, Any]] = []
+            to_delete: List[int] = []
+            for alias, alias_data in synced:
+                # Sem o campo address o pfSense não informou os endereços: não mexer
+                if 'address' not in alias_data:
+                    continue
+                
+                addresses = alias_data.get('address') or []
+                details_list = alias_data.get('detail') or []
+                upstream: Dict[str, Optional[str]] = {}
+                for i, address in enumerate(addresses):
+                    upstream[address] = details_list[i] if i < len(details_list) else None
+                
+                existing = current_addresses.get(alias.id, {})
+                for address, detail in upstream.items():
+                    current = existing.get(address)
+                    if current is None:
+                        to_insert.append({'alias_id': alias.id, 'address': address, 'detail': detail, 'created_at': now})
+                    elif current[1] != detail:
+                        to_update.append({'id': current[0], 'detail': detail})
+                for address, (addr_id, _) in existing.items():
+                    if address not in upstream:
+                        to_delete.append(addr_id)
+            
+            # 5) Aplicar em lotes (cada lote em sua própria transação curta)
+            for batch in self._batches(to_insert):
+                self.db.bulk_insert_mappings(PfSenseAliasAddress, batch)
+                self.db.commit()
+            for batch in self._batches(to_update):
+                self.db.bulk_update_mappings(PfSenseAliasAddress, batch)
+                self.db.commit()
+            for batch in self._batches(to_delete):
+                self.db.query(PfSenseAliasAddress).filter(
+                    PfSenseAliasAddress.id.in_(batch)
+                ).delete(synchronize_session=False)
+                self.db.commit()
+            
+            # Aliases mudaram em bloco: recalcular o status de acesso de todos os IPs
+            refresh_access_status(db=self.db)
+            
+            elapsed = time.perf_counter() - started
+            rows_written = aliases_saved + aliases_updated + len(to_insert) + len(to_update) + len(to_delete)
+            logger.info(
+                f"Sincronização de aliases: {len(synced)} aliases, +{len(to_insert)} "
+                f"~{len(to_update)} -{len(to_delete)} endereços em {elapsed:.2f}s"
+            )
+            
             return {
                 'status': 'success',
                 'aliases_saved': aliases_saved,
                 'aliases_updated': aliases_updated,
-                'addresses_saved': addresses_saved,
-                'addresses_updated': addresses_updated,
+                'addresses_saved': len(to_insert),
+                'addresses_updated': len(to_update),
+                'addresses_deleted': len(to_delete),
+                'elapsed_ms': round(elapsed * 1000, 2),
+                'rows_per_second': round(rows_written / elapsed, 1) if elapsed > 0 else None,
                 'timestamp': datetime.utcnow()
             }
             
@@ -148,6 +209,33 @@ class AliasService:
             logger.error(f"Erro ao salvar aliases: {e}")
             raise
     
+    def _batches(self, items: List[Any]):
+        """Divide uma lista em lotes de `batch_size` itens."""
+        for start in range(0, len(items), self.batch_size):
+            yield items[start:start + self.batch_size]
+    
+    @staticmethod
+    def _alias_to_dict(alias: PfSenseAlias, addresses: List[PfSenseAliasAddress]) -> Dict[str, Any]:
+        """Converte um alias e seus endereços no dicionário retornado pela API."""
+        return {
+            'id': alias.id,
+            'pf_id': alias.pf_id,
+            'name': alias.name,
+            'alias_type': alias.alias_type,
+            'descr': alias.descr,
+            'created_at': alias.created_at,
+            'updated_at': alias.updated_at,
+            'addresses': [
+                {
+                    'id': addr.id,
+                    'address': addr.address,
+                    'detail': addr.detail,
+                    'created_at': addr.created_at
+                }
+                for addr in addresses
+            ]
+        }
+    
     def get_all_aliases(self) -> List[Dict[str, Any]]:
         """
         Obtém todos os aliases do banco de dados.
@@ -156,40 +244,45 @@ class AliasService:
             Lista de aliases com endereços
         """
         try:
-            aliases = self.db.query(PfSenseAlias).all()
-            result = []
-            
-            for alias in aliases:
-                addresses = self.db.query(PfSenseAliasAddress).filter(
-                    PfSenseAliasAddress.alias_id == alias.id
-                ).all()
-                
-                alias_dict = {
-                    'id': alias.id,
-                    'pf_id': alias.pf_id,
-                    'name': alias.name,
-                    'alias_type': alias.alias_type,
-                    'descr': alias.descr,
-                    'created_at': alias.created_at,
-                    'updated_at': alias.updated_at,
-                    'addresses': [
-                        {
-                            'id': addr.id,
-                            'address': addr.address,
-                            'detail': addr.detail,
-                            'created_at': addr.created_at
-                        }
-                        for addr in addresses
-                    ]
-                }
-                result.append(alias_dict)
-            
-            return result
+            aliases = self.db.query(PfSenseAlias).options(selectinload(PfSenseAlias.addresses)).all()
+            return [self._alias_to_dict(alias, alias.addresses) for alias in aliases]
             
         except Exception as e:
             logger.error(f"Erro ao buscar aliases: {e}")
             raise
     
+    def get_aliases_page(self, page: int, per_page: int, name: Optional[str] = None,
+                         cursor: Optional[str] = None) -> Tuple[Page, int]:
+        """
+        Retorna uma página de aliases com os endereços já carregados.
+        
+        A paginação é feita no banco: por cursor sobre o id quando `cursor` é
+        informado ou por LIMIT/OFFSET a partir de `page`. Os endereços são
+        carregados com selectinload apenas para os aliases da página.
+        
+        Args:
+            page: Número da página (a partir de 1; ignorado quando há cursor)
+            per_page: Itens por página
+            name: Filtrar por nome exato do alias (opcional)
+            cursor: Cursor da próxima página retornado pela consulta anterior
+            
+        Returns:
+            Tupla (Page com os aliases como dicionários e o próximo cursor, total de aliases)
+            
+        Raises:
+            CursorError: Se o cursor for inválido
+        """
+        query = self.db.query(PfSenseAlias)
+        if name:
+            query = query.filter(PfSenseAlias.name == name)
+        
+        total = query.count()
+        result = paginate(
+            query.options(selectinload(PfSenseAlias.addresses)),
+            ALIAS_ORDER, per_page, cursor=cursor, offset=(page - 1) * per_page
+        )
+        return Page([self._alias_to_dict(alias, alias.addresses) for alias in result.items], result.next_cursor), total
+    
     def get_alias_by_name(self, name: str) -> Optional[Dict[str, Any]]:
         """
         Busca um alias específico por nome.
@@ -212,24 +305,7 @@ class AliasService:
                 PfSenseAliasAddress.alias_id == alias.id
             ).all()
             
-            return {
-                'id': alias.id,
-                'pf_id': alias.pf_id,
-                'name': alias.name,
-                'alias_type': alias.alias_type,
-                'descr': alias.descr,
-                'created_at': alias.created_at,
-                'updated_at': alias.updated_at,
-                'addresses': [
-                    {
-                        'id': addr.id,
-                        'address': addr.address,
-                        'detail': addr.detail,
-                        'created_at': addr.created_at
-                    }
-                    for addr in addresses
-                ]
-            }
+            return self._alias_to_dict(alias, addresses)
             
         except Exception as e:
             logger.error(f"Erro ao buscar alias por nome: {e}")
@@ -379,15 +455,10 @@ class AliasService:
                     self.db.add(new_address)
                 
                 self.db.commit()
+                refresh_access_status([addr['address'] for addr in alias_data['addresses']], db=self.db)
                 
-                # Aplicar mudanças no firewall do pfSense
-                try:
-                    from services_firewalls.pfsense_client import aplicar_mudancas_firewall_pfsense
-                    aplicar_mudancas_firewall_pfsense()
-                    logger.info(f"Mudanças aplicadas no firewall após criar alias '{alias_data['name']}'")
-                except Exception as apply_error:
-                    logger.error(f"Erro ao aplicar mudanças no firewall: {apply_error}")
-                    # Não falha a operação se a aplicação das mudanças falhar
+                # Agendar o apply do firewall (agrupado com outras alterações próximas)
+                get_apply_coalescer().mark_dirty(FIREWALL, reason=f"alias '{alias_data['name']}' criado")
                 
                 return {
                     'success': True,
@@ -438,7 +509,16 @@ class AliasService:
                 pfsense_data['descr'] = update_data['descr']
                 alias.descr = update_data['descr']
                 
+            affected_ips = set()
             if 'addresses' in update_data and update_data['addresses'] is not None:
+                # IPs que saem ou entram no alias têm o status de acesso recalculado
+                affected_ips.update(
+                    address for (address,) in self.db.query(PfSenseAliasAddress.address).filter(
+                        PfSenseAliasAddress.alias_id == alias.id
+                    ).all()
+                )
+                affected_ips.update(addr_data['address'] for addr_data in update_data['addresses'])
+                
                 # Atualizar endereços no banco
                 # Primeiro, remover endereços existentes
                 self.db.query(PfSenseAliasAddress).filter(
@@ -484,16 +564,12 @@ class AliasService:
                 if pfsense_result.get('status') != 'ok':
                     raise ValueError(f"Erro ao atualizar alias no pfSense: {pfsense_result}")
                 
-                # Aplicar mudanças no firewall do pfSense
-                try:
-                    from services_firewalls.pfsense_client import aplicar_mudancas_firewall_pfsense
-                    aplicar_mudancas_firewall_pfsense()
-                    logger.info(f"Mudanças aplicadas no firewall após atualizar alias '{alias_name}'")
-                except Exception as apply_error:
-                    logger.error(f"Erro ao aplicar mudanças no firewall: {apply_error}")
-                    # Não falha a operação se a aplicação das mudanças falhar
+                # Agendar o apply do firewall (agrupado com outras alterações próximas)
+                get_apply_coalescer().mark_dirty(FIREWALL, reason=f"alias '{alias_name}' atualizado")
             
             self.db.commit()
+            if affected_ips:
+                refresh_access_status(affected_ips, db=self.db)
             
             # Retornar dados atualizados
             return {
@@ -620,16 +696,12 @@ class AliasService:
                 
                 logger.info(f"Alias {alias_name} atualizado no pfSense com sucesso")
                 
-                # Aplicar mudanças no firewall do pfSense
-                try:
-                    from services_firewalls.pfsense_client import aplicar_mudancas_firewall_pfsense
-                    aplicar_mudancas_firewall_pfsense()
-                    logger.info(f"Mudanças aplicadas no firewall após adicionar endereços ao alias '{alias_name}'")
-                except Exception as apply_error:
-                    logger.error(f"Erro ao aplicar mudanças no firewall: {apply_error}")
-                    # Não falha a operação se a aplicação das mudanças falhar
+                # Agendar o apply do firewall (agrupado com outras alterações próximas)
+                get_apply_coalescer().mark_dirty(FIREWALL, reason=f"endereços adicionados ao alias '{alias_name}'")
             
             self.db.commit()
+            if addresses_to_add:
+                refresh_access_status(addresses_to_add, db=self.db)
             
             # Retornar dados atualizados
             return {
@@ -1,12 +1,13 @@
 """
 Router para gerenciar feedback de bloqueio de dispositivos.
 """
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
 from typing import List, Optional
 from pydantic import BaseModel, Field
 from datetime import datetime, timedelta
 
 from db.enums import FeedbackStatus
+from db.pagination import NEXT_CURSOR_HEADER, CursorError
 from services_firewalls.blocking_feedback_service import BlockingFeedbackService
 
 router = APIRouter()
@@ -77,9 +78,11 @@ async def create_feedback(feedback_data: FeedbackCreate):
 
 @router.get("/feedback/dhcp/{dhcp_mapping_id}", response_model=List[FeedbackResponse])
 async def get_feedback_by_dhcp(
+    response: Response,
     dhcp_mapping_id: int,
     limit: int = Query(10, ge=1, le=100),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página (cabeçalho X-Next-Cursor)")
 ):
     """
     Busca feedback por mapeamento DHCP.
@@ -87,28 +90,37 @@ async def get_feedback_by_dhcp(
     Args:
         dhcp_mapping_id: ID do mapeamento DHCP
         limit: Limite de resultados (1-100)
-        offset: Offset para paginação
+        offset: Offset para paginação (legado; prefira o cursor)
+        cursor: Cursor da próxima página, devolvido no cabeçalho X-Next-Cursor
+            (ausente na última página)
         
     Returns:
         Lista de feedbacks
     """
     try:
-        feedbacks = feedback_service.get_feedback_by_dhcp_mapping(
+        page = feedback_service.get_feedback_by_dhcp_mapping(
             dhcp_mapping_id=dhcp_mapping_id,
             limit=limit,
-            offset=offset
+            offset=offset,
+            cursor=cursor
         )
         
-        return [FeedbackResponse(**feedback.to_dict()) for feedback in feedbacks]
+        if page.next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+        return [FeedbackResponse(**feedback.to_dict()) for feedback in page.items]
         
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
 @router.get("/feedback/status/{status}", response_model=List[FeedbackResponse])
 async def get_feedback_by_status(
+    response: Response,
     status: FeedbackStatus,
     limit: int = Query(50, ge=1, le=100),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página (cabeçalho X-Next-Cursor)")
 ):
     """
     Busca feedback por status.
@@ -116,28 +128,37 @@ async def get_feedback_by_status(
     Args:
         status: Status do feedback
         limit: Limite de resultados (1-100)
-        offset: Offset para paginação
+        offset: Offset para paginação (legado; prefira o cursor)
+        cursor: Cursor da próxima página, devolvido no cabeçalho X-Next-Cursor
+            (ausente na última página)
         
     Returns:
         Lista de feedbacks
     """
     try:
-        feedbacks = feedback_service.get_feedback_by_status(
+        page = feedback_service.get_feedback_by_status(
             status=status,
             limit=limit,
-            offset=offset
+            offset=offset,
+            cursor=cursor
         )
         
-        return [FeedbackResponse(**feedback.to_dict()) for feedback in feedbacks]
+        if page.next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+        return [FeedbackResponse(**feedback.to_dict()) for feedback in page.items]
         
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
 @router.get("/feedback/user/{feedback_by}", response_model=List[FeedbackResponse])
 async def get_feedback_by_user(
+    response: Response,
     feedback_by: str,
     limit: int = Query(50, ge=1, le=100),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página (cabeçalho X-Next-Cursor)")
 ):
     """
     Busca feedback por usuário.
@@ -145,20 +166,27 @@ async def get_feedback_by_user(
     Args:
         feedback_by: Nome/identificação do usuário
         limit: Limite de resultados (1-100)
-        offset: Offset para paginação
+        offset: Offset para paginação (legado; prefira o cursor)
+        cursor: Cursor da próxima página, devolvido no cabeçalho X-Next-Cursor
+            (ausente na última página)
         
     Returns:
         Lista de feedbacks
     """
     try:
-        feedbacks = feedback_service.get_feedback_by_user(
+        page = feedback_service.get_feedback_by_user(
             feedback_by=feedback_by,
             limit=limit,
-            offset=offset
+            offset=offset,
+            cursor=cursor
         )
         
-        return [FeedbackResponse(**feedback.to_dict()) for feedback in feedbacks]
+        if page.next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+        return [FeedbackResponse(**feedback.to_dict()) for feedback in page.items]
         
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
@@ -9,10 +9,14 @@ from sqlalchemy import and_, desc, asc
 
 from db.models import BlockingFeedbackHistory, DhcpStaticMapping
 from db.enums import FeedbackStatus
+from db.pagination import CursorError, Page, paginate
 from db.session import get_db_session
 
 logger = logging.getLogger(__name__)
 
+# Ordenação das listagens de feedback (mais recentes primeiro; id desempata)
+FEEDBACK_ORDER = ((BlockingFeedbackHistory.feedback_date, True), (BlockingFeedbackHistory.id, True))
+
 class BlockingFeedbackService:
     """Serviço para gerenciar feedback de bloqueio de dispositivos."""
     
@@ -74,91 +78,115 @@ class BlockingFeedbackService:
         self, 
         dhcp_mapping_id: int,
         limit: int = 10,
-        offset: int = 0
-    ) -> List[BlockingFeedbackHistory]:
+        offset: int = 0,
+        cursor: Optional[str] = None
+    ) -> Page:
         """
         Busca feedback por mapeamento DHCP.
         
         Args:
             dhcp_mapping_id: ID do mapeamento DHCP
             limit: Limite de resultados
-            offset: Offset para paginação
+            offset: Offset para paginação (legado; ignorado quando há cursor)
+            cursor: Cursor da próxima página retornado pela consulta anterior
             
         Returns:
-            Lista de feedback
+            Page com os feedbacks e o cursor da próxima página
+            
+        Raises:
+            CursorError: Se o cursor for inválido
         """
         try:
             with get_db_session() as db:
-                feedbacks = db.query(BlockingFeedbackHistory).filter(
+                query = db.query(BlockingFeedbackHistory).filter(
                     BlockingFeedbackHistory.dhcp_mapping_id == dhcp_mapping_id
-                ).order_by(desc(BlockingFeedbackHistory.feedback_date)).offset(offset).limit(limit).all()
+                )
+                page = paginate(query, FEEDBACK_ORDER, limit, cursor=cursor, offset=offset)
                 
-                logger.info(f"Encontrados {len(feedbacks)} feedbacks para mapeamento {dhcp_mapping_id}")
-                return feedbacks
+                logger.info(f"Encontrados {len(page.items)} feedbacks para mapeamento {dhcp_mapping_id}")
+                return page
                 
+        except CursorError:
+            raise
         except Exception as e:
             logger.error(f"Erro ao buscar feedback por mapeamento: {e}")
-            return []
+            return Page([], None)
     
     def get_feedback_by_status(
         self, 
         status: FeedbackStatus,
         limit: int = 50,
-        offset: int = 0
-    ) -> List[BlockingFeedbackHistory]:
+        offset: int = 0,
+        cursor: Optional[str] = None
+    ) -> Page:
         """
         Busca feedback por status.
         
         Args:
             status: Status do feedback
             limit: Limite de resultados
-            offset: Offset para paginação
+            offset: Offset para paginação (legado; ignorado quando há cursor)
+            cursor: Cursor da próxima página retornado pela consulta anterior
             
         Returns:
-            Lista de feedback
+            Page com os feedbacks e o cursor da próxima página
+            
+        Raises:
+            CursorError: Se o cursor for inválido
         """
         try:
             with get_db_session() as db:
-                feedbacks = db.query(BlockingFeedbackHistory).filter(
+                query = db.query(BlockingFeedbackHistory).filter(
                     BlockingFeedbackHistory.status == status
-                ).order_by(desc(BlockingFeedbackHistory.feedback_date)).offset(offset).limit(limit).all()
+                )
+                page = paginate(query, FEEDBACK_ORDER, limit, cursor=cursor, offset=offset)
                 
-                logger.info(f"Encontrados {len(feedbacks)} feedbacks com status {status}")
-                return feedbacks
+                logger.info(f"Encontrados {len(page.items)} feedbacks com status {status}")
+                return page
                 
+        except CursorError:
+            raise
         except Exception as e:
             logger.error(f"Erro ao buscar feedback por status: {e}")
-            return []
+            return Page([], None)
     
     def get_feedback_by_user(
         self, 
         feedback_by: str,
         limit: int = 50,
-        offset: int = 0
-    ) -> List[BlockingFeedbackHistory]:
+        offset: int = 0,
+        cursor: Optional[str] = None
+    ) -> Page:
         """
         Busca feedback por usuário.
         
         Args:
             feedback_by: Nome/identificação do usuário
             limit: Limite de resultados
-            offset: Offset para paginação
+            offset: Offset para paginação (legado; ignorado quando há cursor)
+            cursor: Cursor da próxima página retornado pela consulta anterior
             
         Returns:
-            Lista de feedback
+            Page com os feedbacks e o cursor da próxima página
+            
+        Raises:
+            CursorError: Se o cursor for inválido
         """
         try:
             with get_db_session() as db:
-                feedbacks = db.query(BlockingFeedbackHistory).filter(
+                query = db.query(BlockingFeedbackHistory).filter(
                     BlockingFeedbackHistory.feedback_by == feedback_by
-                ).order_by(desc(BlockingFeedbackHistory.feedback_date)).offset(offset).limit(limit).all()
+                )
+                page = paginate(query, FEEDBACK_ORDER, limit, cursor=cursor, offset=offset)
                 
-                logger.info(f"Encontrados {len(feedbacks)} feedbacks do usuário {feedback_by}")
-                return feedbacks
+                logger.info(f"Encontrados {len(page.items)} feedbacks do usuário {feedback_by}")
+                return page
                 
+        except CursorError:
+            raise
         except Exception as e:
             logger.error(f"Erro ao buscar feedback por usuário: {e}")
-            return []
+            return Page([], None)
     
     def update_feedback_status(
         self, 
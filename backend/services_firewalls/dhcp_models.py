@@ -93,6 +93,7 @@ class BulkDeviceResponse(BaseModel):
     per_page: int
     has_next: bool
     has_prev: bool
+    next_cursor: Optional[str] = Field(None, description="Cursor da próxima página (None na última)")
 
 class UserResponse(BaseModel):
     """Modelo para resposta de usuário."""
@@ -8,21 +8,28 @@ Este módulo fornece funcionalidades para:
 - Identificar dispositivos já cadastrados
 - Sincronizar IDs do pfSense com o banco local
 """
-from typing import List, Dict, Optional, Any
-from sqlalchemy.orm import Session
+from typing import List, Dict, Optional, Any, Tuple
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy import and_, or_
 from db.session import SessionLocal
-from db.models import DhcpServer, DhcpStaticMapping
+from db.pagination import Page, paginate
+from db.models import DhcpServer, DhcpStaticMapping, UserDeviceAssignment, BlockingFeedbackHistory
 from datetime import datetime
+import config
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# Ordenação da listagem paginada de dispositivos
+DEVICE_ORDER = ((DhcpStaticMapping.id, False),)
+
 class DhcpService:
     """Serviço para gerenciamento de dados DHCP."""
     
-    def __init__(self):
+    def __init__(self, batch_size: Optional[int] = None):
         self.db: Session = SessionLocal()
+        self.batch_size = batch_size or config.DHCP_SYNC_BATCH_SIZE
     
     def __enter__(self):
         return self
@@ -30,208 +37,238 @@ class DhcpService:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.db.close()
     
-    def sync_pfsense_ids(self, dhcp_data: Dict[str, Any]) -> Dict[str, Any]:
+    # Colunas do mapeamento comparadas com o pfSense na sincronização
+    SYNC_FIELDS = ('server_id', 'pf_id', 'mac', 'ipaddr', 'cid', 'hostname', 'descr')
+    
+    def sync_pfsense_ids(self, dhcp_data: Dict[str, Any], prune: bool = False) -> Dict[str, Any]:
         """
         Sincroniza os IDs do pfSense com os pf_id do banco de dados local.
         
         Args:
             dhcp_data: Dados retornados pela API do pfSense
+            prune: Se True, remove do banco os mapeamentos dos servidores
+                sincronizados que não existem mais no pfSense
             
         Returns:
             Dict com estatísticas da sincronização
         """
-        try:
-            synced_count = 0
-            created_count = 0
-            updated_count = 0
-            
-            for server_data in dhcp_data.get('data', []):
-                server_id = server_data.get('id')
-                
-                # Buscar ou criar servidor DHCP local
-                server = self.db.query(DhcpServer).filter(
-                    DhcpServer.server_id == server_id
-                ).first()
-                
-                if not server:
-                    # Criar servidor se não existir
-                    server = DhcpServer(
-                        server_id=server_id,
-                        interface=server_data.get('interface', ''),
-                        enable=server_data.get('enable', False),
-                        range_from=server_data.get('range_from'),
-                        range_to=server_data.get('range_to'),
-                        domain=server_data.get('domain'),
-                        gateway=server_data.get('gateway'),
-                        dnsserver=server_data.get('dnsserver')
-                    )
-                    self.db.add(server)
-                    self.db.flush()
-                    created_count += 1
-                
-                # Sincronizar mapeamentos estáticos
-                static_maps = server_data.get('staticmap', [])
-                for mapping_data in static_maps:
-                    result = self._sync_static_mapping(server.id, mapping_data)
-                    if result['action'] == 'synced':
-                        synced_count += 1
-                    elif result['action'] == 'created':
-                        created_count += 1
-                    elif result['action'] == 'updated':
-                        updated_count += 1
-            
-            self.db.commit()
-            
-            return {
-                'status': 'success',
-                'servers_created': created_count,
-                'mappings_synced': synced_count,
-                'mappings_created': created_count,
-                'mappings_updated': updated_count,
-                'timestamp': datetime.now().isoformat()
-            }
-            
-        except Exception as e:
-            self.db.rollback()
-            logger.error(f"Erro ao sincronizar IDs do pfSense: {e}")
-            raise
+        summary = self.sync_static_mappings(dhcp_data, prune=prune)
+        return {
+            'status': 'success',
+            'servers_created': summary['servers_created'],
+            'mappings_synced': summary['mappings_unchanged'],
+            'mappings_created': summary['mappings_created'],
+            'mappings_updated': summary['mappings_updated'],
+            'mappings_deleted': summary['mappings_deleted'],
+            'summary': summary,
+            'timestamp': datetime.now().isoformat()
+        }
     
-    def _sync_static_mapping(self, server_id: int, mapping_data: Dict[str, Any]) -> Dict[str, str]:
+    def save_dhcp_data(self, dhcp_data: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Sincroniza um mapeamento estático DHCP com o ID real do pfSense.
-        Usa a mesma lógica do _save_static_mapping para evitar duplicatas.
+        Salva dados de DHCP do pfSense no banco de dados.
+        
+        Nunca remove mapeamentos: o payload pode conter apenas parte dos
+        dispositivos (ex.: cadastro de um único dispositivo).
         
         Args:
-            server_id: ID do servidor DHCP local
-            mapping_data: Dados do mapeamento do pfSense
+            dhcp_data: Dados retornados pela API do pfSense
             
         Returns:
-            Dict com ação realizada e mapeamento
+            Dict com estatísticas da operação
         """
-        # Usar a mesma lógica do _save_static_mapping para consistência
-        return self._save_static_mapping(server_id, mapping_data)
+        summary = self.sync_static_mappings(dhcp_data, prune=False)
+        return {
+            'status': 'success',
+            'servers_saved': summary['servers_created'] + summary['servers_updated'],
+            'mappings_saved': summary['mappings_created'],
+            'mappings_updated': summary['mappings_updated'],
+            'timestamp': datetime.now().isoformat()
+        }
     
-    def save_dhcp_data(self, dhcp_data: Dict[str, Any]) -> Dict[str, Any]:
+    def sync_static_mappings(self, dhcp_data: Dict[str, Any], prune: bool = False) -> Dict[str, Any]:
         """
-        Salva dados de DHCP do pfSense no banco de dados.
+        Sincroniza servidores e mapeamentos estáticos DHCP com base no payload do pfSense.
+        
+        Motor de sincronização em conjunto: carrega de uma vez os mapeamentos
+        locais que podem corresponder ao payload (por MAC ou IP), calcula em
+        memória as inserções, atualizações e remoções e as aplica com
+        instruções em lote, em uma única transação.
+        
+        Um mapeamento do pfSense corresponde ao registro local com o mesmo MAC
+        ou, na falta deste, com o mesmo IP.
         
         Args:
-            dhcp_data: Dados retornados pela API do pfSense
+            dhcp_data: Dados retornados pela API do pfSense (services/dhcp_servers)
+            prune: Se True, remove os mapeamentos locais dos servidores presentes
+                no payload que não existem mais no pfSense. As atribuições de
+                usuários desses dispositivos são removidas antes; dispositivos
+                com histórico de feedback de bloqueio são mantidos.
             
         Returns:
-            Dict com estatísticas da operação
+            Resumo das mudanças (contagens e MACs afetados)
         """
+        started = time.perf_counter()
         try:
-            servers_saved = 0
-            mappings_saved = 0
-            mappings_updated = 0
+            servers_data = dhcp_data.get('data', []) if isinstance(dhcp_data, dict) else []
             
-            for server_data in dhcp_data.get('data', []):
-                # Salvar ou atualizar servidor DHCP
-                server = self._save_dhcp_server(server_data)
-                servers_saved += 1
-                
-                # Salvar mapeamentos estáticos
-                static_maps = server_data.get('staticmap', [])
+            # 1) Servidores: poucos registros, carregados em uma consulta
+            servers_by_key = {server.server_id: server for server in self.db.query(DhcpServer).all()}
+            servers_created = 0
+            servers_updated = 0
+            payload = []  # (servidor local, lista de staticmap)
+            for server_data in servers_data:
+                server = servers_by_key.get(server_data.get('id'))
+                if server is None:
+                    server = DhcpServer(server_id=server_data.get('id'))
+                    self.db.add(server)
+                    servers_by_key[server.server_id] = server
+                    servers_created += 1
+                else:
+                    servers_updated += 1
+                server.interface = server_data.get('interface', '')
+                server.enable = server_data.get('enable', False)
+                server.range_from = server_data.get('range_from')
+                server.range_to = server_data.get('range_to')
+                server.domain = server_data.get('domain')
+                server.gateway = server_data.get('gateway')
+                server.dnsserver = server_data.get('dnsserver')
+                payload.append((server, server_data.get('staticmap') or []))
+            self.db.flush()  # Para obter os IDs dos servidores novos
+            
+            # 2) Mapeamentos locais candidatos: uma consulta por lote de MACs/IPs
+            macs = {m.get('mac') for _, maps in payload for m in maps if m.get('mac')}
+            ips = {m.get('ipaddr') for _, maps in payload for m in maps if m.get('ipaddr')}
+            columns = [DhcpStaticMapping.id] + [getattr(DhcpStaticMapping, f) for f in self.SYNC_FIELDS]
+            local_rows: Dict[int, Dict[str, Any]] = {}
+            
+            def load(criteria):
+                for row in self.db.query(*columns).filter(criteria).all():
+                    local_rows[row[0]] = dict(zip(('id',) + self.SYNC_FIELDS, row))
+            
+            for batch in self._batches(sorted(macs)):
+                load(DhcpStaticMapping.mac.in_(batch))
+            for batch in self._batches(sorted(ips)):
+                load(DhcpStaticMapping.ipaddr.in_(batch))
+            if prune and payload:
+                load(DhcpStaticMapping.server_id.in_([server.id for server, _ in payload]))
+            
+            by_mac = {row['mac']: row for row in local_rows.values()}
+            by_ip = {row['ipaddr']: row for row in local_rows.values()}
+            
+            # 3) Diff em memória
+            now = datetime.now()
+            to_insert: List[Dict[str, Any]] = []
+            to_update: List[Dict[str, Any]] = []
+            matched_ids = set()
+            unchanged = 0
+            changes = {'created': [], 'updated': [], 'deleted': [], 'prune_skipped': []}
+            
+            for server, static_maps in payload:
                 for mapping_data in static_maps:
-                    result = self._save_static_mapping(server.id, mapping_data)
-                    if result['action'] == 'created':
-                        mappings_saved += 1
-                    elif result['action'] == 'updated':
-                        mappings_updated += 1
+                    mac = mapping_data.get('mac')
+                    ipaddr = mapping_data.get('ipaddr')
+                    values = {
+                        'server_id': server.id,
+                        'pf_id': mapping_data.get('id'),
+                        'mac': mac,
+                        'ipaddr': ipaddr,
+                        'cid': mapping_data.get('cid'),
+                        'hostname': mapping_data.get('hostname'),
+                        'descr': mapping_data.get('descr'),
+                    }
+                    row = by_mac.get(mac) or by_ip.get(ipaddr)
+                    if row is not None and row['id'] in matched_ids:
+                        logger.warning(f"Mapeamento duplicado no payload do pfSense ignorado: MAC={mac}, IP={ipaddr}")
+                        continue
+                    
+                    if row is None:
+                        to_insert.append({**values, 'is_blocked': False, 'created_at': now, 'updated_at': now})
+                        changes['created'].append(mac)
+                        # Registrar a inserção pendente para que o mesmo MAC/IP repetido no payload seja ignorado
+                        pending = {'id': ('novo', len(to_insert)), **values}
+                        matched_ids.add(pending['id'])
+                        if mac:
+                            by_mac[mac] = pending
+                        if ipaddr:
+                            by_ip[ipaddr] = pending
+                        continue
+                    
+                    matched_ids.add(row['id'])
+                    if all(row[field] == values[field] for field in self.SYNC_FIELDS):
+                        unchanged += 1
+                        continue
+                    
+                    to_update.append({'id': row['id'], **values, 'updated_at': now})
+                    changes['updated'].append(mac)
+                    # Manter os índices em memória coerentes com MAC/IP novos
+                    by_mac.pop(row['mac'], None)
+                    by_ip.pop(row['ipaddr'], None)
+                    row.update(values)
+                    by_mac[mac] = row
+                    by_ip[ipaddr] = row
+            
+            # 4) Remoções (opcionais): mapeamentos dos servidores sincronizados ausentes no pfSense
+            to_delete: List[int] = []
+            if prune:
+                synced_server_ids = {server.id for server, _ in payload}
+                stale = {
+                    row['id']: row for row in local_rows.values()
+                    if row['server_id'] in synced_server_ids and row['id'] not in matched_ids
+                }
+                if stale:
+                    with_history = {
+                        mapping_id for (mapping_id,) in self.db.query(BlockingFeedbackHistory.dhcp_mapping_id).filter(
+                            BlockingFeedbackHistory.dhcp_mapping_id.in_(list(stale))
+                        ).distinct().all()
+                    }
+                    for mapping_id, row in stale.items():
+                        if mapping_id in with_history:
+                            changes['prune_skipped'].append(row['mac'])
+                        else:
+                            to_delete.append(mapping_id)
+                            changes['deleted'].append(row['mac'])
+            
+            # 5) Aplicar em lotes
+            for batch in self._batches(to_insert):
+                self.db.bulk_insert_mappings(DhcpStaticMapping, batch)
+            for batch in self._batches(to_update):
+                self.db.bulk_update_mappings(DhcpStaticMapping, batch)
+            for batch in self._batches(to_delete):
+                self.db.query(UserDeviceAssignment).filter(
+                    UserDeviceAssignment.device_id.in_(batch)
+                ).delete(synchronize_session=False)
+                self.db.query(DhcpStaticMapping).filter(
+                    DhcpStaticMapping.id.in_(batch)
+                ).delete(synchronize_session=False)
             
             self.db.commit()
             
+            elapsed = time.perf_counter() - started
+            logger.info(
+                f"Sincronização DHCP: +{len(to_insert)} ~{len(to_update)} -{len(to_delete)} "
+                f"={unchanged} mapeamentos em {elapsed:.3f}s"
+            )
             return {
-                'status': 'success',
-                'servers_saved': servers_saved,
-                'mappings_saved': mappings_saved,
-                'mappings_updated': mappings_updated,
-                'timestamp': datetime.now().isoformat()
+                'servers_created': servers_created,
+                'servers_updated': servers_updated,
+                'mappings_created': len(to_insert),
+                'mappings_updated': len(to_update),
+                'mappings_unchanged': unchanged,
+                'mappings_deleted': len(to_delete),
+                'changes': changes,
+                'elapsed_ms': round(elapsed * 1000, 2),
             }
             
         except Exception as e:
             self.db.rollback()
-            logger.error(f"Erro ao salvar dados DHCP: {e}")
+            logger.error(f"Erro ao sincronizar mapeamentos DHCP: {e}")
             raise
     
-    def _save_dhcp_server(self, server_data: Dict[str, Any]) -> DhcpServer:
-        """Salva ou atualiza um servidor DHCP."""
-        server_id = server_data.get('id')
-        
-        # Verificar se o servidor já existe
-        server = self.db.query(DhcpServer).filter(DhcpServer.server_id == server_id).first()
-        
-        if server:
-            # Atualizar servidor existente
-            server.interface = server_data.get('interface', '')
-            server.enable = server_data.get('enable', False)
-            server.range_from = server_data.get('range_from')
-            server.range_to = server_data.get('range_to')
-            server.domain = server_data.get('domain')
-            server.gateway = server_data.get('gateway')
-            server.dnsserver = server_data.get('dnsserver')
-            server.updated_at = datetime.now()
-        else:
-            # Criar novo servidor
-            server = DhcpServer(
-                server_id=server_id,
-                interface=server_data.get('interface', ''),
-                enable=server_data.get('enable', False),
-                range_from=server_data.get('range_from'),
-                range_to=server_data.get('range_to'),
-                domain=server_data.get('domain'),
-                gateway=server_data.get('gateway'),
-                dnsserver=server_data.get('dnsserver')
-            )
-            self.db.add(server)
-        
-        self.db.flush()  # Para obter o ID
-        return server
-    
-    def _save_static_mapping(self, server_id: int, mapping_data: Dict[str, Any]) -> Dict[str, str]:
-        """Salva ou atualiza um mapeamento estático DHCP."""
-        mac = mapping_data.get('mac')
-        ipaddr = mapping_data.get('ipaddr')
-        pf_id = mapping_data.get('id')  # ID do pfSense (não persistente, apenas para referência)
-        
-        # Buscar por MAC/IP (identificadores únicos e persistentes)
-        existing_mapping = self.db.query(DhcpStaticMapping).filter(
-            or_(
-                DhcpStaticMapping.mac == mac,
-                DhcpStaticMapping.ipaddr == ipaddr
-            )
-        ).first()
-        
-        if existing_mapping:
-            # Atualizar mapeamento existente
-            existing_mapping.pf_id = pf_id  # Atualizar pf_id atual (pode mudar)
-            existing_mapping.server_id = server_id
-            existing_mapping.mac = mac
-            existing_mapping.ipaddr = ipaddr
-            existing_mapping.cid = mapping_data.get('cid')
-            existing_mapping.hostname = mapping_data.get('hostname')
-            existing_mapping.descr = mapping_data.get('descr')
-            existing_mapping.updated_at = datetime.now()
-            action = 'updated'
-            logger.info(f"Atualizando mapeamento existente: MAC={mac}, IP={ipaddr}, pf_id={pf_id}")
-            mapping = existing_mapping
-        else:
-            # Criar novo mapeamento
-            mapping = DhcpStaticMapping(
-                server_id=server_id,
-                pf_id=pf_id,  # Usar pf_id atual (pode ser None se não disponível)
-                mac=mac,
-                ipaddr=ipaddr,
-                cid=mapping_data.get('cid'),
-                hostname=mapping_data.get('hostname'),
-                descr=mapping_data.get('descr')
-            )
-            self.db.add(mapping)
-            action = 'created'
-            logger.info(f"Criando novo mapeamento: MAC={mac}, IP={ipaddr}, pf_id={pf_id}")
-        
-        return {'action': action, 'mapping': mapping}
+    def _batches(self, items: List[Any]):
+        """Divide uma lista em lotes de `batch_size` itens."""
+        for start in range(0, len(items), self.batch_size):
+            yield items[start:start + self.batch_size]
     
     def find_device_by_ip(self, ipaddr: str) -> Optional[DhcpStaticMapping]:
         """Busca dispositivo por endereço IP."""
@@ -261,6 +298,39 @@ class DhcpService:
             DhcpServer.server_id == server_id
         ).all()
     
+    def get_devices_page(self, page: int, per_page: int, server_id: Optional[str] = None,
+                         cursor: Optional[str] = None) -> Tuple[Page, int]:
+        """
+        Retorna uma página de dispositivos com as atribuições e usuários já carregados.
+        
+        A paginação é feita no banco: por cursor sobre o id quando `cursor` é
+        informado (custo constante em qualquer página) ou por LIMIT/OFFSET a
+        partir de `page`. As atribuições/usuários são carregados com
+        selectinload apenas para os dispositivos da página.
+        
+        Args:
+            page: Número da página (a partir de 1; ignorado quando há cursor)
+            per_page: Itens por página
+            server_id: Filtrar por servidor DHCP (opcional)
+            cursor: Cursor da próxima página retornado pela consulta anterior
+            
+        Returns:
+            Tupla (Page com os dispositivos e o próximo cursor, total de dispositivos)
+            
+        Raises:
+            CursorError: Se o cursor for inválido
+        """
+        query = self.db.query(DhcpStaticMapping)
+        if server_id:
+            query = query.join(DhcpServer).filter(DhcpServer.server_id == server_id)
+        
+        total = query.count()
+        devices = paginate(
+            query.options(selectinload(DhcpStaticMapping.user_assignments).selectinload(UserDeviceAssignment.user)),
+            DEVICE_ORDER, per_page, cursor=cursor, offset=(page - 1) * per_page
+        )
+        return devices, total
+    
     def search_devices(self, query: str) -> List[DhcpStaticMapping]:
         """
         Busca dispositivos por IP, MAC ou descrição.
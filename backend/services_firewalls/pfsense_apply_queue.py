@@ -0,0 +1,328 @@
+"""
+Fila de aplicação (apply) de mudanças no pfSense com agrupamento por janela.
+
+Cada "apply" do pfSense recarrega o filtro inteiro (firewall) ou reinicia o
+serviço DHCP, e leva segundos. Em vez de aplicar a cada alteração, as escritas
+apenas marcam o alvo como pendente (`mark_dirty`) e uma thread em segundo
+plano executa um único apply por janela:
+
+- o apply ocorre quando o alvo fica `window` segundos sem novas marcações
+  (debounce), ou no máximo `max_wait` segundos após a primeira marcação
+  pendente, mesmo que as marcações continuem chegando;
+- `flush` força o apply imediato e pode aguardar a convergência;
+- em caso de erro o alvo continua pendente e é reenviado na próxima janela.
+
+Cada marcação recebe um número de geração crescente: o alvo está convergido
+quando a geração aplicada é maior ou igual à geração da marcação
+(ver `status` e `wait`).
+
+Com PFSENSE_APPLY_COALESCE=false, `mark_dirty` aplica imediatamente (comportamento
+anterior).
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+import config
+
+logger = logging.getLogger("pfsense_apply_queue")
+
+FIREWALL = "firewall"
+DHCP = "dhcp"
+
+
+def _default_appliers() -> Dict[str, Callable[[], Any]]:
+    # Importação tardia: evita ciclo com pfsense_client e permite trocar o cliente em testes
+    from services_firewalls.pfsense_client import aplicar_mudancas_firewall_pfsense, aplicar_mudancas_dhcp_pfsense
+    return {
+        FIREWALL: aplicar_mudancas_firewall_pfsense,
+        DHCP: aplicar_mudancas_dhcp_pfsense,
+    }
+
+
+class _TargetState:
+    """Estado de um alvo de apply (firewall ou DHCP)."""
+
+    def __init__(self):
+        self.generation = 0          # Última marcação recebida
+        self.applied_generation = 0  # Última marcação coberta por um apply bem-sucedido
+        self.first_pending_at: Optional[float] = None
+        self.last_mark_at: Optional[float] = None
+        self.flush_requested = False
+        self.applying = False
+        self.retry_at: Optional[float] = None
+        self.apply_count = 0
+        self.error_count = 0
+        self.marks_since_apply = 0
+        self.last_reasons: list = []
+        self.last_applied_at: Optional[datetime] = None
+        self.last_duration_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def pending(self) -> bool:
+        return self.generation > self.applied_generation
+
+
+class ApplyCoalescer:
+    """
+    Agrupa pedidos de apply do pfSense e os executa em uma thread de fundo.
+    """
+
+    def __init__(
+        self,
+        appliers: Optional[Dict[str, Callable[[], Any]]] = None,
+        window: Optional[float] = None,
+        max_wait: Optional[float] = None,
+        enabled: Optional[bool] = None,
+    ):
+        """
+        Parâmetros:
+            appliers (dict, opcional): Função de apply por alvo (padrão: firewall e DHCP do pfsense_client).
+            window (float, opcional): Segundos sem novas marcações antes do apply (padrão: config.PFSENSE_APPLY_WINDOW).
+            max_wait (float, opcional): Atraso máximo desde a primeira marcação (padrão: config.PFSENSE_APPLY_MAX_WAIT).
+            enabled (bool, opcional): Se False, `mark_dirty` aplica imediatamente (padrão: config.PFSENSE_APPLY_COALESCE).
+        """
+        self._appliers = appliers
+        self.window = window if window is not None else config.PFSENSE_APPLY_WINDOW
+        self.max_wait = max_wait if max_wait is not None else config.PFSENSE_APPLY_MAX_WAIT
+        self.enabled = enabled if enabled is not None else config.PFSENSE_APPLY_COALESCE
+        self._targets: Dict[str, _TargetState] = {FIREWALL: _TargetState(), DHCP: _TargetState()}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    @property
+    def appliers(self) -> Dict[str, Callable[[], Any]]:
+        if self._appliers is None:
+            self._appliers = _default_appliers()
+        return self._appliers
+
+    def _state(self, target: str) -> _TargetState:
+        if target not in self._targets:
+            raise ValueError(f"Alvo de apply desconhecido: {target}")
+        return self._targets[target]
+
+    def _ensure_worker(self) -> None:
+        """Inicia a thread de fundo na primeira marcação. Chamar com o lock adquirido."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="pfsense-apply", daemon=True)
+            self._thread.start()
+
+    def mark_dirty(self, target: str, reason: Optional[str] = None) -> int:
+        """
+        Marca o alvo como pendente de apply.
+
+        Parâmetros:
+            target (str): "firewall" ou "dhcp".
+            reason (str, opcional): Descrição da alteração (exibida no status).
+
+        Retorna:
+            int: Geração da marcação (ver `wait`).
+        """
+        with self._cond:
+            state = self._state(target)
+            state.generation += 1
+            generation = state.generation
+            now = time.monotonic()
+            if state.first_pending_at is None:
+                state.first_pending_at = now
+            state.last_mark_at = now
+            state.marks_since_apply += 1
+            if reason:
+                state.last_reasons = (state.last_reasons + [reason])[-10:]
+            if self.enabled:
+                self._ensure_worker()
+                self._cond.notify_all()
+
+        if not self.enabled:
+            self._apply(target)
+        else:
+            logger.debug(f"Apply de {target} agendado (geração {generation}): {reason}")
+        return generation
+
+    def flush(self, target: Optional[str] = None, wait: bool = True, timeout: Optional[float] = 60) -> Dict[str, Any]:
+        """
+        Solicita o apply imediato dos alvos pendentes.
+
+        Parâmetros:
+            target (str, opcional): Alvo específico; todos se omitido.
+            wait (bool): Se deve aguardar a convergência.
+            timeout (float, opcional): Tempo máximo de espera, em segundos.
+
+        Retorna:
+            dict: Estado dos alvos após o flush (ver `status`), com "converged".
+        """
+        targets = [target] if target else list(self._targets)
+        with self._cond:
+            tickets = {}
+            for name in targets:
+                state = self._state(name)
+                tickets[name] = state.generation
+                if state.pending:
+                    state.flush_requested = True
+                    state.retry_at = None
+            pending = [name for name in targets if self._targets[name].pending]
+            if self.enabled and pending:
+                self._ensure_worker()
+                self._cond.notify_all()
+
+        if not self.enabled:
+            # Sem thread de fundo: aplica na própria chamada
+            for name in pending:
+                self._apply(name)
+
+        converged = True
+        if wait:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            for name, generation in tickets.items():
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                converged = self.wait(name, generation, remaining) and converged
+        status = self.status()
+        status["converged"] = converged
+        return status
+
+    def wait(self, target: str, generation: int, timeout: Optional[float] = None) -> bool:
+        """
+        Aguarda até que a marcação `generation` do alvo tenha sido aplicada.
+
+        Retorna:
+            bool: True se convergiu dentro do tempo limite.
+        """
+        with self._cond:
+            state = self._state(target)
+            return self._cond.wait_for(lambda: state.applied_generation >= generation, timeout)
+
+    def status(self) -> Dict[str, Any]:
+        """Retorna o estado de cada alvo: pendências, gerações e último apply."""
+        now = time.monotonic()
+        with self._cond:
+            targets = {}
+            for name, state in self._targets.items():
+                targets[name] = {
+                    "pending": state.pending,
+                    "applying": state.applying,
+                    "generation": state.generation,
+                    "applied_generation": state.applied_generation,
+                    "pending_changes": state.marks_since_apply,
+                    "pending_for_s": round(now - state.first_pending_at, 2) if state.first_pending_at else None,
+                    "recent_reasons": list(state.last_reasons),
+                    "apply_count": state.apply_count,
+                    "error_count": state.error_count,
+                    "last_applied_at": state.last_applied_at.isoformat() if state.last_applied_at else None,
+                    "last_duration_ms": state.last_duration_ms,
+                    "last_error": state.last_error,
+                }
+            return {
+                "coalescing": self.enabled,
+                "window_s": self.window,
+                "max_wait_s": self.max_wait,
+                "worker_running": self._thread is not None and self._thread.is_alive(),
+                "targets": targets,
+            }
+
+    def stop(self, flush: bool = True, timeout: float = 30) -> None:
+        """Encerra a thread de fundo, aplicando antes as pendências se `flush`."""
+        if flush and any(state.pending for state in self._targets.values()):
+            self.flush(wait=True, timeout=timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout=5)
+
+    def _due_at(self, state: _TargetState) -> Optional[float]:
+        """Instante (monotonic) em que o alvo deve ser aplicado. Chamar com o lock adquirido."""
+        if not state.pending or state.applying:
+            return None
+        if state.flush_requested:
+            return 0.0
+        due = min(state.last_mark_at + self.window, state.first_pending_at + self.max_wait)
+        if state.retry_at is not None:
+            due = max(due, state.retry_at)
+        return due
+
+    def _run(self) -> None:
+        """Laço da thread de fundo: aguarda o próximo alvo vencido e o aplica."""
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopping:
+                        return
+                    now = time.monotonic()
+                    due = {name: self._due_at(state) for name, state in self._targets.items()}
+                    ready = [name for name, at in due.items() if at is not None and at <= now]
+                    if ready:
+                        break
+                    upcoming = [at for at in due.values() if at is not None]
+                    self._cond.wait(timeout=(min(upcoming) - now) if upcoming else None)
+            for name in ready:
+                self._apply(name)
+
+    def _apply(self, target: str) -> None:
+        """Executa o apply do alvo cobrindo todas as marcações recebidas até agora."""
+        with self._cond:
+            state = self._state(target)
+            generation = state.generation
+            marks = state.marks_since_apply
+            state.applying = True
+            state.flush_requested = False
+
+        started = time.perf_counter()
+        error = None
+        try:
+            self.appliers[target]()
+        except Exception as e:
+            error = e
+
+        with self._cond:
+            state.applying = False
+            state.last_duration_ms = round((time.perf_counter() - started) * 1000, 2)
+            if error is None:
+                state.applied_generation = max(state.applied_generation, generation)
+                state.apply_count += 1
+                state.last_applied_at = datetime.now()
+                state.last_error = None
+                state.retry_at = None
+                state.marks_since_apply = max(0, state.marks_since_apply - marks)
+                if state.pending:
+                    # Marcações recebidas durante o apply: nova janela a partir de agora
+                    state.first_pending_at = time.monotonic()
+                else:
+                    state.first_pending_at = None
+                    state.last_reasons = []
+            else:
+                state.error_count += 1
+                state.last_error = str(error)
+                state.retry_at = time.monotonic() + max(self.window, 1.0)
+            self._cond.notify_all()
+
+        if error is None:
+            logger.info(f"Apply de {target} executado ({marks} alteração(ões) agrupada(s)) em {state.last_duration_ms} ms")
+        else:
+            logger.error(f"Erro ao aplicar mudanças de {target} no pfSense (nova tentativa na próxima janela): {error}")
+
+
+_coalescer: Optional[ApplyCoalescer] = None
+_coalescer_lock = threading.Lock()
+
+def get_apply_coalescer() -> ApplyCoalescer:
+    """Retorna a instância compartilhada da fila de apply (criada sob demanda)."""
+    global _coalescer
+    if _coalescer is None:
+        with _coalescer_lock:
+            if _coalescer is None:
+                _coalescer = ApplyCoalescer()
+    return _coalescer
+
+def stop_apply_coalescer(flush: bool = True) -> None:
+    """Encerra a fila de apply, aplicando antes as pendências (usado no shutdown)."""
+    global _coalescer
+    with _coalescer_lock:
+        if _coalescer is not None:
+            _coalescer.stop(flush=flush)
+            _coalescer = None
@@ -0,0 +1,535 @@
+"""
+Cliente assíncrono para a API REST v2 do pfSense.
+
+Contraparte de `pfsense_client.py` baseada em `httpx.AsyncClient`, para uso nas
+rotas `async def` do FastAPI. As funções têm os mesmos nomes, parâmetros e
+retornos das versões síncronas, mas não ocupam uma thread do threadpool
+enquanto aguardam o firewall: um único worker consegue manter centenas de
+requisições ao pfSense em andamento.
+
+Erros de rede e de protocolo são propagados como `httpx.TransportError`
+(inclui `httpx.TimeoutException`) e respostas de erro como
+`httpx.HTTPStatusError`.
+
+As listagens passam pelo mesmo cache (`pfsense_cache`) do cliente síncrono, e
+as escritas o invalidam.
+"""
+import logging
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+import config
+from services_firewalls import pfsense_cache
+from services_firewalls.pfsense_client import EndpointLatencyStats
+
+logger = logging.getLogger("pfsense_async_client")
+
+
+class AsyncPfSenseClient:
+    """
+    Cliente HTTP assíncrono para a API do pfSense.
+
+    Mantém um único `httpx.AsyncClient` com limites de conexão configuráveis,
+    reaproveitando conexões keep-alive entre requisições. Falhas ao estabelecer
+    a conexão são reenviadas pelo transporte do httpx.
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        max_connections: Optional[int] = None,
+        max_keepalive: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        verify_ssl: Optional[bool] = None,
+    ):
+        """
+        Inicializa o cliente.
+
+        Parâmetros:
+            base_url (str, opcional): URL base da API (padrão: config.PFSENSE_API_URL).
+            api_key (str, opcional): Chave da API (padrão: config.PFSENSE_API_KEY).
+            max_connections (int, opcional): Máximo de conexões simultâneas com o pfSense.
+            max_keepalive (int, opcional): Máximo de conexões ociosas mantidas abertas.
+            max_retries (int, opcional): Tentativas extras em falhas de conexão.
+            verify_ssl (bool, opcional): Se deve validar o certificado TLS do pfSense.
+        """
+        self.base_url = base_url if base_url is not None else (config.PFSENSE_API_URL or "")
+        self.max_connections = max_connections or config.PFSENSE_ASYNC_MAX_CONNECTIONS
+        self.max_keepalive = max_keepalive or config.PFSENSE_POOL_SIZE
+        self.max_retries = max_retries if max_retries is not None else config.PFSENSE_MAX_RETRIES
+        verify_ssl = verify_ssl if verify_ssl is not None else config.PFSENSE_VERIFY_SSL
+        api_key = api_key if api_key is not None else config.PFSENSE_API_KEY
+
+        headers = {"Content-Type": "application/json"}
+        if api_key:
+            headers["X-API-Key"] = api_key
+
+        # Com um transporte explícito, verify/limits devem ser passados a ele (e não ao cliente)
+        self.client = httpx.AsyncClient(
+            headers=headers,
+            transport=httpx.AsyncHTTPTransport(
+                verify=verify_ssl,
+                retries=self.max_retries,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive,
+                ),
+            ),
+            timeout=httpx.Timeout(30.0, connect=10.0),
+        )
+        self.stats = EndpointLatencyStats()
+
+    async def request(self, method: str, endpoint: str, **kwargs) -> httpx.Response:
+        """
+        Executa uma requisição na API do pfSense.
+
+        Parâmetros:
+            method (str): Verbo HTTP (GET, POST, PATCH, DELETE).
+            endpoint (str): Caminho relativo à URL base (ex: "firewall/aliases").
+            **kwargs: Argumentos repassados para `httpx.AsyncClient.request`.
+
+        Retorna:
+            httpx.Response: Resposta HTTP (sem raise_for_status aplicado).
+        """
+        method = method.upper()
+        url = f"{self.base_url}{endpoint}"
+        start = time.perf_counter()
+        failed = False
+        try:
+            return await self.client.request(method, url, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.stats.record(method, endpoint, time.perf_counter() - start, failed)
+
+    async def get(self, endpoint: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", endpoint, **kwargs)
+
+    async def post(self, endpoint: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", endpoint, **kwargs)
+
+    async def patch(self, endpoint: str, **kwargs) -> httpx.Response:
+        return await self.request("PATCH", endpoint, **kwargs)
+
+    async def delete(self, endpoint: str, **kwargs) -> httpx.Response:
+        return await self.request("DELETE", endpoint, **kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retorna a configuração do pool e os contadores de latência por endpoint.
+        """
+        return {
+            "max_connections": self.max_connections,
+            "max_keepalive": self.max_keepalive,
+            "max_retries": self.max_retries,
+            **self.stats.snapshot(),
+        }
+
+    def reset_stats(self) -> None:
+        """Zera os contadores de latência."""
+        self.stats.reset()
+
+    async def aclose(self) -> None:
+        """Fecha as conexões mantidas no pool."""
+        await self.client.aclose()
+
+
+_client: Optional[AsyncPfSenseClient] = None
+
+def get_async_pfsense_client() -> AsyncPfSenseClient:
+    """
+    Retorna a instância compartilhada do `AsyncPfSenseClient` (criada sob demanda).
+
+    A criação não contém pontos de suspensão, portanto é atômica dentro do
+    event loop e não precisa de lock.
+    """
+    global _client
+    if _client is None:
+        _client = AsyncPfSenseClient()
+    return _client
+
+def peek_async_pfsense_client() -> Optional[AsyncPfSenseClient]:
+    """Retorna o cliente compartilhado apenas se já tiver sido criado."""
+    return _client
+
+async def close_async_pfsense_client() -> None:
+    """Fecha o cliente compartilhado (usado no encerramento da aplicação)."""
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.aclose()
+
+
+def _log_http_error(message: str, e: Exception) -> None:
+    """Registra a resposta do pfSense, quando houver, junto com a mensagem de erro."""
+    logger.error(message)
+    if isinstance(e, httpx.HTTPStatusError):
+        logger.error(f"Resposta do pfSense: {e.response.text}")
+
+
+async def _get_json(endpoint: str, description: str, timeout: float = 10, cache_key: Optional[str] = None,
+                    use_cache: bool = True, **kwargs):
+    """
+    GET com raise_for_status e log padronizado; retorna o JSON da resposta.
+
+    Com `cache_key`, a leitura passa pelo cache de listagens do pfSense.
+    """
+    async def fetch():
+        response = await get_async_pfsense_client().get(endpoint, timeout=timeout, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    try:
+        if cache_key is None:
+            return await fetch()
+        return await pfsense_cache.get_pfsense_cache().aget_or_fetch(cache_key, fetch, use_cache=use_cache)
+    except httpx.TransportError as e:
+        logger.error(f"Timeout/Conexão ao {description} no pfSense: {e}")
+        raise
+    except Exception as e:
+        _log_http_error(f"Erro ao {description} no pfSense: {e}\nEndpoint: {endpoint}", e)
+        raise
+
+
+async def cadastrar_alias_pfsense(name, alias_type, descr, address, detail):
+    """
+    Cadastra um novo alias no pfSense.
+
+    Parâmetros:
+        name (str): Nome do alias.
+        alias_type (str): Tipo do alias (host, network, port, etc.).
+        descr (str): Descrição do alias.
+        address (list): Lista de endereços IP ou redes.
+        detail (list): Lista de detalhes para cada endereço.
+
+    Retorna:
+        dict: Resposta JSON da API do pfSense.
+    """
+    endpoint = "firewall/alias"
+    data = {
+        "name": name,
+        "type": alias_type,
+        "descr": descr,
+        "address": address,
+        "detail": detail
+    }
+
+    try:
+        response = await get_async_pfsense_client().post(endpoint, json=data, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        _log_http_error(f"Erro ao cadastrar alias no pfSense: {e}\nEndpoint: {endpoint}\nPayload: {data}", e)
+        raise
+    finally:
+        # Mesmo em caso de erro a escrita pode ter sido aplicada: descartar o cache
+        pfsense_cache.invalidate(pfsense_cache.ALIASES)
+
+async def listar_aliases_pfsense(use_cache: bool = True):
+    """
+    Lista todos os aliases do pfSense.
+
+    Parâmetros:
+        use_cache (bool): Se False, ignora o cache e consulta o pfSense
+            (o resultado atualiza o cache).
+
+    Retorna:
+        dict: Resposta JSON da API do pfSense contendo todos os aliases.
+    """
+    return await _get_json(pfsense_cache.ALIASES, "listar aliases", cache_key=pfsense_cache.ALIASES, use_cache=use_cache)
+
+async def obter_alias_pfsense(name):
+    """
+    Obtém um alias específico do pfSense.
+
+    Parâmetros:
+        name (str): Nome do alias.
+
+    Retorna:
+        dict: Dados do alias ou None se não encontrado.
+    """
+    result = await listar_aliases_pfsense()
+
+    if result and isinstance(result, list):
+        aliases = result
+    elif result and isinstance(result, dict) and result.get("data"):
+        aliases = result["data"]
+    else:
+        aliases = []
+
+    for alias in aliases:
+        if alias.get("name") == name:
+            return alias
+    return None
+
+async def listar_clientes_dhcp_pfsense(use_cache: bool = True):
+    """
+    Lista todos os servidores DHCP e seus clientes do pfSense.
+
+    Parâmetros:
+        use_cache (bool): Se False, ignora o cache e consulta o pfSense
+            (o resultado atualiza o cache).
+
+    Retorna:
+        dict: Resposta JSON da API do pfSense contendo informações dos servidores DHCP e clientes.
+    """
+    return await _get_json(pfsense_cache.DHCP_SERVERS, "listar clientes DHCP", cache_key=pfsense_cache.DHCP_SERVERS, use_cache=use_cache)
+
+async def listar_mapeamentos_staticos_dhcp_pfsense(parent_id, mapping_id):
+    """
+    Lista mapeamentos estáticos DHCP do pfSense.
+
+    Parâmetros:
+        parent_id (str): ID da interface (ex: "lan", "wan", "opt1")
+        mapping_id (int): ID do mapeamento específico
+
+    Retorna:
+        dict: Resposta JSON da API do pfSense contendo o mapeamento específico.
+    """
+    params = {
+        "parent_id": parent_id,
+        "id": mapping_id
+    }
+    return await _get_json("services/dhcp_server/static_mapping", "listar mapeamentos estáticos DHCP", params=params)
+
+async def listar_regras_firewall_pfsense(use_cache: bool = True):
+    """
+    Lista todas as regras de firewall do pfSense.
+
+    Parâmetros:
+        use_cache (bool): Se False, ignora o cache e consulta o pfSense
+            (o resultado atualiza o cache).
+
+    Retorna:
+        dict|list: Resposta JSON da API do pfSense contendo as regras.
+    """
+    return await _get_json(pfsense_cache.FIREWALL_RULES, "listar regras de firewall", cache_key=pfsense_cache.FIREWALL_RULES, use_cache=use_cache)
+
+async def listar_leases_dhcp_pfsense(use_cache: bool = True):
+    """
+    Lista os leases do servidor DHCP do pfSense (status online/offline dos dispositivos).
+
+    Parâmetros:
+        use_cache (bool): Se False, ignora o cache e consulta o pfSense
+            (o resultado atualiza o cache).
+
+    Retorna:
+        dict: Resposta JSON da API do pfSense contendo os leases.
+    """
+    return await _get_json(pfsense_cache.DHCP_LEASES, "listar leases DHCP", timeout=30, cache_key=pfsense_cache.DHCP_LEASES, use_cache=use_cache)
+
+async def verificar_mapeamento_existente_pfsense(parent_id, ipaddr=None, mac=None):
+    """
+    Verifica se já existe um mapeamento estático DHCP com o mesmo IP ou MAC.
+
+    Parâmetros:
+        parent_id (str): ID do servidor DHCP pai
+        ipaddr (str, opcional): Endereço IP para verificar
+        mac (str, opcional): Endereço MAC para verificar
+
+    Retorna:
+        dict: Informações sobre mapeamentos existentes encontrados
+    """
+    # Consulta sempre o pfSense (antes de uma escrita); o resultado atualiza o cache
+    result = await listar_clientes_dhcp_pfsense(use_cache=False)
+
+    existing_mappings = []
+    if result and isinstance(result, dict) and result.get("data"):
+        for server in result["data"]:
+            if server.get("id") == parent_id and server.get("staticmap"):
+                for mapping in server["staticmap"]:
+                    if ipaddr and mapping.get("ipaddr") == ipaddr:
+                        existing_mappings.append({
+                            "type": "ip",
+                            "mapping": mapping,
+                            "server_id": parent_id
+                        })
+                    if mac and mapping.get("mac") == mac:
+                        existing_mappings.append({
+                            "type": "mac",
+                            "mapping": mapping,
+                            "server_id": parent_id
+                        })
+
+    return {
+        "exists": len(existing_mappings) > 0,
+        "mappings": existing_mappings,
+        "total_found": len(existing_mappings)
+    }
+
+async def cadastrar_mapeamento_statico_dhcp_pfsense(mapping_data, verificar_existente=True):
+    """
+    Cadastra um novo mapeamento estático DHCP no pfSense.
+
+    Parâmetros:
+        mapping_data (dict): Dados do mapeamento estático DHCP (ver versão síncrona).
+        verificar_existente (bool): Se deve verificar mapeamentos existentes antes de cadastrar
+
+    Retorna:
+        dict: Resposta JSON da API do pfSense.
+
+    Raises:
+        ValueError: Se já existir mapeamento com o mesmo IP ou MAC.
+    """
+    if verificar_existente:
+        parent_id = mapping_data.get("parent_id")
+        ipaddr = mapping_data.get("ipaddr")
+        mac = mapping_data.get("mac")
+
+        if parent_id and (ipaddr or mac):
+            existing_check = await verificar_mapeamento_existente_pfsense(parent_id, ipaddr, mac)
+
+            if existing_check["exists"]:
+                error_msg = "Já existem mapeamentos DHCP com os mesmos dados:"
+                for mapping_info in existing_check["mappings"]:
+                    mapping = mapping_info["mapping"]
+                    if mapping_info["type"] == "ip":
+                        error_msg += f"\n- IP {mapping.get('ipaddr')} já está em uso pelo dispositivo {mapping.get('cid', 'N/A')} (MAC: {mapping.get('mac', 'N/A')})"
+                    elif mapping_info["type"] == "mac":
+                        error_msg += f"\n- MAC {mapping.get('mac')} já está em uso pelo dispositivo {mapping.get('cid', 'N/A')} (IP: {mapping.get('ipaddr', 'N/A')})"
+                raise ValueError(error_msg)
+
+    endpoint = "services/dhcp_server/static_mapping"
+    try:
+        response = await get_async_pfsense_client().post(endpoint, json=mapping_data, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.TransportError as e:
+        logger.error(f"Timeout/Conexão ao cadastrar mapeamento DHCP no pfSense: {e}")
+        raise
+    except Exception as e:
+        _log_http_error(f"Erro ao cadastrar mapeamento estático DHCP no pfSense: {e}\nEndpoint: {endpoint}\nPayload: {mapping_data}", e)
+        raise
+    finally:
+        pfsense_cache.invalidate(pfsense_cache.DHCP_SERVERS, pfsense_cache.DHCP_LEASES)
+
+async def atualizar_alias_pfsense(alias_id: int, name: str, alias_type=None, descr=None, address=None, detail=None):
+    """
+    Atualiza um alias existente no pfSense.
+
+    Parâmetros:
+        alias_id (int): ID do alias no pfSense
+        name (str): Nome do alias a ser atualizado.
+        alias_type, descr, address, detail (opcionais): Campos a atualizar.
+
+    Retorna:
+        dict: Resposta JSON da API do pfSense.
+    """
+    endpoint = "firewall/alias"
+    data = {"id": alias_id, "name": name}
+    if alias_type is not None:
+        data["type"] = alias_type
+    if descr is not None:
+        data["descr"] = descr
+    if address is not None:
+        data["address"] = address
+    if detail is not None:
+        data["detail"] = detail
+
+    try:
+        response = await get_async_pfsense_client().patch(endpoint, json=data, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        _log_http_error(f"Erro ao atualizar alias '{name}' (ID: {alias_id}) no pfSense: {e}\nEndpoint: {endpoint}\nPayload: {data}", e)
+        raise
+    finally:
+        pfsense_cache.invalidate(pfsense_cache.ALIASES)
+
+async def excluir_mapeamento_statico_dhcp_pfsense(parent_id: str, mapping_id: int, apply: bool = False):
+    """
+    Exclui um mapeamento estático DHCP no pfSense.
+
+    Parâmetros:
+        parent_id (str): ID do servidor DHCP pai (ex: "lan", "wan", "opt1")
+        mapping_id (int): ID do mapeamento estático DHCP a ser excluído
+        apply (bool): Se deve aplicar a exclusão imediatamente (padrão: False)
+
+    Retorna:
+        dict: Resposta JSON da API do pfSense.
+    """
+    endpoint = "services/dhcp_server/static_mapping"
+    # Enviado em minúsculas de propósito ("true"/"false"): o requests mandava "True"/"False"
+    params = {"parent_id": parent_id, "id": mapping_id, "apply": str(apply).lower()}
+
+    try:
+        response = await get_async_pfsense_client().delete(endpoint, params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        _log_http_error(f"Erro ao excluir mapeamento estático DHCP (parent_id: {parent_id}, mapping_id: {mapping_id}) no pfSense: {e}\nEndpoint: {endpoint}\nParams: {params}", e)
+        raise
+    finally:
+        pfsense_cache.invalidate(pfsense_cache.DHCP_SERVERS, pfsense_cache.DHCP_LEASES)
+
+async def atualizar_mapeamento_statico_dhcp_pfsense(parent_id: str, mapping_id: int, update_data: dict, apply: bool = False):
+    """
+    Atualiza um mapeamento estático DHCP no pfSense.
+
+    Parâmetros:
+        parent_id (str): ID do servidor DHCP pai (ex: "lan", "wan", "opt1")
+        mapping_id (int): ID do mapeamento estático DHCP a ser atualizado
+        update_data (dict): Dados para atualização (ver versão síncrona)
+        apply (bool): Se deve aplicar a atualização imediatamente (padrão: False)
+
+    Retorna:
+        dict: Resposta JSON da API do pfSense.
+    """
+    endpoint = "services/dhcp_server/static_mapping"
+    payload = {"id": mapping_id, "parent_id": parent_id, **update_data}
+    params = {"apply": str(apply).lower()}
+
+    try:
+        response = await get_async_pfsense_client().patch(endpoint, json=payload, params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        _log_http_error(f"Erro ao atualizar mapeamento estático DHCP (parent_id: {parent_id}, mapping_id: {mapping_id}) no pfSense: {e}\nEndpoint: {endpoint}\nPayload: {payload}\nParams: {params}", e)
+        raise
+    finally:
+        pfsense_cache.invalidate(pfsense_cache.DHCP_SERVERS, pfsense_cache.DHCP_LEASES)
+
+async def _aplicar(endpoint: str, description: str):
+    """POST sem corpo em um endpoint de apply do pfSense."""
+    try:
+        logger.info(f"Aplicando mudanças pendentes no {description} do pfSense...")
+        response = await get_async_pfsense_client().post(endpoint, timeout=30)
+        response.raise_for_status()
+        result = response.json()
+        logger.info(f"Mudanças aplicadas com sucesso no {description} do pfSense: {result}")
+        return result
+    except httpx.TransportError as e:
+        logger.error(f"Timeout/Conexão ao aplicar mudanças no {description} do pfSense: {e}")
+        raise
+    except Exception as e:
+        _log_http_error(f"Erro ao aplicar mudanças no {description} do pfSense: {e}\nEndpoint: {endpoint}", e)
+        raise
+
+async def aplicar_mudancas_firewall_pfsense():
+    """
+    Aplica as mudanças pendentes no firewall do pfSense (POST /api/v2/firewall/apply).
+
+    Retorna:
+        dict: Resposta JSON da API do pfSense.
+    """
+    try:
+        return await _aplicar("firewall/apply", "firewall")
+    finally:
+        pfsense_cache.invalidate(pfsense_cache.ALIASES, pfsense_cache.FIREWALL_RULES)
+
+async def aplicar_mudancas_dhcp_pfsense():
+    """
+    Aplica as mudanças pendentes no servidor DHCP do pfSense
+    (POST /api/v2/services/dhcp_server/apply).
+
+    Retorna:
+        dict: Resposta JSON da API do pfSense.
+    """
+    try:
+        return await _aplicar("services/dhcp_server/apply", "servidor DHCP")
+    finally:
+        pfsense_cache.invalidate(pfsense_cache.DHCP_SERVERS, pfsense_cache.DHCP_LEASES)
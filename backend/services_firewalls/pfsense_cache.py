@@ -0,0 +1,238 @@
+"""
+Cache read-through com TTL para as listagens da API do pfSense.
+
+Compartilhado pelos clientes síncrono (`pfsense_client.py`) e assíncrono
+(`pfsense_async_client.py`). Cada listagem é armazenada pela chave do endpoint
+(ex: "firewall/aliases") e expira após o TTL configurado para ela.
+
+- Single-flight: quando várias requisições concorrentes encontram a mesma
+  chave expirada, apenas uma vai ao pfSense; as demais aguardam e recebem o
+  mesmo resultado (ou a mesma exceção). Erros nunca são armazenados.
+- Invalidação: as funções de escrita dos clientes chamam `invalidate` com as
+  chaves afetadas. Uma busca iniciada antes da invalidação não grava o seu
+  resultado (contador de geração por chave), evitando repovoar o cache com
+  dados anteriores à escrita.
+- Cada leitura devolve uma cópia profunda, para que o chamador possa alterar
+  o resultado sem afetar o cache.
+"""
+import asyncio
+import copy
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+import config
+
+logger = logging.getLogger("pfsense_cache")
+
+# Chaves (endpoints) armazenadas em cache
+ALIASES = "firewall/aliases"
+DHCP_SERVERS = "services/dhcp_servers"
+FIREWALL_RULES = "firewall/rules"
+DHCP_LEASES = "status/dhcp_server/leases"
+
+
+def default_ttls() -> Dict[str, float]:
+    """TTL (segundos) de cada chave conforme config.py; 0 desativa o cache da chave."""
+    return {
+        ALIASES: config.PFSENSE_CACHE_TTL_ALIASES,
+        DHCP_SERVERS: config.PFSENSE_CACHE_TTL_DHCP_SERVERS,
+        FIREWALL_RULES: config.PFSENSE_CACHE_TTL_RULES,
+        DHCP_LEASES: config.PFSENSE_CACHE_TTL_LEASES,
+    }
+
+
+class _InFlight:
+    """Busca em andamento (modo síncrono) aguardada pelas demais threads."""
+
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class PfSenseResponseCache:
+    """
+    Cache em memória, com TTL por chave e coalescência de buscas concorrentes.
+    """
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, enabled: Optional[bool] = None):
+        """
+        Parâmetros:
+            ttls (dict, opcional): TTL em segundos por chave (padrão: config.py).
+            enabled (bool, opcional): Liga/desliga o cache (padrão: config.PFSENSE_CACHE_ENABLED).
+        """
+        self.ttls = ttls if ttls is not None else default_ttls()
+        self.enabled = enabled if enabled is not None else config.PFSENSE_CACHE_ENABLED
+        self._entries: Dict[str, tuple] = {}  # chave -> (expira_em, valor)
+        self._generations: Dict[str, int] = {}
+        self._inflight: Dict[str, _InFlight] = {}
+        self._async_inflight: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0}
+
+    def _ttl(self, key: str) -> float:
+        return self.ttls.get(key, 0) if self.enabled else 0
+
+    def _lookup(self, key: str):
+        """Retorna (True, valor) se houver entrada válida. Chamar com o lock adquirido."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._counters["hits"] += 1
+            return True, entry[1]
+        return False, None
+
+    def _store(self, key: str, generation: int, value: Any) -> None:
+        """Grava o valor se a chave não foi invalidada durante a busca. Chamar com o lock adquirido."""
+        if self._generations.get(key, 0) == generation:
+            self._entries[key] = (time.monotonic() + self._ttl(key), value)
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], Any], use_cache: bool = True) -> Any:
+        """
+        Retorna o valor da chave, buscando-o com `fetch()` se ausente ou expirado.
+
+        Parâmetros:
+            key (str): Chave (endpoint) da listagem.
+            fetch (callable): Função síncrona que busca o valor no pfSense.
+            use_cache (bool): Se False, ignora a entrada atual e força a busca
+                (o resultado ainda é gravado para as leituras seguintes).
+        """
+        if self._ttl(key) <= 0:
+            return fetch()
+
+        with self._lock:
+            if use_cache:
+                found, value = self._lookup(key)
+                if found:
+                    return copy.deepcopy(value)
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _InFlight()
+                self._inflight[key] = flight
+                self._counters["misses"] += 1
+            else:
+                self._counters["coalesced"] += 1
+            generation = self._generations.get(key, 0)
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.value)
+
+        try:
+            flight.value = fetch()
+            with self._lock:
+                self._store(key, generation, flight.value)
+            return copy.deepcopy(flight.value)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    async def aget_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]], use_cache: bool = True) -> Any:
+        """
+        Versão assíncrona de `get_or_fetch`; `fetch` é uma corrotina.
+
+        A coalescência ocorre entre tarefas do mesmo event loop.
+        """
+        if self._ttl(key) <= 0:
+            return await fetch()
+
+        with self._lock:
+            if use_cache:
+                found, value = self._lookup(key)
+                if found:
+                    return copy.deepcopy(value)
+            future = self._async_inflight.get(key)
+            leader = future is None
+            if leader:
+                future = asyncio.get_running_loop().create_future()
+                self._async_inflight[key] = future
+                self._counters["misses"] += 1
+            else:
+                self._counters["coalesced"] += 1
+            generation = self._generations.get(key, 0)
+
+        if not leader:
+            # shield: o cancelamento de um aguardante não cancela a busca compartilhada
+            return copy.deepcopy(await asyncio.shield(future))
+
+        try:
+            value = await fetch()
+            with self._lock:
+                self._store(key, generation, value)
+            future.set_result(value)
+            return copy.deepcopy(value)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Marca como recuperada caso ninguém aguarde
+            raise
+        finally:
+            with self._lock:
+                self._async_inflight.pop(key, None)
+
+    def invalidate(self, *keys: str) -> None:
+        """Descarta as chaves informadas (todas, se nenhuma for informada)."""
+        with self._lock:
+            targets: Iterable[str] = keys or list(set(self._entries) | set(self._generations) | set(self.ttls))
+            for key in targets:
+                self._entries.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+            self._counters["invalidations"] += 1
+        logger.debug(f"Cache do pfSense invalidado: {', '.join(keys) if keys else 'todas as chaves'}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna contadores de acertos/faltas e a idade das entradas atuais."""
+        now = time.monotonic()
+        with self._lock:
+            entries = {
+                key: {
+                    "ttl_s": self._ttl(key),
+                    "expires_in_s": round(expires_at - now, 2),
+                }
+                for key, (expires_at, _) in self._entries.items()
+                if expires_at > now
+            }
+            counters = dict(self._counters)
+        lookups = counters["hits"] + counters["misses"] + counters["coalesced"]
+        return {
+            "enabled": self.enabled,
+            "ttls": dict(self.ttls),
+            **counters,
+            "hit_ratio": round((counters["hits"] + counters["coalesced"]) / lookups, 3) if lookups else None,
+            "entries": entries,
+        }
+
+    def reset_stats(self) -> None:
+        """Zera os contadores."""
+        with self._lock:
+            for name in self._counters:
+                self._counters[name] = 0
+
+
+_cache: Optional[PfSenseResponseCache] = None
+_cache_lock = threading.Lock()
+
+def get_pfsense_cache() -> PfSenseResponseCache:
+    """Retorna a instância compartilhada do cache (criada sob demanda)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PfSenseResponseCache()
+    return _cache
+
+def invalidate(*keys: str) -> None:
+    """Atalho para `get_pfsense_cache().invalidate(...)`."""
+    get_pfsense_cache().invalidate(*keys)
@@ -2,9 +2,246 @@ import requests
 import json
 import config
 import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from services_firewalls import pfsense_cache
 
 logger = logging.getLogger("pfsense_client")
 
+# Verbos reenviados após timeout de leitura ou resposta 502/503/504. Escritas ficam de
+# fora: a primeira tentativa pode ter sido aplicada (ex: DELETE por `id` posicional, que
+# o pfSense renumera após a exclusão, apagaria outro mapeamento no reenvio). Falhas de
+# conexão (requisição não enviada) são reenviadas para qualquer verbo.
+READ_ONLY_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class EndpointLatencyStats:
+    """
+    Contadores de latência por endpoint, seguros para uso concorrente.
+    
+    Compartilhado pelos clientes síncrono e assíncrono do pfSense.
+    """
+    
+    def __init__(self):
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, method: str, endpoint: str, elapsed: float, failed: bool) -> None:
+        """Acumula os contadores de latência de uma chamada."""
+        key = f"{method} {endpoint}"
+        elapsed_ms = elapsed * 1000
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                entry = {"calls": 0, "errors": 0, "total_ms": 0.0, "min_ms": None, "max_ms": 0.0, "last_ms": 0.0}
+                self._stats[key] = entry
+            entry["calls"] += 1
+            if failed:
+                entry["errors"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["last_ms"] = elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["min_ms"] = elapsed_ms if entry["min_ms"] is None else min(entry["min_ms"], elapsed_ms)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Retorna uma cópia dos contadores acumulados.
+        
+        Retorna:
+            dict: Total de chamadas, latência média e, para cada "VERBO endpoint",
+            número de chamadas, erros e latências (total, média, mínima, máxima e última) em ms.
+        """
+        with self._lock:
+            endpoints = {}
+            total_calls = 0
+            total_ms = 0.0
+            for key, entry in self._stats.items():
+                endpoints[key] = {
+                    **entry,
+                    "total_ms": round(entry["total_ms"], 2),
+                    "avg_ms": round(entry["total_ms"] / entry["calls"], 2) if entry["calls"] else 0.0,
+                    "min_ms": round(entry["min_ms"], 2) if entry["min_ms"] is not None else None,
+                    "max_ms": round(entry["max_ms"], 2),
+                    "last_ms": round(entry["last_ms"], 2),
+                }
+                total_calls += entry["calls"]
+                total_ms += entry["total_ms"]
+        return {
+            "total_calls": total_calls,
+            "avg_ms": round(total_ms / total_calls, 2) if total_calls else 0.0,
+            "endpoints": endpoints,
+        }
+    
+    def reset(self) -> None:
+        """Zera os contadores."""
+        with self._lock:
+            self._stats.clear()
+
+
+class PfSenseClient:
+    """
+    Cliente HTTP para a API REST v2 do pfSense.
+    
+    Mantém uma única `requests.Session` com pool de conexões keep-alive, de modo
+    que chamadas consecutivas reutilizam a mesma conexão TCP/TLS com o firewall
+    em vez de refazer o handshake a cada requisição. Falhas de conexão são
+    reenviadas com backoff exponencial; timeouts de leitura e respostas
+    502/503/504 só são reenviados em consultas (GET/HEAD/OPTIONS).
+    
+    Também registra contadores de latência por endpoint (ver `get_stats`).
+    """
+    
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        pool_size: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        backoff_factor: Optional[float] = None,
+        verify_ssl: Optional[bool] = None,
+    ):
+        """
+        Inicializa o cliente.
+        
+        Parâmetros:
+            base_url (str, opcional): URL base da API (padrão: config.PFSENSE_API_URL).
+            api_key (str, opcional): Chave da API (padrão: config.PFSENSE_API_KEY).
+            pool_size (int, opcional): Número máximo de conexões mantidas no pool.
+            max_retries (int, opcional): Tentativas extras em falhas de conexão e em consultas.
+            backoff_factor (float, opcional): Fator de backoff exponencial entre tentativas.
+            verify_ssl (bool, opcional): Se deve validar o certificado TLS do pfSense.
+        """
+        self.base_url = base_url if base_url is not None else (config.PFSENSE_API_URL or "")
+        self.api_key = api_key if api_key is not None else config.PFSENSE_API_KEY
+        self.pool_size = pool_size or config.PFSENSE_POOL_SIZE
+        self.max_retries = max_retries if max_retries is not None else config.PFSENSE_MAX_RETRIES
+        self.backoff_factor = backoff_factor if backoff_factor is not None else config.PFSENSE_RETRY_BACKOFF
+        self.verify_ssl = verify_ssl if verify_ssl is not None else config.PFSENSE_VERIFY_SSL
+        
+        retry = Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=self.max_retries,
+            status=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=READ_ONLY_METHODS,
+            raise_on_status=False,  # O chamador decide via raise_for_status()
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_size,
+            pool_maxsize=self.pool_size,
+            max_retries=retry,
+        )
+        
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.verify = self.verify_ssl
+        self.session.headers.update({"Content-Type": "application/json"})
+        if self.api_key:
+            self.session.headers.update({"X-API-Key": self.api_key})
+        
+        self.stats = EndpointLatencyStats()
+    
+    def request(self, method: str, endpoint: str, **kwargs) -> requests.Response:
+        """
+        Executa uma requisição na API do pfSense reutilizando o pool de conexões.
+        
+        Parâmetros:
+            method (str): Verbo HTTP (GET, POST, PATCH, DELETE).
+            endpoint (str): Caminho relativo à URL base (ex: "firewall/aliases").
+            **kwargs: Argumentos repassados para `requests.Session.request`.
+        
+        Retorna:
+            requests.Response: Resposta HTTP (sem raise_for_status aplicado).
+        """
+        method = method.upper()
+        url = f"{self.base_url}{endpoint}"
+        start = time.perf_counter()
+        failed = False
+        try:
+            return self.session.request(method, url, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.stats.record(method, endpoint, time.perf_counter() - start, failed)
+    
+    def get(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request("GET", endpoint, **kwargs)
+    
+    def post(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request("POST", endpoint, **kwargs)
+    
+    def patch(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request("PATCH", endpoint, **kwargs)
+    
+    def delete(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", endpoint, **kwargs)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retorna a configuração do pool e os contadores de latência por endpoint.
+        """
+        return {
+            "pool_size": self.pool_size,
+            "max_retries": self.max_retries,
+            "backoff_factor": self.backoff_factor,
+            **self.stats.snapshot(),
+        }
+    
+    def reset_stats(self) -> None:
+        """Zera os contadores de latência."""
+        self.stats.reset()
+    
+    def close(self) -> None:
+        """Fecha as conexões mantidas no pool."""
+        self.session.close()
+
+
+_client: Optional[PfSenseClient] = None
+_client_lock = threading.Lock()
+
+def get_pfsense_client() -> PfSenseClient:
+    """
+    Retorna a instância compartilhada do `PfSenseClient` (criada sob demanda).
+    
+    Todas as funções deste módulo usam esta instância, de modo que o pool de
+    conexões é compartilhado por todo o processo.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = PfSenseClient()
+    return _client
+
+def close_pfsense_client() -> None:
+    """Fecha o cliente compartilhado (usado no encerramento da aplicação)."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+def _get_cached_json(endpoint: str, use_cache: bool = True, timeout: float = 10):
+    """
+    GET com raise_for_status passando pelo cache de listagens (`pfsense_cache`).
+    
+    O endpoint é a própria chave do cache; buscas concorrentes pela mesma chave
+    expirada resultam em uma única requisição ao pfSense.
+    """
+    def fetch():
+        response = get_pfsense_client().get(endpoint, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+    
+    return pfsense_cache.get_pfsense_cache().get_or_fetch(endpoint, fetch, use_cache=use_cache)
+
 def cadastrar_alias_pfsense(name, alias_type, descr, address, detail):
     """
     Cadastra um novo alias no pfSense.
@@ -19,11 +256,7 @@ def cadastrar_alias_pfsense(name, alias_type, descr, address, detail):
     Retorna:
         dict: Resposta JSON da API do pfSense.
     """
-    url = f"{config.PFSENSE_API_URL}firewall/alias"
-    headers = {
-        "X-API-Key": config.PFSENSE_API_KEY,
-        "Content-Type": "application/json"
-    }
+    endpoint = "firewall/alias"
     data = {
         "name": name,
         "type": alias_type,
@@ -33,14 +266,17 @@ def cadastrar_alias_pfsense(name, alias_type, descr, address, detail):
     }
     
     try:
-        response = requests.post(url, json=data, headers=headers, timeout=10, verify=False)
+        response = get_pfsense_client().post(endpoint, json=data, timeout=10)
         response.raise_for_status()
         return response.json()
     except Exception as e:
-        logger.error(f"Erro ao cadastrar alias no pfSense: {e}\nURL: {url}\nHeaders: {headers}\nPayload: {data}")
+        logger.error(f"Erro ao cadastrar alias no pfSense: {e}\nEndpoint: {endpoint}\nPayload: {data}")
         if hasattr(e, 'response') and e.response is not None:
             logger.error(f"Resposta do pfSense: {e.response.text}")
         raise
+    finally:
+        # Mesmo em caso de erro a escrita pode ter sido aplicada: descartar o cache
+        pfsense_cache.invalidate(pfsense_cache.ALIASES)
 
 def obter_alias_pfsense(name):
     """
@@ -52,14 +288,11 @@ def obter_alias_pfsense(name):
     Retorna:
         dict: Dados do alias ou None se não encontrado.
     """
-    # Usar o mesmo endpoint que funciona para listar todos os aliases
-    url = f"{config.PFSENSE_API_URL}firewall/aliases"
-    headers = {"X-API-Key": config.PFSENSE_API_KEY}
+    # Usar o mesmo endpoint que funciona para listar todos os aliases (em cache)
+    endpoint = pfsense_cache.ALIASES
     
     try:
-        response = requests.get(url, headers=headers, timeout=10, verify=False)
-        response.raise_for_status()
-        result = response.json()
+        result = _get_cached_json(endpoint)
         
         # Filtrar pelo nome do alias
         if result and isinstance(result, list):
@@ -73,55 +306,55 @@ def obter_alias_pfsense(name):
         
         return None
     except Exception as e:
-        logger.error(f"Erro ao obter alias '{name}' do pfSense: {e}\nURL: {url}\nHeaders: {headers}")
+        logger.error(f"Erro ao obter alias '{name}' do pfSense: {e}\nEndpoint: {endpoint}")
         if hasattr(e, 'response') and e.response is not None:
             logger.error(f"Resposta do pfSense: {e.response.text}")
         raise
 
-def listar_aliases_pfsense():
+def listar_aliases_pfsense(use_cache: bool = True):
     """
     Lista todos os aliases do pfSense.
     
+    Parâmetros:
+        use_cache (bool): Se False, ignora o cache e consulta o pfSense
+            (o resultado atualiza o cache).
+    
     Retorna:
         dict: Resposta JSON da API do pfSense contendo todos os aliases.
     """
-    url = f"{config.PFSENSE_API_URL}firewall/aliases"
-    headers = {"X-API-Key": config.PFSENSE_API_KEY}
+    endpoint = pfsense_cache.ALIASES
     
     try:
-        response = requests.get(url, headers=headers, timeout=10, verify=False)
-        response.raise_for_status()
-        return response.json()
+        return _get_cached_json(endpoint, use_cache=use_cache)
     except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
         logger.error(f"Timeout/Conexão ao listar aliases do pfSense: {e}")
         raise
     except Exception as e:
-        logger.error(f"Erro ao listar aliases do pfSense: {e}\nURL: {url}\nHeaders: {headers}")
+        logger.error(f"Erro ao listar aliases do pfSense: {e}\nEndpoint: {endpoint}")
         if hasattr(e, 'response') and e.response is not None:
             logger.error(f"Resposta do pfSense: {e.response.text}")
         raise
 
-def listar_clientes_dhcp_pfsense():
+def listar_clientes_dhcp_pfsense(use_cache: bool = True):
     """
     Lista todos os servidores DHCP e seus clientes do pfSense.
     
+    Parâmetros:
+        use_cache (bool): Se False, ignora o cache e consulta o pfSense
+            (o resultado atualiza o cache).
+    
     Retorna:
         dict: Resposta JSON da API do pfSense contendo informações dos servidores DHCP e clientes.
     """
-    url = f"{config.PFSENSE_API_URL}services/dhcp_servers"
-    headers = {
-        "X-API-Key": config.PFSENSE_API_KEY
-    }
+    endpoint = pfsense_cache.DHCP_SERVERS
     
     try:
-        response = requests.get(url, headers=headers, timeout=10, verify=False)
-        response.raise_for_status()
-        return response.json()
+        return _get_cached_json(endpoint, use_cache=use_cache)
     except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
         logger.error(f"Timeout/Conexão ao listar clientes DHCP no pfSense: {e}")
         raise
     except Exception as e:
-        logger.error(f"Erro ao listar clientes DHCP no pfSense: {e}\nURL: {url}\nHeaders: {headers}")
+        logger.error(f"Erro ao listar clientes DHCP no pfSense: {e}\nEndpoint: {endpoint}")
         if hasattr(e, 'response') and e.response is not None:
             logger.error(f"Resposta do pfSense: {e.response.text}")
         raise
@@ -137,10 +370,7 @@ def listar_mapeamentos_staticos_dhcp_pfsense(parent_id, mapping_id):
     Retorna:
         dict: Resposta JSON da API do pfSense contendo o mapeamento específico.
     """
-    url = f"{config.PFSENSE_API_URL}services/dhcp_server/static_mapping"
-    headers = {
-        "X-API-Key": config.PFSENSE_API_KEY
-    }
+    endpoint = "services/dhcp_server/static_mapping"
     
     # Usar query parameters em vez de body
     params = {
@@ -149,33 +379,60 @@ def listar_mapeamentos_staticos_dhcp_pfsense(parent_id, mapping_id):
     }
     
     try:
-        response = requests.get(url, params=params, headers=headers, timeout=10, verify=False)
+        response = get_pfsense_client().get(endpoint, params=params, timeout=10)
         response.raise_for_status()
         return response.json()
     except Exception as e:
-        logger.error(f"Erro ao listar mapeamentos estáticos DHCP no pfSense: {e}\nURL: {url}\nHeaders: {headers}\nParams: {params}")
+        logger.error(f"Erro ao listar mapeamentos estáticos DHCP no pfSense: {e}\nEndpoint: {endpoint}\nParams: {params}")
         if hasattr(e, 'response') and e.response is not None:
             logger.error(f"Resposta do pfSense: {e.response.text}")
         raise
 
-def listar_regras_firewall_pfsense():
+def listar_regras_firewall_pfsense(use_cache: bool = True):
     """
     Lista todas as regras de firewall do pfSense.
     
+    Parâmetros:
+        use_cache (bool): Se False, ignora o cache e consulta o pfSense
+            (o resultado atualiza o cache).
+    
     Retorna:
         dict|list: Resposta JSON da API do pfSense contendo as regras.
     """
-    url = f"{config.PFSENSE_API_URL}firewall/rules"
-    headers = {"X-API-Key": config.PFSENSE_API_KEY}
+    endpoint = pfsense_cache.FIREWALL_RULES
     try:
-        response = requests.get(url, headers=headers, timeout=10, verify=False)
-        response.raise_for_status()
-        return response.json()
+        return _get_cached_json(endpoint, use_cache=use_cache)
     except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
         logger.error(f"Timeout/Conexão ao listar regras de firewall no pfSense: {e}")
         raise
     except Exception as e:
-        logger.error(f"Erro ao listar regras de firewall do pfSense: {e}\nURL: {url}\nHeaders: {headers}")
+        logger.error(f"Erro ao listar regras de firewall do pfSense: {e}\nEndpoint: {endpoint}")
+        if hasattr(e, 'response') and e.response is not None:
+            logger.error(f"Resposta do pfSense: {e.response.text}")
+        raise
+
+def listar_leases_dhcp_pfsense(use_cache: bool = True):
+    """
+    Lista os leases do servidor DHCP do pfSense (status online/offline dos dispositivos).
+    
+    Utiliza a API oficial do pfSense v2:
+    GET /api/v2/status/dhcp_server/leases
+    
+    Parâmetros:
+        use_cache (bool): Se False, ignora o cache e consulta o pfSense
+            (o resultado atualiza o cache).
+    
+    Retorna:
+        dict: Resposta JSON da API do pfSense contendo os leases.
+    """
+    endpoint = pfsense_cache.DHCP_LEASES
+    try:
+        return _get_cached_json(endpoint, use_cache=use_cache, timeout=30)
+    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+        logger.error(f"Timeout/Conexão ao listar leases DHCP no pfSense: {e}")
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao listar leases DHCP no pfSense: {e}\nEndpoint: {endpoint}")
         if hasattr(e, 'response') and e.response is not None:
             logger.error(f"Resposta do pfSense: {e.response.text}")
         raise
@@ -192,13 +449,11 @@ def verificar_mapeamento_existente_pfsense(parent_id, ipaddr=None, mac=None):
     Retorna:
         dict: Informações sobre mapeamentos existentes encontrados
     """
-    url = f"{config.PFSENSE_API_URL}services/dhcp_servers"
-    headers = {"X-API-Key": config.PFSENSE_API_KEY}
+    endpoint = pfsense_cache.DHCP_SERVERS
     
     try:
-        response = requests.get(url, headers=headers, timeout=10, verify=False)
-        response.raise_for_status()
-        result = response.json()
+        # Consulta sempre o pfSense (antes de uma escrita); o resultado atualiza o cache
+        result = _get_cached_json(endpoint, use_cache=False)
         
         existing_mappings = []
         
@@ -285,24 +540,22 @@ def cadastrar_mapeamento_statico_dhcp_pfsense(mapping_data, verificar_existente=
                 
                 raise ValueError(error_msg)
     
-    url = f"{config.PFSENSE_API_URL}services/dhcp_server/static_mapping"
-    headers = {
-        "X-API-Key": config.PFSENSE_API_KEY,
-        "Content-Type": "application/json"
-    }
+    endpoint = "services/dhcp_server/static_mapping"
     
     try:
-        response = requests.post(url, json=mapping_data, headers=headers, timeout=10, verify=False)
+        response = get_pfsense_client().post(endpoint, json=mapping_data, timeout=10)
         response.raise_for_status()
         return response.json()
     except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
         logger.error(f"Timeout/Conexão ao cadastrar mapeamento DHCP no pfSense: {e}")
         raise
     except Exception as e:
-        logger.error(f"Erro ao cadastrar mapeamento estático DHCP no pfSense: {e}\nURL: {url}\nHeaders: {headers}\nPayload: {mapping_data}")
+        logger.error(f"Erro ao cadastrar mapeamento estático DHCP no pfSense: {e}\nEndpoint: {endpoint}\nPayload: {mapping_data}")
         if hasattr(e, 'response') and e.response is not None:
             logger.error(f"Resposta do pfSense: {e.response.text}")
         raise
+    finally:
+        pfsense_cache.invalidate(pfsense_cache.DHCP_SERVERS, pfsense_cache.DHCP_LEASES)
 
 def atualizar_alias_pfsense(alias_id: int, name: str, alias_type=None, descr=None, address=None, detail=None):
     """
@@ -319,11 +572,7 @@ def atualizar_alias_pfsense(alias_id: int, name: str, alias_type=None, descr=Non
     Retorna:
         dict: Resposta JSON da API do pfSense.
     """
-    url = f"{config.PFSENSE_API_URL}firewall/alias"
-    headers = {
-        "X-API-Key": config.PFSENSE_API_KEY,
-        "Content-Type": "application/json"
-    }
+    endpoint = "firewall/alias"
     
     # Construir payload com id obrigatório
     data = {
@@ -341,14 +590,16 @@ def atualizar_alias_pfsense(alias_id: int, name: str, alias_type=None, descr=Non
         data["detail"] = detail
     
     try:
-        response = requests.patch(url, json=data, headers=headers, timeout=10, verify=False)
+        response = get_pfsense_client().patch(endpoint, json=data, timeout=10)
         response.raise_for_status()
         return response.json()
     except Exception as e:
-        logger.error(f"Erro ao atualizar alias '{name}' (ID: {alias_id}) no pfSense: {e}\nURL: {url}\nHeaders: {headers}\nPayload: {data}")
+        logger.error(f"Erro ao atualizar alias '{name}' (ID: {alias_id}) no pfSense: {e}\nEndpoint: {endpoint}\nPayload: {data}")
         if hasattr(e, 'response') and e.response is not None:
             logger.error(f"Resposta do pfSense: {e.response.text}")
         raise
+    finally:
+        pfsense_cache.invalidate(pfsense_cache.ALIASES)
 
 def excluir_mapeamento_statico_dhcp_pfsense(parent_id: str, mapping_id: int, apply: bool = False):
     """
@@ -368,10 +619,7 @@ def excluir_mapeamento_statico_dhcp_pfsense(parent_id: str, mapping_id: int, app
     Exemplo:
         excluir_mapeamento_statico_dhcp_pfsense(parent_id="lan", mapping_id=5, apply=True)
     """
-    url = f"{config.PFSENSE_API_URL}services/dhcp_server/static_mapping"
-    headers = {
-        "X-API-Key": config.PFSENSE_API_KEY
-    }
+    endpoint = "services/dhcp_server/static_mapping"
     
     # Parâmetros de query conforme documentação oficial
     params = {
@@ -381,14 +629,16 @@ def excluir_mapeamento_statico_dhcp_pfsense(parent_id: str, mapping_id: int, app
     }
     
     try:
-        response = requests.delete(url, headers=headers, params=params, timeout=10, verify=False)
+        response = get_pfsense_client().delete(endpoint, params=params, timeout=10)
         response.raise_for_status()
         return response.json()
     except Exception as e:
-        logger.error(f"Erro ao excluir mapeamento estático DHCP (parent_id: {parent_id}, mapping_id: {mapping_id}) no pfSense: {e}\nURL: {url}\nHeaders: {headers}\nParams: {params}")
+        logger.error(f"Erro ao excluir mapeamento estático DHCP (parent_id: {parent_id}, mapping_id: {mapping_id}) no pfSense: {e}\nEndpoint: {endpoint}\nParams: {params}")
         if hasattr(e, 'response') and e.response is not None:
             logger.error(f"Resposta do pfSense: {e.response.text}")
         raise
+    finally:
+        pfsense_cache.invalidate(pfsense_cache.DHCP_SERVERS, pfsense_cache.DHCP_LEASES)
 
 def atualizar_mapeamento_statico_dhcp_pfsense(parent_id: str, mapping_id: int, update_data: dict, apply: bool = False):
     """
@@ -430,11 +680,7 @@ def atualizar_mapeamento_statico_dhcp_pfsense(parent_id: str, mapping_id: int, u
             apply=True
         )
     """
-    url = f"{config.PFSENSE_API_URL}services/dhcp_server/static_mapping"
-    headers = {
-        "X-API-Key": config.PFSENSE_API_KEY,
-        "Content-Type": "application/json"
-    }
+    endpoint = "services/dhcp_server/static_mapping"
     
     # Adicionar ID e parent_id ao payload
     payload = {
@@ -447,14 +693,16 @@ def atualizar_mapeamento_statico_dhcp_pfsense(parent_id: str, mapping_id: int, u
     params = {"apply": apply}
     
     try:
-        response = requests.patch(url, json=payload, headers=headers, params=params, timeout=10, verify=False)
+        response = get_pfsense_client().patch(endpoint, json=payload, params=params, timeout=10)
         response.raise_for_status()
         return response.json()
     except Exception as e:
-        logger.error(f"Erro ao atualizar mapeamento estático DHCP (parent_id: {parent_id}, mapping_id: {mapping_id}) no pfSense: {e}\nURL: {url}\nHeaders: {headers}\nPayload: {payload}\nParams: {params}")
+        logger.error(f"Erro ao atualizar mapeamento estático DHCP (parent_id: {parent_id}, mapping_id: {mapping_id}) no pfSense: {e}\nEndpoint: {endpoint}\nPayload: {payload}\nParams: {params}")
         if hasattr(e, 'response') and e.response is not None:
             logger.error(f"Resposta do pfSense: {e.response.text}")
         raise
+    finally:
+        pfsense_cache.invalidate(pfsense_cache.DHCP_SERVERS, pfsense_cache.DHCP_LEASES)
 
 def aplicar_mudancas_firewall_pfsense():
     """
@@ -477,15 +725,11 @@ def aplicar_mudancas_firewall_pfsense():
         if resultado.get('code') == 200:
             print("Mudanças aplicadas com sucesso!")
     """
-    url = f"{config.PFSENSE_API_URL}firewall/apply"
-    headers = {
-        "X-API-Key": config.PFSENSE_API_KEY,
-        "Content-Type": "application/json"
-    }
+    endpoint = "firewall/apply"
     
     try:
         logger.info("Aplicando mudanças pendentes no firewall do pfSense...")
-        response = requests.post(url, headers=headers, timeout=30, verify=False)
+        response = get_pfsense_client().post(endpoint, timeout=30)
         response.raise_for_status()
         result = response.json()
         logger.info(f"Mudanças aplicadas com sucesso no pfSense: {result}")
@@ -494,10 +738,12 @@ def aplicar_mudancas_firewall_pfsense():
         logger.error(f"Timeout/Conexão ao aplicar mudanças no firewall do pfSense: {e}")
         raise
     except Exception as e:
-        logger.error(f"Erro ao aplicar mudanças no firewall do pfSense: {e}\nURL: {url}\nHeaders: {headers}")
+        logger.error(f"Erro ao aplicar mudanças no firewall do pfSense: {e}\nEndpoint: {endpoint}")
         if hasattr(e, 'response') and e.response is not None:
             logger.error(f"Resposta do pfSense: {e.response.text}")
         raise
+    finally:
+        pfsense_cache.invalidate(pfsense_cache.ALIASES, pfsense_cache.FIREWALL_RULES)
 
 def aplicar_mudancas_dhcp_pfsense():
     """
@@ -520,15 +766,11 @@ def aplicar_mudancas_dhcp_pfsense():
         if resultado.get('code') == 200:
             print("Mudanças DHCP aplicadas com sucesso!")
     """
-    url = f"{config.PFSENSE_API_URL}services/dhcp_server/apply"
-    headers = {
-        "X-API-Key": config.PFSENSE_API_KEY,
-        "Content-Type": "application/json"
-    }
+    endpoint = "services/dhcp_server/apply"
     
     try:
         logger.info("Aplicando mudanças pendentes no servidor DHCP do pfSense...")
-        response = requests.post(url, headers=headers, timeout=30, verify=False)
+        response = get_pfsense_client().post(endpoint, timeout=30)
         response.raise_for_status()
         result = response.json()
         logger.info(f"Mudanças DHCP aplicadas com sucesso no pfSense: {result}")
@@ -537,8 +779,10 @@ def aplicar_mudancas_dhcp_pfsense():
         logger.error(f"Timeout/Conexão ao aplicar mudanças DHCP no pfSense: {e}")
         raise
     except Exception as e:
-        logger.error(f"Erro ao aplicar mudanças DHCP no pfSense: {e}\nURL: {url}\nHeaders: {headers}")
+        logger.error(f"Erro ao aplicar mudanças DHCP no pfSense: {e}\nEndpoint: {endpoint}")
         if hasattr(e, 'response') and e.response is not None:
             logger.error(f"Resposta do pfSense: {e.response.text}")
         raise
+    finally:
+        pfsense_cache.invalidate(pfsense_cache.DHCP_SERVERS, pfsense_cache.DHCP_LEASES)
 
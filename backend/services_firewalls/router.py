@@ -13,20 +13,25 @@ Todos os endpoints retornam JSON.
 from fastapi import APIRouter, HTTPException, Query, Request, Depends, Body
 from datetime import datetime
 import requests
-import config
+import httpx
+from fastapi.concurrency import run_in_threadpool
+from services_firewalls import pfsense_async_client as pfsense_async
 from services_firewalls.pfsense_client import (
-    cadastrar_alias_pfsense, listar_aliases_pfsense, obter_alias_pfsense,
-    listar_clientes_dhcp_pfsense, listar_mapeamentos_staticos_dhcp_pfsense,
-    cadastrar_mapeamento_statico_dhcp_pfsense, excluir_mapeamento_statico_dhcp_pfsense,
-    atualizar_mapeamento_statico_dhcp_pfsense, listar_regras_firewall_pfsense,
-    aplicar_mudancas_firewall_pfsense, aplicar_mudancas_dhcp_pfsense
+    listar_aliases_pfsense, listar_clientes_dhcp_pfsense,
+    excluir_mapeamento_statico_dhcp_pfsense, atualizar_mapeamento_statico_dhcp_pfsense,
+    get_pfsense_client
 )
+from services_firewalls.pfsense_cache import get_pfsense_cache
+from services_firewalls.pfsense_apply_queue import get_apply_coalescer, FIREWALL, DHCP
 from services_firewalls.dhcp_service import DhcpService
 from services_firewalls.alias_service import AliasService
+from services_firewalls.access_status_service import (
+    AccessStatusService, refresh_access_status, RULE_SIDES, ADDRESS_SIDES
+)
 from services_firewalls.ip_assignment_service import ip_assignment_service
 from services_firewalls.blocking_feedback_service import BlockingFeedbackService
-from db.models import DhcpStaticMapping
 from db.session import SessionLocal
+from db.pagination import CursorError
 import ipaddress
 from services_firewalls.dhcp_models import (
     DeviceSearchRequest, DeviceResponse, ServerResponse, DeviceStatisticsResponse,
@@ -43,13 +48,13 @@ from services_firewalls.alias_models import (
 )
 from services_firewalls.user_device_service import UserDeviceService
 from services_firewalls.permission_service import PermissionService
-from db.models import DhcpServer, DhcpStaticMapping, User, UserDeviceAssignment, PfSenseFirewallRule
+from db.models import DhcpServer, DhcpStaticMapping, UserDeviceAssignment, PfSenseFirewallRule
 from db.enums import UserPermission
 from pydantic import BaseModel
 from typing import List, Optional
 import json
 import logging
-from sqlalchemy import and_, or_, func
+from sqlalchemy import and_, func
 import requests
 
 logger = logging.getLogger(__name__)
@@ -74,23 +79,23 @@ class DhcpStaticMappingRequest(BaseModel):
 
 # Endpoints Regras de Firewall
 @router.get("/firewall/rules", summary="Listar regras de firewall do pfSense")
-def list_firewall_rules():
+async def list_firewall_rules():
     """
     Lista regras de firewall do pfSense via endpoint oficial /firewall/rules.
     Retorna 504 quando o pfSense está indisponível (timeout/conexão).
     """
     try:
-        result = listar_regras_firewall_pfsense()
+        result = await pfsense_async.listar_regras_firewall_pfsense()
         # Normalizar para retornar apenas o array data
         data = result.get("data") if isinstance(result, dict) else result
         return data
-    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+    except httpx.TransportError as e:
         raise HTTPException(status_code=504, detail=f"pfSense indisponível: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao listar regras de firewall: {e}")
 
 @router.post("/firewall/apply", summary="Aplicar mudanças pendentes no firewall do pfSense")
-def apply_firewall_changes():
+async def apply_firewall_changes():
     """
     Aplica as mudanças pendentes no firewall do pfSense.
     
@@ -105,20 +110,20 @@ def apply_firewall_changes():
         de dispositivos, mas pode ser chamado manualmente se necessário.
     """
     try:
-        result = aplicar_mudancas_firewall_pfsense()
+        result = await pfsense_async.aplicar_mudancas_firewall_pfsense()
         return {
             "status": "ok",
             "message": "Mudanças aplicadas com sucesso no firewall",
             "result": result
         }
-    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+    except httpx.TransportError as e:
         raise HTTPException(status_code=504, detail=f"pfSense indisponível: {e}")
     except Exception as e:
         logger.error(f"Erro ao aplicar mudanças no firewall: {e}")
         raise HTTPException(status_code=500, detail=f"Erro ao aplicar mudanças no firewall: {e}")
 
 @router.post("/dhcp/apply", summary="Aplicar mudanças pendentes no servidor DHCP do pfSense")
-def apply_dhcp_changes():
+async def apply_dhcp_changes():
     """
     Aplica as mudanças pendentes no servidor DHCP do pfSense.
     
@@ -141,147 +146,202 @@ def apply_dhcp_changes():
         - Excluir mapeamentos (se não usar apply=true)
     """
     try:
-        result = aplicar_mudancas_dhcp_pfsense()
+        result = await pfsense_async.aplicar_mudancas_dhcp_pfsense()
         return {
             "status": "ok",
             "message": "Mudanças DHCP aplicadas com sucesso no pfSense",
             "result": result
         }
-    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+    except httpx.TransportError as e:
         raise HTTPException(status_code=504, detail=f"pfSense indisponível: {e}")
     except Exception as e:
         logger.error(f"Erro ao aplicar mudanças DHCP: {e}")
         raise HTTPException(status_code=500, detail=f"Erro ao aplicar mudanças DHCP: {e}")
 
+def _persist_firewall_rules(rules: list) -> tuple:
+    """
+    Salva/atualiza as regras de firewall do pfSense na tabela pfsense_firewall_rules.
+    
+    Retorna:
+        tuple: (quantidade de regras inseridas, quantidade de regras atualizadas)
+    """
+    saved, updated = 0, 0
+    db = SessionLocal()
+    try:
+        for r in rules:
+            pf_id = r.get("id")
+            if pf_id is None:
+                continue
+            existing = db.query(PfSenseFirewallRule).filter(PfSenseFirewallRule.pf_id == pf_id).first()
+            payload = {
+                'type': r.get('type'),
+                'interface': ", ".join(r.get('interface') or []) if isinstance(r.get('interface'), list) else (r.get('interface') or None),
+                'ipprotocol': r.get('ipprotocol'),
+                'protocol': r.get('protocol'),
+                'icmptype': r.get('icmptype'),
+                'source': r.get('source'),
+                'source_port': r.get('source_port'),
+                'destination': r.get('destination'),
+                'destination_port': r.get('destination_port'),
+                'descr': r.get('descr'),
+                'disabled': r.get('disabled') or False,
+                'log': r.get('log') or False,
+                'tag': r.get('tag'),
+                'statetype': r.get('statetype'),
+                'tcp_flags_any': r.get('tcp_flags_any') or False,
+                'tcp_flags_out_of': r.get('tcp_flags_out_of'),
+                'tcp_flags_set': r.get('tcp_flags_set'),
+                'gateway': r.get('gateway'),
+                'sched': r.get('sched'),
+                'dnpipe': r.get('dnpipe'),
+                'pdnpipe': r.get('pdnpipe'),
+                'defaultqueue': r.get('defaultqueue'),
+                'ackqueue': r.get('ackqueue'),
+                'floating': r.get('floating') or False,
+                'quick': r.get('quick') or False,
+                'direction': r.get('direction'),
+                'tracker': r.get('tracker'),
+                'associated_rule_id': r.get('associated_rule_id'),
+                'created_time': datetime.fromtimestamp(r.get('created_time')) if r.get('created_time') else None,
+                'created_by': r.get('created_by'),
+                'updated_time': datetime.fromtimestamp(r.get('updated_time')) if r.get('updated_time') else None,
+                'updated_by': r.get('updated_by'),
+            }
+            if existing:
+                for k, v in payload.items():
+                    setattr(existing, k, v)
+                updated += 1
+            else:
+                rec = PfSenseFirewallRule(pf_id=pf_id, **payload)
+                db.add(rec)
+                saved += 1
+        db.commit()
+        
+        # Regras mudaram: reconstruir o índice alias→regra e recalcular o status de acesso
+        try:
+            with AccessStatusService(db) as access_service:
+                access_service.rebuild_rule_endpoints()
+            refresh_access_status(db=db)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Erro ao reconstruir índice de regras por alias: {e}")
+    finally:
+        db.close()
+    return saved, updated
+
 @router.post("/firewall/rules/save", summary="Sincronizar regras de firewall do pfSense com o banco de dados")
-def save_firewall_rules():
+async def save_firewall_rules():
     """
     Busca as regras no pfSense e salva/atualiza na tabela pfsense_firewall_rules.
     """
     try:
-        result = listar_regras_firewall_pfsense()
+        # Sincronização: sempre consultar o pfSense, sem usar o cache
+        result = await pfsense_async.listar_regras_firewall_pfsense(use_cache=False)
         rules = result.get("data") if isinstance(result, dict) else (result or [])
         if not isinstance(rules, list):
             raise ValueError("Formato inesperado de retorno de regras")
 
-        saved, updated = 0, 0
-        from db.session import SessionLocal
-        from datetime import datetime
-        db = SessionLocal()
-        try:
-            for r in rules:
-                pf_id = r.get("id")
-                if pf_id is None:
-                    continue
-                existing = db.query(PfSenseFirewallRule).filter(PfSenseFirewallRule.pf_id == pf_id).first()
-                payload = {
-                    'type': r.get('type'),
-                    'interface': ", ".join(r.get('interface') or []) if isinstance(r.get('interface'), list) else (r.get('interface') or None),
-                    'ipprotocol': r.get('ipprotocol'),
-                    'protocol': r.get('protocol'),
-                    'icmptype': r.get('icmptype'),
-                    'source': r.get('source'),
-                    'source_port': r.get('source_port'),
-                    'destination': r.get('destination'),
-                    'destination_port': r.get('destination_port'),
-                    'descr': r.get('descr'),
-                    'disabled': r.get('disabled') or False,
-                    'log': r.get('log') or False,
-                    'tag': r.get('tag'),
-                    'statetype': r.get('statetype'),
-                    'tcp_flags_any': r.get('tcp_flags_any') or False,
-                    'tcp_flags_out_of': r.get('tcp_flags_out_of'),
-                    'tcp_flags_set': r.get('tcp_flags_set'),
-                    'gateway': r.get('gateway'),
-                    'sched': r.get('sched'),
-                    'dnpipe': r.get('dnpipe'),
-                    'pdnpipe': r.get('pdnpipe'),
-                    'defaultqueue': r.get('defaultqueue'),
-                    'ackqueue': r.get('ackqueue'),
-                    'floating': r.get('floating') or False,
-                    'quick': r.get('quick') or False,
-                    'direction': r.get('direction'),
-                    'tracker': r.get('tracker'),
-                    'associated_rule_id': r.get('associated_rule_id'),
-                    'created_time': datetime.fromtimestamp(r.get('created_time')) if r.get('created_time') else None,
-                    'created_by': r.get('created_by'),
-                    'updated_time': datetime.fromtimestamp(r.get('updated_time')) if r.get('updated_time') else None,
-                    'updated_by': r.get('updated_by'),
-                }
-                if existing:
-                    for k, v in payload.items():
-                        setattr(existing, k, v)
-                    updated += 1
-                else:
-                    rec = PfSenseFirewallRule(pf_id=pf_id, **payload)
-                    db.add(rec)
-                    saved += 1
-            db.commit()
-        finally:
-            db.close()
+        # Escrita no banco é síncrona: executa no threadpool para não bloquear o event loop
+        saved, updated = await run_in_threadpool(_persist_firewall_rules, rules)
 
         return {"status": "success", "saved": saved, "updated": updated, "total": len(rules)}
-    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+    except httpx.TransportError as e:
         raise HTTPException(status_code=504, detail=f"pfSense indisponível: {e}")
     except Exception as e:
         logger.error(f"Erro ao salvar regras de firewall: {e}")
         raise HTTPException(status_code=500, detail=f"Erro ao salvar regras de firewall: {e}")
 
+def _firewall_rule_to_dict(r: PfSenseFirewallRule) -> dict:
+    """Serializa uma regra de firewall salva no banco (campos CSV viram listas onde aplicável)."""
+    return {
+        'id': r.id,
+        'pf_id': r.pf_id,
+        'type': r.type,
+        'interface': r.interface.split(', ') if r.interface else [],
+        'ipprotocol': r.ipprotocol,
+        'protocol': r.protocol,
+        'icmptype': r.icmptype,
+        'source': r.source,
+        'source_port': r.source_port,
+        'destination': r.destination,
+        'destination_port': r.destination_port,
+        'descr': r.descr,
+        'disabled': r.disabled,
+        'log': r.log,
+        'tag': r.tag,
+        'statetype': r.statetype,
+        'tcp_flags_any': r.tcp_flags_any,
+        'tcp_flags_out_of': r.tcp_flags_out_of,
+        'tcp_flags_set': r.tcp_flags_set,
+        'gateway': r.gateway,
+        'sched': r.sched,
+        'dnpipe': r.dnpipe,
+        'pdnpipe': r.pdnpipe,
+        'defaultqueue': r.defaultqueue,
+        'ackqueue': r.ackqueue,
+        'floating': r.floating,
+        'quick': r.quick,
+        'direction': r.direction,
+        'tracker': r.tracker,
+        'associated_rule_id': r.associated_rule_id,
+        'created_time': r.created_time,
+        'created_by': r.created_by,
+        'updated_time': r.updated_time,
+        'updated_by': r.updated_by,
+    }
+
 @router.get("/firewall/rules-db", summary="Listar regras de firewall salvas no banco de dados")
 def list_firewall_rules_db():
     try:
-        from db.session import SessionLocal
         db = SessionLocal()
         try:
             rules = db.query(PfSenseFirewallRule).all()
-            return [
-                {
-                    'id': r.id,
-                    'pf_id': r.pf_id,
-                    'type': r.type,
-                    'interface': r.interface.split(', ') if r.interface else [],
-                    'ipprotocol': r.ipprotocol,
-                    'protocol': r.protocol,
-                    'icmptype': r.icmptype,
-                    'source': r.source,
-                    'source_port': r.source_port,
-                    'destination': r.destination,
-                    'destination_port': r.destination_port,
-                    'descr': r.descr,
-                    'disabled': r.disabled,
-                    'log': r.log,
-                    'tag': r.tag,
-                    'statetype': r.statetype,
-                    'tcp_flags_any': r.tcp_flags_any,
-                    'tcp_flags_out_of': r.tcp_flags_out_of,
-                    'tcp_flags_set': r.tcp_flags_set,
-                    'gateway': r.gateway,
-                    'sched': r.sched,
-                    'dnpipe': r.dnpipe,
-                    'pdnpipe': r.pdnpipe,
-                    'defaultqueue': r.defaultqueue,
-                    'ackqueue': r.ackqueue,
-                    'floating': r.floating,
-                    'quick': r.quick,
-                    'direction': r.direction,
-                    'tracker': r.tracker,
-                    'associated_rule_id': r.associated_rule_id,
-                    'created_time': r.created_time,
-                    'created_by': r.created_by,
-                    'updated_time': r.updated_time,
-                    'updated_by': r.updated_by,
-                }
-                for r in rules
-            ]
+            return [_firewall_rule_to_dict(r) for r in rules]
         finally:
             db.close()
     except Exception as e:
         logger.error(f"Erro ao listar regras no banco: {e}")
         raise HTTPException(status_code=500, detail=f"Erro ao listar regras no banco: {e}")
 
+@router.get("/firewall/rules-db/by-alias/{alias_name}", summary="Listar regras que referenciam um alias")
+def list_firewall_rules_by_alias(
+    alias_name: str,
+    rule_type: Optional[str] = Query("pass,block", alias="type", description="Tipos de regra separados por vírgula (vazio = todos)"),
+    side: Optional[str] = Query(None, description="Restringir a source, destination ou interface"),
+    include_negated: bool = Query(True, description="Incluir referências negadas (!alias)")
+):
+    """
+    Lista as regras de firewall salvas no banco que referenciam um alias.
+    
+    A busca usa o índice (token, side, rule_id) da tabela pfsense_rule_endpoints,
+    populada por POST /firewall/rules/save.
+    
+    Exemplo:
+        GET /api/devices/firewall/rules-db/by-alias/Bloqueados?type=block
+    """
+    sides = ADDRESS_SIDES
+    if side:
+        if side not in RULE_SIDES:
+            raise HTTPException(status_code=400, detail=f"side deve ser um de: {', '.join(RULE_SIDES)}")
+        sides = (side,)
+    types = [t.strip() for t in rule_type.split(',') if t.strip()] if rule_type else None
+    try:
+        with AccessStatusService() as access_service:
+            rules = access_service.find_rules_referencing(
+                alias_name, types=types or None, sides=sides, include_negated=include_negated
+            )
+            return {
+                "alias": alias_name,
+                "total": len(rules),
+                "rules": [_firewall_rule_to_dict(r) for r in rules]
+            }
+    except Exception as e:
+        logger.error(f"Erro ao buscar regras do alias {alias_name}: {e}")
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar regras do alias: {e}")
+
 # Endpoints para aliases
 @router.post("/alias", summary="Cadastrar alias no pfSense")
-def add_alias(alias: AliasCreateLegacy):
+async def add_alias(alias: AliasCreateLegacy):
     """
     Cadastra um novo alias no pfSense.
     Parâmetros:
@@ -290,7 +350,7 @@ def add_alias(alias: AliasCreateLegacy):
         JSON com resposta do pfSense.
     """
     try:
-        result = cadastrar_alias_pfsense(
+        result = await pfsense_async.cadastrar_alias_pfsense(
             name=alias.name,
             alias_type=alias.type,
             descr=alias.descr,
@@ -298,11 +358,13 @@ def add_alias(alias: AliasCreateLegacy):
             detail=alias.detail
         )
         return {"status": "ok", "result": result}
+    except httpx.TransportError as e:
+        raise HTTPException(status_code=504, detail=f"pfSense indisponível: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao cadastrar alias no pfSense: {e}")
 
 @router.get("/aliases/{name}", summary="Obter alias específico")
-def get_alias_v2(name: str):
+async def get_alias_v2(name: str):
     """
     Obtém um alias específico do pfSense pelo nome.
     
@@ -316,17 +378,19 @@ def get_alias_v2(name: str):
         GET /api/devices/aliases/Teste_API_IoT_EDU
     """
     try:
-        result = obter_alias_pfsense(name)
+        result = await pfsense_async.obter_alias_pfsense(name)
         if result is None:
             raise HTTPException(status_code=404, detail=f"Alias '{name}' não encontrado")
         return {"status": "ok", "result": result}
+    except httpx.TransportError as e:
+        raise HTTPException(status_code=504, detail=f"pfSense indisponível: {e}")
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao obter alias: {e}")
 
 @router.get("/aliases", summary="Listar todos os aliases ou buscar por nome")
-def get_aliases(name: Optional[str] = Query(None, description="Nome do alias (opcional)")):
+async def get_aliases(name: Optional[str] = Query(None, description="Nome do alias (opcional)")):
     """
     Lista todos os aliases do pfSense ou busca um alias específico.
     
@@ -344,15 +408,15 @@ def get_aliases(name: Optional[str] = Query(None, description="Nome do alias (op
     try:
         if name:
             # Buscar alias específico
-            result = obter_alias_pfsense(name)
+            result = await pfsense_async.obter_alias_pfsense(name)
             if result is None:
                 raise HTTPException(status_code=404, detail=f"Alias '{name}' não encontrado")
             return {"status": "ok", "result": result}
         else:
             # Listar todos os aliases
-            result = listar_aliases_pfsense()
+            result = await pfsense_async.listar_aliases_pfsense()
             return {"status": "ok", "result": result}
-    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+    except httpx.TransportError as e:
         # Retornar mensagem amigável para erros de conexão com pfSense
         raise HTTPException(status_code=504, detail=f"pfSense indisponível: {e}")
     except HTTPException:
@@ -362,7 +426,7 @@ def get_aliases(name: Optional[str] = Query(None, description="Nome do alias (op
 
 # Endpoints DHCP
 @router.get("/dhcp/servers", summary="Listar todos os servidores DHCP")
-def list_dhcp_servers():
+async def list_dhcp_servers():
     """
     Lista todos os servidores DHCP do pfSense.
     Acessa o endpoint /services/dhcp_servers.
@@ -370,13 +434,15 @@ def list_dhcp_servers():
         JSON com lista de servidores DHCP e seus clientes.
     """
     try:
-        result = listar_clientes_dhcp_pfsense()
+        result = await pfsense_async.listar_clientes_dhcp_pfsense()
         return {"status": "ok", "result": result}
+    except httpx.TransportError as e:
+        raise HTTPException(status_code=504, detail=f"pfSense indisponível: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao listar servidores DHCP: {e}")
 
 @router.get("/dhcp/static_mapping", summary="Listar mapeamentos estáticos DHCP")
-def list_dhcp_static_mappings(parent_id: str = Query(..., description="ID da interface (ex: lan, wan, opt1)"), 
+async def list_dhcp_static_mappings(parent_id: str = Query(..., description="ID da interface (ex: lan, wan, opt1)"), 
                              id: int = Query(..., description="ID do mapeamento específico")):
     """
     Lista mapeamentos estáticos DHCP do pfSense.
@@ -393,8 +459,10 @@ def list_dhcp_static_mappings(parent_id: str = Query(..., description="ID da int
         JSON com mapeamento estático DHCP específico.
     """
     try:
-        result = listar_mapeamentos_staticos_dhcp_pfsense(parent_id, id)
+        result = await pfsense_async.listar_mapeamentos_staticos_dhcp_pfsense(parent_id, id)
         return {"status": "ok", "result": result}
+    except httpx.TransportError as e:
+        raise HTTPException(status_code=504, detail=f"pfSense indisponível: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao listar mapeamentos estáticos DHCP: {e}")
 
@@ -534,13 +602,8 @@ def save_dhcp_data(request: DhcpSaveRequest):
             pfsense_success = True
             pfsense_message = "Dados salvos no pfSense com sucesso"
             
-            # Aplicar mudanças DHCP automaticamente
-            try:
-                apply_result = aplicar_mudancas_dhcp_pfsense()
-                logger.info(f"Mudanças DHCP aplicadas automaticamente após cadastro: {apply_result}")
-            except Exception as apply_error:
-                logger.warning(f"Erro ao aplicar mudanças DHCP automaticamente: {apply_error}")
-                # Não falhar a operação se o apply der erro, apenas logar
+            # Agendar o apply do DHCP (agrupado com outros cadastros próximos)
+            get_apply_coalescer().mark_dirty(DHCP, reason=f"mapeamento {pfsense_data.get('mac')} cadastrado")
             
         except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
             # Propagar para ser tratado como 504 no bloco externo
@@ -584,7 +647,8 @@ def save_dhcp_data(request: DhcpSaveRequest):
 def list_cadastred_devices(
     page: int = Query(1, ge=1, description="Número da página"),
     per_page: int = Query(20, ge=1, le=100, description="Itens por página"),
-    server_id: Optional[str] = Query(None, description="Filtrar por servidor DHCP")
+    server_id: Optional[str] = Query(None, description="Filtrar por servidor DHCP"),
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página (campo next_cursor)")
 ):
     """
     Lista dispositivos cadastrados no banco de dados com paginação.
@@ -593,116 +657,60 @@ def list_cadastred_devices(
         page (int): Número da página (padrão: 1)
         per_page (int): Itens por página (padrão: 20, máximo: 100)
         server_id (str, opcional): Filtrar por servidor DHCP
+        cursor (str, opcional): Cursor da próxima página, retornado em next_cursor;
+            quando informado, substitui `page` (paginação por id, sem OFFSET)
     
     Retorna:
         Lista paginada de dispositivos cadastrados.
     """
     try:
         with DhcpService() as dhcp_service:
-            if server_id:
-                devices = dhcp_service.get_devices_by_server(server_id)
-            else:
-                devices = dhcp_service.get_all_devices()
-            
-            # Enriquecer com usuários atribuídos (ativos)
-            with UserDeviceService() as uds:
-                enriched_devices = []
-                for dev in devices:
-                    # Buscar usuários ativos (join explícito pela coluna user_id)
-                    assignments = uds.db.query(UserDeviceAssignment).join(User, UserDeviceAssignment.user_id == User.id).filter(
-                        and_(
-                            UserDeviceAssignment.device_id == dev.id,
-                            UserDeviceAssignment.is_active == True
-                        )
-                    ).all()
-                    assigned_users = [
-                        UserResponse(
-                            id=a.user.id,
-                            email=a.user.email,
-                            nome=a.user.nome,
-                            instituicao=a.user.instituicao,
-                            permission=a.user.permission,
-                            ultimo_login=a.user.ultimo_login,
-                        ) for a in assignments
-                    ]
-                    # Calcular status de acesso baseado em alias/rules
-                    status_acesso = None
-                    try:
-                        # Encontrar aliases que contenham o IP do dispositivo
-                        from db.models import PfSenseAlias, PfSenseAliasAddress, PfSenseFirewallRule
-                        alias_rows = uds.db.query(PfSenseAlias).join(
-                            PfSenseAliasAddress, PfSenseAliasAddress.alias_id == PfSenseAlias.id
-                        ).filter(PfSenseAliasAddress.address == dev.ipaddr).all()
-
-                        found_pass = False
-                        found_block = False
-                        for alias in alias_rows:
-                            name = alias.name
-                            # Considerar também regras com negação (ex.: !alias)
-                            match_tokens = [name, f'!{name}']
-                            all_conds = []
-                            for token in match_tokens:
-                                all_conds.extend([
-                                    PfSenseFirewallRule.source == token,
-                                    PfSenseFirewallRule.destination == token,
-                                    PfSenseFirewallRule.source.like(f'%,{token},%'),
-                                    PfSenseFirewallRule.source.like(f'{token},%'),
-                                    PfSenseFirewallRule.source.like(f'%,{token}'),
-                                    PfSenseFirewallRule.destination.like(f'%,{token},%'),
-                                    PfSenseFirewallRule.destination.like(f'{token},%'),
-                                    PfSenseFirewallRule.destination.like(f'%,{token}')
-                                ])
-                            rules = uds.db.query(PfSenseFirewallRule).filter(
-                                or_(*all_conds),
-                                PfSenseFirewallRule.type.in_(['pass', 'block'])
-                            ).all()
-                            for r in rules:
-                                if r.type == 'block':
-                                    found_block = True
-                                elif r.type == 'pass':
-                                    found_pass = True
-                        if found_block:
-                            status_acesso = 'BLOQUEADO'
-                        elif found_pass:
-                            status_acesso = 'LIBERADO'
-                        else:
-                            # Se não encontrou nem block nem pass, está aguardando
-                            # (tanto se tem aliases sem regras quanto se não tem aliases)
-                            status_acesso = 'AGUARDANDO'
-                    except Exception as _:
-                        # Em caso de erro, manter None
-                        status_acesso = status_acesso
-                    # Copiar dev para DeviceResponse incluindo assigned_users
-                    enriched_devices.append(DeviceResponse(
-                        id=dev.id,
-                        server_id=dev.server_id,
-                        pf_id=dev.pf_id,
-                        mac=dev.mac,
-                        ipaddr=dev.ipaddr,
-                        cid=dev.cid,
-                        hostname=dev.hostname,
-                        descr=dev.descr,
-                        created_at=dev.created_at,
-                        updated_at=dev.updated_at,
-                        assigned_users=assigned_users,
-                        status_acesso=status_acesso
-                    ))
-                devices = enriched_devices
-
-            # Paginação simples
-            total = len(devices)
-            start = (page - 1) * per_page
-            end = start + per_page
-            paginated_devices = devices[start:end]
+            result, total = dhcp_service.get_devices_page(page, per_page, server_id, cursor)
+            devices = result.items
+            
+            # Status de acesso (alias/regras) de todos os IPs da página em lote
+            with AccessStatusService(dhcp_service.db) as access_service:
+                status_map = access_service.get_access_status_map(dev.ipaddr for dev in devices)
+            
+            paginated_devices = []
+            for dev in devices:
+                # Usuários com atribuição ativa (já carregados via selectinload)
+                assigned_users = [
+                    UserResponse(
+                        id=a.user.id,
+                        email=a.user.email,
+                        nome=a.user.nome,
+                        instituicao=a.user.instituicao,
+                        permission=a.user.permission,
+                        ultimo_login=a.user.ultimo_login,
+                    ) for a in dev.user_assignments if a.is_active and a.user is not None
+                ]
+                paginated_devices.append(DeviceResponse(
+                    id=dev.id,
+                    server_id=dev.server_id,
+                    pf_id=dev.pf_id,
+                    mac=dev.mac,
+                    ipaddr=dev.ipaddr,
+                    cid=dev.cid,
+                    hostname=dev.hostname,
+                    descr=dev.descr,
+                    created_at=dev.created_at,
+                    updated_at=dev.updated_at,
+                    assigned_users=assigned_users,
+                    status_acesso=status_map.get(dev.ipaddr)
+                ))
             
             return BulkDeviceResponse(
                 devices=paginated_devices,
                 total=total,
                 page=page,
                 per_page=per_page,
-                has_next=end < total,
-                has_prev=page > 1
+                has_next=result.next_cursor is not None,
+                has_prev=page > 1 or cursor is not None,
+                next_cursor=result.next_cursor
             )
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao listar dispositivos: {e}")
 
@@ -1053,51 +1061,13 @@ def get_user_devices(user_id: int, current_user_id: int = Query(..., description
                     UserDeviceAssignment.is_active == True
                 )
             ).count()
+            # Status de acesso (alias/regras) de todos os dispositivos em lote
+            with AccessStatusService(service.db) as access_service:
+                status_map = access_service.get_access_status_map(dev.ipaddr for dev in devices)
+            
             # Enriquecer cada device em DeviceResponse incluindo status_acesso
             enriched_devices = []
             for dev in devices:
-                status_acesso = None
-                try:
-                    from db.models import PfSenseAlias, PfSenseAliasAddress, PfSenseFirewallRule
-                    alias_rows = service.db.query(PfSenseAlias).join(
-                        PfSenseAliasAddress, PfSenseAliasAddress.alias_id == PfSenseAlias.id
-                    ).filter(PfSenseAliasAddress.address == dev.ipaddr).all()
-                    found_pass, found_block = False, False
-                    for alias in alias_rows:
-                        name = alias.name
-                        match_tokens = [name, f'!{name}']
-                        all_conds = []
-                        for token in match_tokens:
-                            all_conds.extend([
-                                PfSenseFirewallRule.source == token,
-                                PfSenseFirewallRule.destination == token,
-                                PfSenseFirewallRule.source.like(f'%,{token},%'),
-                                PfSenseFirewallRule.source.like(f'{token},%'),
-                                PfSenseFirewallRule.source.like(f'%,{token}'),
-                                PfSenseFirewallRule.destination.like(f'%,{token},%'),
-                                PfSenseFirewallRule.destination.like(f'{token},%'),
-                                PfSenseFirewallRule.destination.like(f'%,{token}')
-                            ])
-                        rules = service.db.query(PfSenseFirewallRule).filter(
-                            or_(*all_conds),
-                            PfSenseFirewallRule.type.in_(['pass', 'block'])
-                        ).all()
-                        for r in rules:
-                            if r.type == 'block':
-                                found_block = True
-                            elif r.type == 'pass':
-                                found_pass = True
-                    if found_block:
-                        status_acesso = 'BLOQUEADO'
-                    elif found_pass:
-                        status_acesso = 'LIBERADO'
-                    else:
-                        # Se não encontrou nem block nem pass, está aguardando
-                        # (tanto se tem aliases sem regras quanto se não tem aliases)
-                        status_acesso = 'AGUARDANDO'
-                except Exception:
-                    status_acesso = status_acesso
-
                 enriched_devices.append(DeviceResponse(
                     id=dev.id,
                     server_id=dev.server_id,
@@ -1109,7 +1079,7 @@ def get_user_devices(user_id: int, current_user_id: int = Query(..., description
                     descr=dev.descr,
                     created_at=dev.created_at,
                     updated_at=dev.updated_at,
-                    status_acesso=status_acesso,
+                    status_acesso=status_map.get(dev.ipaddr),
                     assigned_users=[]
                 ))
             
@@ -1276,7 +1246,7 @@ def get_assignment_statistics():
         raise HTTPException(status_code=500, detail=f"Erro ao obter estatísticas: {e}")
 
 @router.post("/dhcp/static_mapping", summary="Cadastrar mapeamento estático DHCP no pfSense", response_model=DhcpStaticMappingCreateResponse)
-def create_dhcp_static_mapping(mapping: DhcpStaticMappingCreateRequest):
+async def create_dhcp_static_mapping(mapping: DhcpStaticMappingCreateRequest):
     """
     Cadastra um novo mapeamento estático DHCP no pfSense e aplica as mudanças automaticamente.
     
@@ -1310,19 +1280,25 @@ def create_dhcp_static_mapping(mapping: DhcpStaticMappingCreateRequest):
         mapping_data = mapping.model_dump(exclude_none=True)
         
         # Cadastrar no pfSense com verificação de existência
-        result = cadastrar_mapeamento_statico_dhcp_pfsense(mapping_data, verificar_existente=True)
-        
-        # Aplicar mudanças DHCP automaticamente
-        try:
-            apply_result = aplicar_mudancas_dhcp_pfsense()
-            logger.info(f"Mudanças DHCP aplicadas automaticamente após cadastro: {apply_result}")
-        except Exception as apply_error:
-            logger.warning(f"Erro ao aplicar mudanças DHCP automaticamente: {apply_error}")
-            # Não falhar a operação se o apply der erro, apenas logar
+        result = await pfsense_async.cadastrar_mapeamento_statico_dhcp_pfsense(mapping_data, verificar_existente=True)
+        
+        # Agendar o apply do DHCP (agrupado com outros cadastros próximos). Sem
+        # agrupamento (PFSENSE_APPLY_COALESCE=false) o apply roda na própria
+        # chamada, por isso fora do event loop
+        coalescer = get_apply_coalescer()
+        generation = await run_in_threadpool(
+            coalescer.mark_dirty, DHCP, reason=f"mapeamento {mapping_data.get('mac')} cadastrado"
+        )
+        if coalescer.enabled:
+            message = "Mapeamento estático DHCP cadastrado no pfSense (aplicação agendada; ver /pfsense/apply/status)"
+        elif coalescer.wait(DHCP, generation, timeout=0):
+            message = "Mapeamento estático DHCP cadastrado e aplicado no pfSense"
+        else:
+            message = "Mapeamento estático DHCP cadastrado no pfSense, mas a aplicação falhou (ver /pfsense/apply/status)"
         
         return DhcpStaticMappingCreateResponse(
             success=True,
-            message="Mapeamento estático DHCP cadastrado e aplicado com sucesso no pfSense",
+            message=message,
             data=result
         )
     except ValueError as e:
@@ -1332,6 +1308,8 @@ def create_dhcp_static_mapping(mapping: DhcpStaticMappingCreateRequest):
             status_code=409, 
             detail=str(e)
         )
+    except httpx.TransportError as e:
+        raise HTTPException(status_code=504, detail=f"pfSense indisponível: {e}")
     except Exception as e:
         logger.error(f"Erro ao cadastrar mapeamento estático DHCP: {e}")
         raise HTTPException(
@@ -1524,16 +1502,20 @@ def delete_dhcp_static_mapping(
         )
 
 @router.post("/dhcp/sync", summary="Sincronizar IDs do pfSense com o banco de dados local")
-def sync_pfsense_ids():
+def sync_pfsense_ids(
+    prune: bool = Query(False, description="Remover mapeamentos locais que não existem mais no pfSense")
+):
     """
     Sincroniza os IDs do pfSense com os pf_id do banco de dados local.
     
     Este endpoint:
     1. Busca todos os dados DHCP do pfSense
-    2. Compara com os dados locais
+    2. Compara com os dados locais (diff em memória, uma consulta por lote)
     3. Atualiza os pf_id para corresponder aos IDs reais do pfSense
     4. Cria novos registros se necessário
     5. Atualiza registros existentes com IDs incorretos
+    6. Com prune=true, remove mapeamentos que não existem mais no pfSense
+       (exceto dispositivos com histórico de feedback de bloqueio)
     
     ⚠️ **IMPORTANTE**: Esta operação pode alterar os pf_id existentes.
     Use apenas quando houver inconsistências entre pfSense e banco local.
@@ -1548,16 +1530,18 @@ def sync_pfsense_ids():
         "mappings_synced": 5,
         "mappings_created": 2,
         "mappings_updated": 1,
+        "mappings_deleted": 0,
+        "summary": {"changes": {"created": [...], "updated": [...], "deleted": [...]}, "elapsed_ms": 42.0},
         "timestamp": "2024-01-15T10:30:00"
     }
     """
     try:
-        # Buscar dados do pfSense
-        dhcp_data = listar_clientes_dhcp_pfsense()
+        # Buscar dados do pfSense (sem cache: a sincronização precisa do estado atual)
+        dhcp_data = listar_clientes_dhcp_pfsense(use_cache=False)
         
         # Sincronizar com banco local
         with DhcpService() as dhcp_service:
-            result = dhcp_service.sync_pfsense_ids(dhcp_data)
+            result = dhcp_service.sync_pfsense_ids(dhcp_data, prune=prune)
         
         return {
             "status": "success",
@@ -1573,7 +1557,7 @@ def sync_pfsense_ids():
         )
 
 @router.get("/dhcp/static_mapping/check", summary="Verificar mapeamentos DHCP existentes")
-def check_existing_dhcp_mappings(
+async def check_existing_dhcp_mappings(
     parent_id: str = Query("lan", description="ID do servidor DHCP pai (padrão: lan)"),
     ipaddr: Optional[str] = Query(None, description="Endereço IP para verificar"),
     mac: Optional[str] = Query(None, description="Endereço MAC para verificar")
@@ -1598,15 +1582,13 @@ def check_existing_dhcp_mappings(
         GET /api/devices/dhcp/static_mapping/check?parent_id=lan&ipaddr=192.168.1.100
     """
     try:
-        from services_firewalls.pfsense_client import verificar_mapeamento_existente_pfsense
-        
         if not ipaddr and not mac:
             raise HTTPException(
                 status_code=400,
                 detail="É necessário fornecer pelo menos um endereço IP ou MAC para verificar"
             )
         
-        result = verificar_mapeamento_existente_pfsense(parent_id, ipaddr, mac)
+        result = await pfsense_async.verificar_mapeamento_existente_pfsense(parent_id, ipaddr, mac)
         
         return {
             "parent_id": parent_id,
@@ -1618,6 +1600,10 @@ def check_existing_dhcp_mappings(
             "message": "Verificação concluída com sucesso"
         }
         
+    except HTTPException:
+        raise
+    except httpx.TransportError as e:
+        raise HTTPException(status_code=504, detail=f"pfSense indisponível: {e}")
     except Exception as e:
         logger.error(f"Erro ao verificar mapeamentos existentes: {e}")
         raise HTTPException(
@@ -1642,7 +1628,7 @@ def save_aliases_data():
     try:
         # Buscar aliases do pfSense
         try:
-            pfsense_aliases = listar_aliases_pfsense()
+            pfsense_aliases = listar_aliases_pfsense(use_cache=False)
         except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
             raise HTTPException(status_code=504, detail=f"pfSense indisponível: {e}")
         
@@ -1665,7 +1651,8 @@ def save_aliases_data():
 def list_aliases_from_db(
     page: int = Query(1, ge=1, description="Número da página"),
     per_page: int = Query(20, ge=1, le=100, description="Itens por página"),
-    name: Optional[str] = Query(None, description="Filtrar por nome do alias")
+    name: Optional[str] = Query(None, description="Filtrar por nome do alias"),
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página (campo next_cursor)")
 ):
     """
     Lista aliases salvos no banco de dados local.
@@ -1674,31 +1661,27 @@ def list_aliases_from_db(
         page (int): Número da página (padrão: 1)
         per_page (int): Itens por página (padrão: 20, máximo: 100)
         name (str, opcional): Filtrar por nome do alias
+        cursor (str, opcional): Cursor da próxima página, retornado em next_cursor;
+            quando informado, substitui `page` (paginação por id, sem OFFSET)
     
     Retorna:
         Lista paginada de aliases com endereços.
     """
     try:
         with AliasService() as alias_service:
-            if name:
-                aliases = [alias_service.get_alias_by_name(name)] if alias_service.get_alias_by_name(name) else []
-            else:
-                aliases = alias_service.get_all_aliases()
-            
-            # Paginação simples
-            total = len(aliases)
-            start = (page - 1) * per_page
-            end = start + per_page
-            paginated_aliases = aliases[start:end]
+            result, total = alias_service.get_aliases_page(page, per_page, name, cursor)
             
             return AliasListResponse(
-                aliases=paginated_aliases,
+                aliases=result.items,
                 total=total,
                 page=page,
                 per_page=per_page,
-                has_next=end < total,
-                has_prev=page > 1
+                has_next=result.next_cursor is not None,
+                has_prev=page > 1 or cursor is not None,
+                next_cursor=result.next_cursor
             )
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao listar aliases: {e}")
 
@@ -2082,7 +2065,7 @@ def delete_dhcp_static_mapping_by_mac(
         )
 
 @router.get("/dhcp/status", summary="Obter status online/offline dos dispositivos DHCP")
-def get_dhcp_status():
+async def get_dhcp_status():
     """
     Obtém o status online/offline dos dispositivos através do servidor DHCP do pfSense.
     
@@ -2090,17 +2073,7 @@ def get_dhcp_status():
         Lista de dispositivos com status online/offline
     """
     try:
-        # URL do endpoint de leases DHCP do pfSense
-        url = f"{config.PFSENSE_API_URL}status/dhcp_server/leases"
-        headers = {
-            "X-API-Key": config.PFSENSE_API_KEY,
-            "Content-Type": "application/json"
-        }
-        
-        response = requests.get(url, headers=headers, timeout=30, verify=False)
-        response.raise_for_status()
-        
-        data = response.json()
+        data = await pfsense_async.listar_leases_dhcp_pfsense()
         
         if data.get("code") == 200 and data.get("status") == "ok":
             # Processar os dados para um formato mais limpo
@@ -2130,13 +2103,13 @@ def get_dhcp_status():
                 detail=f"Erro na resposta do pfSense: {data.get('message', 'Erro desconhecido')}"
             )
             
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         logger.warning("Timeout ao conectar com pfSense para obter status DHCP")
         raise HTTPException(
             status_code=504,
             detail="pfSense não respondeu a tempo. Verifique a conectividade."
         )
-    except requests.exceptions.ConnectionError:
+    except httpx.TransportError:
         logger.warning("Erro de conexão com pfSense para obter status DHCP")
         raise HTTPException(
             status_code=503,
@@ -2162,6 +2135,76 @@ def get_dhcp_status():
                 detail=f"Erro interno ao obter status dos dispositivos: {str(e)}"
             )
 
+@router.get("/pfsense/client-stats", summary="Estatísticas de latência do cliente pfSense")
+def get_pfsense_client_stats(reset: bool = Query(False, description="Zerar os contadores após a leitura")):
+    """
+    Retorna a configuração do pool de conexões com o pfSense e as latências
+    acumuladas por endpoint (chamadas, erros, média, mínima e máxima em ms).
+    Os contadores do cliente assíncrono (rotas async) aparecem na chave "async"
+    e os do cache de listagens na chave "cache".
+    """
+    client = get_pfsense_client()
+    async_client = pfsense_async.peek_async_pfsense_client()
+    cache = get_pfsense_cache()
+    stats = client.get_stats()
+    if async_client is not None:
+        stats["async"] = async_client.get_stats()
+    stats["cache"] = cache.get_stats()
+    if reset:
+        client.reset_stats()
+        if async_client is not None:
+            async_client.reset_stats()
+        cache.reset_stats()
+    return {
+        "success": True,
+        "data": stats
+    }
+
+@router.get("/pfsense/apply/status", summary="Estado da fila de apply do pfSense")
+def get_pfsense_apply_status():
+    """
+    Retorna, para firewall e DHCP, se há alterações aguardando apply, a geração
+    da última marcação e da última aplicada, e o resultado do último apply.
+    
+    O alvo está convergido quando "applied_generation" >= geração retornada
+    na alteração, ou quando "pending" é false.
+    """
+    return {
+        "success": True,
+        "data": get_apply_coalescer().status()
+    }
+
+@router.post("/pfsense/apply/flush", summary="Aplicar imediatamente as alterações pendentes no pfSense")
+def flush_pfsense_apply(
+    target: Optional[str] = Query(None, description="Alvo: firewall ou dhcp (padrão: ambos)"),
+    wait: bool = Query(True, description="Aguardar a conclusão do apply"),
+    timeout: float = Query(60, ge=0, le=300, description="Tempo máximo de espera em segundos")
+):
+    """
+    Força o apply das alterações pendentes sem esperar a janela de agrupamento.
+    Com wait=true, só retorna após a convergência (ou o tempo limite).
+    """
+    if target is not None and target not in (FIREWALL, DHCP):
+        raise HTTPException(status_code=400, detail="target deve ser 'firewall' ou 'dhcp'")
+    status = get_apply_coalescer().flush(target, wait=wait, timeout=timeout)
+    return {
+        "success": status["converged"],
+        "data": status
+    }
+
+@router.post("/pfsense/cache/invalidate", summary="Descartar o cache de listagens do pfSense")
+def invalidate_pfsense_cache():
+    """
+    Descarta todas as listagens do pfSense em cache (aliases, servidores DHCP,
+    regras e leases). Útil após alterações feitas diretamente na interface do
+    pfSense, que não passam pela API e portanto não invalidam o cache.
+    """
+    get_pfsense_cache().invalidate()
+    return {
+        "success": True,
+        "message": "Cache do pfSense descartado"
+    }
+
 @router.get("/ip-assignment/range-info", summary="Obter informações do range de IPs")
 def get_ip_range_info():
     """Retorna informações sobre o range de IPs configurado"""
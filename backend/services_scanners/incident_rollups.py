@@ -0,0 +1,337 @@
+"""
+Agregados de incidentes por minuto e por hora para os painéis.
+
+As tabelas zeek_incident_rollup_minute e zeek_incident_rollup_hour somam, por
+(bucket, IP, severidade, tipo de log, tipo de incidente):
+- incident_count: incidentes criados, no intervalo da data de detecção;
+- occurrence_count: ocorrências registradas (inclusive as agrupadas em um
+  incidente já existente), no intervalo em que aconteceram.
+
+Os agregados são atualizados por IncidentService na mesma transação da
+gravação dos incidentes (upsert somando as contagens). Uma consulta por
+janela soma as horas inteiras na tabela por hora e as bordas na tabela por
+minuto. O status do incidente muda ao longo do tempo e não faz parte
+dos agregados.
+
+Como os incidentes já são agrupados por (IP, tipo, severidade, janela de
+ZEEK_INCIDENT_DEDUPE_BUCKET), a chave completa por hora tem quase tantas
+linhas quanto zeek_incidents. O painel de /zeek/stats usa agregados mais
+estreitos, também mantidos aqui (hourly_facets): por hora, tipo de log e
+severidade, e por IP (por dia, com as horas do primeiro dia parcial da
+janela), cujo tamanho depende do período e da quantidade de IPs, e não do
+volume de incidentes.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, desc, func, or_, select, union_all
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import Session
+
+import config
+from db.models import (
+    ZeekIncidentRollupHour, ZeekIncidentRollupIpDay, ZeekIncidentRollupIpHour, ZeekIncidentRollupMinute,
+    ZeekIncidentRollupTypeHour
+)
+
+logger = logging.getLogger(__name__)
+
+# Dimensões aceitas em group_by (colunas dos agregados)
+DIMENSIONS = ('device_ip', 'severity', 'zeek_log_type', 'incident_type')
+
+# Linhas por INSERT dos agregados
+_WRITE_BATCH = 500
+
+
+def minute_bucket(value: datetime) -> datetime:
+    return value.replace(second=0, microsecond=0)
+
+
+def hour_bucket(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+# Agregados mantidos: (tabela, função de bucket, dimensões)
+ROLLUP_TARGETS = (
+    (ZeekIncidentRollupMinute, minute_bucket, DIMENSIONS),
+    (ZeekIncidentRollupHour, hour_bucket, DIMENSIONS),
+    (ZeekIncidentRollupTypeHour, hour_bucket, ('zeek_log_type', 'severity')),
+    (ZeekIncidentRollupIpHour, hour_bucket, ('device_ip',)),
+    (ZeekIncidentRollupIpDay, day_bucket, ('device_ip',)),
+)
+
+
+def _primary_key_order(item: Tuple[Tuple, List[int]]) -> Tuple:
+    """Ordem total das chaves (bucket, dimensões...) de RollupCounter.rows, com enums pelo valor e None primeiro."""
+    bucket, *values = item[0]
+    return (bucket, *((value is not None, str(getattr(value, 'value', value))) for value in values))
+
+
+class RollupCounter:
+    """Acumula as contagens de um lote de incidentes antes de gravá-las nos agregados."""
+
+    def __init__(self):
+        # (minuto, IP, severidade, tipo de log, tipo de incidente) -> [incidentes, ocorrências]
+        self._counts: Dict[Tuple, List[int]] = defaultdict(lambda: [0, 0])
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def add(self, row: Dict[str, Any], incidents: int = 0, occurrences: int = 0,
+            at: Optional[datetime] = None) -> None:
+        """
+        Soma incidentes/ocorrências de uma linha no formato de zeek_incidents.
+
+        Args:
+            row: Colunas do incidente (device_ip, severity, zeek_log_type, incident_type, detected_at)
+            incidents: Incidentes criados
+            occurrences: Ocorrências registradas
+            at: Momento das contagens (usa row['detected_at'] se omitido)
+        """
+        key = (minute_bucket(at or row['detected_at']), row['device_ip'], row['severity'],
+               row['zeek_log_type'], row['incident_type'])
+        counts = self._counts[key]
+        counts[0] += incidents
+        counts[1] += occurrences
+
+    def rows(self, bucket=minute_bucket, dims: Sequence[str] = DIMENSIONS) -> List[Dict[str, Any]]:
+        """
+        Linhas dos agregados, com os minutos reagrupados pela função de bucket
+        informada e as contagens somadas sobre as dimensões fora de `dims`.
+
+        As linhas saem na ordem da chave primária (bucket, dims), de modo que
+        lotes gravados em paralelo bloqueiam as linhas comuns na mesma ordem e o
+        InnoDB não entra em deadlock.
+        """
+        positions = [DIMENSIONS.index(name) for name in dims]
+        merged: Dict[Tuple, List[int]] = defaultdict(lambda: [0, 0])
+        for (minute, *values), (incidents, occurrences) in self._counts.items():
+            counts = merged[(bucket(minute), *(values[i] for i in positions))]
+            counts[0] += incidents
+            counts[1] += occurrences
+        return [
+            {'bucket': key[0], **dict(zip(dims, key[1:])),
+             'incident_count': incidents, 'occurrence_count': occurrences}
+            for key, (incidents, occurrences) in sorted(merged.items(), key=_primary_key_order)
+        ]
+
+
+class IncidentRollupService:
+    """Grava, consulta e expira os agregados de incidentes."""
+
+    def __init__(self, minute_retention_hours: Optional[int] = None, hour_retention_days: Optional[int] = None):
+        """
+        Args:
+            minute_retention_hours: Horas mantidas na tabela por minuto (usa config.ZEEK_ROLLUP_MINUTE_RETENTION_HOURS)
+            hour_retention_days: Dias mantidos na tabela por hora (usa config.ZEEK_ROLLUP_HOUR_RETENTION_DAYS)
+        """
+        self.minute_retention = timedelta(hours=minute_retention_hours or config.ZEEK_ROLLUP_MINUTE_RETENTION_HOURS)
+        self.hour_retention = timedelta(days=hour_retention_days or config.ZEEK_ROLLUP_HOUR_RETENTION_DAYS)
+
+    def write(self, db: Session, counter: RollupCounter, models: Optional[Sequence[Any]] = None) -> None:
+        """
+        Soma as contagens acumuladas em todos os agregados, ou apenas nos de
+        `models` (sem commit; usa a transação do chamador).
+        """
+        if not len(counter):
+            return
+        for model, bucket, dims in ROLLUP_TARGETS:
+            if models is not None and model not in models:
+                continue
+            rows = counter.rows(bucket, dims)
+            for start in range(0, len(rows), _WRITE_BATCH):
+                self._upsert(db, model, rows[start:start + _WRITE_BATCH])
+
+    def _upsert(self, db: Session, model, rows: List[Dict[str, Any]]) -> None:
+        if db.get_bind().dialect.name == 'sqlite':
+            stmt = sqlite.insert(model).values(rows)
+            new = stmt.excluded
+        else:
+            stmt = mysql.insert(model).values(rows)
+            new = stmt.inserted
+        updates = {
+            'incident_count': model.incident_count + new.incident_count,
+            'occurrence_count': model.occurrence_count + new.occurrence_count,
+        }
+        if db.get_bind().dialect.name == 'sqlite':
+            keys = [column.name for column in model.__table__.primary_key]
+            stmt = stmt.on_conflict_do_update(index_elements=keys, set_=updates)
+        else:
+            stmt = stmt.on_duplicate_key_update(**updates)
+        db.execute(stmt)
+
+    def _ranges(self, since: datetime, until: datetime, now: datetime) -> List[Tuple[Any, datetime, datetime]]:
+        """
+        Divide [since, until) em (tabela, início, fim): horas inteiras na tabela por
+        hora e bordas na tabela por minuto. Bordas anteriores à retenção por minuto
+        são ampliadas para a hora inteira.
+        """
+        expired = now - self.minute_retention
+        start = minute_bucket(since)
+        if start < expired:
+            start = hour_bucket(start)
+        end = until
+        if end < expired and end != hour_bucket(end):
+            end = hour_bucket(end) + timedelta(hours=1)
+        first_hour = hour_bucket(start)
+        if first_hour < start:
+            first_hour += timedelta(hours=1)
+        last_hour = hour_bucket(end)
+        if first_hour >= last_hour:
+            return [(ZeekIncidentRollupMinute, start, end)]
+        ranges = [(ZeekIncidentRollupHour, first_hour, last_hour)]
+        if start < first_hour:
+            ranges.append((ZeekIncidentRollupMinute, start, first_hour))
+        if last_hour < end:
+            ranges.append((ZeekIncidentRollupMinute, last_hour, end))
+        return ranges
+
+    def summarize(self, db: Session, since: datetime, until: Optional[datetime] = None,
+                  group_by: Sequence[str] = (), device_ip: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Soma os agregados de uma janela (até a retenção da tabela por hora).
+
+        Args:
+            db: Sessão do banco
+            since: Início da janela (arredondado para o minuto, ou para a hora fora da retenção por minuto)
+            until: Fim da janela, exclusivo (agora se omitido)
+            group_by: Dimensões de agrupamento (device_ip, severity, zeek_log_type, incident_type)
+            device_ip: Filtra um IP
+
+        Returns:
+            Totais da janela e, com group_by, a lista de grupos ordenada por incidentes
+        """
+        unknown = [name for name in group_by if name not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Dimensões inválidas: {unknown} (aceitas: {list(DIMENSIONS)})")
+
+        now = datetime.now()
+        until = until or now
+        totals = [0, 0]
+        groups: Dict[Tuple, List[int]] = defaultdict(lambda: [0, 0])
+
+        ranges = self._ranges(since, until, now)
+        by_model: Dict[Any, List[Tuple[datetime, datetime]]] = defaultdict(list)
+        for model, start, end in ranges:
+            by_model[model].append((start, end))
+
+        # Uma consulta por tabela (as duas bordas da tabela por minuto entram no mesmo WHERE)
+        for model, model_ranges in by_model.items():
+            columns = [getattr(model, name) for name in group_by]
+            query = db.query(*columns, func.sum(model.incident_count), func.sum(model.occurrence_count)).filter(
+                or_(*[and_(model.bucket >= start, model.bucket < end) for start, end in model_ranges])
+            )
+            if device_ip:
+                query = query.filter(model.device_ip == device_ip)
+            if columns:
+                query = query.group_by(*columns)
+            for *key, incidents, occurrences in query.all():
+                incidents, occurrences = int(incidents or 0), int(occurrences or 0)
+                totals[0] += incidents
+                totals[1] += occurrences
+                if columns:
+                    counts = groups[tuple(getattr(value, 'value', value) for value in key)]
+                    counts[0] += incidents
+                    counts[1] += occurrences
+
+        result = {
+            # Janela efetivamente somada (após o arredondamento para os buckets)
+            'since': min(start for _, start, _ in ranges).isoformat(),
+            'until': max(end for _, _, end in ranges).isoformat(),
+            'total_incidents': totals[0],
+            'total_occurrences': totals[1],
+        }
+        if group_by:
+            result['groups'] = sorted(
+                ({**dict(zip(group_by, key)), 'incidents': incidents, 'occurrences': occurrences}
+                 for key, (incidents, occurrences) in groups.items()),
+                key=lambda group: (-group['incidents'], -group['occurrences'])
+            )
+        return result
+
+    def hourly_facets(self, db: Session, since: datetime, top: int = 10) -> Dict[str, Any]:
+        """
+        Incidentes por tipo de log e por severidade e os IPs mais afetados desde o
+        início da hora de `since`, a partir dos agregados estreitos por hora.
+
+        Returns:
+            since (início efetivo), total_incidents, total_occurrences,
+            log_type_stats, severity_stats e top_ips ({ip, count, occurrences})
+        """
+        start = hour_bucket(since)
+        log_type_stats: Dict[str, int] = defaultdict(int)
+        severity_stats: Dict[str, int] = defaultdict(int)
+        totals = [0, 0]
+        for log_type, severity, incidents, occurrences in db.query(
+            ZeekIncidentRollupTypeHour.zeek_log_type,
+            ZeekIncidentRollupTypeHour.severity,
+            func.sum(ZeekIncidentRollupTypeHour.incident_count),
+            func.sum(ZeekIncidentRollupTypeHour.occurrence_count)
+        ).filter(ZeekIncidentRollupTypeHour.bucket >= start).group_by(
+            ZeekIncidentRollupTypeHour.zeek_log_type, ZeekIncidentRollupTypeHour.severity
+        ):
+            incidents, occurrences = int(incidents or 0), int(occurrences or 0)
+            log_type_stats[log_type.value] += incidents
+            severity_stats[severity.value] += incidents
+            totals[0] += incidents
+            totals[1] += occurrences
+
+        # IPs: dias inteiros (o dia atual só tem dados até agora) e as horas do primeiro dia, se parcial
+        first_day = day_bucket(start)
+        if first_day < start:
+            first_day += timedelta(days=1)
+        ip_hour, ip_day = ZeekIncidentRollupIpHour, ZeekIncidentRollupIpDay
+        parts = union_all(
+            select(ip_hour.device_ip, ip_hour.incident_count, ip_hour.occurrence_count).where(
+                ip_hour.bucket >= start, ip_hour.bucket < first_day
+            ),
+            select(ip_day.device_ip, ip_day.incident_count, ip_day.occurrence_count).where(
+                ip_day.bucket >= first_day
+            ),
+        ).subquery()
+        top_ips = db.query(
+            parts.c.device_ip,
+            func.sum(parts.c.incident_count).label('incidents'),
+            func.sum(parts.c.occurrence_count)
+        ).group_by(parts.c.device_ip).having(
+            func.sum(parts.c.incident_count) > 0
+        ).order_by(desc('incidents')).limit(top).all()
+
+        return {
+            'since': start.isoformat(),
+            'total_incidents': totals[0],
+            'total_occurrences': totals[1],
+            'log_type_stats': dict(log_type_stats),
+            'severity_stats': dict(severity_stats),
+            'top_ips': [
+                {'ip': ip, 'count': int(incidents), 'occurrences': int(occurrences or 0)}
+                for ip, incidents, occurrences in top_ips
+            ],
+        }
+
+    def prune(self, db: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Remove os buckets mais antigos que a retenção de cada tabela (com commit)."""
+        now = now or datetime.now()
+        hour_cutoff = hour_bucket(now - self.hour_retention)
+        removed = {
+            'minute': db.query(ZeekIncidentRollupMinute).filter(
+                ZeekIncidentRollupMinute.bucket < minute_bucket(now - self.minute_retention)
+            ).delete(synchronize_session=False),
+            'hour': sum(
+                db.query(model).filter(model.bucket < hour_cutoff).delete(synchronize_session=False)
+                for model in (ZeekIncidentRollupHour, ZeekIncidentRollupTypeHour, ZeekIncidentRollupIpHour)
+            ),
+            'day': db.query(ZeekIncidentRollupIpDay).filter(
+                ZeekIncidentRollupIpDay.bucket < day_bucket(now - self.hour_retention)
+            ).delete(synchronize_session=False),
+        }
+        db.commit()
+        if removed['minute'] or removed['hour']:
+            logger.info(f"Agregados de incidentes expirados: {removed['minute']} por minuto, {removed['hour']} por hora")
+        return removed
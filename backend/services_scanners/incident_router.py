@@ -2,13 +2,14 @@
 Roteador FastAPI para endpoints de incidentes de segurança.
 """
 import logging
-from typing import List, Optional
+from typing import Any, List, Optional
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
 from .incident_service import IncidentService
+from db.pagination import NEXT_CURSOR_HEADER, CursorError
 from db.models import ZeekIncident
 from db.enums import IncidentSeverity, IncidentStatus, ZeekLogType
 from services_firewalls.alias_service import AliasService
@@ -53,8 +54,12 @@ class IncidentResponse(BaseModel):
     action_taken: Optional[str]
     assigned_to: Optional[int]
     notes: Optional[str]
+    occurrence_count: int = 1
+    first_seen: Optional[str] = None
+    last_seen: Optional[str] = None
     created_at: str
     updated_at: str
+    raw_log_data: Optional[Any] = None
 
     class Config:
         from_attributes = True
@@ -66,13 +71,15 @@ class AutoBlockRequest(BaseModel):
 
 @router.get("/", response_model=List[IncidentResponse], summary="Lista incidentes")
 async def get_incidents(
+    response: Response,
     device_ip: Optional[str] = Query(None, description="Filtrar por IP do dispositivo"),
     severity: Optional[str] = Query(None, description="Filtrar por severidade"),
     status: Optional[str] = Query(None, description="Filtrar por status"),
     log_type: Optional[str] = Query(None, description="Filtrar por tipo de log"),
     hours_ago: Optional[int] = Query(24, ge=1, le=168, description="Buscar incidentes das últimas N horas"),
     limit: int = Query(100, ge=1, le=1000, description="Limite de resultados"),
-    offset: int = Query(0, ge=0, description="Offset para paginação")
+    offset: int = Query(0, ge=0, description="Offset para paginação (legado)"),
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página (cabeçalho X-Next-Cursor)")
 ):
     """
     Lista incidentes de segurança com filtros opcionais.
@@ -83,21 +90,28 @@ async def get_incidents(
     - **log_type**: Filtrar por tipo de log do Zeek
     - **hours_ago**: Buscar incidentes das últimas N horas
     - **limit**: Número máximo de resultados (1-1000)
-    - **offset**: Número de resultados para pular (paginação)
+    - **offset**: Número de resultados para pular (legado; prefira o cursor)
+    - **cursor**: Cursor da próxima página, devolvido no cabeçalho X-Next-Cursor
+      (ausente na última página)
     """
     try:
-        incidents = incident_service.get_incidents(
+        page = incident_service.get_incidents(
             device_ip=device_ip,
             severity=severity,
             status=status,
             log_type=log_type,
             hours_ago=hours_ago,
             limit=limit,
-            offset=offset
+            offset=offset,
+            cursor=cursor
         )
         
-        return [incident.to_dict() for incident in incidents]
+        if page.next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+        return [incident.to_dict() for incident in page.items]
         
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Erro ao listar incidentes: {e}")
         raise HTTPException(
@@ -108,7 +122,7 @@ async def get_incidents(
 @router.get("/{incident_id}", response_model=IncidentResponse, summary="Busca incidente por ID")
 async def get_incident(incident_id: int):
     """
-    Busca um incidente específico por ID.
+    Busca um incidente específico por ID, com o log original que o gerou.
     """
     try:
         incident = incident_service.get_incident_by_id(incident_id)
@@ -119,7 +133,9 @@ async def get_incident(incident_id: int):
                 detail=f"Incidente {incident_id} não encontrado"
             )
         
-        return incident.to_dict()
+        data = incident.to_dict()
+        data['raw_log_data'] = incident_service.get_raw_log(incident_id)
+        return data
         
     except HTTPException:
         raise
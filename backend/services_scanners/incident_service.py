@@ -1,25 +1,127 @@
 """
 Serviço para gerenciar incidentes de segurança no banco de dados.
 """
+import copy
+import hashlib
 import json
 import logging
-from typing import List, Optional, Dict, Any
+import threading
+import time
+import zlib
+from typing import List, Optional, Dict, Any, Hashable
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc, asc
+from sqlalchemy import or_, asc, func
+from sqlalchemy.dialects import mysql, sqlite
 
-from db.models import ZeekIncident
+import config
+from db.models import ZeekIncident, ZeekIncidentRawLog
 from db.enums import IncidentSeverity, IncidentStatus, ZeekLogType
+from db.pagination import CursorError, Page, paginate
 from db.session import get_db_session
+from .incident_rollups import IncidentRollupService, RollupCounter
 
 logger = logging.getLogger(__name__)
 
+# Ordenação das listagens de incidentes (índice idx_incident_detected_at)
+INCIDENT_ORDER = ((ZeekIncident.detected_at, True), (ZeekIncident.id, True))
+
+
+def incident_dedupe_key(device_ip: str, incident_type: str, severity: str, seen_at: datetime,
+                        bucket_seconds: Optional[int] = None) -> str:
+    """
+    Chave de agrupamento de um incidente: hash de (IP, tipo, severidade, início da
+    janela de detecção). Ocorrências com a mesma chave somam em occurrence_count.
+    """
+    bucket_seconds = bucket_seconds or config.ZEEK_INCIDENT_DEDUPE_BUCKET
+    bucket_start = int(seen_at.timestamp()) // bucket_seconds * bucket_seconds
+    raw = f"{device_ip}|{incident_type}|{severity}|{bucket_start}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def pack_raw_log(raw_log: Any) -> Optional[bytes]:
+    """
+    Serializa o log original de um incidente para zeek_incident_raw_logs (JSON
+    comprimido com zlib). Aceita o log como objeto ou como JSON já serializado,
+    inclusive serializado duas vezes (formato antigo de raw_log_data).
+    """
+    while isinstance(raw_log, str):
+        try:
+            raw_log = json.loads(raw_log)
+        except ValueError:
+            break
+    if not raw_log:
+        return None
+    return zlib.compress(json.dumps(raw_log, default=str, separators=(',', ':')).encode('utf-8'))
+
+
+def unpack_raw_log(data: Optional[bytes]) -> Any:
+    """Log original gravado por pack_raw_log (None se não houver)."""
+    return json.loads(zlib.decompress(data)) if data else None
+
+
+class IncidentStatsCache:
+    """
+    Cache em memória das estatísticas de incidentes, por chave (ex: período em horas).
+
+    Cada entrada expira após o TTL; as gravações de incidentes chamam
+    `invalidate`, e um cálculo iniciado antes da invalidação não é armazenado
+    (contador de geração). Cada leitura devolve uma cópia profunda.
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        """
+        Args:
+            ttl: Segundos de validade de cada entrada (usa config.ZEEK_INCIDENT_STATS_TTL; 0 desativa)
+        """
+        self.ttl = ttl if ttl is not None else config.ZEEK_INCIDENT_STATS_TTL
+        self._entries: Dict[Hashable, tuple] = {}  # chave -> (expira_em, estatísticas)
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._counters['hits'] += 1
+                return copy.deepcopy(entry[1])
+            self._counters['misses'] += 1
+            return None
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def put(self, key: Hashable, stats: Dict[str, Any], generation: int):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(stats))
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._counters['invalidations'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Entradas e contadores do cache."""
+        with self._lock:
+            return {'ttl': self.ttl, 'entries': len(self._entries), **self._counters}
+
+
+# Compartilhado por todas as instâncias de IncidentService
+stats_cache = IncidentStatsCache()
+
+
 class IncidentService:
     """Serviço para gerenciar incidentes de segurança."""
     
     def __init__(self):
         """Inicializa o serviço de incidentes."""
-        pass
+        self.rollups = IncidentRollupService()
     
     def save_incident(self, incident_data: Dict[str, Any]) -> Optional[ZeekIncident]:
         """
@@ -33,31 +135,27 @@ class IncidentService:
         """
         try:
             with get_db_session() as db:
-                # Verifica se já existe um incidente similar (para evitar duplicatas)
-                existing = self._find_similar_incident(db, incident_data)
-                if existing:
-                    logger.info(f"Incidente similar já existe: {existing.id}")
-                    return existing
-                
-                # Cria novo incidente
-                incident = ZeekIncident(
-                    device_ip=incident_data.get('device_ip', 'unknown'),
-                    device_name=incident_data.get('device_name'),
-                    incident_type=incident_data.get('incident_type', 'Unknown'),
-                    severity=IncidentSeverity(incident_data.get('severity', 'medium')),
-                    status=IncidentStatus(incident_data.get('status', 'new')),
-                    description=incident_data.get('description', ''),
-                    detected_at=incident_data.get('detected_at', datetime.now()),
-                    zeek_log_type=ZeekLogType(incident_data.get('zeek_log_type', 'notice.log')),
-                    raw_log_data=json.dumps(incident_data.get('raw_log_data', {})) if incident_data.get('raw_log_data') else None,
-                    action_taken=incident_data.get('action_taken'),
-                    assigned_to=incident_data.get('assigned_to'),
-                    notes=incident_data.get('notes')
-                )
-                
-                db.add(incident)
+                # Cria o incidente ou, se já houver um com a mesma chave de agrupamento,
+                # apenas soma a ocorrência (upsert atômico)
+                row = self._incident_row(incident_data)
+                self._upsert_incidents(db, [row])
+                incident = db.query(ZeekIncident).filter(ZeekIncident.dedupe_key == row['dedupe_key']).first()
+                
+                # Log original só na criação (ocorrências agrupadas mantêm o da primeira)
+                raw_log = pack_raw_log(incident_data.get('raw_log_data'))
+                if incident.occurrence_count == 1 and raw_log:
+                    self._insert_raw_logs(db, [{'incident_id': incident.id, 'data': raw_log}])
+                
+                # Agregados por minuto/hora na mesma transação
+                rollup = RollupCounter()
+                rollup.add(row, incidents=1 if incident.occurrence_count == 1 else 0, occurrences=1)
+                self.rollups.write(db, rollup)
                 db.commit()
-                db.refresh(incident)
+                stats_cache.invalidate()
+                
+                if incident.occurrence_count > 1:
+                    logger.info(f"Incidente similar já existe: {incident.id} ({incident.occurrence_count} ocorrências)")
+                    return incident
                 
                 logger.info(f"Incidente salvo com ID: {incident.id}")
                 
@@ -72,6 +170,155 @@ class IncidentService:
             logger.error(f"Erro ao salvar incidente: {e}")
             return None
     
+    def _incident_row(self, incident_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Converte os dados de um incidente nas colunas de zeek_incidents (mesmas regras de save_incident)."""
+        now = datetime.now()
+        row = {
+            'device_ip': incident_data.get('device_ip', 'unknown'),
+            'device_name': incident_data.get('device_name'),
+            'incident_type': incident_data.get('incident_type', 'Unknown'),
+            'severity': IncidentSeverity(incident_data.get('severity', 'medium')),
+            'status': IncidentStatus(incident_data.get('status', 'new')),
+            'description': incident_data.get('description', ''),
+            'detected_at': incident_data.get('detected_at') or now,
+            'zeek_log_type': ZeekLogType(incident_data.get('zeek_log_type', 'notice.log')),
+            'action_taken': incident_data.get('action_taken'),
+            'assigned_to': incident_data.get('assigned_to'),
+            'notes': incident_data.get('notes'),
+            'created_at': now,
+            'updated_at': now,
+        }
+        row['occurrence_count'] = 1
+        row['first_seen'] = row['last_seen'] = row['detected_at']
+        row['dedupe_key'] = incident_dedupe_key(
+            row['device_ip'], row['incident_type'], row['severity'].value, row['detected_at']
+        )
+        return row
+    
+    def _upsert_incidents(self, db: Session, rows: List[Dict[str, Any]]) -> None:
+        """
+        Insere os incidentes em um único INSERT de várias linhas; os que já
+        existem (mesma dedupe_key) têm as ocorrências somadas e first_seen/last_seen
+        ampliados. Usa ON DUPLICATE KEY UPDATE no MySQL (ON CONFLICT no SQLite).
+        """
+        if db.get_bind().dialect.name == 'sqlite':
+            stmt = sqlite.insert(ZeekIncident).values(rows)
+            new = stmt.excluded
+            greatest, least = func.max, func.min
+        else:
+            stmt = mysql.insert(ZeekIncident).values(rows)
+            new = stmt.inserted
+            greatest, least = func.greatest, func.least
+        
+        updates = {
+            'occurrence_count': ZeekIncident.occurrence_count + new.occurrence_count,
+            'last_seen': greatest(func.coalesce(ZeekIncident.last_seen, new.last_seen), new.last_seen),
+            'first_seen': least(func.coalesce(ZeekIncident.first_seen, new.first_seen), new.first_seen),
+            'updated_at': new.updated_at,
+        }
+        if db.get_bind().dialect.name == 'sqlite':
+            stmt = stmt.on_conflict_do_update(index_elements=['dedupe_key'], set_=updates)
+        else:
+            stmt = stmt.on_duplicate_key_update(**updates)
+        db.execute(stmt)
+    
+    def _insert_raw_logs(self, db: Session, rows: List[Dict[str, Any]]) -> None:
+        """Grava os logs originais (incident_id, data); incidentes que já têm log são ignorados."""
+        if db.get_bind().dialect.name == 'sqlite':
+            stmt = sqlite.insert(ZeekIncidentRawLog).values(rows).on_conflict_do_nothing()
+        else:
+            stmt = mysql.insert(ZeekIncidentRawLog).values(rows).prefix_with('IGNORE')
+        db.execute(stmt)
+    
+    def save_incidents_batch(self, incidents_data: List[Dict[str, Any]],
+                             batch_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Salva vários incidentes de uma vez, agrupando as ocorrências repetidas.
+        
+        Ocorrências com a mesma chave (IP, tipo, severidade, janela de
+        ZEEK_INCIDENT_DEDUPE_BUCKET) são agregadas em memória e gravadas com um
+        upsert de várias linhas por lote: chaves novas criam o incidente e chaves
+        existentes somam occurrence_count e atualizam first_seen/last_seen.
+        
+        Incidentes de atacante seguem por save_incident (um a um), pois o
+        bloqueio automático precisa do ID do incidente criado.
+        
+        Args:
+            incidents_data: Dados dos incidentes (mesmo formato de save_incident)
+            batch_size: Linhas por INSERT (usa config.ZEEK_INCIDENT_BATCH_SIZE se omitido)
+            
+        Returns:
+            Contadores: received, upserted (incidentes distintos), merged
+            (ocorrências agrupadas em memória), attackers e elapsed_ms
+        """
+        started = time.perf_counter()
+        batch_size = batch_size or config.ZEEK_INCIDENT_BATCH_SIZE
+        result = {'received': len(incidents_data), 'upserted': 0, 'merged': 0, 'attackers': 0}
+        
+        groups: Dict[str, Dict[str, Any]] = {}
+        raw_logs: Dict[str, bytes] = {}
+        rollup = RollupCounter()
+        for data in incidents_data:
+            if "Atacante" in (data.get('incident_type') or ''):
+                if self.save_incident(data) is not None:
+                    result['attackers'] += 1
+                continue
+            
+            row = self._incident_row(data)
+            rollup.add(row, occurrences=1)
+            group = groups.get(row['dedupe_key'])
+            if group is None:
+                groups[row['dedupe_key']] = row
+                raw_log = pack_raw_log(data.get('raw_log_data'))
+                if raw_log:
+                    raw_logs[row['dedupe_key']] = raw_log
+                continue
+            group['occurrence_count'] += 1
+            if row['detected_at'] < group['first_seen']:
+                group['first_seen'] = group['detected_at'] = row['detected_at']
+            if row['detected_at'] > group['last_seen']:
+                group['last_seen'] = row['detected_at']
+            result['merged'] += 1
+        
+        if groups:
+            rows = list(groups.values())
+            with get_db_session() as db:
+                # Chaves que já têm incidente só somam ocorrências nos agregados
+                keys = list(groups)
+                existing = set()
+                for start in range(0, len(keys), batch_size):
+                    existing.update(key for (key,) in db.query(ZeekIncident.dedupe_key).filter(
+                        ZeekIncident.dedupe_key.in_(keys[start:start + batch_size])
+                    ))
+                for row in rows:
+                    if row['dedupe_key'] not in existing:
+                        rollup.add(row, incidents=1)
+                
+                for start in range(0, len(rows), batch_size):
+                    self._upsert_incidents(db, rows[start:start + batch_size])
+                
+                # Logs originais dos incidentes criados neste lote
+                new_keys = [key for key in keys if key not in existing and key in raw_logs]
+                for start in range(0, len(new_keys), batch_size):
+                    created = db.query(ZeekIncident.id, ZeekIncident.dedupe_key).filter(
+                        ZeekIncident.dedupe_key.in_(new_keys[start:start + batch_size])
+                    ).all()
+                    if created:
+                        self._insert_raw_logs(db, [{'incident_id': incident_id, 'data': raw_logs[key]}
+                                                   for incident_id, key in created])
+                self.rollups.write(db, rollup)
+                db.commit()
+            stats_cache.invalidate()
+            result['upserted'] = len(rows)
+        
+        result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        if result['upserted'] or result['attackers']:
+            logger.info(
+                f"Lote de incidentes: {result['received']} ocorrências em {result['upserted']} incidentes, "
+                f"{result['attackers']} de atacante ({result['elapsed_ms']} ms)"
+            )
+        return result
+    
     def get_incidents(
         self, 
         device_ip: Optional[str] = None,
@@ -80,10 +327,11 @@ class IncidentService:
         log_type: Optional[str] = None,
         hours_ago: Optional[int] = None,
         limit: int = 100,
-        offset: int = 0
-    ) -> List[ZeekIncident]:
+        offset: int = 0,
+        cursor: Optional[str] = None
+    ) -> Page:
         """
-        Busca incidentes com filtros.
+        Busca incidentes com filtros, paginados por cursor sobre (detected_at, id).
         
         Args:
             device_ip: Filtrar por IP do dispositivo
@@ -92,10 +340,14 @@ class IncidentService:
             log_type: Filtrar por tipo de log
             hours_ago: Buscar incidentes das últimas N horas
             limit: Limite de resultados
-            offset: Offset para paginação
+            offset: Offset para paginação (legado; ignorado quando há cursor)
+            cursor: Cursor da próxima página retornado pela consulta anterior
             
         Returns:
-            Lista de incidentes
+            Page com os incidentes e o cursor da próxima página
+            
+        Raises:
+            CursorError: Se o cursor for inválido
         """
         try:
             with get_db_session() as db:
@@ -118,18 +370,17 @@ class IncidentService:
                     since = datetime.now() - timedelta(hours=hours_ago)
                     query = query.filter(ZeekIncident.detected_at >= since)
                 
-                # Ordena por data de detecção (mais recentes primeiro)
-                query = query.order_by(desc(ZeekIncident.detected_at))
+                # Mais recentes primeiro; id desempata incidentes do mesmo instante
+                page = paginate(query, INCIDENT_ORDER, limit, cursor=cursor, offset=offset)
                 
-                # Aplica paginação
-                incidents = query.offset(offset).limit(limit).all()
-                
-                logger.info(f"Encontrados {len(incidents)} incidentes")
-                return incidents
+                logger.info(f"Encontrados {len(page.items)} incidentes")
+                return page
                 
+        except CursorError:
+            raise
         except Exception as e:
             logger.error(f"Erro ao buscar incidentes: {e}")
-            return []
+            return Page([], None)
     
     def get_incident_by_id(self, incident_id: int) -> Optional[ZeekIncident]:
         """
@@ -149,6 +400,26 @@ class IncidentService:
             logger.error(f"Erro ao buscar incidente {incident_id}: {e}")
             return None
     
+    def get_raw_log(self, incident_id: int) -> Any:
+        """
+        Busca o log original de um incidente (armazenado à parte, comprimido).
+        
+        Args:
+            incident_id: ID do incidente
+            
+        Returns:
+            Log original ou None se não houver
+        """
+        try:
+            with get_db_session() as db:
+                data = db.query(ZeekIncidentRawLog.data).filter(
+                    ZeekIncidentRawLog.incident_id == incident_id
+                ).scalar()
+                return unpack_raw_log(data)
+        except Exception as e:
+            logger.error(f"Erro ao buscar log original do incidente {incident_id}: {e}")
+            return None
+    
     def update_incident_status(self, incident_id: int, status: str, notes: Optional[str] = None) -> bool:
         """
         Atualiza o status de um incidente.
@@ -174,6 +445,7 @@ class IncidentService:
                 incident.updated_at = datetime.now()
                 
                 db.commit()
+                stats_cache.invalidate()
                 logger.info(f"Status do incidente {incident_id} atualizado para {status}")
                 return True
                 
@@ -214,99 +486,77 @@ class IncidentService:
         """
         Retorna estatísticas dos incidentes.
         
+        Totais, severidade, tipo de log e IPs saem dos agregados por minuto e por
+        hora (IncidentRollupService.summarize), sem ler zeek_incidents; apenas as
+        contagens por status, que mudam depois da criação e não fazem parte dos
+        agregados, vêm de uma consulta agrupada pelo índice idx_incident_stats.
+        O resultado fica em cache por config.ZEEK_INCIDENT_STATS_TTL segundos.
+        
         Args:
             hours_ago: Período em horas para as estatísticas
             
         Returns:
-            Dicionário com estatísticas
+            Dicionário com estatísticas (total_occurrences conta as ocorrências
+            registradas no período)
         """
+        cached = stats_cache.get(hours_ago)
+        if cached is not None:
+            return cached
+        
+        generation = stats_cache.generation()
         try:
             with get_db_session() as db:
-                since = datetime.now() - timedelta(hours=hours_ago)
-                
-                # Total de incidentes
-                total = db.query(ZeekIncident).filter(ZeekIncident.detected_at >= since).count()
-                
-                # Por severidade
-                severity_stats = {}
-                for severity in IncidentSeverity:
-                    count = db.query(ZeekIncident).filter(
-                        and_(ZeekIncident.detected_at >= since, ZeekIncident.severity == severity)
-                    ).count()
-                    severity_stats[severity.value] = count
-                
-                # Por status
-                status_stats = {}
-                for status in IncidentStatus:
-                    count = db.query(ZeekIncident).filter(
-                        and_(ZeekIncident.detected_at >= since, ZeekIncident.status == status)
-                    ).count()
-                    status_stats[status.value] = count
-                
-                # Por tipo de log
-                log_type_stats = {}
-                for log_type in ZeekLogType:
-                    count = db.query(ZeekIncident).filter(
-                        and_(ZeekIncident.detected_at >= since, ZeekIncident.zeek_log_type == log_type)
-                    ).count()
-                    log_type_stats[log_type.value] = count
-                
-                # Top IPs com mais incidentes
-                from sqlalchemy import func
-                top_ips = db.query(
-                    ZeekIncident.device_ip,
-                    func.count(ZeekIncident.id).label('count')
-                ).filter(
-                    ZeekIncident.detected_at >= since
-                ).group_by(
-                    ZeekIncident.device_ip
-                ).order_by(
-                    desc('count')
-                ).limit(10).all()
-                
-                return {
-                    'total_incidents': total,
+                now = datetime.now()
+                since = now - timedelta(hours=hours_ago)
+                
+                # Incidentes por severidade e tipo de log (e totais) a partir dos agregados
+                by_type = self.rollups.summarize(db, since, now, group_by=('severity', 'zeek_log_type'))
+                severity_stats = {severity.value: 0 for severity in IncidentSeverity}
+                log_type_stats = {log_type.value: 0 for log_type in ZeekLogType}
+                for group in by_type['groups']:
+                    severity_stats[group['severity']] += group['incidents']
+                    log_type_stats[group['zeek_log_type']] += group['incidents']
+                
+                # Top IPs com mais incidentes (grupos já ordenados por incidentes)
+                by_ip = self.rollups.summarize(db, since, now, group_by=('device_ip',))
+                top_ips = [group for group in by_ip['groups'] if group['incidents'] > 0][:10]
+                
+                # O status não faz parte dos agregados (mesma janela efetivamente somada nos agregados)
+                status_stats = {status.value: 0 for status in IncidentStatus}
+                for status, count in db.query(ZeekIncident.status, func.count()).filter(
+                    ZeekIncident.detected_at >= datetime.fromisoformat(by_type['since'])
+                ).group_by(ZeekIncident.status):
+                    if status is not None:
+                        status_stats[status.value] += count
+                
+                stats = {
+                    'total_incidents': by_type['total_incidents'],
+                    'total_occurrences': by_type['total_occurrences'],
                     'severity_stats': severity_stats,
                     'status_stats': status_stats,
                     'log_type_stats': log_type_stats,
-                    'top_ips': [{'ip': ip, 'count': count} for ip, count in top_ips],
+                    'top_ips': [
+                        {'ip': group['device_ip'], 'count': group['incidents'], 'occurrences': group['occurrences']}
+                        for group in top_ips
+                    ],
                     'period_hours': hours_ago,
-                    'generated_at': datetime.now().isoformat()
+                    'generated_at': now.isoformat()
                 }
                 
         except Exception as e:
             logger.error(f"Erro ao gerar estatísticas: {e}")
             return {}
+        
+        stats_cache.put(hours_ago, stats, generation)
+        return stats
     
-    def _find_similar_incident(self, db: Session, incident_data: Dict[str, Any]) -> Optional[ZeekIncident]:
+    def get_hourly_stats(self, hours_ago: int) -> Dict[str, Any]:
         """
-        Busca incidentes similares para evitar duplicatas.
-        
-        Args:
-            db: Sessão do banco de dados
-            incident_data: Dados do incidente
-            
-        Returns:
-            Incidente similar ou None
+        Incidentes por tipo de log e severidade e os IPs mais afetados desde o início
+        da hora de `hours_ago` horas atrás (agregados por hora; ver IncidentRollupService.hourly_facets).
         """
-        try:
-            # Busca por incidente do mesmo tipo, IP e severidade nas últimas 1 hora
-            since = datetime.now() - timedelta(hours=1)
-            
-            similar = db.query(ZeekIncident).filter(
-                and_(
-                    ZeekIncident.device_ip == incident_data.get('device_ip'),
-                    ZeekIncident.incident_type == incident_data.get('incident_type'),
-                    ZeekIncident.severity == IncidentSeverity(incident_data.get('severity', 'medium')),
-                    ZeekIncident.detected_at >= since
-                )
-            ).first()
-            
-            return similar
-            
-        except Exception as e:
-            logger.error(f"Erro ao buscar incidente similar: {e}")
-            return None
+        with get_db_session() as db:
+            return self.rollups.hourly_facets(db, datetime.now() - timedelta(hours=hours_ago))
     
     def _apply_auto_block(self, incident: ZeekIncident) -> bool:
         """
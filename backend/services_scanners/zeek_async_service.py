@@ -0,0 +1,164 @@
+"""
+Variante assíncrona do ZeekService para as rotas `async def`.
+
+Busca os logs com um `httpx.AsyncClient` compartilhado (conexões keep-alive com
+o sensor), sem bloquear o event loop, e permite buscar vários tipos de log em
+paralelo (`get_logs_many`) com tempo limite por tipo: um log lento ou
+indisponível vira uma resposta de falha, e os demais são retornados
+normalmente (resultado parcial).
+
+A filtragem e a detecção de incidentes (que podem gravar no banco) reutilizam
+o ZeekService e rodam no threadpool. Com ZEEK_SOURCE=local, a leitura do
+arquivo também roda no threadpool.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from fastapi.concurrency import run_in_threadpool
+
+import config
+from .zeek_models import ZeekLogRequest, ZeekLogResponse
+from .zeek_service import ZeekService
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncZeekService:
+    """Busca assíncrona e concorrente dos logs do Zeek."""
+
+    def __init__(self, service: Optional[ZeekService] = None, timeout: Optional[float] = None,
+                 max_connections: Optional[int] = None):
+        """
+        Args:
+            service: ZeekService usado para configuração, filtros e detecção (cria um se omitido)
+            timeout: Tempo máximo (segundos) para buscar cada tipo de log (usa config.ZEEK_FETCH_TIMEOUT)
+            max_connections: Conexões simultâneas com a API do Zeek (usa config.ZEEK_ASYNC_MAX_CONNECTIONS)
+        """
+        self.service = service or ZeekService()
+        self.timeout = timeout if timeout is not None else config.ZEEK_FETCH_TIMEOUT
+        self.max_connections = max_connections or config.ZEEK_ASYNC_MAX_CONNECTIONS
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Cliente HTTP compartilhado (criado sob demanda, dentro do event loop)."""
+        if self._client is None:
+            headers = {}
+            if self.service.api_token:
+                headers['Authorization'] = f'Bearer {self.service.api_token}'
+            self._client = httpx.AsyncClient(
+                headers=headers,
+                timeout=httpx.Timeout(self.service.timeout, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return self._client
+
+    async def _fetch_logs_http(self, request: ZeekLogRequest) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Equivalente assíncrono de ZeekService._fetch_logs_http."""
+        if not self.service.api_token:
+            return [], "Token de autenticação não configurado"
+
+        params = {
+            'logfile': request.logfile.value,
+            'maxlines': request.maxlines,
+            'mode': 'tail'
+        }
+        response = await self.client.get(f"{self.service.base_url}/alert_data.php", params=params)
+        response.raise_for_status()
+
+        try:
+            json_data = response.json()
+        except ValueError as e:
+            logger.error(f"Erro ao decodificar JSON da resposta Zeek: {e}")
+            return [], f"Erro ao decodificar resposta JSON: {str(e)}"
+
+        if not json_data.get('success', False):
+            return [], json_data.get('error', 'Erro desconhecido da API Zeek')
+        return json_data.get('data', []), None
+
+    async def get_logs(self, request: ZeekLogRequest, timeout: Optional[float] = None) -> ZeekLogResponse:
+        """
+        Busca os logs e detecta incidentes (mesmo retorno de ZeekService.get_logs)
+
+        Nunca lança exceção: falhas e timeouts retornam success=False.
+
+        Args:
+            request: Parâmetros da requisição
+            timeout: Tempo máximo para buscar o log (usa self.timeout se omitido)
+        """
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            if self.service.local_source is not None:
+                fetch = run_in_threadpool(self.service._read_logs_local, request)
+            else:
+                fetch = self._fetch_logs_http(request)
+            logs, error = await asyncio.wait_for(fetch, timeout)
+        except asyncio.TimeoutError:
+            error = f"Tempo limite de {timeout:g}s excedido ao buscar {request.logfile.value}"
+        except httpx.HTTPError as e:
+            error = f"Erro de comunicação com Zeek API: {str(e) or type(e).__name__}"
+        except Exception as e:
+            error = f"Erro interno: {str(e)}"
+
+        if error is not None:
+            logger.warning(f"Falha ao buscar logs {request.logfile.value}: {error}")
+            return ZeekLogResponse(
+                success=False,
+                message=error,
+                log_type=request.logfile,
+                total_lines=0,
+                logs=[],
+                incidents=[]
+            )
+
+        try:
+            return await run_in_threadpool(self.service.build_response, request, logs)
+        except Exception as e:
+            logger.error(f"Erro inesperado ao processar logs do Zeek: {e}")
+            return ZeekLogResponse(
+                success=False,
+                message=f"Erro interno: {str(e)}",
+                log_type=request.logfile,
+                total_lines=0,
+                logs=[],
+                incidents=[]
+            )
+
+    async def get_logs_many(self, requests: List[ZeekLogRequest],
+                            timeout: Optional[float] = None) -> List[ZeekLogResponse]:
+        """
+        Busca vários tipos de log em paralelo
+
+        O tempo total fica limitado ao do tipo mais lento (e a `timeout`), e não
+        à soma das buscas. As respostas seguem a ordem de `requests`; as que
+        falharam têm success=False.
+        """
+        return list(await asyncio.gather(*(self.get_logs(request, timeout) for request in requests)))
+
+    async def aclose(self) -> None:
+        """Fecha as conexões mantidas com a API do Zeek."""
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+
+
+_service: Optional[AsyncZeekService] = None
+
+def get_async_zeek_service(service: Optional[ZeekService] = None) -> AsyncZeekService:
+    """Retorna a instância compartilhada do AsyncZeekService (criada sob demanda)."""
+    global _service
+    if _service is None:
+        _service = AsyncZeekService(service)
+    return _service
+
+async def close_async_zeek_service() -> None:
+    """Fecha o cliente compartilhado (usado no encerramento da aplicação)."""
+    global _service
+    if _service is not None:
+        service, _service = _service, None
+        await service.aclose()
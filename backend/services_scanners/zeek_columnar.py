@@ -0,0 +1,143 @@
+"""
+Detecção vetorizada (NumPy) em lotes de registros do conn.log.
+
+O lote de registros (dicts, no formato do alert_data.php / ZeekLocalSource ou
+já normalizado) é convertido uma vez em colunas:
+- ts, duration: float64
+- orig_bytes, resp_bytes: int64 (ausente = 0)
+- conn_state: códigos categóricos int16 (índice em `states`; -1 = ausente)
+- orig_ip, resp_ip: uint32 (IPv4; 0 para ausente ou IPv6)
+
+As regras de limiar e de pertencimento são avaliadas como operações sobre os
+arrays, e só os índices que casam voltam para o caminho por registro
+(normalização e montagem do ZeekIncident).
+"""
+import socket
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+import config
+
+# Tipos de incidente (mesmos textos de ZeekService._detect_conn_incident)
+HIGH_VOLUME = "High Volume Traffic"
+CONNECTION_FAILED = "Connection Failed"
+
+
+def _number(value: Any) -> float:
+    if isinstance(value, dict):
+        value = value.get('raw')
+    if value is None:
+        return 0.0
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _float_column(values: List[Any]) -> np.ndarray:
+    """Coluna float64; None vira 0."""
+    try:
+        # Conversão em C; None vira NaN
+        column = np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        # Valores fora do padrão (texto não numérico, {"raw", "iso"}): conversão item a item
+        column = np.fromiter((_number(v) for v in values), dtype=np.float64, count=len(values))
+    column[np.isnan(column)] = 0.0
+    return column
+
+
+def _ipv4_to_int(ip: Any) -> int:
+    try:
+        return int.from_bytes(socket.inet_aton(ip), 'big') if isinstance(ip, str) and ip.count('.') == 3 else 0
+    except OSError:
+        return 0
+
+
+def _key(logs: Sequence[Dict[str, Any]], dotted: str) -> str:
+    # Registros brutos usam "id.orig_h"; normalizados, "id_orig_h"
+    return dotted if logs and dotted in logs[0] else dotted.replace('.', '_')
+
+
+def int_to_ipv4(value: int) -> str:
+    """Converte um IPv4 em uint32 de volta para texto."""
+    return socket.inet_ntoa(int(value).to_bytes(4, 'big'))
+
+
+class ConnColumns:
+    """Colunas NumPy de um lote do conn.log."""
+
+    __slots__ = ("size", "ts", "duration", "orig_bytes", "resp_bytes",
+                 "state_codes", "states", "orig_ip", "resp_ip")
+
+    def __init__(self, logs: Sequence[Dict[str, Any]]):
+        """
+        Args:
+            logs: Registros do conn.log (campos com ponto, "id.orig_h", ou normalizados, "id_orig_h")
+        """
+        n = len(logs)
+        self.size = n
+        self.ts = _float_column([ts['raw'] if ts.__class__ is dict else ts for ts in (log.get('ts') for log in logs)])
+        self.duration = _float_column([log.get('duration') for log in logs])
+        self.orig_bytes = _float_column([log.get('orig_bytes') for log in logs]).astype(np.int64)
+        self.resp_bytes = _float_column([log.get('resp_bytes') for log in logs]).astype(np.int64)
+
+        # conn_state como categoria: poucos valores distintos (S0, SF, REJ, ...)
+        states = [log.get('conn_state') for log in logs]
+        self.states: List[str] = [state for state in dict.fromkeys(states) if state is not None]
+        codes = {state: code for code, state in enumerate(self.states)}
+        codes[None] = -1
+        self.state_codes = np.fromiter(map(codes.__getitem__, states), dtype=np.int16, count=n)
+
+        # IPs convertidos uma vez por endereço distinto
+        orig_key, resp_key = _key(logs, 'id.orig_h'), _key(logs, 'id.resp_h')
+        self.orig_ip = self._ip_column([log.get(orig_key) for log in logs])
+        self.resp_ip = self._ip_column([log.get(resp_key) for log in logs])
+
+    @staticmethod
+    def _ip_column(ips: List[Any]) -> np.ndarray:
+        mapping = {ip: _ipv4_to_int(ip) for ip in dict.fromkeys(ips)}
+        return np.fromiter(map(mapping.__getitem__, ips), dtype=np.uint32, count=len(ips))
+
+    def state_mask(self, states: Sequence[str]) -> np.ndarray:
+        """Máscara dos registros cujo conn_state está em `states`."""
+        wanted = [code for code, state in enumerate(self.states) if state in states]
+        if not wanted:
+            return np.zeros(self.size, dtype=bool)
+        return np.isin(self.state_codes, wanted)
+
+
+class ConnMatches:
+    """Índices dos registros que geram incidente, com o tipo de cada um."""
+
+    __slots__ = ("high_volume", "failed")
+
+    def __init__(self, high_volume: np.ndarray, failed: np.ndarray):
+        self.high_volume = high_volume
+        self.failed = failed
+
+    def __len__(self):
+        return len(self.high_volume) + len(self.failed)
+
+    def items(self):
+        """Pares (índice, tipo de incidente) em ordem de índice."""
+        merged = [(int(i), HIGH_VOLUME) for i in self.high_volume]
+        merged.extend((int(i), CONNECTION_FAILED) for i in self.failed)
+        merged.sort()
+        return merged
+
+
+def detect_conn(columns: ConnColumns, high_volume_bytes: Optional[int] = None,
+                failed_states: Optional[Sequence[str]] = None) -> ConnMatches:
+    """
+    Avalia as regras do conn.log sobre as colunas.
+
+    Mesma prioridade de ZeekService._detect_conn_incident: alto volume de
+    tráfego primeiro; conexão falhada para os demais registros.
+    """
+    high_volume_bytes = config.ZEEK_CONN_HIGH_VOLUME_BYTES if high_volume_bytes is None else high_volume_bytes
+    failed_states = config.ZEEK_CONN_FAILED_STATES if failed_states is None else failed_states
+
+    high_volume = (columns.orig_bytes + columns.resp_bytes) > high_volume_bytes
+    failed = columns.state_mask(failed_states) & ~high_volume
+    return ConnMatches(np.flatnonzero(high_volume), np.flatnonzero(failed))
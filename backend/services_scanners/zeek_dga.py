@@ -0,0 +1,227 @@
+"""
+Pontuação de domínios gerados algoritmicamente (DGA) nas consultas do dns.log.
+
+Para cada consulta é avaliado o rótulo registrável (ex: "x7kq2p9zt" em
+"a.x7kq2p9zt.com", ou "exemplo" em "www.exemplo.com.br"):
+- entropia de Shannon dos caracteres (bits);
+- proporção de consoantes entre as letras;
+- verossimilhança média dos bigramas, pela tabela de frequências em
+  dga_bigrams.json (gerada por scripts/generate_dga_bigrams.py).
+
+Os rótulos de um lote são codificados em uma matriz NumPy (um rótulo por
+linha) e as três medidas são calculadas de uma vez para o lote. As pontuações
+ficam em um cache LRU por domínio, de modo que consultas repetidas (a maioria
+do tráfego DNS) não são recalculadas.
+
+Um domínio é considerado DGA quando o rótulo tem pelo menos
+ZEEK_DGA_MIN_LENGTH caracteres, a verossimilhança dos bigramas é menor ou
+igual a ZEEK_DGA_BIGRAM_THRESHOLD e a entropia ou a proporção de consoantes
+passa do respectivo limiar. Rótulos de CDNs e fabricantes conhecidos
+(BENIGN_LABELS e ZEEK_DGA_ALLOWLIST) nunca são considerados DGA: nomes como
+"jsdelivr" ou "bunnycdn" têm poucas vogais e bigramas raros.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+import config
+
+DEFAULT_BIGRAMS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dga_bigrams.json")
+
+# Tamanho máximo de um rótulo DNS
+MAX_LABEL = 63
+# Segundos níveis genéricos sob TLDs de país (ex: exemplo.com.br)
+_GENERIC_SLDS = frozenset({"com", "net", "org", "gov", "edu", "ac", "co", "gob", "mil", "ind", "nom"})
+_VOWELS = frozenset("aeiou")
+# Rótulos registráveis de CDNs, serviços e fabricantes de IoT com cara de DGA pelas medidas
+BENIGN_LABELS = frozenset({
+    "jsdelivr", "bunnycdn", "b-cdn", "cdn77", "cdnjs", "bootstrapcdn", "unpkg", "stackpathdns",
+    "stackpathcdn", "edgecastcdn", "llnwd", "llnwi", "cdngc", "phicdn", "msecnd", "azureedge",
+    "akamaized", "akamaihd", "akamaiedge", "edgekey", "edgesuite", "akadns", "fbcdn", "ytimg",
+    "ggpht", "gvt1", "gvt2", "twimg", "licdn", "sndcdn", "scdn", "lencr", "hs-scripts",
+    "hs-analytics", "hs-banner", "hsforms", "hscollectedforms", "hsadspixel", "mxpnl",
+    "tplinkcloud", "tplinkra", "tuyaus", "tuyaeu", "tuyacn", "tuyain", "ewelink", "xmcsrv",
+})
+
+
+class DgaScore(NamedTuple):
+    """Medidas do rótulo registrável de um domínio."""
+    label: str
+    length: int
+    entropy: float
+    consonant_ratio: float
+    bigram_score: float
+    is_dga: bool
+
+
+def registered_label(query: str) -> Optional[str]:
+    """
+    Extrai o rótulo registrável de um domínio, ou None se o domínio deve ser ignorado
+    (sem ponto, sufixos locais/reversos em ZEEK_DGA_IGNORE_SUFFIXES, rótulos de serviço "_..." e punycode).
+    """
+    labels = [label for label in query.strip().rstrip(".").lower().split(".") if label]
+    if len(labels) < 2 or labels[-1] in config.ZEEK_DGA_IGNORE_SUFFIXES:
+        return None
+    label = labels[-2]
+    if len(labels) >= 3 and len(labels[-1]) == 2 and label in _GENERIC_SLDS:
+        label = labels[-3]
+    if label.startswith("_") or label.startswith("xn--"):
+        # Rótulos de serviço (_dns-sd) e nomes internacionalizados (punycode) não são avaliados
+        return None
+    return label[:MAX_LABEL]
+
+
+class DgaScorer:
+    """Calcula as medidas de DGA em lotes, com cache LRU por domínio."""
+
+    def __init__(self, bigrams_file: Optional[str] = None, cache_size: Optional[int] = None,
+                 min_length: Optional[int] = None, entropy_threshold: Optional[float] = None,
+                 consonant_threshold: Optional[float] = None, bigram_threshold: Optional[float] = None,
+                 allowlist: Optional[Iterable[str]] = None):
+        """
+        Args:
+            bigrams_file: Tabela de bigramas (usa services_scanners/dga_bigrams.json se não especificado)
+            cache_size: Domínios mantidos no cache (usa config.ZEEK_DGA_CACHE_SIZE)
+            min_length: Tamanho mínimo do rótulo para ser avaliado
+            entropy_threshold: Entropia (bits) a partir da qual o rótulo é suspeito
+            consonant_threshold: Proporção de consoantes a partir da qual o rótulo é suspeito
+            bigram_threshold: Verossimilhança média dos bigramas (log10) abaixo da qual o rótulo é suspeito
+            allowlist: Rótulos nunca considerados DGA, além de BENIGN_LABELS (usa config.ZEEK_DGA_ALLOWLIST)
+        """
+        with open(bigrams_file or DEFAULT_BIGRAMS_FILE, encoding="utf-8") as fh:
+            table = json.load(fh)
+        alphabet = table["alphabet"]
+        self.size = len(alphabet)
+        self.logprob = np.array(table["logprob"], dtype=np.float64).reshape(-1)
+        if self.logprob.size != self.size * self.size:
+            raise ValueError(f"Tabela de bigramas inválida: esperado {self.size}x{self.size} valores")
+
+        # Byte -> índice no alfabeto (-1 para caracteres fora dele e para o preenchimento)
+        self._codes = np.full(256, -1, dtype=np.int16)
+        for index, char in enumerate(alphabet):
+            self._codes[ord(char)] = index
+        self._letters = np.array([char.isalpha() for char in alphabet])
+        self._consonants = np.array([char.isalpha() and char not in _VOWELS for char in alphabet])
+
+        self.cache_size = cache_size or config.ZEEK_DGA_CACHE_SIZE
+        self.min_length = min_length or config.ZEEK_DGA_MIN_LENGTH
+        self.entropy_threshold = entropy_threshold if entropy_threshold is not None else config.ZEEK_DGA_ENTROPY_THRESHOLD
+        self.consonant_threshold = consonant_threshold if consonant_threshold is not None else config.ZEEK_DGA_CONSONANT_THRESHOLD
+        self.bigram_threshold = bigram_threshold if bigram_threshold is not None else config.ZEEK_DGA_BIGRAM_THRESHOLD
+        self.allowlist = BENIGN_LABELS | frozenset(
+            label.lower() for label in (allowlist if allowlist is not None else config.ZEEK_DGA_ALLOWLIST)
+        )
+        self._cache: "OrderedDict[str, Optional[DgaScore]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def score(self, query: str) -> Optional[DgaScore]:
+        """Pontua um domínio (None se o domínio é ignorado)."""
+        return self.score_many([query]).get(query)
+
+    def score_many(self, queries: Iterable[str]) -> Dict[str, Optional[DgaScore]]:
+        """
+        Pontua um lote de domínios
+
+        Returns:
+            Domínio -> DgaScore (None para domínios ignorados), sem repetições
+        """
+        result: Dict[str, Optional[DgaScore]] = {}
+        pending: List[str] = []
+        with self._lock:
+            for query in queries:
+                if query in result or not isinstance(query, str):
+                    continue
+                cached = self._cache.get(query, False)
+                if cached is False:
+                    result[query] = None
+                    pending.append(query)
+                else:
+                    self._cache.move_to_end(query)
+                    result[query] = cached
+                    self.hits += 1
+
+        if not pending:
+            return result
+
+        labels = [registered_label(query) for query in pending]
+        scored = [i for i, label in enumerate(labels) if label is not None]
+        scores = self._score_labels([labels[i] for i in scored])
+        for i, score in zip(scored, scores):
+            result[pending[i]] = score
+
+        with self._lock:
+            self.misses += len(pending)
+            for query in pending:
+                self._cache[query] = result[query]
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def _score_labels(self, labels: List[str]) -> List[DgaScore]:
+        """Calcula as medidas de todos os rótulos com operações sobre a matriz do lote."""
+        n = len(labels)
+        if n == 0:
+            return []
+        k = self.size
+        encoded = [label.encode("ascii", "ignore") for label in labels]
+        width = max(1, max(len(label) for label in encoded))
+        # Matriz n x width de bytes (zeros à direita) -> índices no alfabeto (-1 = vazio/fora do alfabeto)
+        matrix = np.array(encoded, dtype=f"S{width}").view(np.uint8).reshape(n, width)
+        codes = self._codes[matrix]
+        valid = codes >= 0
+        lengths = valid.sum(axis=1)
+
+        # Contagem de cada caractere por rótulo
+        rows = np.broadcast_to(np.arange(n)[:, None], codes.shape)
+        counts = np.bincount((rows[valid] * k + codes[valid]), minlength=n * k).reshape(n, k)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            p = counts / np.maximum(lengths, 1)[:, None]
+            entropy = -np.where(p > 0, p * np.log2(p), 0.0).sum(axis=1)
+            letters = counts[:, self._letters].sum(axis=1)
+            consonant_ratio = np.where(letters > 0, counts[:, self._consonants].sum(axis=1) / np.maximum(letters, 1), 0.0)
+
+        # Bigramas com os dois caracteres no alfabeto
+        pairs = valid[:, :-1] & valid[:, 1:]
+        index = np.where(pairs, codes[:, :-1] * k + codes[:, 1:], 0)
+        pair_counts = pairs.sum(axis=1)
+        bigram_score = np.where(pair_counts > 0,
+                                np.where(pairs, self.logprob[index], 0.0).sum(axis=1) / np.maximum(pair_counts, 1),
+                                0.0)
+
+        is_dga = ((lengths >= self.min_length)
+                  & (bigram_score <= self.bigram_threshold)
+                  & ((entropy >= self.entropy_threshold) | (consonant_ratio >= self.consonant_threshold)))
+
+        return [
+            DgaScore(label, int(lengths[i]), round(float(entropy[i]), 4), round(float(consonant_ratio[i]), 4),
+                     round(float(bigram_score[i]), 4), bool(is_dga[i]) and label not in self.allowlist)
+            for i, label in enumerate(labels)
+        ]
+
+    def status(self) -> Dict[str, object]:
+        """Tamanho e aproveitamento do cache."""
+        return {
+            'cache_size': len(self._cache),
+            'max_cache_size': self.cache_size,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+_scorer: Optional[DgaScorer] = None
+_scorer_lock = threading.Lock()
+
+def get_dga_scorer() -> DgaScorer:
+    """Retorna a instância compartilhada do DgaScorer (cache compartilhado entre as consultas)."""
+    global _scorer
+    if _scorer is None:
+        with _scorer_lock:
+            if _scorer is None:
+                _scorer = DgaScorer()
+    return _scorer
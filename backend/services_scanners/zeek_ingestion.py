@@ -0,0 +1,318 @@
+"""
+Worker de ingestão incremental dos logs do Zeek.
+
+Tarefa asyncio iniciada junto com a aplicação (ZEEK_INGESTION_ENABLED=true) que,
+a cada ZEEK_INGESTION_INTERVAL segundos, busca em cada log configurado apenas as
+linhas novas desde o último cursor salvo (tabela zeek_log_cursors), detecta os
+incidentes e os persiste. Com o worker ativo, as rotas de leitura
+(/zeek/incidents, /zeek/stats) consultam o banco em vez de baixar e reanalisar
+os logs a cada requisição.
+
+As chamadas bloqueantes (HTTP para a API do Zeek e banco de dados) rodam no
+threadpool para não ocupar o event loop.
+"""
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
+from sqlalchemy.dialects import mysql, sqlite
+
+import config
+from db.models import ZeekIngestionStat, ZeekLogCursor
+from db.session import get_db_session
+from .incident_rollups import IncidentRollupService
+from .zeek_models import ZeekLogType
+from .zeek_service import ZeekService
+
+logger = logging.getLogger(__name__)
+
+
+def _record_ts(log: Dict[str, Any]) -> Optional[float]:
+    """Extrai o campo ts de um registro (formato {'raw', 'iso'} da API ou número)."""
+    ts = log.get('ts')
+    if isinstance(ts, dict):
+        ts = ts.get('raw')
+    try:
+        return float(ts) if ts is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def load_cursor(logfile: str) -> Optional[Dict[str, Any]]:
+    """Retorna o cursor salvo do log (ou None se ainda não houver)."""
+    with get_db_session() as db:
+        cursor = db.query(ZeekLogCursor).filter(ZeekLogCursor.logfile == logfile).first()
+        return cursor.to_dict() if cursor else None
+
+
+def hourly_lines(logs: List[Dict[str, Any]]) -> Counter:
+    """Conta os registros por hora (local) do timestamp; registros sem ts entram na hora atual."""
+    now = datetime.now().timestamp()
+    minutes = Counter()
+    for log in logs:
+        ts = _record_ts(log)
+        minutes[int((ts if ts is not None else now) // 60)] += 1
+    counts = Counter()
+    for minute, count in minutes.items():
+        counts[datetime.fromtimestamp(minute * 60).replace(minute=0, second=0, microsecond=0)] += count
+    return counts
+
+
+def _add_ingestion_lines(db, logfile: str, lines: Counter) -> None:
+    """Soma as linhas por hora em zeek_ingestion_stats (upsert, sem commit)."""
+    rows = [{'bucket': bucket, 'logfile': logfile, 'lines': count} for bucket, count in lines.items()]
+    if db.get_bind().dialect.name == 'sqlite':
+        stmt = sqlite.insert(ZeekIngestionStat).values(rows)
+        stmt = stmt.on_conflict_do_update(index_elements=['bucket', 'logfile'],
+                                          set_={'lines': ZeekIngestionStat.lines + stmt.excluded.lines})
+    else:
+        stmt = mysql.insert(ZeekIngestionStat).values(rows)
+        stmt = stmt.on_duplicate_key_update(lines=ZeekIngestionStat.lines + stmt.inserted.lines)
+    db.execute(stmt)
+
+
+def save_cursor(logfile: str, lines: Optional[Counter] = None, **fields) -> None:
+    """
+    Cria ou atualiza o cursor do log com os campos informados e, na mesma
+    transação, soma as linhas por hora (`lines`, de hourly_lines) em zeek_ingestion_stats.
+    """
+    increments = {name: fields.pop(name) for name in ('lines_processed', 'incidents_detected', 'rotations') if name in fields}
+    with get_db_session() as db:
+        if lines:
+            _add_ingestion_lines(db, logfile, lines)
+        cursor = db.query(ZeekLogCursor).filter(ZeekLogCursor.logfile == logfile).first()
+        if cursor is None:
+            cursor = ZeekLogCursor(logfile=logfile, offset=0, lines_processed=0, incidents_detected=0, rotations=0)
+            db.add(cursor)
+        for name, value in fields.items():
+            setattr(cursor, name, value)
+        for name, value in increments.items():
+            setattr(cursor, name, (getattr(cursor, name) or 0) + value)
+        db.commit()
+
+
+def list_cursors() -> List[Dict[str, Any]]:
+    """Retorna todos os cursores salvos."""
+    with get_db_session() as db:
+        return [cursor.to_dict() for cursor in db.query(ZeekLogCursor).order_by(ZeekLogCursor.logfile).all()]
+
+
+def lines_since(since: datetime) -> Dict[str, int]:
+    """Linhas processadas por log desde o início da hora de `since`."""
+    bucket = since.replace(minute=0, second=0, microsecond=0)
+    with get_db_session() as db:
+        rows = db.query(ZeekIngestionStat.logfile, func.sum(ZeekIngestionStat.lines)).filter(
+            ZeekIngestionStat.bucket >= bucket
+        ).group_by(ZeekIngestionStat.logfile).all()
+        return {logfile: int(lines or 0) for logfile, lines in rows}
+
+
+class ZeekIngestionWorker:
+    """Consulta periodicamente os logs do Zeek e processa apenas os registros novos."""
+
+    def __init__(
+        self,
+        service: Optional[ZeekService] = None,
+        interval: Optional[float] = None,
+        logfiles: Optional[List[str]] = None,
+        batch_lines: Optional[int] = None,
+        max_batches: Optional[int] = None,
+        start_from: Optional[str] = None,
+    ):
+        """
+        Args:
+            service: Instância do ZeekService (cria uma se omitido)
+            interval: Segundos entre ciclos de consulta
+            logfiles: Logs a acompanhar (ex: ["conn.log", "dns.log"])
+            batch_lines: Linhas buscadas por requisição
+            max_batches: Requisições por log em um ciclo (limita o atraso para alcançar o fim do arquivo)
+            start_from: "end" ou "beginning" para logs ainda sem cursor
+        """
+        self.service = service or ZeekService()
+        self.interval = interval if interval is not None else config.ZEEK_INGESTION_INTERVAL
+        self.log_types = [ZeekLogType(name) for name in (logfiles or config.ZEEK_INGESTION_LOGS)]
+        self.batch_lines = batch_lines or config.ZEEK_INGESTION_BATCH_LINES
+        self.max_batches = max_batches or config.ZEEK_INGESTION_MAX_BATCHES
+        self.start_from = start_from or config.ZEEK_INGESTION_START
+        self._task: Optional[asyncio.Task] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self.cycles = 0
+        self.last_cycle_at: Optional[datetime] = None
+        self.last_cycle_ms: Optional[float] = None
+        self.last_results: Dict[str, Dict[str, Any]] = {}
+        self.rollups = IncidentRollupService()
+        self.last_rollup_prune_at: Optional[datetime] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Inicia a tarefa de ingestão no event loop atual."""
+        if self.running:
+            return
+        self._stop_event = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="zeek-ingestion")
+        logger.info(f"Worker de ingestão do Zeek iniciado (logs: {[t.value for t in self.log_types]}, intervalo: {self.interval}s)")
+
+    async def stop(self) -> None:
+        """Sinaliza a parada e aguarda o ciclo em andamento terminar."""
+        if not self.running:
+            return
+        self._stop_event.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=self.interval + 30)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+        logger.info("Worker de ingestão do Zeek encerrado")
+
+    async def _run(self) -> None:
+        while not self._stop_event.is_set():
+            await self.run_cycle()
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_cycle(self) -> Dict[str, Dict[str, Any]]:
+        """Processa as linhas novas de todos os logs configurados (um ciclo)."""
+        started = asyncio.get_running_loop().time()
+        for log_type in self.log_types:
+            if self._stop_event is not None and self._stop_event.is_set():
+                break
+            try:
+                self.last_results[log_type.value] = await self.poll_log(log_type)
+            except Exception as e:
+                logger.error(f"Erro na ingestão de {log_type.value}: {e}")
+                self.last_results[log_type.value] = {'error': str(e), 'at': datetime.now().isoformat()}
+                try:
+                    await run_in_threadpool(save_cursor, log_type.value, last_polled_at=datetime.now(), last_error=str(e))
+                except Exception as save_error:
+                    logger.error(f"Erro ao registrar falha no cursor de {log_type.value}: {save_error}")
+        # Expiração dos agregados de incidentes (no máximo a cada ZEEK_ROLLUP_PRUNE_INTERVAL segundos)
+        if self.last_rollup_prune_at is None or \
+                (datetime.now() - self.last_rollup_prune_at).total_seconds() >= config.ZEEK_ROLLUP_PRUNE_INTERVAL:
+            try:
+                await run_in_threadpool(self._prune_rollups)
+            except Exception as e:
+                logger.error(f"Erro ao expirar os agregados de incidentes: {e}")
+            self.last_rollup_prune_at = datetime.now()
+        self.cycles += 1
+        self.last_cycle_at = datetime.now()
+        self.last_cycle_ms = round((asyncio.get_running_loop().time() - started) * 1000, 2)
+        return self.last_results
+
+    async def poll_log(self, log_type: ZeekLogType) -> Dict[str, Any]:
+        """
+        Busca e processa as linhas novas de um log a partir do cursor salvo.
+
+        Returns:
+            Resumo do processamento (linhas, incidentes, cursor final)
+        """
+        cursor = await run_in_threadpool(load_cursor, log_type.value)
+
+        if cursor is None and self.start_from == "end":
+            # Primeiro contato: posiciona o cursor no fim do arquivo atual, sem processar o histórico
+            chunk = await run_in_threadpool(self.service.fetch_log_chunk, log_type, None, None, 1)
+            await run_in_threadpool(
+                save_cursor, log_type.value,
+                offset=chunk['next_offset'] or 0, inode=chunk['inode'],
+                last_polled_at=datetime.now(), last_error=None,
+            )
+            return {'lines': 0, 'incidents': 0, 'offset': chunk['next_offset'], 'initialized': True}
+
+        offset = cursor['offset'] if cursor else 0
+        inode = cursor['inode'] if cursor else None
+        total_lines = 0
+        total_incidents = 0
+        rotated = False
+
+        for _ in range(self.max_batches):
+            chunk = await run_in_threadpool(self.service.fetch_log_chunk, log_type, offset, inode, self.batch_lines)
+            logs = chunk['logs']
+            if chunk['rotated']:
+                rotated = True
+                logger.info(f"Rotação detectada em {log_type.value}: lendo o novo arquivo desde o início")
+
+            incidents = await run_in_threadpool(self.service.analyze_logs, logs, log_type) if logs else []
+
+            last = logs[-1] if logs else {}
+            offset = chunk['next_offset'] if chunk['next_offset'] is not None else offset
+            inode = chunk['inode']
+            fields = {
+                'offset': offset,
+                'inode': inode,
+                'lines_processed': len(logs),
+                'incidents_detected': len(incidents),
+                'last_polled_at': datetime.now(),
+                'last_error': None,
+            }
+            if chunk['rotated']:
+                fields['rotations'] = 1
+            if logs:
+                fields['last_ts'] = _record_ts(last)
+                fields['last_uid'] = last.get('uid')
+                fields['lines'] = hourly_lines(logs)
+            # Cursor salvo a cada lote: uma falha no lote seguinte não reprocessa este
+            await run_in_threadpool(save_cursor, log_type.value, **fields)
+
+            total_lines += len(logs)
+            total_incidents += len(incidents)
+            if len(logs) < self.batch_lines:
+                break
+
+        if total_lines:
+            logger.info(f"Ingestão {log_type.value}: {total_lines} linhas novas, {total_incidents} incidentes")
+        return {'lines': total_lines, 'incidents': total_incidents, 'offset': offset, 'rotated': rotated}
+
+    def _prune_rollups(self) -> Dict[str, int]:
+        """Remove os agregados de incidentes e as linhas por hora fora da retenção."""
+        with get_db_session() as db:
+            removed = self.rollups.prune(db)
+            removed['ingestion'] = db.query(ZeekIngestionStat).filter(
+                ZeekIngestionStat.bucket < datetime.now() - self.rollups.hour_retention
+            ).delete(synchronize_session=False)
+            db.commit()
+            return removed
+
+    def status(self) -> Dict[str, Any]:
+        """Estado do worker (sem consultar o banco)."""
+        return {
+            'enabled': config.ZEEK_INGESTION_ENABLED,
+            'running': self.running,
+            'interval_s': self.interval,
+            'logfiles': [t.value for t in self.log_types],
+            'batch_lines': self.batch_lines,
+            'cycles': self.cycles,
+            'last_cycle_at': self.last_cycle_at.isoformat() if self.last_cycle_at else None,
+            'last_cycle_ms': self.last_cycle_ms,
+            'last_results': self.last_results,
+            'last_rollup_prune_at': self.last_rollup_prune_at.isoformat() if self.last_rollup_prune_at else None,
+        }
+
+
+_worker: Optional[ZeekIngestionWorker] = None
+
+def get_ingestion_worker() -> ZeekIngestionWorker:
+    """Retorna a instância compartilhada do worker (criada sob demanda)."""
+    global _worker
+    if _worker is None:
+        _worker = ZeekIngestionWorker()
+    return _worker
+
+def start_ingestion_worker() -> Optional[ZeekIngestionWorker]:
+    """Inicia o worker se ZEEK_INGESTION_ENABLED estiver ativo (usado no startup)."""
+    if not config.ZEEK_INGESTION_ENABLED:
+        return None
+    worker = get_ingestion_worker()
+    worker.start()
+    return worker
+
+async def stop_ingestion_worker() -> None:
+    """Encerra o worker, se estiver em execução (usado no shutdown)."""
+    if _worker is not None:
+        await _worker.stop()
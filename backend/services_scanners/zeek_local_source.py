@@ -0,0 +1,286 @@
+"""
+Leitura direta dos logs do Zeek no próprio sensor (sem passar pelo alert_data.php).
+
+Quando o backend roda no mesmo host do Zeek (ZEEK_SOURCE=local), os logs são lidos
+de ZEEK_LOG_DIR (padrão /usr/local/spool/zeek) via mmap, evitando o ciclo
+PHP (TSV -> array -> JSON) + HTTP + json.loads do Python.
+
+Os registros têm exatamente o formato retornado pelo alert_data.php:
+- o cabeçalho #fields/#types define as colunas;
+- "-" e "(empty)" viram None;
+- count/port -> int, double -> float, time -> {"raw": float, "iso": "..."},
+  set[enum]/set[string] -> lista; demais tipos permanecem como texto.
+
+Logs em formato JSON (LogAscii::use_json=T) também são aceitos: cada linha é
+decodificada e o campo "ts" numérico é convertido para {"raw", "iso"}.
+
+Os modos de leitura e os metadados (next_offset, inode, rotated, file_size)
+seguem o alert_data.php, de modo que o cursor do worker de ingestão funciona
+com as duas fontes.
+"""
+import json
+import mmap
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import config
+from .zeek_models import ZeekLogType
+
+# Mesma lista de logs permitidos do alert_data.php (impede leitura de outros arquivos)
+VALID_LOGS = {log_type.value for log_type in ZeekLogType} | {'reporter.log'}
+
+_NULL_VALUES = ('-', '(empty)')
+
+
+def _to_int(value: str) -> int:
+    # Equivalente ao (int) do PHP: prefixo numérico ou 0
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return int(float(value))
+        except ValueError:
+            return 0
+
+
+def _to_float(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return 0.0
+
+
+def _to_time(value: Union[str, float]) -> Dict[str, Any]:
+    raw = _to_float(value) if isinstance(value, str) else float(value)
+    return {'raw': raw, 'iso': datetime.fromtimestamp(int(raw), timezone.utc).isoformat()}
+
+
+def _to_set(value: str) -> List[str]:
+    return [item.strip() for item in value.split(',')]
+
+
+_CONVERTERS: Dict[str, Callable[[str], Any]] = {
+    'count': _to_int,
+    'port': _to_int,
+    'double': _to_float,
+    'time': _to_time,
+    'set[enum]': _to_set,
+    'set[string]': _to_set,
+}
+
+
+class ZeekLocalSource:
+    """Lê os logs do Zeek diretamente do diretório de spool do sensor."""
+
+    def __init__(self, log_dir: Optional[str] = None):
+        """
+        Args:
+            log_dir: Diretório dos logs correntes do Zeek (usa config.ZEEK_LOG_DIR se não especificado)
+        """
+        self.log_dir = log_dir or config.ZEEK_LOG_DIR
+        # Cabeçalho por arquivo (dispositivo, inode): só muda quando o log é rotacionado
+        self._headers: Dict[Tuple[int, int], Tuple[List[str], List[Optional[Callable]]]] = {}
+        self._headers_lock = threading.Lock()
+
+    def _path(self, logfile: Union[ZeekLogType, str]) -> str:
+        name = logfile.value if isinstance(logfile, ZeekLogType) else logfile
+        if name not in VALID_LOGS:
+            raise ValueError(f"Log inválido: {name}")
+        return os.path.join(self.log_dir, name)
+
+    def _header(self, mm: Optional[mmap.mmap], st: os.stat_result) -> Tuple[List[str], List[Optional[Callable]]]:
+        """Lê #fields e #types do início do arquivo (em cache por inode)."""
+        key = (st.st_dev, st.st_ino)
+        with self._headers_lock:
+            cached = self._headers.get(key)
+        if cached is not None and cached[0]:
+            return cached
+
+        fields: List[str] = []
+        types: List[str] = []
+        pos = 0
+        while mm is not None and pos < len(mm) and mm[pos:pos + 1] == b'#':
+            nl = mm.find(b'\n', pos)
+            if nl == -1:
+                break  # cabeçalho ainda incompleto
+            line = mm[pos:nl].rstrip(b'\r').decode('utf-8', errors='replace')
+            if line.startswith('#fields'):
+                fields = line[8:].split('\t')
+            elif line.startswith('#types'):
+                types = line[7:].split('\t')
+            pos = nl + 1
+
+        converters = [_CONVERTERS.get(types[i]) if i < len(types) else None for i in range(len(fields))]
+        header = (fields, converters)
+        with self._headers_lock:
+            if len(self._headers) > 64:
+                self._headers.clear()
+            self._headers[key] = header
+        return header
+
+    @staticmethod
+    def _parse_line(line: bytes, fields: List[str], converters: List[Optional[Callable]]) -> Optional[Dict[str, Any]]:
+        """Converte uma linha de dados em dict; None para comentários/linhas inválidas."""
+        if not line or line[:1] == b'#':
+            return None
+        text = line.decode('utf-8', errors='replace')
+
+        if not fields:
+            # Log em JSON (sem cabeçalho TSV)
+            if text[:1] != '{':
+                return None
+            try:
+                row = json.loads(text)
+            except ValueError:
+                return None
+            if isinstance(row.get('ts'), (int, float)):
+                row['ts'] = _to_time(row['ts'])
+            return row
+
+        cols = text.split('\t')
+        n_cols = len(cols)
+        row = {}
+        for i, field in enumerate(fields):
+            value = cols[i] if i < n_cols else None
+            if value is None or value in _NULL_VALUES:
+                row[field] = None
+                continue
+            convert = converters[i]
+            row[field] = convert(value) if convert is not None else value
+        return row
+
+    @staticmethod
+    def _tail_lines(mm: mmap.mmap, maxlines: int) -> Tuple[List[bytes], int]:
+        """
+        Últimas `maxlines` linhas de dados, percorrendo o mapeamento do fim para o início.
+
+        Returns:
+            (linhas em ordem cronológica, posição após a última linha completa)
+        """
+        end = mm.rfind(b'\n')
+        if end == -1:
+            return [], 0  # nenhuma linha completa (a última pode estar sendo escrita)
+        lines = []
+        pos = end
+        while pos >= 0 and len(lines) < maxlines:
+            start = mm.rfind(b'\n', 0, pos) + 1
+            line = mm[start:pos].rstrip(b'\r')
+            if line and line[:1] != b'#':
+                lines.append(line)
+            pos = start - 1
+        lines.reverse()
+        return lines, end + 1
+
+    def iter_records(self, logfile: Union[ZeekLogType, str], maxlines: int = 50,
+                     offset: Optional[int] = None, inode: Optional[int] = None,
+                     mode: str = 'tail', meta: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Gera os registros do log sob demanda (mesmos modos do alert_data.php)
+
+        Args:
+            logfile: Tipo de log
+            maxlines: Número máximo de registros
+            offset: Cursor em bytes; se informado, lê para frente a partir dele
+            inode: Inode do arquivo quando o cursor foi gravado (detecta rotação)
+            mode: "tail" (últimas linhas) ou "head" (primeiras linhas), quando sem offset
+            meta: Dict opcional preenchido com next_offset, inode, file_size e rotated
+                  (next_offset só é final após o fim da iteração)
+
+        Yields:
+            Registros do log, em ordem cronológica
+
+        Raises:
+            ValueError: Log ou modo inválido
+            FileNotFoundError: Log não encontrado
+        """
+        if mode not in ('tail', 'head'):
+            raise ValueError(f"Modo inválido: {mode}")
+        maxlines = max(1, min(int(maxlines), 100000))
+        path = self._path(logfile)
+        meta = meta if meta is not None else {}
+
+        with open(path, 'rb') as fh:
+            st = os.fstat(fh.fileno())
+            size = st.st_size
+            # mmap não aceita arquivo vazio (log recém-rotacionado)
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+            try:
+                fields, converters = self._header(mm, st)
+
+                rotated = False
+                start_offset = None
+                if offset is not None:
+                    start_offset = int(offset)
+                    # Rotação (inode diferente) ou truncamento: recomeça do início do arquivo atual
+                    if (inode is not None and int(inode) != st.st_ino) or start_offset > size:
+                        rotated = True
+                        start_offset = 0
+                    mode = 'offset'
+                meta.update({
+                    'mode': mode,
+                    'offset': start_offset,
+                    'inode': st.st_ino,
+                    'file_size': size,
+                    'rotated': rotated,
+                    'next_offset': 0,
+                })
+                if mm is None:
+                    return
+
+                parse = self._parse_line
+                if mode == 'tail':
+                    lines, meta['next_offset'] = self._tail_lines(mm, maxlines)
+                    for line in lines:
+                        row = parse(line, fields, converters)
+                        if row is not None:
+                            yield row
+                    return
+
+                # head / offset: leitura para frente, apenas linhas completas
+                pos = start_offset if mode == 'offset' else 0
+                meta['next_offset'] = pos
+                count = 0
+                while count < maxlines:
+                    nl = mm.find(b'\n', pos)
+                    if nl == -1:
+                        break  # linha ainda sendo escrita
+                    line = mm[pos:nl].rstrip(b'\r')
+                    pos = nl + 1
+                    meta['next_offset'] = pos
+                    row = parse(line, fields, converters)
+                    if row is not None:
+                        count += 1
+                        yield row
+            finally:
+                if mm is not None:
+                    mm.close()
+
+    def read_logs(self, logfile: Union[ZeekLogType, str], maxlines: int = 50) -> List[Dict[str, Any]]:
+        """Últimas `maxlines` linhas do log (equivalente ao modo tail do alert_data.php)."""
+        return list(self.iter_records(logfile, maxlines=maxlines))
+
+    def fetch_chunk(self, logfile: Union[ZeekLogType, str], offset: Optional[int] = None,
+                    inode: Optional[int] = None, maxlines: int = 5000) -> Dict[str, Any]:
+        """
+        Trecho do log a partir de um cursor em bytes (mesmo retorno de ZeekService.fetch_log_chunk)
+        """
+        meta: Dict[str, Any] = {}
+        logs = list(self.iter_records(logfile, maxlines=maxlines, offset=offset, inode=inode, meta=meta))
+        return {
+            'logs': logs,
+            'next_offset': meta['next_offset'],
+            'inode': meta['inode'],
+            'rotated': meta['rotated'],
+            'file_size': meta['file_size'],
+        }
+
+    def test_access(self) -> Tuple[bool, str]:
+        """Verifica se o diretório de logs está acessível."""
+        if not os.path.isdir(self.log_dir):
+            return False, f"Diretório de logs do Zeek não encontrado: {self.log_dir}"
+        if not os.access(self.log_dir, os.R_OK | os.X_OK):
+            return False, f"Sem permissão de leitura em {self.log_dir}"
+        available = sorted(name for name in VALID_LOGS if os.path.exists(os.path.join(self.log_dir, name)))
+        return True, f"Leitura local dos logs do Zeek em {self.log_dir} ({len(available)} logs disponíveis)"
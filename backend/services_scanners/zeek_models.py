@@ -32,6 +32,7 @@ class ZeekIncidentStatus(str, Enum):
     INVESTIGATING = "investigating"
     RESOLVED = "resolved"
     FALSE_POSITIVE = "false_positive"
+    ESCALATED = "escalated"
 
 
 class ZeekHttpLog(BaseModel):
@@ -134,6 +135,9 @@ class ZeekIncident(BaseModel):
     status: ZeekIncidentStatus = Field(default=ZeekIncidentStatus.NEW, description="Status atual")
     raw_log_data: Optional[Dict[str, Any]] = Field(default=None, description="Dados brutos do log")
     zeek_log_type: ZeekLogType = Field(description="Tipo de log do Zeek")
+    occurrence_count: int = Field(default=1, description="Ocorrências agrupadas no incidente")
+    first_seen: Optional[datetime] = Field(default=None, description="Primeira ocorrência")
+    last_seen: Optional[datetime] = Field(default=None, description="Última ocorrência")
     created_at: Optional[datetime] = Field(default=None, description="Quando foi criado no sistema")
     updated_at: Optional[datetime] = Field(default=None, description="Última atualização")
 
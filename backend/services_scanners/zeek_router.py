@@ -4,10 +4,19 @@ Roteador FastAPI para endpoints do Zeek
 import logging
 from typing import List, Optional
 from datetime import datetime, timedelta
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 
+import config
 from .zeek_service import ZeekService
+from .zeek_async_service import AsyncZeekService, get_async_zeek_service
+from .incident_service import IncidentService, stats_cache
+from db.pagination import NEXT_CURSOR_HEADER, CursorError
+from .zeek_ingestion import get_ingestion_worker, lines_since, list_cursors
+from .zeek_rules import get_rule_engine
+from .zeek_stream_detectors import get_beacon_detector, get_scan_detector
+from .zeek_dga import get_dga_scorer
 from .zeek_models import (
     ZeekLogType, ZeekLogRequest, ZeekLogResponse, 
     ZeekIncident, ZeekSeverity, ZeekIncidentStatus
@@ -27,13 +36,42 @@ def get_zeek_service() -> ZeekService:
     return zeek_service
 
 
+def get_async_service() -> AsyncZeekService:
+    """Dependency para obter a instância compartilhada do AsyncZeekService"""
+    return get_async_zeek_service(zeek_service)
+
+
+def _db_incident_to_model(incident) -> ZeekIncident:
+    """
+    Converte um incidente do banco (db.models.ZeekIncident) no modelo da API.
+    O log original não é incluído na listagem (fica em zeek_incident_raw_logs).
+    """
+    return ZeekIncident(
+        id=incident.id,
+        device_name=incident.device_name,
+        device_ip=incident.device_ip,
+        incident_type=incident.incident_type,
+        severity=ZeekSeverity(incident.severity.value),
+        action_taken=incident.action_taken,
+        description=incident.description,
+        detected_at=incident.detected_at,
+        status=ZeekIncidentStatus(incident.status.value),
+        zeek_log_type=ZeekLogType(incident.zeek_log_type.value),
+        occurrence_count=incident.occurrence_count or 1,
+        first_seen=incident.first_seen,
+        last_seen=incident.last_seen,
+        created_at=incident.created_at,
+        updated_at=incident.updated_at,
+    )
+
+
 @router.get("/health", summary="Verifica saúde da API Zeek")
 async def health_check(service: ZeekService = Depends(get_zeek_service)):
     """
     Verifica se a API do Zeek está respondendo
     """
     try:
-        success, message = service.test_connection()
+        success, message = await run_in_threadpool(service.test_connection)
         
         return JSONResponse(
             status_code=200 if success else 503,
@@ -61,7 +99,7 @@ async def get_logs(
     maxlines: int = Query(10, ge=1, le=1000, description="Número máximo de linhas"),
     filter_ip: Optional[str] = Query(None, description="Filtrar por IP específico"),
     hours_ago: Optional[int] = Query(None, ge=1, le=168, description="Buscar logs das últimas N horas"),
-    service: ZeekService = Depends(get_zeek_service)
+    service: AsyncZeekService = Depends(get_async_service)
 ):
     """
     Busca logs do Zeek Network Monitor
@@ -89,8 +127,8 @@ async def get_logs(
             end_time=end_time
         )
         
-        # Busca os logs
-        response = service.get_logs(request)
+        # Busca os logs (sem bloquear o event loop)
+        response = await service.get_logs(request)
         
         return response
         
@@ -104,13 +142,16 @@ async def get_logs(
 
 @router.get("/incidents", response_model=List[ZeekIncident], summary="Lista incidentes detectados")
 async def get_incidents(
+    response: Response,
     logfile: Optional[ZeekLogType] = Query(None, description="Filtrar por tipo de log"),
     severity: Optional[ZeekSeverity] = Query(None, description="Filtrar por severidade"),
     status: Optional[ZeekIncidentStatus] = Query(None, description="Filtrar por status"),
     device_ip: Optional[str] = Query(None, description="Filtrar por IP do dispositivo"),
     hours_ago: int = Query(24, ge=1, le=168, description="Buscar incidentes das últimas N horas"),
     maxlines: int = Query(50, ge=1, le=1000, description="Número máximo de logs a analisar"),
-    service: ZeekService = Depends(get_zeek_service)
+    limit: int = Query(500, ge=1, le=5000, description="Máximo de incidentes retornados (com ingestão ativa)"),
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página (com ingestão ativa)"),
+    service: AsyncZeekService = Depends(get_async_service)
 ):
     """
     Lista incidentes de segurança detectados nos logs do Zeek
@@ -120,8 +161,41 @@ async def get_incidents(
     - **status**: Filtrar por status do incidente
     - **device_ip**: Filtrar por IP do dispositivo
     - **hours_ago**: Buscar incidentes das últimas N horas
-    - **maxlines**: Número máximo de logs a analisar por tipo
+    - **maxlines**: Número máximo de logs a analisar por tipo (sem ingestão ativa)
+    - **limit**: Máximo de incidentes retornados (com ingestão ativa)
+    - **cursor**: Cursor da próxima página (com ingestão ativa), devolvido no
+      cabeçalho X-Next-Cursor
+    
+    Com o worker de ingestão ativo (ZEEK_INGESTION_ENABLED), os incidentes são
+    lidos do banco; caso contrário os logs são baixados em paralelo e analisados
+    na hora. Se algum tipo de log falhar ou exceder ZEEK_FETCH_TIMEOUT, os
+    incidentes dos demais são retornados e o cabeçalho X-Zeek-Failed-Logs lista
+    os tipos que faltaram.
     """
+    if config.ZEEK_INGESTION_ENABLED:
+        try:
+            page = await run_in_threadpool(
+                IncidentService().get_incidents,
+                device_ip=device_ip,
+                severity=severity.value if severity else None,
+                status=status.value if status else None,
+                log_type=logfile.value if logfile else None,
+                hours_ago=hours_ago,
+                limit=limit,
+                cursor=cursor,
+            )
+            if page.next_cursor:
+                response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+            return [_db_incident_to_model(incident) for incident in page.items]
+        except CursorError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            logger.error(f"Erro ao buscar incidentes no banco: {e}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Erro interno ao buscar incidentes: {str(e)}"
+            )
+    
     try:
         all_incidents = []
         
@@ -137,27 +211,26 @@ async def get_incidents(
         end_time = datetime.now()
         start_time = end_time - timedelta(hours=hours_ago)
         
-        # Analisa cada tipo de log
-        for log_type in log_types_to_analyze:
-            try:
-                request = ZeekLogRequest(
-                    logfile=log_type,
-                    maxlines=maxlines,
-                    filter_ip=device_ip,
-                    start_time=start_time,
-                    end_time=end_time
-                )
-                
-                response = service.get_logs(request)
-                
-                if response.success:
-                    all_incidents.extend(response.incidents)
-                else:
-                    logger.warning(f"Falha ao analisar logs {log_type.value}: {response.message}")
-                    
-            except Exception as e:
-                logger.error(f"Erro ao analisar logs {log_type.value}: {e}")
-                continue
+        # Busca e analisa os tipos de log em paralelo
+        requests = [
+            ZeekLogRequest(
+                logfile=log_type,
+                maxlines=maxlines,
+                filter_ip=device_ip,
+                start_time=start_time,
+                end_time=end_time
+            )
+            for log_type in log_types_to_analyze
+        ]
+        failed_logs = []
+        for log_response in await service.get_logs_many(requests):
+            if log_response.success:
+                all_incidents.extend(log_response.incidents)
+            else:
+                failed_logs.append(log_response.log_type.value)
+        
+        if failed_logs:
+            response.headers["X-Zeek-Failed-Logs"] = ",".join(failed_logs)
         
         # Aplica filtros
         filtered_incidents = all_incidents
@@ -198,82 +271,103 @@ async def get_log_types(service: ZeekService = Depends(get_zeek_service)):
 
 @router.get("/stats", summary="Estatísticas dos logs")
 async def get_stats(
-    hours_ago: int = Query(24, ge=1, le=168, description="Período para estatísticas"),
-    service: ZeekService = Depends(get_zeek_service)
+    hours_ago: int = Query(24, ge=1, le=168, description="Período para estatísticas")
 ):
     """
     Retorna estatísticas dos logs do Zeek
+    
+    Calculadas a partir do banco, sem buscar nem reanalisar os logs: linhas
+    processadas pelo worker de ingestão (zeek_ingestion_stats) e incidentes
+    por tipo de log, severidade e IP (agregados por hora mantidos na gravação
+    dos incidentes). O período começa no início da hora ("since") e o
+    resultado fica em cache por config.ZEEK_INCIDENT_STATS_TTL segundos.
     """
     try:
-        stats = {
-            "period_hours": hours_ago,
-            "timestamp": datetime.now().isoformat(),
-            "log_types": {},
-            "incidents_by_severity": {
-                "low": 0,
-                "medium": 0,
-                "high": 0,
-                "critical": 0
-            },
-            "top_affected_ips": {},
-            "total_incidents": 0
-        }
-        
-        # Calcula timestamps
-        end_time = datetime.now()
-        start_time = end_time - timedelta(hours=hours_ago)
-        
-        # Analisa cada tipo de log
-        for log_type in [ZeekLogType.HTTP, ZeekLogType.DNS, ZeekLogType.CONN]:
-            try:
-                request = ZeekLogRequest(
-                    logfile=log_type,
-                    maxlines=100,  # Amostra para estatísticas
-                    start_time=start_time,
-                    end_time=end_time
-                )
-                
-                response = service.get_logs(request)
-                
-                if response.success:
-                    stats["log_types"][log_type.value] = {
-                        "total_logs": response.total_lines,
-                        "incidents": len(response.incidents)
-                    }
-                    
-                    # Conta incidentes por severidade
-                    for incident in response.incidents:
-                        severity_key = incident.severity.value
-                        stats["incidents_by_severity"][severity_key] += 1
-                        stats["total_incidents"] += 1
-                        
-                        # Conta IPs mais afetados
-                        ip = incident.device_ip
-                        if ip not in stats["top_affected_ips"]:
-                            stats["top_affected_ips"][ip] = 0
-                        stats["top_affected_ips"][ip] += 1
-                        
-            except Exception as e:
-                logger.error(f"Erro ao calcular stats para {log_type.value}: {e}")
-                stats["log_types"][log_type.value] = {
-                    "total_logs": 0,
-                    "incidents": 0,
-                    "error": str(e)
-                }
-        
-        # Ordena IPs mais afetados
-        sorted_ips = sorted(
-            stats["top_affected_ips"].items(), 
-            key=lambda x: x[1], 
-            reverse=True
-        )[:10]  # Top 10
-        stats["top_affected_ips"] = dict(sorted_ips)
-        
-        return stats
-        
+        return await run_in_threadpool(_stats_from_database, hours_ago)
     except Exception as e:
         logger.error(f"Erro ao calcular estatísticas: {e}")
         raise HTTPException(
             status_code=500,
             detail=f"Erro interno: {str(e)}"
         )
+
+
+def _stats_from_database(hours_ago: int) -> dict:
+    """
+    Estatísticas de /stats a partir das linhas ingeridas e dos agregados por hora
+    (a janela começa no início da hora de `hours_ago` horas atrás).
+    """
+    key = ('zeek_stats', hours_ago)
+    cached = stats_cache.get(key)
+    if cached is not None:
+        return cached
+    generation = stats_cache.generation()
+    
+    db_stats = IncidentService().get_hourly_stats(hours_ago)
+    lines = lines_since(datetime.fromisoformat(db_stats['since']))
+    log_type_stats = db_stats['log_type_stats']
+    severity_stats = db_stats['severity_stats']
+    stats = {
+        "period_hours": hours_ago,
+        "since": db_stats['since'],
+        "timestamp": datetime.now().isoformat(),
+        "source": "database",
+        "log_types": {
+            log_type.value: {
+                "total_logs": lines.get(log_type.value, 0),
+                "incidents": log_type_stats.get(log_type.value, 0)
+            }
+            for log_type in [ZeekLogType.HTTP, ZeekLogType.DNS, ZeekLogType.CONN]
+        },
+        "incidents_by_severity": {
+            key: severity_stats.get(key, 0) for key in ("low", "medium", "high", "critical")
+        },
+        "top_affected_ips": {item['ip']: item['count'] for item in db_stats['top_ips']},
+        "total_incidents": db_stats['total_incidents'],
+        "total_occurrences": db_stats['total_occurrences']
+    }
+    stats_cache.put(key, stats, generation)
+    return stats
+
+
+@router.get("/ingestion/status", summary="Estado do worker de ingestão do Zeek")
+async def get_ingestion_status():
+    """
+    Retorna o estado do worker de ingestão incremental, dos detectores com estado
+    alimentados por ele e os cursores salvos (posição em bytes, inode, último
+    registro e contadores) de cada log.
+    """
+    try:
+        cursors = await run_in_threadpool(list_cursors)
+    except Exception as e:
+        logger.error(f"Erro ao consultar cursores de ingestão: {e}")
+        cursors = []
+    return {
+        "worker": get_ingestion_worker().status(),
+        "detectors": {
+            "conn_scan": get_scan_detector().status(),
+            "beacon": get_beacon_detector().status(),
+            "dga": get_dga_scorer().status(),
+        },
+        "cursors": cursors
+    }
+
+@router.get("/rules", summary="Regras de detecção carregadas")
+async def get_detection_rules():
+    """
+    Retorna o arquivo de regras em uso, a versão, as regras carregadas por tipo
+    de log, o último erro de carga (se houver) e os acertos de cada regra.
+    """
+    return get_rule_engine().status()
+
+@router.post("/rules/reload", summary="Recarrega as regras de detecção")
+async def reload_detection_rules():
+    """
+    Relê o arquivo de regras imediatamente (sem esperar a verificação periódica).
+    Um arquivo inválido é rejeitado e as regras anteriores continuam ativas.
+    """
+    engine = get_rule_engine()
+    loaded = await run_in_threadpool(engine.reload, True)
+    if not loaded:
+        raise HTTPException(status_code=400, detail=f"Regras não recarregadas: {engine.last_error}")
+    return engine.status()
@@ -0,0 +1,420 @@
+"""
+Motor de regras de detecção de incidentes nos logs do Zeek.
+
+As regras ficam em um arquivo JSON (ZEEK_RULES_FILE, padrão
+services_scanners/detection_rules.json) e são compiladas na carga:
+
+- Para cada log, as regras são avaliadas em ordem; a primeira cujas condições
+  forem todas verdadeiras gera o incidente (mesma semântica dos if/elif
+  anteriores do ZeekService).
+- Operadores: contains (substrings, sem diferenciar maiúsculas), regex,
+  gt/gte/lt/lte/eq (numéricos, opcionalmente sobre o tamanho do texto ou a
+  contagem de um caractere), in (conjunto de valores) e present.
+- Campos testados só com contains viram uma sequência de `in` sobre o valor
+  (minúsculo calculado uma vez por registro), mais rápida que uma expressão
+  regular para poucos textos. Nos campos com regex (ou com muitos textos),
+  todos os padrões do campo são combinados em uma única expressão regular,
+  executada uma vez por registro. Em ambos os casos os padrões de cada regra
+  só são testados quando o filtro do campo casa.
+- As regras de cada log são convertidas em uma função Python gerada na carga
+  (sem interpretar a estrutura das regras a cada registro).
+- O arquivo é relido automaticamente quando a data de modificação muda
+  (verificada no máximo a cada ZEEK_RULES_RELOAD_INTERVAL segundos). Um arquivo
+  inválido é ignorado e as regras anteriores continuam ativas.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "detection_rules.json")
+
+_SEVERITIES = ("low", "medium", "high", "critical")
+_NUMERIC_OPS = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<=", "eq": "=="}
+_PATTERN_OPS = ("contains", "regex")
+_TEMPLATE_FIELD = re.compile(r"\{(\w+)(?:\|([^}]*))?\}")
+# Acima deste número de textos contains em um campo, usa a expressão regular combinada
+_LITERAL_CHAIN_MAX = 32
+
+
+class RuleError(ValueError):
+    """Regra inválida no arquivo de regras."""
+
+
+class RuleMatch:
+    """Resultado da avaliação: regra que casou e textos do incidente já formatados."""
+
+    __slots__ = ("rule_id", "incident_type", "severity", "description", "device_ip")
+
+    def __init__(self, rule_id: str, incident_type: str, severity: str, description: str, device_ip: str):
+        self.rule_id = rule_id
+        self.incident_type = incident_type
+        self.severity = severity
+        self.description = description
+        self.device_ip = device_ip
+
+    def __repr__(self):
+        return f"<RuleMatch(rule='{self.rule_id}', type='{self.incident_type}', severity='{self.severity}')>"
+
+
+class _Template:
+    """Texto com {campo} e {campo|padrão}, convertido na carga em uma função que monta o texto."""
+
+    __slots__ = ("render",)
+
+    def __init__(self, template: str):
+        # Partes: texto literal e, para cada campo, o valor do registro (ou o padrão se vazio)
+        lines = ["def _render(log):", "    get = log.get"]
+        parts = []
+        position = 0
+        for match in _TEMPLATE_FIELD.finditer(template):
+            if match.start() > position:
+                parts.append(repr(template[position:match.start()]))
+            var = f"v{len(lines)}"
+            lines.append(f"    {var} = get({match.group(1)!r})")
+            lines.append(f"    {var} = {(match.group(2) or '')!r} if {var} is None or {var} == '' else str({var})")
+            parts.append(var)
+            position = match.end()
+        if position < len(template):
+            parts.append(repr(template[position:]))
+        lines.append(f"    return {' + '.join(parts) or repr('')}")
+        namespace: Dict[str, Any] = {}
+        exec(compile("\n".join(lines), "<detection_rules>", "exec"), namespace)
+        self.render: Callable[[Dict[str, Any]], str] = namespace["_render"]
+
+
+class _Condition:
+    """Condição validada sobre um campo do registro."""
+
+    __slots__ = ("field", "op", "spec", "source", "target", "literals")
+
+    def __init__(self, spec: Dict[str, Any], rule_id: str):
+        try:
+            self.field = spec["field"]
+            self.op = spec["op"]
+        except KeyError as e:
+            raise RuleError(f"Regra '{rule_id}': condição sem {e}")
+        self.spec = spec
+        self.source = None  # Expressão regular (contains/regex), usada no filtro combinado do campo
+        self.target = "raw"  # Valor testado: "raw" (original) ou "lower" (minúsculo, calculado uma vez)
+        self.literals = None  # Textos de contains, já no caso comparado (teste com `in`)
+        op = self.op
+
+        if op == "contains":
+            patterns = spec.get("patterns") or []
+            if not patterns or not all(isinstance(p, str) and p for p in patterns):
+                raise RuleError(f"Regra '{rule_id}': 'contains' exige 'patterns' (textos não vazios)")
+            if spec.get("case_sensitive"):
+                self.literals = tuple(dict.fromkeys(patterns))
+            else:
+                # Comparação no valor já minúsculo (sem (?i) na expressão regular)
+                self.literals = tuple(dict.fromkeys(p.lower() for p in patterns))
+                self.target = "lower"
+            self.source = "|".join(re.escape(p) for p in self.literals)
+        elif op == "regex":
+            if not isinstance(spec.get("pattern"), str):
+                raise RuleError(f"Regra '{rule_id}': 'regex' exige 'pattern'")
+            self.source = spec["pattern"] if spec.get("case_sensitive") else f"(?i:{spec['pattern']})"
+        elif op in _NUMERIC_OPS:
+            value = spec.get("value")
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise RuleError(f"Regra '{rule_id}': '{op}' exige 'value' numérico")
+            measure = spec.get("measure")
+            if measure not in (None, "length", "count"):
+                raise RuleError(f"Regra '{rule_id}': 'measure' desconhecida '{measure}'")
+            if measure == "count" and not (isinstance(spec.get("char"), str) and spec["char"]):
+                raise RuleError(f"Regra '{rule_id}': 'measure': 'count' exige 'char'")
+        elif op == "in":
+            if not isinstance(spec.get("values"), list):
+                raise RuleError(f"Regra '{rule_id}': 'in' exige a lista 'values'")
+        elif op != "present":
+            raise RuleError(f"Regra '{rule_id}': operador desconhecido '{op}'")
+
+        if self.source is not None:
+            try:
+                re.compile(self.source)
+            except re.error as e:
+                raise RuleError(f"Regra '{rule_id}': expressão inválida ({e})")
+
+
+class _Rule:
+    """Regra validada: condições (E lógico) e modelos do incidente."""
+
+    __slots__ = ("id", "conditions", "incident_type", "severity", "descriptions")
+
+    def __init__(self, spec: Dict[str, Any], index: int):
+        self.id = spec.get("id") or f"rule_{index}"
+        conditions = spec.get("conditions") or []
+        if not conditions:
+            raise RuleError(f"Regra '{self.id}': sem condições")
+        self.conditions = [_Condition(c, self.id) for c in conditions]
+        incident_type = spec.get("incident_type")
+        if not isinstance(incident_type, str) or not incident_type:
+            raise RuleError(f"Regra '{self.id}': sem 'incident_type'")
+        self.incident_type = _Template(incident_type)
+        self.severity = spec.get("severity", "medium")
+        if self.severity not in _SEVERITIES:
+            raise RuleError(f"Regra '{self.id}': severidade inválida '{self.severity}'")
+        description = spec.get("description") or incident_type
+        self.descriptions = [_Template(d) for d in ([description] if isinstance(description, str) else description)]
+
+
+class _RuleSet:
+    """
+    Regras de um tipo de log compiladas em uma única função Python.
+
+    A função gerada lê cada campo usado uma vez, aplica o filtro de cada campo
+    textual uma vez (sequência de `in` ou expressão regular combinada) e testa
+    as regras em ordem, retornando o índice da primeira satisfeita (-1 se
+    nenhuma). Os padrões individuais só são testados quando o filtro do campo
+    casa; um campo com uma só condição usa o resultado do filtro diretamente.
+    """
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.rules = [_Rule(rule, i) for i, rule in enumerate(spec.get("rules", []))]
+        self.device_ip_fields = spec.get("device_ip_fields") or ["id_orig_h"]
+        self.device_ip_default = spec.get("device_ip_default", "unknown")
+        self.match = self._compile()
+        self.device_ip = self._compile_device_ip()
+
+    def _compile(self) -> Callable[[Dict[str, Any]], int]:
+        namespace: Dict[str, Any] = {"_NUM": (int, float)}
+        fields: Dict[str, str] = {}
+        sources: Dict[Tuple[str, str], List[str]] = {}
+        literals: Dict[Tuple[str, str], List[str]] = {}
+
+        def const(value: Any) -> str:
+            name = f"_k{len(namespace)}"
+            namespace[name] = value
+            return name
+
+        for rule in self.rules:
+            for condition in rule.conditions:
+                if condition.field not in fields:
+                    fields[condition.field] = f"f{len(fields)}"
+                if condition.source is not None:
+                    group = (condition.field, condition.target)
+                    items = sources.setdefault(group, [])
+                    if condition.source not in items:
+                        items.append(condition.source)
+                    if condition.literals is None:
+                        literals[group] = None
+                    elif literals.get(group, []) is not None:
+                        texts = literals.setdefault(group, [])
+                        texts.extend(t for t in condition.literals if t not in texts)
+        # Campos só com contains (e poucos textos) usam `in`; os demais, a expressão combinada
+        chains = {group for group, texts in literals.items() if texts is not None and len(texts) <= _LITERAL_CHAIN_MAX}
+
+        def chain(texts, value: str) -> str:
+            return "(" + " or ".join(f"{t!r} in {value}" for t in texts) + ")"
+
+        lines = ["def _match(log):"]
+        getter = "log.get"
+        if len(fields) > 2:
+            lines.append("    get = log.get")
+            getter = "get"
+        numeric = set()
+        for field, var in fields.items():
+            lines.append(f"    {var} = {getter}({field!r})")
+        for (field, target), items in sources.items():
+            var = fields[field]
+            value = var
+            if (field, target) in chains:
+                # Campo ausente ou não textual: texto vazio (nenhum `in` casa)
+                value = f"l{var}" if target == "lower" else f"s{var}"
+                convert = f"{var}.lower()" if target == "lower" else var
+                lines.append(f"    {value} = {convert} if {var}.__class__ is str else ''")
+                if len(items) > 1:
+                    lines.append(f"    p{value} = {chain(literals[(field, target)], value)}")
+                continue
+            if target == "lower":
+                value = f"l{var}"
+                lines.append(f"    {value} = {var}.lower() if {var}.__class__ is str else None")
+            prefilter = const(re.compile("|".join(f"(?:{s})" for s in items)).search)
+            lines.append(f"    p{value} = {value}.__class__ is str and {prefilter}({value}) is not None")
+
+        def expression(condition: _Condition) -> str:
+            var = fields[condition.field]
+            spec = condition.spec
+            op = condition.op
+            if condition.source is not None:
+                group = (condition.field, condition.target)
+                if group in chains:
+                    value = f"l{var}" if condition.target == "lower" else f"s{var}"
+                else:
+                    value = f"l{var}" if condition.target == "lower" else var
+                if group in chains and sources[group] == [condition.source]:
+                    # Só esta condição usa o campo: os textos são testados na própria regra
+                    return chain(condition.literals, value)
+                if sources[group] == [condition.source]:
+                    return f"p{value}"
+                if group in chains:
+                    return f"(p{value} and {chain(condition.literals, value)})"
+                return f"(p{value} and {const(re.compile(condition.source).search)}({value}) is not None)"
+            if op in _NUMERIC_OPS:
+                symbol = _NUMERIC_OPS[op]
+                threshold = const(spec["value"])
+                if spec.get("measure") == "length":
+                    return f"({var}.__class__ is str and len({var}) {symbol} {threshold})"
+                if spec.get("measure") == "count":
+                    return f"({var}.__class__ is str and {var}.count({const(spec['char'])}) {symbol} {threshold})"
+                numeric.add(var)
+                # bool é subclasse de int, mas não é um valor numérico do log
+                return f"(n{var} is not None and n{var} {symbol} {threshold})"
+            if op == "in":
+                if spec.get("ignore_case"):
+                    values = const(frozenset(str(v).lower() for v in spec["values"]))
+                    return f"({var}.__class__ is str and {var}.lower() in {values})"
+                values = const(frozenset(v for v in spec["values"] if not isinstance(v, (list, dict))))
+                return f"(isinstance({var}, (str, int, float)) and {var} in {values})"
+            return f"({var} is not None and {var} != '')"
+
+        tests = []
+        for index, rule in enumerate(self.rules):
+            tests.append(f"    if {' and '.join(expression(c) for c in rule.conditions)}:")
+            tests.append(f"        return {index}")
+        for var in sorted(numeric):
+            lines.append(f"    n{var} = {var} if {var}.__class__ in _NUM else None")
+        lines.extend(tests)
+        lines.append("    return -1")
+
+        exec(compile("\n".join(lines), "<detection_rules>", "exec"), namespace)
+        return namespace["_match"]
+
+    def _compile_device_ip(self) -> Callable[[Dict[str, Any]], str]:
+        """IP do dispositivo: primeiro campo preenchido de device_ip_fields (ou o padrão)."""
+        candidates = " or ".join(f"get({field!r})" for field in self.device_ip_fields)
+        namespace: Dict[str, Any] = {"_DEFAULT": self.device_ip_default}
+        code = f"def _device_ip(log):\n    get = log.get\n    return {candidates} or _DEFAULT"
+        exec(compile(code, "<detection_rules>", "exec"), namespace)
+        return namespace["_device_ip"]
+
+
+class DetectionRuleEngine:
+    """Carrega, compila e avalia as regras de detecção, com recarga automática."""
+
+    def __init__(self, path: Optional[str] = None, reload_interval: Optional[float] = None):
+        """
+        Args:
+            path: Arquivo JSON de regras (usa config.ZEEK_RULES_FILE se não especificado)
+            reload_interval: Intervalo mínimo, em segundos, entre verificações do arquivo
+        """
+        self.path = path or config.ZEEK_RULES_FILE or DEFAULT_RULES_FILE
+        self.reload_interval = reload_interval if reload_interval is not None else config.ZEEK_RULES_RELOAD_INTERVAL
+        self._rulesets: Dict[str, _RuleSet] = {}
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.version = None
+        self.loaded_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.reloads = 0
+        self.hits: Dict[str, int] = {}
+        self.reload(force=True)
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Relê o arquivo se ele mudou (ou sempre, com `force`).
+
+        Returns:
+            True se novas regras foram carregadas
+        """
+        with self._lock:
+            mtime = None
+            try:
+                mtime = os.path.getmtime(self.path)
+                if not force and mtime == self._mtime:
+                    return False
+                with open(self.path, encoding="utf-8") as fh:
+                    spec = json.load(fh)
+                rulesets = {log_type: _RuleSet(rules) for log_type, rules in (spec.get("logs") or {}).items()}
+            except (OSError, ValueError, TypeError, AttributeError) as e:
+                # Mantém as regras atuais; o erro fica visível em status(). A mesma versão
+                # inválida do arquivo não é relida até ser alterada de novo
+                if mtime is not None:
+                    self._mtime = mtime
+                if str(e) != self.last_error:
+                    logger.error(f"Erro ao carregar regras de detecção de {self.path}: {e}")
+                self.last_error = str(e)
+                return False
+            self._rulesets = rulesets
+            self._mtime = mtime
+            self.version = spec.get("version")
+            self.loaded_at = time.time()
+            self.last_error = None
+            self.reloads += 1
+            self.hits = {}
+        logger.info(f"Regras de detecção carregadas de {self.path}: "
+                    f"{sum(len(r.rules) for r in rulesets.values())} regras em {len(rulesets)} logs")
+        return True
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.reload_interval
+        self.reload()
+
+    def handles(self, log_type: str) -> bool:
+        """Se há regras carregadas para o tipo de log."""
+        return log_type in self._rulesets
+
+    def evaluate(self, log_type: str, log: Dict[str, Any]) -> Optional[RuleMatch]:
+        """
+        Avalia um registro (já normalizado pelo ZeekService) contra as regras do tipo de log.
+
+        Returns:
+            RuleMatch da primeira regra satisfeita ou None
+        """
+        if time.monotonic() >= self._next_check:
+            self._maybe_reload()
+        ruleset = self._rulesets.get(log_type)
+        if ruleset is None:
+            return None
+        index = ruleset.match(log)
+        if index < 0:
+            return None
+        rule = ruleset.rules[index]
+        hits = self.hits
+        hits[rule.id] = hits.get(rule.id, 0) + 1
+        if len(rule.descriptions) == 1:
+            description = rule.descriptions[0].render(log)
+        else:
+            # Primeira descrição que não fique vazia com os campos do registro
+            for template in rule.descriptions:
+                description = template.render(log)
+                if description.strip():
+                    break
+        return RuleMatch(rule.id, rule.incident_type.render(log), rule.severity, description, ruleset.device_ip(log))
+
+    def status(self) -> Dict[str, Any]:
+        """Arquivo, versão, regras carregadas por log e contagem de acertos por regra."""
+        return {
+            "path": self.path,
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+            "logs": {log_type: [rule.id for rule in ruleset.rules] for log_type, ruleset in self._rulesets.items()},
+            "hits": dict(self.hits),
+        }
+
+
+_engine: Optional[DetectionRuleEngine] = None
+_engine_lock = threading.Lock()
+
+def get_rule_engine() -> DetectionRuleEngine:
+    """Retorna a instância compartilhada do motor de regras (criada sob demanda)."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = DetectionRuleEngine()
+    return _engine
@@ -14,27 +14,45 @@ from .zeek_models import (
     ZeekLogRequest, ZeekLogResponse, ZeekHttpLog, ZeekDnsLog, ZeekConnLog
 )
 from .incident_service import IncidentService
+from .zeek_local_source import ZeekLocalSource
+from .zeek_rules import DetectionRuleEngine, RuleMatch, get_rule_engine
+from .zeek_columnar import CONNECTION_FAILED, HIGH_VOLUME, ConnColumns, detect_conn
+from .zeek_stream_detectors import get_beacon_detector, get_scan_detector
+from .zeek_dga import DgaScore, get_dga_scorer
 
 logger = logging.getLogger(__name__)
 
+# Nome de cada log avaliado pelo motor de regras (ZeekLogType.value é lento no laço por registro)
+_RULE_LOG_NAMES = {log_type: log_type.value for log_type in ZeekLogType if log_type is not ZeekLogType.CONN}
+_SEVERITIES = {severity.value: severity for severity in ZeekSeverity}
+
 
 class ZeekService:
     """Serviço para comunicação com API do Zeek"""
     
-    def __init__(self, zeek_api_base_url: Optional[str] = None, api_token: Optional[str] = None):
+    def __init__(self, zeek_api_base_url: Optional[str] = None, api_token: Optional[str] = None,
+                 source: Optional[str] = None, rule_engine: Optional[DetectionRuleEngine] = None):
         """
         Inicializa o serviço Zeek
         
         Args:
             zeek_api_base_url: URL base da API do Zeek (usa config se não especificado)
             api_token: Token de autenticação (usa config se não especificado)
+            source: "http" (API do Zeek) ou "local" (leitura direta dos logs); usa config.ZEEK_SOURCE se não especificado
+            rule_engine: Motor de regras de detecção (usa a instância compartilhada se não especificado)
         """
         self.base_url = (zeek_api_base_url or config.ZEEK_API_URL or "http://192.168.100.1/zeek-api").rstrip('/')
         self.api_token = api_token or config.ZEEK_API_TOKEN
         self.timeout = 30
         self.incident_service = IncidentService()
-        
-        if not self.api_token:
+        self.source = (source or config.ZEEK_SOURCE).lower()
+        self.local_source = ZeekLocalSource() if self.source == "local" else None
+        self.rule_engine = rule_engine or get_rule_engine()
+        self.scan_detector = get_scan_detector()
+        self.beacon_detector = get_beacon_detector()
+        self.dga_scorer = get_dga_scorer()
+        
+        if self.local_source is None and not self.api_token:
             logger.warning("Token de autenticação do Zeek não configurado. Configure ZEEK_API_TOKEN no .env")
         
     def get_logs(self, request: ZeekLogRequest) -> ZeekLogResponse:
@@ -48,84 +66,22 @@ class ZeekService:
             Resposta com os logs e incidentes detectados
         """
         try:
-            # Verifica se o token está configurado
-            if not self.api_token:
-                return ZeekLogResponse(
-                    success=False,
-                    message="Token de autenticação não configurado",
-                    log_type=request.logfile,
-                    total_lines=0,
-                    logs=[],
-                    incidents=[]
-                )
-            
-            # Monta os parâmetros da URL
-            params = {
-                'logfile': request.logfile.value,
-                'maxlines': request.maxlines
-            }
-            
-            # Configura headers de autenticação
-            headers = {
-                'Authorization': f'Bearer {self.api_token}',
-                'Content-Type': 'application/json'
-            }
-            
-            # Faz a requisição para a API do Zeek
-            url = f"{self.base_url}/alert_data.php"
-            logger.info(f"Fazendo requisição para Zeek API: {url} com params: {params}")
-            
-            response = requests.get(url, params=params, headers=headers, timeout=self.timeout)
-            response.raise_for_status()
-            
-            # Processa a resposta JSON
-            try:
-                json_data = response.json()
-            except json.JSONDecodeError as e:
-                logger.error(f"Erro ao decodificar JSON da resposta Zeek: {e}")
-                return ZeekLogResponse(
-                    success=False,
-                    message=f"Erro ao decodificar resposta JSON: {str(e)}",
-                    log_type=request.logfile,
-                    total_lines=0,
-                    logs=[],
-                    incidents=[]
-                )
-            
-            # Verifica se a API retornou erro
-            if not json_data.get('success', False):
-                error_msg = json_data.get('error', 'Erro desconhecido da API Zeek')
+            if self.local_source is not None:
+                # Leitura direta do spool do Zeek (backend no próprio sensor)
+                logs, error = self._read_logs_local(request)
+            else:
+                logs, error = self._fetch_logs_http(request)
+            if error is not None:
                 return ZeekLogResponse(
                     success=False,
-                    message=error_msg,
+                    message=error,
                     log_type=request.logfile,
                     total_lines=0,
                     logs=[],
                     incidents=[]
                 )
             
-            # Extrai os dados dos logs
-            logs = json_data.get('data', [])
-            
-            # Filtra por IP se especificado
-            if request.filter_ip:
-                logs = self._filter_logs_by_ip(logs, request.filter_ip)
-            
-            # Filtra por tempo se especificado
-            if request.start_time or request.end_time:
-                logs = self._filter_logs_by_time(logs, request.start_time, request.end_time)
-            
-            # Analisa logs para detectar incidentes
-            incidents = self._analyze_logs_for_incidents(logs, request.logfile)
-            
-            return ZeekLogResponse(
-                success=True,
-                message=f"Logs recuperados com sucesso ({len(logs)} registros)",
-                log_type=request.logfile,
-                total_lines=len(logs),
-                logs=logs,
-                incidents=incidents
-            )
+            return self.build_response(request, logs)
             
         except requests.exceptions.RequestException as e:
             logger.error(f"Erro ao buscar logs do Zeek: {e}")
@@ -148,6 +104,178 @@ class ZeekService:
                 incidents=[]
             )
     
+    def _fetch_logs_http(self, request: ZeekLogRequest) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Busca as últimas linhas do log pela API do Zeek (alert_data.php)
+        
+        Args:
+            request: Parâmetros da requisição
+            
+        Returns:
+            Tupla (logs, mensagem de erro ou None)
+            
+        Raises:
+            requests.exceptions.RequestException: Falha de comunicação com a API
+        """
+        # Verifica se o token está configurado
+        if not self.api_token:
+            return [], "Token de autenticação não configurado"
+        
+        # Monta os parâmetros da URL
+        params = {
+            'logfile': request.logfile.value,
+            'maxlines': request.maxlines,
+            'mode': 'tail'  # Linhas mais recentes (lidas do fim do arquivo)
+        }
+        
+        # Configura headers de autenticação
+        headers = {
+            'Authorization': f'Bearer {self.api_token}',
+            'Content-Type': 'application/json'
+        }
+        
+        # Faz a requisição para a API do Zeek
+        url = f"{self.base_url}/alert_data.php"
+        logger.info(f"Fazendo requisição para Zeek API: {url} com params: {params}")
+        
+        response = requests.get(url, params=params, headers=headers, timeout=self.timeout)
+        response.raise_for_status()
+        
+        # Processa a resposta JSON
+        try:
+            json_data = response.json()
+        except json.JSONDecodeError as e:
+            logger.error(f"Erro ao decodificar JSON da resposta Zeek: {e}")
+            return [], f"Erro ao decodificar resposta JSON: {str(e)}"
+        
+        # Verifica se a API retornou erro
+        if not json_data.get('success', False):
+            return [], json_data.get('error', 'Erro desconhecido da API Zeek')
+        
+        # Extrai os dados dos logs
+        return json_data.get('data', []), None
+    
+    def build_response(self, request: ZeekLogRequest, logs: List[Dict[str, Any]]) -> ZeekLogResponse:
+        """
+        Aplica os filtros da requisição aos logs já obtidos e detecta os incidentes
+        
+        Compartilhado com o AsyncZeekService, que busca os logs de forma assíncrona.
+        
+        Args:
+            request: Parâmetros da requisição
+            logs: Logs brutos obtidos da fonte (API ou leitura local)
+            
+        Returns:
+            Resposta com os logs filtrados e incidentes detectados
+        """
+        # Filtra por IP se especificado
+        if request.filter_ip:
+            logs = self._filter_logs_by_ip(logs, request.filter_ip)
+        
+        # Filtra por tempo se especificado
+        if request.start_time or request.end_time:
+            logs = self._filter_logs_by_time(logs, request.start_time, request.end_time)
+        
+        # Analisa logs para detectar incidentes. Com o worker de ingestão ativo,
+        # os incidentes já são persistidos por ele: aqui apenas são exibidos
+        incidents = self._analyze_logs_for_incidents(
+            logs, request.logfile, persist=not config.ZEEK_INGESTION_ENABLED
+        )
+        
+        return ZeekLogResponse(
+            success=True,
+            message=f"Logs recuperados com sucesso ({len(logs)} registros)",
+            log_type=request.logfile,
+            total_lines=len(logs),
+            logs=logs,
+            incidents=incidents
+        )
+    
+    def _read_logs_local(self, request: ZeekLogRequest) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Lê as últimas linhas do log diretamente do spool do Zeek (ZEEK_SOURCE=local)
+        
+        Args:
+            request: Parâmetros da requisição
+            
+        Returns:
+            Tupla (logs, mensagem de erro ou None)
+        """
+        try:
+            return self.local_source.read_logs(request.logfile, request.maxlines), None
+        except FileNotFoundError:
+            return [], f"Log não encontrado em {self.local_source.log_dir}: {request.logfile.value}"
+        except (OSError, ValueError) as e:
+            logger.error(f"Erro ao ler log local do Zeek: {e}")
+            return [], f"Erro ao ler log local do Zeek: {str(e)}"
+    
+    def fetch_log_chunk(self, logfile: ZeekLogType, offset: Optional[int] = None,
+                        inode: Optional[int] = None, maxlines: int = 5000) -> Dict[str, Any]:
+        """
+        Busca um trecho do log a partir de um cursor em bytes (leitura incremental)
+        
+        Sem `offset`, retorna as últimas `maxlines` linhas (modo tail); o
+        `next_offset` retornado pode ser usado como cursor das chamadas seguintes.
+        
+        Args:
+            logfile: Tipo de log
+            offset: Posição (bytes) logo após a última linha já processada
+            inode: Inode do arquivo quando o cursor foi gravado (detecta rotação)
+            maxlines: Número máximo de linhas do trecho
+            
+        Returns:
+            Dict com logs, next_offset, inode, rotated e file_size
+            
+        Raises:
+            requests.exceptions.RequestException: Falha de comunicação com a API
+            ValueError: Token não configurado ou erro retornado pela API
+            OSError: Falha de leitura do log (ZEEK_SOURCE=local)
+        """
+        if self.local_source is not None:
+            return self.local_source.fetch_chunk(logfile, offset, inode, maxlines)
+        
+        if not self.api_token:
+            raise ValueError("Token de autenticação do Zeek não configurado")
+        
+        params = {'logfile': logfile.value, 'maxlines': maxlines}
+        if offset is None:
+            params['mode'] = 'tail'
+        else:
+            params['offset'] = offset
+            if inode is not None:
+                params['inode'] = inode
+        headers = {'Authorization': f'Bearer {self.api_token}'}
+        
+        response = requests.get(f"{self.base_url}/alert_data.php", params=params, headers=headers, timeout=self.timeout)
+        response.raise_for_status()
+        json_data = response.json()
+        if not json_data.get('success', False):
+            raise ValueError(json_data.get('error', 'Erro desconhecido da API Zeek'))
+        
+        return {
+            'logs': json_data.get('data', []),
+            'next_offset': json_data.get('next_offset'),
+            'inode': json_data.get('inode'),
+            'rotated': bool(json_data.get('rotated', False)),
+            'file_size': json_data.get('file_size'),
+        }
+    
+    def analyze_logs(self, logs: List[Dict[str, Any]], log_type: ZeekLogType,
+                     persist: bool = True, stream: bool = True) -> List[ZeekIncident]:
+        """
+        Detecta incidentes em uma lista de logs já obtida (usado pelo worker de ingestão)
+        
+        Args:
+            logs: Lista de logs brutos
+            log_type: Tipo de log
+            persist: Se os incidentes detectados devem ser salvos no banco
+            stream: Se os logs alimentam os detectores com estado (somente linhas novas)
+            
+        Returns:
+            Lista de incidentes detectados
+        """
+        return self._analyze_logs_for_incidents(logs, log_type, persist=persist, stream=stream)
+    
     def _normalize_log_fields(self, log: Dict[str, Any]) -> Dict[str, Any]:
         """
         Normaliza campos do log para formato consistente
@@ -242,30 +370,54 @@ class ZeekService:
         return filtered_logs
     
     def _analyze_logs_for_incidents(self, logs: List[Dict[str, Any]], 
-                                  log_type: ZeekLogType) -> List[ZeekIncident]:
+                                  log_type: ZeekLogType, persist: bool = True,
+                                  stream: bool = False) -> List[ZeekIncident]:
         """
         Analisa logs para detectar possíveis incidentes de segurança
         
         Args:
             logs: Lista de logs
             log_type: Tipo de log
+            persist: Se os incidentes detectados devem ser salvos no banco
+            stream: Se os logs alimentam os detectores com estado (varreduras, força bruta, beaconing).
+                Só o worker de ingestão usa, pois as rotas releem as mesmas linhas a cada consulta
             
         Returns:
             Lista de incidentes detectados
         """
         incidents = []
+        to_save = []
         
-        for log in logs:
-            normalized = self._normalize_log_fields(log)
-            incident = self._detect_incident_in_log(normalized, log_type)
-            if incident:
-                incidents.append(incident)
-                # Salva automaticamente no banco de dados
-                try:
-                    self._save_incident_to_database(incident, normalized)
-                except Exception as e:
-                    logger.error(f"Erro ao salvar incidente no banco de dados: {e}")
-                    # Continua o processamento mesmo se houver erro ao salvar
+        if log_type == ZeekLogType.CONN and len(logs) >= config.ZEEK_COLUMNAR_MIN_BATCH:
+            detected = self._detect_conn_incidents_batch(logs)
+        else:
+            detected = []
+            # dns.log: domínios do lote pontuados de uma vez (DGA), usados quando nenhuma regra casa
+            dga_scores = self._score_dns_queries(logs) if log_type == ZeekLogType.DNS else None
+            for log in logs:
+                normalized = self._normalize_log_fields(log)
+                incident = self._detect_incident_in_log(normalized, log_type)
+                if incident is None and dga_scores:
+                    incident = self._detect_dga_incident(normalized, dga_scores)
+                if incident:
+                    detected.append((incident, normalized))
+        
+        if stream and log_type == ZeekLogType.CONN:
+            detected.extend(self.scan_detector.process(logs))
+            detected.extend(self.beacon_detector.process(logs))
+        
+        for incident, normalized in detected:
+            incidents.append(incident)
+            if persist:
+                to_save.append((incident, normalized))
+        
+        # Salva automaticamente no banco de dados, em lote
+        if to_save:
+            try:
+                self._save_incidents_to_database(to_save)
+            except Exception as e:
+                logger.error(f"Erro ao salvar incidentes no banco de dados: {e}")
+                # Os incidentes detectados são retornados mesmo se houver erro ao salvar
         
         return incidents
     
@@ -281,6 +433,13 @@ class ZeekService:
         Returns:
             Incidente detectado ou None
         """
+        # HTTP, DNS e notice usam as regras de detection_rules.json; os métodos
+        # _detect_*_incident continuam como alternativa se o arquivo não tiver o log
+        name = _RULE_LOG_NAMES.get(log_type)
+        if name is not None and self.rule_engine.handles(name):
+            match = self.rule_engine.evaluate(name, log)
+            return self._incident_from_rule(match, log, log_type) if match else None
+
         if log_type == ZeekLogType.HTTP:
             return self._detect_http_incident(log)
         elif log_type == ZeekLogType.DNS:
@@ -292,6 +451,34 @@ class ZeekService:
         
         return None
     
+    def _incident_from_rule(self, match: RuleMatch, log: Dict[str, Any],
+                            log_type: ZeekLogType) -> ZeekIncident:
+        """
+        Monta o incidente a partir da regra que casou
+        
+        Args:
+            match: Resultado do motor de regras
+            log: Log avaliado
+            log_type: Tipo de log
+            
+        Returns:
+            Incidente
+        """
+        ts = log.get('ts')
+        if isinstance(ts, dict) and 'raw' in ts:
+            ts = ts['raw']
+        
+        return ZeekIncident(
+            device_ip=match.device_ip,
+            incident_type=match.incident_type,
+            severity=_SEVERITIES[match.severity],
+            description=match.description,
+            detected_at=datetime.fromtimestamp(float(ts)) if isinstance(ts, (int, float)) else datetime.now(),
+            status=ZeekIncidentStatus.NEW,
+            raw_log_data=log,
+            zeek_log_type=log_type
+        )
+    
     def _detect_http_incident(self, log: Dict[str, Any]) -> Optional[ZeekIncident]:
         """
         Detecta incidentes em logs HTTP
@@ -383,7 +570,7 @@ class ZeekService:
         Returns:
             Incidente ou None
         """
-        query = log.get('query', '').lower()
+        query = (log.get('query') or '').lower()
         if not query:
             return None
         
@@ -393,12 +580,8 @@ class ZeekService:
             # Adicione mais domínios conhecidamente maliciosos
         ]
         
-        # Verifica DGA (Domain Generation Algorithm) patterns
-        if len(query) > 20 and query.count('.') > 3:
-            severity = ZeekSeverity.MEDIUM
-            incident_type = "Possible DGA Domain"
-            description = f"Possível domínio gerado algoritmicamente: {query}"
-        elif any(domain in query for domain in suspicious_domains):
+        # Padrões DGA (Domain Generation Algorithm) são avaliados em lote por _detect_dga_incident
+        if any(domain in query for domain in suspicious_domains):
             severity = ZeekSeverity.HIGH
             incident_type = "Malicious Domain Query"
             description = f"Query para domínio malicioso: {query}"
@@ -419,6 +602,54 @@ class ZeekService:
             zeek_log_type=ZeekLogType.DNS
         )
     
+    def _score_dns_queries(self, logs: List[Dict[str, Any]]) -> Dict[str, Optional[DgaScore]]:
+        """
+        Pontua (DGA) os domínios consultados em um lote do dns.log
+        
+        Args:
+            logs: Lista de logs DNS brutos
+            
+        Returns:
+            Domínio -> DgaScore (None para domínios ignorados)
+        """
+        try:
+            return self.dga_scorer.score_many(log.get('query') for log in logs if log.get('query'))
+        except Exception as e:
+            logger.error(f"Erro ao pontuar domínios DNS (DGA): {e}")
+            return {}
+    
+    def _detect_dga_incident(self, log: Dict[str, Any],
+                             scores: Dict[str, Optional[DgaScore]]) -> Optional[ZeekIncident]:
+        """
+        Gera o incidente de DGA para um log DNS cujo domínio foi pontuado como suspeito
+        
+        Args:
+            log: Log DNS normalizado
+            scores: Pontuações do lote (_score_dns_queries)
+            
+        Returns:
+            Incidente ou None
+        """
+        query = log.get('query')
+        score = scores.get(query) if query else None
+        if score is None or not score.is_dga:
+            return None
+        
+        ts = log.get('ts', datetime.now().timestamp())
+        
+        return ZeekIncident(
+            device_ip=log.get('id_orig_h', 'unknown'),
+            incident_type="Possible DGA Domain",
+            severity=ZeekSeverity.MEDIUM,
+            description=(f"Possível domínio gerado algoritmicamente: {query} "
+                         f"(entropia {score.entropy:.2f}, consoantes {score.consonant_ratio:.2f}, "
+                         f"bigramas {score.bigram_score:.2f})"),
+            detected_at=datetime.fromtimestamp(ts) if isinstance(ts, (int, float)) else datetime.now(),
+            status=ZeekIncidentStatus.NEW,
+            raw_log_data=log,
+            zeek_log_type=ZeekLogType.DNS
+        )
+    
     def _detect_conn_incident(self, log: Dict[str, Any]) -> Optional[ZeekIncident]:
         """
         Detecta incidentes em logs de conexão
@@ -432,22 +663,54 @@ class ZeekService:
         # Verifica conexões com volumes anômalos de dados
         orig_bytes = log.get('orig_bytes', 0) or 0
         resp_bytes = log.get('resp_bytes', 0) or 0
-        total_bytes = orig_bytes + resp_bytes
         
-        # Limiar para considerar tráfego suspeito (100MB)
-        if total_bytes > 100 * 1024 * 1024:
-            severity = ZeekSeverity.MEDIUM
-            incident_type = "High Volume Traffic"
-            description = f"Alto volume de tráfego detectado: {total_bytes / (1024*1024):.2f} MB"
+        if orig_bytes + resp_bytes > config.ZEEK_CONN_HIGH_VOLUME_BYTES:
+            return self._conn_incident(log, HIGH_VOLUME)
         
         # Verifica conexões falhadas
-        conn_state = log.get('conn_state', '')
-        if conn_state in ['REJ', 'RSTO', 'RSTR']:
-            severity = ZeekSeverity.LOW
-            incident_type = "Connection Failed"
-            description = f"Conexão falhada com estado: {conn_state}"
+        if log.get('conn_state', '') in config.ZEEK_CONN_FAILED_STATES:
+            return self._conn_incident(log, CONNECTION_FAILED)
+        
+        return None
+    
+    def _detect_conn_incidents_batch(self, logs: List[Dict[str, Any]]) -> List[Tuple[ZeekIncident, Dict[str, Any]]]:
+        """
+        Detecta incidentes em um lote do conn.log de forma vetorizada
+        
+        As regras de _detect_conn_incident são avaliadas sobre colunas NumPy do
+        lote; só os registros que casam são normalizados e viram incidentes.
+        
+        Args:
+            logs: Lista de logs brutos do conn.log
+            
+        Returns:
+            Pares (incidente, log normalizado), na ordem dos logs
+        """
+        matches = detect_conn(ConnColumns(logs))
+        detected = []
+        for index, incident_type in matches.items():
+            normalized = self._normalize_log_fields(logs[index])
+            detected.append((self._conn_incident(normalized, incident_type), normalized))
+        return detected
+    
+    def _conn_incident(self, log: Dict[str, Any], incident_type: str) -> ZeekIncident:
+        """
+        Monta o incidente de conexão do tipo indicado
+        
+        Args:
+            log: Log de conexão normalizado
+            incident_type: HIGH_VOLUME ou CONNECTION_FAILED
+            
+        Returns:
+            Incidente
+        """
+        if incident_type == HIGH_VOLUME:
+            total_bytes = (log.get('orig_bytes', 0) or 0) + (log.get('resp_bytes', 0) or 0)
+            severity = ZeekSeverity.MEDIUM
+            description = f"Alto volume de tráfego detectado: {total_bytes / (1024*1024):.2f} MB"
         else:
-            return None
+            severity = ZeekSeverity.LOW
+            description = f"Conexão falhada com estado: {log.get('conn_state', '')}"
         
         ts = log.get('ts', datetime.now().timestamp())
         device_ip = log.get('id_orig_h', 'unknown')
@@ -546,6 +809,9 @@ class ZeekService:
         Returns:
             Tupla (sucesso, mensagem)
         """
+        if self.local_source is not None:
+            return self.local_source.test_access()
+        
         try:
             if not self.api_token:
                 return False, "Token de autenticação não configurado"
@@ -581,39 +847,42 @@ class ZeekService:
         except Exception as e:
             return False, f"Erro inesperado: {str(e)}"
     
-    def _save_incident_to_database(self, incident: ZeekIncident, raw_log: Dict[str, Any]):
+    def _incident_to_data(self, incident: ZeekIncident, raw_log: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Salva um incidente detectado no banco de dados MySQL
+        Converte um incidente detectado (modelo Pydantic) nos dados aceitos pelo IncidentService
         
         Args:
             incident: Incidente detectado pelo Zeek
             raw_log: Log original para armazenar como dados brutos
         """
-        try:
-            # Converte o modelo Pydantic para o modelo SQLAlchemy
-            incident_data = {
-                'device_ip': incident.device_ip,
-                'device_name': incident.device_name,
-                'incident_type': incident.incident_type,
-                'severity': incident.severity.value.lower(),  # Converte para lowercase
-                'status': incident.status.value.lower(),      # Converte para lowercase
-                'description': incident.description,
-                'detected_at': incident.detected_at,
-                'zeek_log_type': incident.zeek_log_type.value.lower(),  # Converte para lowercase
-                'raw_log_data': json.dumps(raw_log, default=str),
-                'action_taken': incident.action_taken,
-                'assigned_to': None,  # Campo não existe no modelo Pydantic
-                'notes': None         # Campo não existe no modelo Pydantic
-            }
-            
-            # Cria o incidente no banco de dados
-            created_incident = self.incident_service.save_incident(incident_data)
+        return {
+            'device_ip': incident.device_ip,
+            'device_name': incident.device_name,
+            'incident_type': incident.incident_type,
+            'severity': incident.severity.value.lower(),  # Converte para lowercase
+            'status': incident.status.value.lower(),      # Converte para lowercase
+            'description': incident.description,
+            'detected_at': incident.detected_at,
+            'zeek_log_type': incident.zeek_log_type.value.lower(),  # Converte para lowercase
+            'raw_log_data': raw_log,  # Serializado e comprimido pelo IncidentService
+            'action_taken': incident.action_taken,
+            'assigned_to': None,  # Campo não existe no modelo Pydantic
+            'notes': None         # Campo não existe no modelo Pydantic
+        }
+    
+    def _save_incidents_to_database(self, detected: List[Tuple[ZeekIncident, Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Salva os incidentes detectados no banco de dados MySQL, em lote
+        (deduplicação e INSERT de várias linhas em IncidentService.save_incidents_batch)
+        
+        Args:
+            detected: Pares (incidente detectado, log original)
             
-            if created_incident:
-                logger.info(f"Incidente salvo no banco de dados - ID: {created_incident.id}, Tipo: {incident.incident_type}, IP: {incident.device_ip}")
-            else:
-                logger.warning(f"Falha ao salvar incidente no banco - Tipo: {incident.incident_type}, IP: {incident.device_ip}")
-                
-        except Exception as e:
-            logger.error(f"Erro ao salvar incidente no banco de dados: {e}")
-            raise
+        Returns:
+            Contadores do lote (inseridos, duplicados, atacantes)
+        """
+        result = self.incident_service.save_incidents_batch(
+            [self._incident_to_data(incident, raw_log) for incident, raw_log in detected]
+        )
+        logger.debug(f"Incidentes do Zeek persistidos: {result}")
+        return result
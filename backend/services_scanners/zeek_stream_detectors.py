@@ -0,0 +1,435 @@
+"""
+Detectores com estado sobre o fluxo de registros do conn.log.
+
+Diferente de ZeekService._detect_conn_incident, que avalia cada conexão
+isoladamente, estes detectores acumulam contadores por IP de origem em uma
+janela deslizante (no tempo dos registros, campo ts) e geram incidentes quando
+um limiar é atingido:
+- Port Scan: portas de destino distintas (varredura vertical)
+- Network Scan: hosts de destino distintos (varredura horizontal)
+- Brute Force: tentativas de conexão a portas de autenticação (SSH, Telnet, ...)
+  de um mesmo host
+- Failed Connection Burst: conexões recusadas/sem resposta (REJ, S0)
+
+A memória é limitada: no máximo ZEEK_SCAN_MAX_EVENTS eventos por origem e
+ZEEK_SCAN_MAX_SOURCES origens (as menos recentes são descartadas, LRU). Cada
+tipo de incidente tem um período de silêncio por origem (ZEEK_SCAN_COOLDOWN)
+para não repetir o alerta a cada conexão.
+
+O BeaconDetector procura conexões periódicas (típicas de dispositivos IoT
+controlados por botnets) por fluxo (orig_h, resp_h, resp_p): guarda os
+últimos instantes de conexão em um buffer circular e mantém a soma e a soma
+dos quadrados dos intervalos entre eles, de modo que média, variância e
+jitter são atualizados em O(1) por conexão. Fluxos com intervalo regular
+(coeficiente de variação baixo) geram o incidente Periodic Beaconing.
+
+O estado fica em memória nas instâncias compartilhadas (get_scan_detector,
+get_beacon_detector) e é mantido entre os ciclos do worker de ingestão, que é
+quem alimenta os detectores (somente com linhas novas, para não contar a mesma
+conexão duas vezes).
+"""
+import math
+import threading
+from array import array
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import config
+from .zeek_models import ZeekIncident, ZeekIncidentStatus, ZeekLogType, ZeekSeverity
+
+PORT_SCAN = "Port Scan"
+NETWORK_SCAN = "Network Scan"
+BRUTE_FORCE = "Brute Force"
+FAILED_BURST = "Failed Connection Burst"
+BEACONING = "Periodic Beaconing"
+
+
+def _field(log: Dict[str, Any], dotted: str) -> Any:
+    # Aceita registros brutos ("id.orig_h") e normalizados ("id_orig_h")
+    value = log.get(dotted)
+    return log.get(dotted.replace('.', '_')) if value is None else value
+
+
+def _ts(log: Dict[str, Any]) -> Optional[float]:
+    ts = log.get('ts')
+    if isinstance(ts, dict):
+        ts = ts.get('raw')
+    return float(ts) if isinstance(ts, (int, float)) else None
+
+
+class _Counter(dict):
+    """Contagem por chave que remove a chave ao chegar a zero."""
+
+    def add(self, key):
+        self[key] = self.get(key, 0) + 1
+
+    def remove(self, key):
+        count = self[key] - 1
+        if count:
+            self[key] = count
+        else:
+            del self[key]
+
+
+class _SourceState:
+    """Eventos recentes de um IP de origem e contadores derivados."""
+
+    __slots__ = ("events", "ports", "hosts", "auth", "failed", "cooldown")
+
+    def __init__(self):
+        # (ts, resp_h, resp_p, tentativa de autenticação, falhou)
+        self.events: deque = deque()
+        self.ports = _Counter()
+        self.hosts = _Counter()
+        self.auth = _Counter()  # Tentativas a portas de autenticação por host de destino
+        self.failed = 0
+        self.cooldown: Dict[str, float] = {}
+
+    def push(self, event: Tuple[float, Any, Any, bool, bool]) -> None:
+        self.events.append(event)
+        _, host, port, auth, failed = event
+        self.ports.add(port)
+        self.hosts.add(host)
+        if auth:
+            self.auth.add(host)
+        if failed:
+            self.failed += 1
+
+    def pop(self) -> None:
+        _, host, port, auth, failed = self.events.popleft()
+        self.ports.remove(port)
+        self.hosts.remove(host)
+        if auth:
+            self.auth.remove(host)
+        if failed:
+            self.failed -= 1
+
+    def expire(self, before: float) -> None:
+        events = self.events
+        while events and events[0][0] < before:
+            self.pop()
+
+
+class ConnScanDetector:
+    """Varreduras e força bruta por IP de origem em janela deslizante."""
+
+    def __init__(
+        self,
+        window: Optional[float] = None,
+        port_threshold: Optional[int] = None,
+        host_threshold: Optional[int] = None,
+        brute_force_threshold: Optional[int] = None,
+        failed_threshold: Optional[int] = None,
+        auth_ports: Optional[Sequence[int]] = None,
+        cooldown: Optional[float] = None,
+        max_sources: Optional[int] = None,
+        max_events: Optional[int] = None,
+    ):
+        """
+        Args:
+            window: Tamanho da janela em segundos
+            port_threshold: Portas de destino distintas para Port Scan
+            host_threshold: Hosts de destino distintos para Network Scan
+            brute_force_threshold: Tentativas a uma porta de autenticação do mesmo host para Brute Force
+            failed_threshold: Conexões REJ/S0 para Failed Connection Burst
+            auth_ports: Portas consideradas de autenticação
+            cooldown: Segundos sem repetir o mesmo tipo de incidente para a mesma origem
+            max_sources: Origens mantidas em memória (LRU)
+            max_events: Eventos mantidos por origem
+        """
+        self.window = window or config.ZEEK_SCAN_WINDOW
+        self.port_threshold = port_threshold or config.ZEEK_SCAN_PORT_THRESHOLD
+        self.host_threshold = host_threshold or config.ZEEK_SCAN_HOST_THRESHOLD
+        self.brute_force_threshold = brute_force_threshold or config.ZEEK_BRUTE_FORCE_THRESHOLD
+        self.failed_threshold = failed_threshold or config.ZEEK_SCAN_FAILED_THRESHOLD
+        self.auth_ports = frozenset(auth_ports or config.ZEEK_BRUTE_FORCE_PORTS)
+        self.cooldown = cooldown if cooldown is not None else config.ZEEK_SCAN_COOLDOWN
+        self.max_sources = max_sources or config.ZEEK_SCAN_MAX_SOURCES
+        self.max_events = max_events or config.ZEEK_SCAN_MAX_EVENTS
+        self._sources: "OrderedDict[str, _SourceState]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.records = 0
+        self.evicted_sources = 0
+        self.incidents: Dict[str, int] = {}
+
+    def process(self, logs: Sequence[Dict[str, Any]]) -> List[Tuple[ZeekIncident, Dict[str, Any]]]:
+        """
+        Alimenta os detectores com registros novos do conn.log (em ordem de chegada).
+
+        Returns:
+            Pares (incidente, resumo da janela) para os limiares atingidos
+        """
+        detected = []
+        with self._lock:
+            for log in logs:
+                source = _field(log, 'id.orig_h')
+                ts = _ts(log)
+                if not source or ts is None:
+                    continue
+                self.records += 1
+                state = self._state(source)
+                state.expire(ts - self.window)
+                if len(state.events) >= self.max_events:
+                    state.pop()
+
+                port = _field(log, 'id.resp_p')
+                state.push((ts, _field(log, 'id.resp_h'), port, port in self.auth_ports,
+                            log.get('conn_state') in ('REJ', 'S0')))
+                detected.extend(self._check(source, state, ts, log))
+        return detected
+
+    def _state(self, source: str) -> _SourceState:
+        state = self._sources.get(source)
+        if state is None:
+            state = self._sources[source] = _SourceState()
+            if len(self._sources) > self.max_sources:
+                self._sources.popitem(last=False)
+                self.evicted_sources += 1
+        else:
+            self._sources.move_to_end(source)
+        return state
+
+    def _check(self, source: str, state: _SourceState, ts: float,
+               log: Dict[str, Any]) -> List[Tuple[ZeekIncident, Dict[str, Any]]]:
+        found = []
+        if len(state.ports) >= self.port_threshold:
+            found.append((PORT_SCAN, ZeekSeverity.HIGH,
+                          f"Varredura de portas: {len(state.ports)} portas distintas em {self.window:g}s"))
+        if len(state.hosts) >= self.host_threshold:
+            found.append((NETWORK_SCAN, ZeekSeverity.HIGH,
+                          f"Varredura de rede: {len(state.hosts)} hosts distintos em {self.window:g}s"))
+        if state.auth:
+            target, attempts = max(state.auth.items(), key=lambda item: item[1])
+            if attempts >= self.brute_force_threshold:
+                found.append((BRUTE_FORCE, ZeekSeverity.HIGH,
+                              f"Possível força bruta contra {target}: {attempts} tentativas em portas "
+                              f"de autenticação em {self.window:g}s"))
+        if state.failed >= self.failed_threshold:
+            found.append((FAILED_BURST, ZeekSeverity.MEDIUM,
+                          f"{state.failed} conexões recusadas ou sem resposta em {self.window:g}s"))
+
+        detected = []
+        for incident_type, severity, description in found:
+            if state.cooldown.get(incident_type, float('-inf')) > ts:
+                continue
+            state.cooldown[incident_type] = ts + self.cooldown
+            self.incidents[incident_type] = self.incidents.get(incident_type, 0) + 1
+            summary = {
+                'detector': 'conn_scan',
+                'source': source,
+                'window_s': self.window,
+                'window_start': state.events[0][0],
+                'ts': ts,
+                'distinct_ports': len(state.ports),
+                'distinct_hosts': len(state.hosts),
+                'failed_connections': state.failed,
+                'auth_attempts': max(state.auth.values(), default=0),
+                'sample_ports': sorted(state.ports, key=str)[:20],
+                'sample_hosts': sorted(state.hosts, key=str)[:20],
+                'uid': log.get('uid'),
+            }
+            detected.append((ZeekIncident(
+                device_ip=source,
+                incident_type=incident_type,
+                severity=severity,
+                description=description,
+                detected_at=datetime.fromtimestamp(ts),
+                status=ZeekIncidentStatus.NEW,
+                raw_log_data=summary,
+                zeek_log_type=ZeekLogType.CONN
+            ), summary))
+        return detected
+
+    def status(self) -> Dict[str, Any]:
+        """Tamanho do estado e contadores do detector."""
+        return {
+            'window_s': self.window,
+            'sources': len(self._sources),
+            'max_sources': self.max_sources,
+            'evicted_sources': self.evicted_sources,
+            'records': self.records,
+            'incidents': dict(self.incidents),
+        }
+
+
+_scan_detector: Optional[ConnScanDetector] = None
+
+def get_scan_detector() -> ConnScanDetector:
+    """Retorna a instância compartilhada do detector (estado mantido entre ciclos)."""
+    global _scan_detector
+    if _scan_detector is None:
+        _scan_detector = ConnScanDetector()
+    return _scan_detector
+
+
+class _Flow:
+    """Buffer circular com os últimos instantes de conexão de um fluxo."""
+
+    __slots__ = ("times", "head", "count", "sum", "sumsq", "cooldown")
+
+    def __init__(self, size: int):
+        self.times = array('d', bytes(8 * size))
+        self.head = 0  # Posição do instante mais antigo
+        self.count = 0
+        self.sum = 0.0  # Soma dos intervalos entre os instantes guardados
+        self.sumsq = 0.0
+        self.cooldown = float('-inf')
+
+    def last(self) -> float:
+        return self.times[(self.head + self.count - 1) % len(self.times)]
+
+    def push(self, ts: float) -> None:
+        times = self.times
+        size = len(times)
+        if self.count:
+            interval = ts - self.last()
+            self.sum += interval
+            self.sumsq += interval * interval
+        if self.count == size:
+            # Descarta o instante mais antigo e o intervalo que começava nele
+            evicted = times[(self.head + 1) % size] - times[self.head]
+            self.sum -= evicted
+            self.sumsq -= evicted * evicted
+            times[self.head] = ts
+            self.head = (self.head + 1) % size
+        else:
+            times[(self.head + self.count) % size] = ts
+            self.count += 1
+
+    def stats(self) -> Tuple[int, float, float]:
+        """Número de intervalos, média e desvio padrão (jitter)."""
+        n = self.count - 1
+        if n < 1:
+            return 0, 0.0, 0.0
+        mean = self.sum / n
+        variance = max(self.sumsq / n - mean * mean, 0.0)
+        return n, mean, math.sqrt(variance)
+
+
+class BeaconDetector:
+    """Conexões periódicas por fluxo (orig_h, resp_h, resp_p)."""
+
+    def __init__(
+        self,
+        buffer_size: Optional[int] = None,
+        min_events: Optional[int] = None,
+        min_interval: Optional[float] = None,
+        max_cv: Optional[float] = None,
+        ignore_ports: Optional[Sequence[int]] = None,
+        cooldown: Optional[float] = None,
+        max_flows: Optional[int] = None,
+    ):
+        """
+        Args:
+            buffer_size: Instantes guardados por fluxo
+            min_events: Conexões necessárias para avaliar o fluxo
+            min_interval: Intervalo médio mínimo (segundos); conexões mais próximas são agrupadas
+            max_cv: Coeficiente de variação (desvio padrão / média) máximo para considerar periódico
+            ignore_ports: Portas de destino ignoradas (serviços periódicos legítimos, ex: DNS, NTP)
+            cooldown: Segundos sem repetir o incidente para o mesmo fluxo
+            max_flows: Fluxos mantidos em memória (LRU)
+        """
+        self.buffer_size = buffer_size or config.ZEEK_BEACON_BUFFER_SIZE
+        self.min_events = min(min_events or config.ZEEK_BEACON_MIN_EVENTS, self.buffer_size)
+        self.min_interval = min_interval if min_interval is not None else config.ZEEK_BEACON_MIN_INTERVAL
+        self.max_cv = max_cv if max_cv is not None else config.ZEEK_BEACON_MAX_CV
+        self.ignore_ports = frozenset(config.ZEEK_BEACON_IGNORE_PORTS if ignore_ports is None else ignore_ports)
+        self.cooldown = cooldown if cooldown is not None else config.ZEEK_BEACON_COOLDOWN
+        self.max_flows = max_flows or config.ZEEK_BEACON_MAX_FLOWS
+        self._flows: "OrderedDict[Tuple[Any, Any, Any], _Flow]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.records = 0
+        self.evicted_flows = 0
+        self.incidents = 0
+
+    def process(self, logs: Sequence[Dict[str, Any]]) -> List[Tuple[ZeekIncident, Dict[str, Any]]]:
+        """
+        Alimenta o detector com registros novos do conn.log (em ordem de chegada).
+
+        Returns:
+            Pares (incidente, estatísticas do fluxo) para os fluxos periódicos
+        """
+        detected = []
+        with self._lock:
+            for log in logs:
+                port = _field(log, 'id.resp_p')
+                if port in self.ignore_ports:
+                    continue
+                source = _field(log, 'id.orig_h')
+                target = _field(log, 'id.resp_h')
+                ts = _ts(log)
+                if not source or not target or ts is None:
+                    continue
+                self.records += 1
+
+                key = (source, target, port)
+                flow = self._flows.get(key)
+                if flow is None:
+                    flow = self._flows[key] = _Flow(self.buffer_size)
+                    if len(self._flows) > self.max_flows:
+                        self._flows.popitem(last=False)
+                        self.evicted_flows += 1
+                else:
+                    self._flows.move_to_end(key)
+                    # Fora de ordem ou na mesma rajada: conta como a mesma conexão
+                    if ts - flow.last() < self.min_interval:
+                        continue
+                flow.push(ts)
+
+                if flow.count < self.min_events or flow.cooldown > ts:
+                    continue
+                n, mean, jitter = flow.stats()
+                cv = jitter / mean if mean else float('inf')
+                if cv > self.max_cv:
+                    continue
+
+                flow.cooldown = ts + self.cooldown
+                self.incidents += 1
+                summary = {
+                    'detector': 'beacon',
+                    'source': source,
+                    'destination': target,
+                    'port': port,
+                    'connections': flow.count,
+                    'mean_interval_s': round(mean, 3),
+                    'jitter_s': round(jitter, 3),
+                    'variance': round(jitter * jitter, 3),
+                    'cv': round(cv, 4),
+                    'first_ts': flow.times[flow.head],
+                    'ts': ts,
+                    'uid': log.get('uid'),
+                }
+                detected.append((ZeekIncident(
+                    device_ip=source,
+                    incident_type=BEACONING,
+                    severity=ZeekSeverity.MEDIUM,
+                    description=(f"Conexões periódicas para {target}:{port}: {n} intervalos de "
+                                 f"{mean:.1f}s em média (jitter {jitter:.2f}s)"),
+                    detected_at=datetime.fromtimestamp(ts),
+                    status=ZeekIncidentStatus.NEW,
+                    raw_log_data=summary,
+                    zeek_log_type=ZeekLogType.CONN
+                ), summary))
+        return detected
+
+    def status(self) -> Dict[str, Any]:
+        """Tamanho do estado e contadores do detector."""
+        return {
+            'flows': len(self._flows),
+            'max_flows': self.max_flows,
+            'buffer_size': self.buffer_size,
+            'evicted_flows': self.evicted_flows,
+            'records': self.records,
+            'incidents': self.incidents,
+        }
+
+
+_beacon_detector: Optional[BeaconDetector] = None
+
+def get_beacon_detector() -> BeaconDetector:
+    """Retorna a instância compartilhada do detector de beaconing."""
+    global _beacon_detector
+    if _beacon_detector is None:
+        _beacon_detector = BeaconDetector()
+    return _beacon_detector